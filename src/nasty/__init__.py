@@ -29,28 +29,37 @@ __version_info__ = tuple(
 import logging
 
 from nasty.__main__ import main
-from nasty.batch.batch import Batch
+from nasty.batch.batch import Batch, BatchExecutionMode
 from nasty.batch.batch_entry import BatchEntry
-from nasty.batch.batch_results import BatchResults
+from nasty.batch.batch_results import BatchResults, ExportFormat, ExportPartitioning
 from nasty.request.conversation_request import ConversationRequest
 from nasty.request.replies import Replies
-from nasty.request.request import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TWEETS, Request
+from nasty.request.request import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_TWEETS,
+    Request,
+    RequestCheckpoint,
+)
 from nasty.request.search import DEFAULT_FILTER, Search, SearchFilter
 from nasty.request.thread import Thread
 from nasty.tweet.conversation_tweet_stream import ConversationTweetStream
 from nasty.tweet.tweet import Tweet, TweetId, User, UserId
-from nasty.tweet.tweet_stream import TweetStream
+from nasty.tweet.tweet_stream import AsyncTweetStream, TweetStream
 
 __all__ = [
     "main",
     "Batch",
+    "BatchExecutionMode",
     "BatchEntry",
     "BatchResults",
+    "ExportFormat",
+    "ExportPartitioning",
     "ConversationRequest",
     "Replies",
     "DEFAULT_BATCH_SIZE",
     "DEFAULT_MAX_TWEETS",
     "Request",
+    "RequestCheckpoint",
     "DEFAULT_FILTER",
     "Search",
     "SearchFilter",
@@ -61,6 +70,7 @@ __all__ = [
     "User",
     "UserId",
     "TweetStream",
+    "AsyncTweetStream",
 ]
 
 # Don't show log messages in applications that don't configure logging.
@@ -14,11 +14,10 @@
 # limitations under the License.
 #
 
-import json
 import sys
 from datetime import date
 from pathlib import Path
-from typing import Mapping, Optional
+from typing import Mapping, Optional, cast
 
 from nasty_utils import (
     Argument,
@@ -33,12 +32,18 @@ from pydantic import validator
 
 import nasty
 from nasty._settings import NastySettings
+from nasty._util.json_ import dumps, loads
 from nasty._util.tweepy_ import statuses_lookup
 from nasty.batch.batch import Batch
-from nasty.batch.batch_results import BatchResults
+from nasty.batch.batch_results import BatchResults, ExportFormat, ExportPartitioning
 from nasty.request.replies import Replies
 from nasty.request.request import DEFAULT_BATCH_SIZE, Request
-from nasty.request.search import DEFAULT_FILTER, Search, SearchFilter
+from nasty.request.search import (
+    DEFAULT_FILTER,
+    DEFAULT_MAX_WINDOW_TWEETS,
+    Search,
+    SearchFilter,
+)
 from nasty.request.thread import Thread
 from nasty.tweet.tweet import Tweet, TweetId
 
@@ -111,7 +116,7 @@ class RequestProgram(Program):
             batch.dump(self.to_batch)
         else:
             for tweet in request.request():
-                sys.stdout.write(json.dumps(tweet.to_json()) + "\n")
+                sys.stdout.write(dumps(tweet.to_json()) + "\n")
 
     def _build_request(self) -> Request:
         raise NotImplementedError()
@@ -204,6 +209,42 @@ class SearchProgram(RequestProgram):
             raise ValueError("-d/--daily requires -s/--since and -u/--until.")
         return v
 
+    adaptive: bool = Argument(
+        False,
+        short_alias="a",
+        description=(
+            "For a request with since and until date, append search requests for "
+            "time windows adapted to how many Tweets match, e.g., one per hour on "
+            "busy days and one per week on quiet ones. Determining the windows "
+            "requires a few requests to Twitter."
+        ),
+        group=_BATCH_ARGUMENT_GROUP,
+    )
+
+    @validator("adaptive")
+    def _adaptive_validator(
+        cls, v: bool, values: Mapping[str, object]  # noqa:N805
+    ) -> bool:
+        if v and not values["to_batch"]:
+            raise ValueError("-a/--adaptive requires -b/--to-batch.")
+        if v and (values["since"] is None or values["until"] is None):
+            raise ValueError("-a/--adaptive requires -s/--since and -u/--until.")
+        if v and values.get("daily"):
+            raise ValueError("-a/--adaptive can not be used with -d/--daily.")
+        return v
+
+    max_window_tweets: int = Argument(
+        DEFAULT_MAX_WINDOW_TWEETS,
+        alias="max-window-tweets",
+        description=(
+            "Maximum estimated number of Tweets per time window of -a/--adaptive. "
+            "Windows are never larger than -n/--max-tweets, so set that to -1 to "
+            "retrieve all Tweets. Defaults to {:d}.".format(DEFAULT_MAX_WINDOW_TWEETS)
+        ),
+        metavar="N",
+        group=_BATCH_ARGUMENT_GROUP,
+    )
+
     @overrides
     def _build_request(self) -> Search:
         return Search(
@@ -222,6 +263,11 @@ class SearchProgram(RequestProgram):
         if self.daily:
             for daily_request in request.to_daily_requests():
                 super()._batch_submit(batch, daily_request)
+        elif self.adaptive:
+            for adaptive_request in request.to_adaptive_requests(
+                max_window_tweets=self.max_window_tweets
+            ):
+                super()._batch_submit(batch, adaptive_request)
         else:
             super()._batch_submit(batch, request)
 
@@ -320,11 +366,41 @@ class BatchProgram(Program):
         group=_BATCH_ARGUMENT_GROUP,
     )
 
+    incremental: bool = Argument(
+        False,
+        description=(
+            "Instead of skipping search requests completed previously, only retrieve "
+            "Tweets posted since then and add them to the existing results."
+        ),
+        group=_BATCH_ARGUMENT_GROUP,
+    )
+
+    replay: bool = Argument(
+        False,
+        description=(
+            "Instead of contacting Twitter, rebuild the results of all requests from "
+            "the responses archived by previous executions (requires "
+            "NASTY_ARCHIVE_RESPONSES=1 during these)."
+        ),
+        group=_BATCH_ARGUMENT_GROUP,
+    )
+
+    @validator("replay")
+    def _replay_validator(
+        cls, v: bool, values: Mapping[str, object]  # noqa:N805
+    ) -> bool:
+        if v and values.get("incremental"):
+            raise ValueError("--replay can not be used with --incremental.")
+        return v
+
     @overrides
     def run(self) -> None:
         batch = Batch()
         batch.load(self.batch_file)
-        batch.execute(self.results_dir)
+        if self.replay:
+            batch.replay(self.results_dir)
+        else:
+            batch.execute(self.results_dir, incremental=self.incremental)
 
 
 _IDIFY_ARGUMENT_GROUP = ArgumentGroup(
@@ -381,7 +457,9 @@ class IdifyProgram(Program):
             batch_results.idify(self.out_dir if self.out_dir else self.in_dir)
         else:
             for line in sys.stdin:
-                sys.stdout.write(str(Tweet(json.loads(line)).id) + "\n")
+                sys.stdout.write(
+                    str(Tweet(cast(Mapping[str, object], loads(line))).id) + "\n"
+                )
 
 
 _UNIDIFY_ARGUMENT_GROUP = ArgumentGroup(
@@ -445,7 +523,68 @@ class UnidifyProgram(Program):
                 (TweetId(line.strip()) for line in sys.stdin), self.settings.twitter_api
             ):
                 if tweet is not None:
-                    sys.stdout.write(json.dumps(tweet.to_json()) + "\n")
+                    sys.stdout.write(dumps(tweet.to_json()) + "\n")
+
+
+_EXPORT_ARGUMENT_GROUP = ArgumentGroup(
+    name="Export Arguments",
+    description="Control the format and layout of the exported dataset.",
+)
+
+
+class ExportProgram(Program):
+    class Config(ProgramConfig):
+        title = "export"
+        aliases = ("e", "exp")
+        description = (
+            "Convert batch results to a columnar dataset (Parquet/Arrow) for analytics."
+        )
+
+    settings: NastySettings = Argument(
+        alias="config", description="Overwrite default config file path."
+    )
+
+    in_dir: Path = Argument(
+        alias="in-dir",
+        short_alias="i",
+        description="Directory with results of a batch of requests.",
+        metavar="DIR",
+        group=_EXPORT_ARGUMENT_GROUP,
+    )
+
+    out_dir: Path = Argument(
+        alias="out-dir",
+        short_alias="o",
+        description="Directory to which the dataset will be written.",
+        metavar="DIR",
+        group=_EXPORT_ARGUMENT_GROUP,
+    )
+
+    format_: ExportFormat = Argument(
+        ExportFormat.PARQUET,
+        alias="format",
+        short_alias="f",
+        description="File format (PARQUET, ARROW). Defaults to 'PARQUET'.",
+        group=_EXPORT_ARGUMENT_GROUP,
+    )
+
+    partitioning: ExportPartitioning = Argument(
+        ExportPartitioning.ENTRY,
+        alias="partition-by",
+        short_alias="p",
+        description=(
+            "Write one file per entry (ENTRY) or per entry and creation day of Tweets "
+            "(DATE). Defaults to 'ENTRY'."
+        ),
+        group=_EXPORT_ARGUMENT_GROUP,
+    )
+
+    @overrides
+    def run(self) -> None:
+        batch_results = BatchResults(self.in_dir)
+        batch_results.export(
+            self.out_dir, format_=self.format_, partitioning=self.partitioning
+        )
 
 
 class NastyProgram(Program):
@@ -460,6 +599,7 @@ class NastyProgram(Program):
             BatchProgram,
             IdifyProgram,
             UnidifyProgram,
+            ExportProgram,
         )
 
     settings: NastySettings = Argument(
@@ -0,0 +1,251 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+from functools import partial
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Generic, Optional, Sequence, Union
+
+import requests
+from overrides import overrides
+from requests.exceptions import RetryError
+from typing_extensions import Final
+
+from .._util.errors import UnexpectedStatusCodeException
+from ..request.request import RequestCheckpoint
+from ..tweet.tweet import Tweet
+from ..tweet.tweet_stream import AsyncTweetStream
+from .request_scheduler import request_scheduler
+from .retriever import (
+    Retriever,
+    RetrieverBatch,
+    _determine_crawl_delay,
+    _FetchAttempts,
+    _RetrievedTweets,
+    _T_Request,
+)
+
+logger = getLogger(__name__)
+
+
+class AsyncRetrieverTweetStream(AsyncTweetStream):
+    def __init__(
+        self,
+        update_callback: Callable[[], Awaitable[bool]],
+        close_callback: Optional[Callable[[], None]] = None,
+    ):
+        self._update_callback: Final = update_callback
+        self._close_callback: Final = close_callback
+        self._closed = False
+        self._tweets: Sequence[Tweet] = []
+        self._tweets_position = 0
+        self._checkpoint: Optional[RequestCheckpoint] = None
+
+    def update_tweets(self, retrieved_tweets: _RetrievedTweets) -> None:
+        self._tweets = retrieved_tweets.tweets
+        self._tweets_position = 0
+        self._checkpoint = retrieved_tweets.checkpoint
+
+    @overrides
+    def checkpoint(self) -> Optional[RequestCheckpoint]:
+        if self._tweets_position != len(self._tweets):
+            return None
+        return self._checkpoint
+
+    @overrides
+    def close(self) -> None:
+        self._closed = True
+        self._tweets = []
+        self._tweets_position = 0
+        if self._close_callback is not None:
+            self._close_callback()
+
+    @overrides
+    async def __anext__(self) -> Tweet:
+        if self._tweets_position == len(self._tweets):
+            if self._closed or not await self._update_callback():
+                raise StopAsyncIteration()
+
+        self._tweets_position += 1
+        return self._tweets[self._tweets_position - 1]
+
+
+_PrefetchResult = Union[Optional[_RetrievedTweets], Exception]
+
+
+class _AsyncPrefetcher:
+    """Retrieves the upcoming batches of a timeline in a separate task.
+
+    Counterpart of the Retriever's prefetching for asyncio, buffering up to depth
+    batches. close() cancels the task, e.g., if the consumer stops early.
+    """
+
+    def __init__(
+        self,
+        retrieve_next_tweets: Callable[[], Awaitable[Optional[_RetrievedTweets]]],
+        depth: int,
+    ):
+        self._retrieve_next_tweets: Final = retrieve_next_tweets
+        self._queue: Final["asyncio.Queue[_PrefetchResult]"] = asyncio.Queue(
+            maxsize=depth
+        )
+        self._exhausted = False
+        self._closed = False
+        self._task: Final = asyncio.ensure_future(self._run())
+
+    async def next(self) -> Optional[_RetrievedTweets]:
+        if self._exhausted:
+            return None
+
+        result = await self._queue.get()
+        if result is None or isinstance(result, Exception):
+            self._exhausted = True
+            await self._task
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self) -> None:
+        self._exhausted = True
+        self._closed = True
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        # Whatever ends the task, the consumer must not wait for batches forever.
+        result: _PrefetchResult = RuntimeError("Prefetching stopped unexpectedly.")
+        try:
+            while True:
+                retrieved_tweets = await self._retrieve_next_tweets()
+                if retrieved_tweets is None:
+                    break
+                await self._queue.put(retrieved_tweets)
+            result = None
+        except Exception as e:
+            result = e
+        finally:
+            if not self._closed:
+                await self._queue.put(result)
+
+
+class AsyncRetriever(Generic[_T_Request]):
+    """Retrieves the timeline of a Retriever on an asyncio event loop.
+
+    URL construction, batch parsing and retry decisions are delegated to the wrapped
+    Retriever. The blocking HTTP calls of its session are run in the event loop's
+    default executor, while waiting for the crawl-delay happens on the event loop
+    itself. This allows many timelines to be retrieved concurrently without having to
+    dedicate a thread to each of them. NASTY_PREFETCH_DEPTH is respected like for the
+    Retriever, with batches being prefetched in a separate task.
+    """
+
+    def __init__(self, retriever: Retriever[_T_Request]):
+        self._retriever: Final = retriever
+        self._tweet_stream: Final = AsyncRetrieverTweetStream(
+            self._update_tweet_stream, self._close_tweet_stream
+        )
+        self._prefetcher: Optional[_AsyncPrefetcher] = None
+
+    @property
+    def tweet_stream(self) -> AsyncRetrieverTweetStream:
+        return self._tweet_stream
+
+    async def _update_tweet_stream(self) -> bool:
+        if self._retriever._prefetch_depth:
+            if self._prefetcher is None:
+                self._prefetcher = _AsyncPrefetcher(
+                    self._retrieve_next_tweets, self._retriever._prefetch_depth
+                )
+            retrieved_tweets = await self._prefetcher.next()
+        else:
+            retrieved_tweets = await self._retrieve_next_tweets()
+
+        if retrieved_tweets is None or not retrieved_tweets.tweets:
+            return False
+        self.tweet_stream.update_tweets(retrieved_tweets)
+        return True
+
+    def _close_tweet_stream(self) -> None:
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+    async def _retrieve_next_tweets(self) -> Optional[_RetrievedTweets]:
+        if self._retriever._request_finished:
+            return None
+
+        if self._retriever._needs_new_twitter_session():
+            await self._fetch_new_twitter_session()
+
+        fetch_attempts = _FetchAttempts()
+        while True:
+            try:
+                batch = await self._fetch_batch()
+            except (RetryError, UnexpectedStatusCodeException) as e:
+                if not fetch_attempts.retry_with_new_session(e):
+                    return None
+                await self._fetch_new_twitter_session(
+                    invalidate_guest_token=isinstance(e, UnexpectedStatusCodeException)
+                )
+                continue
+
+            if not batch.tweets:
+                if not fetch_attempts.retry_after_empty_batch():
+                    return None
+                continue
+
+            retrieved_tweets = self._retriever._consume_batch(batch)
+            if retrieved_tweets.tweets or self._retriever._request_finished:
+                return retrieved_tweets
+            # All Tweets of the batch were known already, continue with the next one.
+            fetch_attempts = _FetchAttempts()
+
+    async def _fetch_new_twitter_session(
+        self, *, invalidate_guest_token: bool = False
+    ) -> None:
+        # Credentials are shared by all retrievers and new ones only need to be fetched
+        # rarely, so simply establish the session in the executor.
+        await asyncio.get_event_loop().run_in_executor(
+            None,
+            partial(
+                self._retriever._fetch_new_twitter_session,
+                invalidate_guest_token=invalidate_guest_token,
+            ),
+        )
+
+    async def _fetch_batch(self) -> RetrieverBatch:
+        if self._retriever._is_replaying():
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self._retriever._replay_batch
+            )
+        response = await self._session_get(**self._retriever._batch_url())
+        return self._retriever._process_batch_response(response)
+
+    async def _session_get(self, url: str, **kwargs: Any) -> requests.Response:
+        loop = asyncio.get_event_loop()
+
+        response = await loop.run_in_executor(
+            None, partial(self._retriever._lookup_get, url, **kwargs)
+        )
+        if response is not None:
+            return response
+
+        delay = await loop.run_in_executor(
+            None, _determine_crawl_delay, self._retriever._session
+        )
+        await request_scheduler.wait_async(url, self._retriever._session.headers, delay)
+
+        return await loop.run_in_executor(
+            None, partial(self._retriever._perform_get, url, **kwargs)
+        )
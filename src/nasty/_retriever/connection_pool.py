@@ -0,0 +1,186 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+from logging import getLogger
+from threading import Lock
+from typing import Any, NamedTuple, Optional, Type
+
+import requests
+from overrides import overrides
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from typing_extensions import Final
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from .transport import retry_policy
+
+logger = getLogger(__name__)
+
+
+class ConnectionPoolStats(NamedTuple):
+    num_requests: int
+    num_opened_connections: int
+
+    @property
+    def num_reused_connections(self) -> int:
+        """Number of requests that were sent over an already open connection."""
+        return max(self.num_requests - self.num_opened_connections, 0)
+
+    def since(self, earlier: "ConnectionPoolStats") -> "ConnectionPoolStats":
+        """Returns the stats counted after the given earlier ones were taken."""
+
+        return ConnectionPoolStats(
+            num_requests=self.num_requests - earlier.num_requests,
+            num_opened_connections=(
+                self.num_opened_connections - earlier.num_opened_connections
+            ),
+        )
+
+
+class _ConnectionCounters:
+    def __init__(self) -> None:
+        self._lock: Final = Lock()
+        self.num_requests = 0
+        self.num_opened_connections = 0
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.num_requests += 1
+
+    def count_opened_connection(self) -> None:
+        with self._lock:
+            self.num_opened_connections += 1
+
+
+def _counting_pool_type(
+    pool_type: Type[HTTPConnectionPool], counters: _ConnectionCounters
+) -> Type[HTTPConnectionPool]:
+    """Subclasses the urllib3 pool type to count requests and opened connections."""
+
+    class CountingConnection(pool_type.ConnectionCls):  # type: ignore
+        def connect(self) -> None:
+            counters.count_opened_connection()
+            super().connect()
+
+    class CountingConnectionPool(pool_type):  # type: ignore
+        ConnectionCls = CountingConnection
+
+        def _get_conn(self, timeout: Optional[float] = None) -> Any:
+            counters.count_request()
+            return super()._get_conn(timeout)
+
+    return CountingConnectionPool
+
+
+class _SharedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that may be mounted on many sessions at the same time.
+
+    Sessions close their adapters when they are closed, so closing is ignored here
+    and only done by the ConnectionPool owning the adapter.
+    """
+
+    def __init__(self, counters: _ConnectionCounters, **kwargs: Any):
+        # Needs to be set before super().__init__(), which calls init_poolmanager().
+        self._counters = counters
+        super().__init__(**kwargs)
+
+    @overrides
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_type(HTTPConnectionPool, self._counters),
+            "https": _counting_pool_type(HTTPSConnectionPool, self._counters),
+        }
+
+    @overrides
+    def close(self) -> None:
+        pass
+
+    def close_connections(self) -> None:
+        super().close()
+
+
+class ConnectionPool:
+    """HTTP connections shared by all retrievers of the process.
+
+    Without it, each retriever would open new connections (including TCP and TLS
+    handshakes) to each Twitter host it accesses, as retrievers only live for a single
+    request. Instead, all retrievers mount the same HTTPAdapter on their sessions,
+    whose connections are kept alive and reused across requests. Cookies and headers
+    are still separate, because they are stored in each retriever's session. The
+    adapter is thread-safe, and keeps up to pool_maxsize idle connections per host,
+    which should be at least the number of concurrently executed requests (see
+    resize()). Child processes create their own connections, because connections can
+    not be shared across processes.
+    """
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOLSIZE):
+        self._lock: Final = Lock()
+        self._counters: Final = _ConnectionCounters()
+        self._pool_maxsize = pool_maxsize
+        self._adapter: Optional[_SharedHTTPAdapter] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self._pool_maxsize
+
+    def mount(self, session: requests.Session) -> None:
+        adapter = self._get_adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def resize(self, num_workers: int) -> None:
+        """Sizes the pool for the given number of concurrently executed requests.
+
+        The previous connections are closed. Sessions mounted before keep using the
+        previous adapter, which opens new connections for them where needed.
+        """
+
+        pool_maxsize = max(num_workers, DEFAULT_POOLSIZE)
+        with self._lock:
+            if pool_maxsize != self._pool_maxsize:
+                self._pool_maxsize = pool_maxsize
+                if self._adapter is not None:
+                    self._adapter.close_connections()
+                self._adapter = None
+
+    def stats(self) -> ConnectionPoolStats:
+        return ConnectionPoolStats(
+            num_requests=self._counters.num_requests,
+            num_opened_connections=self._counters.num_opened_connections,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close_connections()
+            self._adapter = None
+
+    def _get_adapter(self) -> _SharedHTTPAdapter:
+        with self._lock:
+            if self._adapter is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._adapter = _SharedHTTPAdapter(
+                    self._counters,
+                    pool_connections=DEFAULT_POOLSIZE,
+                    pool_maxsize=self._pool_maxsize,
+                    max_retries=retry_policy(),
+                )
+            return self._adapter
+
+
+connection_pool: Final = ConnectionPool()
@@ -15,7 +15,7 @@
 #
 
 from abc import ABC, abstractmethod
-from typing import Iterable, Mapping, Type, TypeVar, cast
+from typing import Any, Iterable, Mapping, Sequence, Type, TypeVar, cast
 
 from overrides import overrides
 
@@ -38,7 +38,7 @@ class ConversationRetrieverBatch(RetrieverBatch, ABC):
 
     @abstractmethod
     @overrides
-    def _tweet_ids(self) -> Iterable[TweetId]:
+    def _tweet_ids(self, instructions: Sequence[Any]) -> Iterable[TweetId]:
         pass
 
 
@@ -0,0 +1,272 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import timedelta
+from enum import Enum
+from logging import getLogger
+from pathlib import Path
+from time import time
+from typing import Any, Mapping, Optional, Sequence, Tuple, cast
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from overrides import overrides
+from requests.cookies import create_cookie
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from typing_extensions import Final
+
+from .._util.json_ import dumps, loads
+from .._util.typing_ import checked_cast
+from .transport import Transport
+
+logger = getLogger(__name__)
+
+# Request headers that influence the response and thus need to match. All others, in
+# particular the bearer and guest tokens, only identify the client.
+MATCH_HEADERS: Final = ("Accept-Language",)
+
+_CREATE_TABLE: Final = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        status_code INTEGER NOT NULL,
+        reason TEXT,
+        headers TEXT NOT NULL,
+        cookies TEXT NOT NULL,
+        content BLOB NOT NULL,
+        recorded_at REAL NOT NULL
+    )
+"""
+
+
+class HttpCacheMissException(LookupError):
+    def __init__(self, url: str):
+        self.url: Final = url
+        super().__init__('No cached response for URL "{:s}".'.format(url))
+
+
+class HttpCache:
+    """Records HTTP responses in a SQLite database, so that they can be replayed.
+
+    Responses are keyed by their normalized request, i.e., its method, its URL with
+    sorted query parameters, its body, and the values of the MATCH_HEADERS. Other
+    headers and cookies are ignored, so that requests still match when Twitter hands
+    out different tokens. Bodies are stored as raw BLOBs. If expire_after is given,
+    responses recorded longer ago than that are ignored.
+
+    The database is opened in WAL mode with one connection per thread, so that
+    lookups do not block each other. Multiple processes can share a database.
+    """
+
+    def __init__(self, path: Path, *, expire_after: Optional[timedelta] = None):
+        self.path: Final = path
+        self.expire_after: Final = expire_after
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._connection().execute(_CREATE_TABLE)
+
+    def __len__(self) -> int:
+        return cast(
+            int,
+            self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0],
+        )
+
+    def get(self, request: requests.PreparedRequest) -> Optional[requests.Response]:
+        """Returns the cached response to the request, if it is cached and fresh."""
+
+        row = (
+            self._connection()
+            .execute(
+                "SELECT url, status_code, reason, headers, cookies, content, "
+                "recorded_at FROM responses WHERE key = ?",
+                (_request_key(request),),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        url, status_code, reason, headers, cookies, content, recorded_at = row
+        if (
+            self.expire_after is not None
+            and recorded_at + self.expire_after.total_seconds() < time()
+        ):
+            return None
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(
+            cast(Sequence[Tuple[str, str]], loads(headers))
+        )
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = bytes(content)
+        response.url = url
+        response.request = request
+        response.elapsed = timedelta()
+        for cookie in cast(Sequence[Mapping[str, Any]], loads(cookies)):
+            response.cookies.set_cookie(create_cookie(**cookie))
+        return response
+
+    def put(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        """Records the response to the request.
+
+        The request is given separately, as the request of the response may differ
+        after following redirects.
+        """
+
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+            }
+            for cookie in response.cookies
+        ]
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _request_key(request),
+                    response.url,
+                    response.status_code,
+                    response.reason,
+                    dumps(list(response.headers.items())),
+                    dumps(cookies),
+                    sqlite3.Binary(response.content),
+                    time(),
+                ),
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections can neither be shared across threads nor processes.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(str(self.path), timeout=60.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return cast(sqlite3.Connection, connection)
+
+
+def _request_key(request: requests.PreparedRequest) -> str:
+    url = urlsplit(checked_cast(str, request.url))
+    query = urlencode(sorted(parse_qsl(url.query, keep_blank_values=True)))
+    key = hashlib.sha256(
+        "\n".join(
+            [cast(str, request.method), url.scheme, url.netloc, url.path, query]
+            + [
+                checked_cast(str, request.headers.get(name, ""))
+                for name in MATCH_HEADERS
+            ]
+        ).encode("UTF-8")
+    )
+    if request.body:
+        body = request.body
+        key.update(
+            body if isinstance(body, bytes) else checked_cast(str, body).encode("UTF-8")
+        )
+    return key.hexdigest()
+
+
+class HttpCacheMode(Enum):
+    """How the CachingTransport uses its HttpCache.
+
+    - RECORD: Requests are answered from the cache. Those not cached are performed
+        and their responses recorded, if successful.
+    - REPLAY: Requests are only answered from the cache, no requests are performed.
+        Requests that are not cached fail with an HttpCacheMissException.
+    - REGENERATE: All requests are performed and their responses recorded, replacing
+        the cached ones.
+    """
+
+    RECORD = "RECORD"
+    REPLAY = "REPLAY"
+    REGENERATE = "REGENERATE"
+
+
+class CachingTransport(Transport):
+    """Answers requests from an HttpCache, performing the others via a transport.
+
+    Cached responses are returned from lookup(), so that retrievers neither wait for
+    the crawl-delay nor for rate limits before receiving them.
+
+    In RECORD mode, requests that bootstrap a Twitter session (the timeline HTML stub
+    and the JS-script) are always performed, as the guest token of a cached stub
+    would long have expired. Their responses are still recorded, so that sessions can
+    be bootstrapped in REPLAY mode.
+    """
+
+    def __init__(self, transport: Transport, cache: HttpCache, mode: HttpCacheMode):
+        self.transport: Final = transport
+        self.cache: Final = cache
+        self.mode: Final = mode
+
+    @overrides
+    def lookup(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+        session_bootstrap: bool = False,
+    ) -> Optional[requests.Response]:
+        if self.mode == HttpCacheMode.REGENERATE or (
+            self.mode == HttpCacheMode.RECORD and session_bootstrap
+        ):
+            return None
+
+        request = session.prepare_request(
+            requests.Request("GET", url, params=params)  # type: ignore
+        )
+        response = self.cache.get(request)
+        if response is None:
+            if self.mode == HttpCacheMode.REPLAY:
+                raise HttpCacheMissException(checked_cast(str, request.url))
+            return None
+
+        logger.debug("    Found cached response for {}".format(response.url))
+        session.cookies.update(response.cookies)
+        return response
+
+    @overrides
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+    ) -> requests.Response:
+        request = session.prepare_request(
+            requests.Request("GET", url, params=params)  # type: ignore
+        )
+        response = self.transport.get(session, url, params=params)
+        # Do not replay transient errors, like rate limits.
+        if response.ok:
+            self.cache.put(request, response)
+        return response
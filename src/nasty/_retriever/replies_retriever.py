@@ -14,10 +14,9 @@
 # limitations under the License.
 #
 
-from typing import Any, Iterable, Optional, Sequence, Type, cast
+from typing import Any, Iterable, Optional, Sequence, Type
 
 from overrides import overrides
-from typing_extensions import Final
 
 from .._util.typing_ import checked_cast
 from ..request.replies import Replies
@@ -27,10 +26,7 @@ from .conversation_retriever import ConversationRetriever, ConversationRetriever
 
 class RepliesRetrieverBatch(ConversationRetrieverBatch):
     @overrides
-    def _tweet_ids(self) -> Iterable[TweetId]:
-        instructions: Final = cast(
-            Sequence[Any], self._json["timeline"]["instructions"]
-        )
+    def _tweet_ids(self, instructions: Sequence[Any]) -> Iterable[TweetId]:
 
         # Replies are nested in conversation threads contained in instructions. Batches
         # look like this:
@@ -179,10 +175,7 @@ class RepliesRetrieverBatch(ConversationRetrieverBatch):
                 )
 
     @overrides
-    def _next_cursor(self) -> Optional[str]:
-        instructions: Final = cast(
-            Sequence[Any], self._json["timeline"]["instructions"]
-        )
+    def _next_cursor(self, instructions: Sequence[Any]) -> Optional[str]:
 
         if "addEntries" not in instructions[0]:
             return None
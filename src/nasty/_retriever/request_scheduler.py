@@ -0,0 +1,235 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+from logging import getLogger
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from typing_extensions import Final
+
+from ..storage.crawl_delay_table import CrawlDelayTable
+
+logger = getLogger(__name__)
+
+_RateLimitKey = Tuple[str, Optional[str]]
+
+
+class RequestSchedulerStats(NamedTuple):
+    queue_depth: int
+    num_requests: int
+    num_delayed_requests: int
+    total_wait_time: float
+    max_wait_time: float
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.total_wait_time / self.num_requests if self.num_requests else 0.0
+
+
+class _RateLimitBudget:
+    """Remaining requests of a rate limit window as announced by X-Rate-Limit-*.
+
+    Requests are subtracted as soon as they are scheduled, so that concurrently
+    scheduled requests can not overshoot the limit before their responses arrive.
+    """
+
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None  # In monotonic() time.
+
+    def available_at(self, now: float) -> float:
+        if self.reset is None or self.reset <= now:
+            return now
+        if self.remaining is None or self.remaining > 0:
+            return now
+        return self.reset
+
+    def consume(self, now: float) -> None:
+        if self.reset is not None and self.reset <= now:
+            # Rate limit window has been reset, we no longer know anything about it.
+            self.remaining = None
+            self.reset = None
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    def update(self, remaining: int, reset: float) -> None:
+        if self.reset is None or abs(self.reset - reset) > 1.0:
+            # New rate limit window.
+            self.remaining = remaining
+        else:
+            # An exhausted budget (remaining == 0) stays exhausted until the reset.
+            self.remaining = (
+                remaining if self.remaining is None else min(remaining, self.remaining)
+            )
+        self.reset = reset
+
+
+class RequestScheduler:
+    """Decides when each request to Twitter may be performed.
+
+    All requests of all retrievers of the process are scheduled centrally:
+    - Requests to the same host are spaced at least crawl-delay seconds apart,
+      regardless of how many threads or tasks perform requests. If a CrawlDelayTable
+      is set, slots are reserved from it instead, so that the requests of multiple
+      processes sharing it are spaced apart together.
+    - For requests carrying a guest token, the X-Rate-Limit-Remaining and
+      X-Rate-Limit-Reset headers of previous responses are tracked. Once no requests
+      remain in the current window, further requests wait until the window is reset.
+
+    For monitoring, stats() reports how many requests are currently waiting and how
+    long requests had to wait so far.
+    """
+
+    def __init__(self) -> None:
+        self._lock: Final = Lock()
+        self._next_slot: Dict[str, float] = {}
+        self._budgets: Dict[_RateLimitKey, _RateLimitBudget] = {}
+        self._crawl_delay_table: Optional[CrawlDelayTable] = None
+
+        self._queue_depth = 0
+        self._num_requests = 0
+        self._num_delayed_requests = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def wait(
+        self, url: str, headers: Mapping[str, str], crawl_delay: Optional[float]
+    ) -> None:
+        """Blocks until a request to the given URL may be performed."""
+
+        delay = self._reserve(url, headers, crawl_delay)
+        if delay <= 0:
+            return
+
+        self._enter_queue()
+        try:
+            sleep(delay)
+        finally:
+            self._leave_queue()
+
+    async def wait_async(
+        self, url: str, headers: Mapping[str, str], crawl_delay: Optional[float]
+    ) -> None:
+        """Waits on the event loop until a request to the given URL may be performed."""
+
+        delay = self._reserve(url, headers, crawl_delay)
+        if delay <= 0:
+            return
+
+        self._enter_queue()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._leave_queue()
+
+    def update(self, response: requests.Response) -> None:
+        """Tracks rate limit information from the headers of a response."""
+
+        if (
+            "X-Rate-Limit-Remaining" not in response.headers
+            or "X-Rate-Limit-Reset" not in response.headers
+        ):
+            return
+
+        remaining = int(response.headers["X-Rate-Limit-Remaining"])
+        # X-Rate-Limit-Reset is given as UNIX timestamp, convert to monotonic() time.
+        reset = monotonic() + float(response.headers["X-Rate-Limit-Reset"]) - time()
+
+        key = self._rate_limit_key(response.url, response.request.headers)
+        with self._lock:
+            self._budgets.setdefault(key, _RateLimitBudget()).update(remaining, reset)
+
+    def stats(self) -> RequestSchedulerStats:
+        with self._lock:
+            return RequestSchedulerStats(
+                queue_depth=self._queue_depth,
+                num_requests=self._num_requests,
+                num_delayed_requests=self._num_delayed_requests,
+                total_wait_time=self._total_wait_time,
+                max_wait_time=self._max_wait_time,
+            )
+
+    def set_crawl_delay_table(
+        self, crawl_delay_table: Optional[CrawlDelayTable]
+    ) -> None:
+        with self._lock:
+            self._crawl_delay_table = crawl_delay_table
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next_slot.clear()
+            self._budgets.clear()
+
+    @classmethod
+    def _rate_limit_key(cls, url: str, headers: Mapping[str, str]) -> _RateLimitKey:
+        return urlparse(url).netloc, headers.get("X-Guest-Token")
+
+    def _reserve(
+        self, url: str, headers: Mapping[str, str], crawl_delay: Optional[float]
+    ) -> float:
+        """Reserves the next slot for a request and returns seconds until it."""
+
+        host = urlparse(url).netloc
+        key = self._rate_limit_key(url, headers)
+        with self._lock:
+            now = monotonic()
+            slot = now
+
+            budget = self._budgets.get(key)
+            if budget is not None:
+                slot = max(slot, budget.available_at(now))
+                budget.consume(slot)
+
+            crawl_delay_table = self._crawl_delay_table
+            if crawl_delay is not None and crawl_delay_table is None:
+                slot = max(slot, self._next_slot.get(host, now))
+                self._next_slot[host] = slot + crawl_delay
+
+        if crawl_delay is not None and crawl_delay_table is not None:
+            # Reserved without holding the lock, as the table locks and rewrites a
+            # file, which would otherwise stall all other threads. The table is shared
+            # across processes, so its slots are in time().
+            earliest = slot + time() - now
+            slot += crawl_delay_table.reserve(host, earliest, crawl_delay) - earliest
+
+        delay = slot - monotonic()
+        with self._lock:
+            self._num_requests += 1
+            if delay > 0:
+                self._num_delayed_requests += 1
+                self._total_wait_time += delay
+                self._max_wait_time = max(self._max_wait_time, delay)
+
+        if budget is not None and budget.reset is not None and slot >= budget.reset:
+            logger.info(
+                "Rate limit for {} exhausted, waiting {:.0f}s.".format(host, delay)
+            )
+        return delay
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            self._queue_depth += 1
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self._queue_depth -= 1
+
+
+request_scheduler: Final = RequestScheduler()
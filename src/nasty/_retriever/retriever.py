@@ -19,52 +19,92 @@ from abc import ABC, abstractmethod
 from http import HTTPStatus
 from logging import getLogger
 from os import getenv
-from time import sleep
+from queue import Empty, Queue
+from threading import Event, Thread
 from typing import (
     Any,
     Callable,
+    Dict,
     Generic,
     Iterable,
     Mapping,
+    NamedTuple,
     Optional,
     Sequence,
+    Tuple,
     Type,
     TypeVar,
+    Union,
     cast,
 )
 
 import requests
 from overrides import overrides
-from requests.adapters import HTTPAdapter
 from requests.exceptions import RetryError
 from typing_extensions import Final, final
-from urllib3 import Retry
 
 from .._util.errors import UnexpectedStatusCodeException
+from .._util.json_ import loads
 from .._util.typing_ import checked_cast
-from ..request.request import Request
+from ..request.request import Request, RequestCheckpoint
+from ..storage.response_archive import get_response_archive
 from ..tweet.tweet import Tweet, TweetId, UserId
 from ..tweet.tweet_stream import TweetStream
+from .connection_pool import connection_pool
+from .request_scheduler import request_scheduler
+from .robots_txt import get_robots_txt_cache
+from .transport import get_transport
+from .twitter_credentials import GuestToken, twitter_credentials
 
 logger = getLogger(__name__)
 
-crawl_delay: Optional[float] = None
+
+class _RetrievedTweets(NamedTuple):
+    """Tweets of a batch together with the checkpoint directly after them.
+
+    checkpoint is None if the request is finished after this batch.
+    """
+
+    tweets: Sequence[Tweet]
+    checkpoint: Optional[RequestCheckpoint]
 
 
 class RetrieverTweetStream(TweetStream):
-    def __init__(self, update_callback: Callable[[], bool]):
+    def __init__(
+        self,
+        update_callback: Callable[[], bool],
+        close_callback: Optional[Callable[[], None]] = None,
+    ):
         self._update_callback: Final = update_callback
+        self._close_callback: Final = close_callback
+        self._closed = False
         self._tweets: Sequence[Tweet] = []
         self._tweets_position = 0
+        self._checkpoint: Optional[RequestCheckpoint] = None
 
-    def update_tweets(self, tweets: Sequence[Tweet]) -> None:
-        self._tweets = tweets
+    def update_tweets(self, retrieved_tweets: _RetrievedTweets) -> None:
+        self._tweets = retrieved_tweets.tweets
+        self._tweets_position = 0
+        self._checkpoint = retrieved_tweets.checkpoint
+
+    @overrides
+    def checkpoint(self) -> Optional[RequestCheckpoint]:
+        if self._tweets_position != len(self._tweets):
+            return None
+        return self._checkpoint
+
+    @overrides
+    def close(self) -> None:
+        self._closed = True
+        self._tweets = []
         self._tweets_position = 0
+        if self._close_callback is not None:
+            self._close_callback()
 
     @overrides
     def __next__(self) -> Tweet:
         if self._tweets_position == len(self._tweets):
-            if not self._update_callback():
+            if self._closed or not self._update_callback():
                 raise StopIteration()
 
         self._tweets_position += 1
@@ -72,24 +112,31 @@ class RetrieverTweetStream(TweetStream):
 
 
 class RetrieverBatch(ABC):
+    """Tweets and next cursor parsed from the response to a batch request.
+
+    The parsed response JSON is owned by the batch: the JSON of each Tweet is completed
+    in place instead of copied, and the response itself is not kept, so that all of it
+    but the Tweets can be freed as soon as the batch is constructed.
+    """
+
     def __init__(self, json: Mapping[str, Mapping[str, object]]):
-        self._json: Final = json
-        self.tweets: Final = self._tweets()
-        self.next_cursor: Final = self._next_cursor()
+        instructions = cast(Sequence[Any], json["timeline"]["instructions"])
+        self.tweets: Final = self._tweets(json["globalObjects"], instructions)
+        self.next_cursor: Final = self._next_cursor(instructions)
 
     @final
-    def _tweets(self) -> Sequence[Tweet]:
+    def _tweets(
+        self, global_objects: Mapping[str, object], instructions: Sequence[Any]
+    ) -> Sequence[Tweet]:
         id_to_tweet_json: Final = cast(
-            Mapping[TweetId, Mapping[str, object]],
-            self._json["globalObjects"]["tweets"],
-        )
-        id_to_user_json: Final = cast(
-            Mapping[UserId, object], self._json["globalObjects"]["users"]
+            Mapping[TweetId, Dict[str, object]], global_objects["tweets"]
         )
+        id_to_user_json: Final = cast(Mapping[UserId, object], global_objects["users"])
 
         result = []
-        for tweet_id in self._tweet_ids():
-            if tweet_id not in id_to_tweet_json:
+        for tweet_id in self._tweet_ids(instructions):
+            tweet_json = id_to_tweet_json.get(tweet_id)
+            if tweet_json is None:
                 # For conversation it can sometimes happen that a Tweet-ID is returned
                 # without accompanying meta information. I have no idea why this happens
                 # or how to fix it.
@@ -101,26 +148,27 @@ class RetrieverBatch(ABC):
                 # TODO: add way to expose this over api
                 continue
 
-            tweet_json = dict(id_to_tweet_json[tweet_id])
-            tweet_json["user"] = id_to_user_json[
-                checked_cast(UserId, tweet_json["user_id_str"])
-            ]
+            # The same Tweet may occur multiple times in a timeline.
+            if "user" not in tweet_json:
+                tweet_json["user"] = id_to_user_json[
+                    checked_cast(UserId, tweet_json["user_id_str"])
+                ]
 
-            # Delete remaining user fields in order to be similar to the Twitter
-            # developer API and because the information is stored in the user object
-            # anyways.
-            tweet_json.pop("user_id", None)  # present on Search, not on Conversation
-            tweet_json.pop("user_id_str")
+                # Delete remaining user fields in order to be similar to the Twitter
+                # developer API and because the information is stored in the user
+                # object anyways.
+                tweet_json.pop("user_id", None)  # present on Search, not Conversation
+                tweet_json.pop("user_id_str")
 
             result.append(Tweet(tweet_json))
         return result
 
     @abstractmethod
-    def _tweet_ids(self) -> Iterable[TweetId]:
+    def _tweet_ids(self, instructions: Sequence[Any]) -> Iterable[TweetId]:
         raise NotImplementedError()
 
     @abstractmethod
-    def _next_cursor(self) -> Optional[str]:
+    def _next_cursor(self, instructions: Sequence[Any]) -> Optional[str]:
         raise NotImplementedError()
 
 
@@ -138,41 +186,44 @@ class Retriever(Generic[_T_Request], ABC):
        user scrolls to the bottom of the page.
     The upside of this approach is that the JSON results have the exact same format as
     the results from the Twitter developer API (and even contain more information).
+
+    By default, the next batch is only fetched once the consumer has processed all
+    Tweets of the current one. If the environment variable NASTY_PREFETCH_DEPTH is set
+    to a positive number, batches are instead fetched on a background thread as soon
+    as the cursor of the previous one is known, buffering up to that many batches.
+
+    Requests are sent via the transport selected by the NASTY_TRANSPORT environment
+    variable, see TransportType, e.g., to multiplex them over HTTP/2 connections. If a
+    ResponseArchive is set, the raw response to each batch request is stored in it, or,
+    when replaying, read from it instead of contacting Twitter.
+
+    If a checkpoint is given, retrieval starts at its cursor instead of at the top of
+    the timeline.
     """
 
-    def __init__(self, request: _T_Request):
-        self._tweet_stream: Final = self._tweet_stream_type()(self._update_tweet_stream)
+    def __init__(
+        self, request: _T_Request, *, checkpoint: Optional[RequestCheckpoint] = None
+    ):
+        self._tweet_stream: Final = self._tweet_stream_type()(
+            self._update_tweet_stream, self._close_tweet_stream
+        )
         self._request: Final = request
         self._session: Final = requests.Session()
+        self._guest_token: Optional[GuestToken] = None
+        self._main_js_url: Optional[str] = None
         self._request_finished = False
         self._retrieved_tweets = 0
         self._cursor: Optional[str] = None
+        if checkpoint is not None:
+            self._retrieved_tweets = checkpoint.num_tweets
+            self._cursor = checkpoint.cursor
 
-        # Configure on which status codes we should perform automated retries.
-        self._session.mount(
-            "https://",
-            HTTPAdapter(
-                max_retries=Retry(
-                    total=5,
-                    connect=5,
-                    redirect=10,
-                    backoff_factor=0.1,
-                    raise_on_redirect=True,
-                    raise_on_status=True,
-                    status_forcelist=[
-                        HTTPStatus.REQUEST_TIMEOUT,  # HTTP 408
-                        HTTPStatus.CONFLICT,  # HTTP 409
-                        HTTPStatus.INTERNAL_SERVER_ERROR,  # HTTP 500
-                        HTTPStatus.NOT_IMPLEMENTED,  # HTTP 501
-                        HTTPStatus.BAD_GATEWAY,  # HTTP 502
-                        HTTPStatus.SERVICE_UNAVAILABLE,  # HTTP 503
-                        HTTPStatus.GATEWAY_TIMEOUT,  # HTTP 504
-                    ],
-                )
-            ),
-        )
+        self._prefetch_depth: Final = int(getenv("NASTY_PREFETCH_DEPTH", default="0"))
+        self._prefetcher: Optional[_Prefetcher] = None
 
-        self._fetch_new_twitter_session()
+        # Borrow the connections shared across retrievers.
+        connection_pool.mount(self._session)
+        self._transport: Final = get_transport()
 
     @classmethod
     def _tweet_stream_type(cls) -> Type[RetrieverTweetStream]:
@@ -195,61 +246,70 @@ class Retriever(Generic[_T_Request], ABC):
     def _batch_url(self) -> Mapping[str, object]:
         raise NotImplementedError()
 
-    def _update_tweet_stream(self) -> bool:  # noqa: C901
-        # TODO: try to reduce complexity and get red of noqa
+    def _update_tweet_stream(self) -> bool:
+        if self._prefetch_depth:
+            if self._prefetcher is None:
+                self._prefetcher = _Prefetcher(
+                    self._retrieve_next_tweets, self._prefetch_depth
+                )
+            retrieved_tweets = self._prefetcher.next()
+        else:
+            retrieved_tweets = self._retrieve_next_tweets()
 
-        if self._request_finished:
+        if retrieved_tweets is None or not retrieved_tweets.tweets:
             return False
+        self.tweet_stream.update_tweets(retrieved_tweets)
+        return True
+
+    def _close_tweet_stream(self) -> None:
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+    @final
+    def _retrieve_next_tweets(self) -> Optional[_RetrievedTweets]:
+        """Fetches the next non-empty batch of the timeline.
 
-        consecutive_retry_error = 0
-        consecutive_rate_limits = 0
-        consecutive_forbidden = 0
-        consecutive_empty_batches = 0
-        batch = None
+        Returns None if there are no more Tweets to retrieve.
+        """
+
+        if self._request_finished:
+            return None
+
+        if self._needs_new_twitter_session():
+            self._fetch_new_twitter_session()
+
+        fetch_attempts = _FetchAttempts()
         while True:
             try:
                 batch = self._fetch_batch()
-            except RetryError:
-                consecutive_retry_error += 1
-                if consecutive_retry_error != 3:
-                    self._fetch_new_twitter_session()
-                    continue
-                logger.warning("Received 3 consecutive RetryErrors.")
-                return False
-            except UnexpectedStatusCodeException as e:
-                if e.status_code == HTTPStatus.TOO_MANY_REQUESTS:  # HTTP 429
-                    consecutive_rate_limits += 1
-                    if consecutive_rate_limits != 3:
-                        self._fetch_new_twitter_session()
-                        continue
-                    logger.warning(
-                        "Received 3 consecutive TOO MANY REQUESTS responses."
-                    )
-                elif e.status_code == HTTPStatus.FORBIDDEN:  # HTTP 403
-                    consecutive_forbidden += 1
-                    if consecutive_forbidden != 3:
-                        self._fetch_new_twitter_session()
-                        continue
-                    logger.warning("Received 3 consecutive FORBIDDEN responses.")
-                raise
-            consecutive_rate_limits = 0
-
-            # Stop the iteration once the returned batch no longer contains any Tweets.
-            # Ideally, we would like to omit this last request but there seems to be no
-            # way to detect this prior to having the last batch loaded. Additionally,
-            # Twitter will sometimes stop sending results early, which we also can not
-            # detect. Because of this, we only stop loading once we receive empty
-            # batches multiple times in a row.
+            except (RetryError, UnexpectedStatusCodeException) as e:
+                if not fetch_attempts.retry_with_new_session(e):
+                    return None
+                self._fetch_new_twitter_session(
+                    invalidate_guest_token=isinstance(e, UnexpectedStatusCodeException)
+                )
+                continue
+
             if not batch.tweets:
-                consecutive_empty_batches += 1
-                if consecutive_empty_batches != 3:
-                    continue
-                logger.info("Received 3 consecutive empty batches.")
-                return False
+                if not fetch_attempts.retry_after_empty_batch():
+                    return None
+                continue
+
+            retrieved_tweets = self._consume_batch(batch)
+            if retrieved_tweets.tweets or self._request_finished:
+                return retrieved_tweets
+            # All Tweets of the batch were known already, continue with the next one.
+            fetch_attempts = _FetchAttempts()
 
-            break
+    @final
+    def _consume_batch(self, batch: RetrieverBatch) -> _RetrievedTweets:
+        """Advances the request state past the given batch.
+
+        Returns the Tweets of the batch that should be handed to the consumer, i.e.,
+        truncated to max_tweets, and the checkpoint after them.
+        """
 
-        tweets = batch.tweets
+        tweets = self._drop_known_tweets(batch.tweets)
         if self._request.max_tweets:
             tweets = tweets[: self._request.max_tweets - self._retrieved_tweets]
         self._retrieved_tweets += len(tweets)
@@ -263,15 +323,37 @@ class Retriever(Generic[_T_Request], ABC):
             and self._request.max_tweets == self._retrieved_tweets
         ):
             self._request_finished = True
-        self.tweet_stream.update_tweets(tweets)
 
         self._cursor = batch.next_cursor
         if self._cursor is None:
             self._request_finished = True
-        return True
+
+        checkpoint = None
+        if not self._request_finished:
+            checkpoint = RequestCheckpoint(
+                cast(str, self._cursor), self._retrieved_tweets
+            )
+        return _RetrievedTweets(tweets, checkpoint)
+
+    def _drop_known_tweets(self, tweets: Sequence[Tweet]) -> Sequence[Tweet]:
+        """Removes Tweets that were already retrieved by a previous execution.
+
+        May mark the request as finished, if no new Tweets will follow.
+        """
+        return tweets
+
+    @final
+    def _needs_new_twitter_session(self) -> bool:
+        if self._is_replaying():
+            return False
+        return self._guest_token is None or twitter_credentials.is_exhausted(
+            self._guest_token
+        )
 
     @final
-    def _fetch_new_twitter_session(self) -> None:
+    def _fetch_new_twitter_session(
+        self, *, invalidate_guest_token: bool = False
+    ) -> None:
         """Establishes a session with Twitter, so that they answer our requests.
 
         If we try to directly access request the first batch of a query, Twitter will
@@ -289,10 +371,13 @@ class Retriever(Generic[_T_Request], ABC):
 
         Each established session is only good for a given number of requests.
         Information on this can be obtained by checking the X-Rate-Limit-* headers in
-        the responses from api.twitter.com. Currently, we do not pay attention to these,
-        and just establish a new session once we run into the first rate limit error.
-        Cursor parameters, i.e. those that specify the current position in the result
-        list seem to persist across sessions.
+        the responses from api.twitter.com. The bearer token and guest tokens are
+        shared across all retrievers of the process via twitter_credentials, which
+        tracks these headers and hands out a fresh guest token before the current one
+        runs into the rate limit. Should Twitter still refuse a request, we invalidate
+        the used guest token and establish a new session. Cursor parameters, i.e.
+        those that specify the current position in the result list seem to persist
+        across sessions.
 
         Technically, a normal web browser would also receive a few cookies from Twitter
         in this process. Currently, api.twitter.com doesn't seem to check for these. In
@@ -306,6 +391,37 @@ class Retriever(Generic[_T_Request], ABC):
 
         logger.debug("  Establishing new Twitter session.")
 
+        if invalidate_guest_token and self._guest_token is not None:
+            twitter_credentials.invalidate(self._guest_token)
+
+        self._reset_session()
+        guest_token = twitter_credentials.guest_token(self._fetch_guest_token)
+        bearer_token = twitter_credentials.bearer_token(self._fetch_bearer_token)
+        self._set_session_tokens(guest_token, bearer_token)
+
+    @final
+    def _fetch_guest_token(self) -> str:
+        # Query HTML stub page. Also automatically adds any returned cookies by Twitter
+        # via response headers to the session.
+        response = self._session_get(**self._timeline_url(), session_bootstrap=True)
+        self._main_js_url, guest_token = _parse_timeline_stub(response.text)
+        return guest_token
+
+    @final
+    def _fetch_bearer_token(self) -> str:
+        if self._main_js_url is None:
+            response = self._session_get(**self._timeline_url(), session_bootstrap=True)
+            self._main_js_url, _ = _parse_timeline_stub(response.text)
+
+        # Queries the JS-script that carries the bearer token. Currently, this does not
+        # seem to constant for all users, but we still check in case this changes in the
+        # future.
+        response = self._session_get(self._main_js_url, session_bootstrap=True)
+        return _parse_main_js(response.text)
+
+    @final
+    def _reset_session(self) -> None:
+        self._guest_token = None
         self._session.headers.clear()
         self._session.cookies.clear()
 
@@ -324,69 +440,95 @@ class Retriever(Generic[_T_Request], ABC):
         # not set, Twitter will guesstimate the language from the IP.
         self._session.headers["Accept-Language"] = "en_US,en"
 
-        # Query HTML stub page. Also automatically adds any returned cookies by Twitter
-        # via response headers to the session.
-        response = self._session_get(**self._timeline_url())
-
-        main_js_url = re.findall(
-            "(https://abs.twimg.com/responsive-web/"
-            "(?:client[-_])?web(?:[-_]legacy)?/main.[a-z0-9]+.js)",
-            response.text,
-        )[0]
-
-        guest_token = re.findall(
-            'document\\.cookie = decodeURIComponent\\(\\"gt=([0-9]+);', response.text
-        )[0]
-
-        # Queries the JS-script that carries the bearer token. Currently, this does not
-        # seem to constant for all users, but we still check in case this changes in the
-        # future.
-        response = self._session_get(main_js_url)
-        bearer_token = re.findall('.="Web-12",.="([^"]+)"', response.text)[0]
-
+    @final
+    def _set_session_tokens(self, guest_token: GuestToken, bearer_token: str) -> None:
         # Emulate cookie setting that would be performed via Javascript.
         self._session.cookies.set_cookie(  # type: ignore
             requests.cookies.create_cookie(
-                "gt", guest_token, domain=".twitter.com", path="/"
+                "gt", guest_token.value, domain=".twitter.com", path="/"
             )
         )
 
         # Set the two headers that we need to access api.twitter.com.
         self._session.headers["Authorization"] = "Bearer {}".format(bearer_token)
-        self._session.headers["X-Guest-Token"] = guest_token
+        self._session.headers["X-Guest-Token"] = guest_token.value
+        self._guest_token = guest_token
 
-        logger.debug(
-            "    Guest token: {}. Bearer token: {}.".format(guest_token, bearer_token)
-        )
+        logger.debug("    Using guest token: {}.".format(guest_token))
+
+    @final
+    def _is_replaying(self) -> bool:
+        response_archive = get_response_archive()
+        return response_archive is not None and response_archive.replay
 
     @final
     def _fetch_batch(self) -> RetrieverBatch:
+        if self._is_replaying():
+            return self._replay_batch()
+        return self._process_batch_response(self._session_get(**self._batch_url()))
+
+    @final
+    def _replay_batch(self) -> RetrieverBatch:
+        """Returns the batch for the current cursor from the response archive."""
+
+        response_archive = get_response_archive()
+        assert response_archive is not None
+        return self._parse_batch(response_archive.read(self._request, self._cursor))
+
+    @final
+    def _process_batch_response(self, response: requests.Response) -> RetrieverBatch:
+        if self._guest_token is not None:
+            self._guest_token.update(response.headers)
+        response_archive = get_response_archive()
+        if response_archive is not None:
+            response_archive.write(self._request, self._cursor, response.content)
+        return self._parse_batch(response.content)
+
+    @final
+    def _parse_batch(self, content: bytes) -> RetrieverBatch:
         return self._retriever_batch_type()(
-            self._session_get(**self._batch_url()).json()
+            cast(Mapping[str, Mapping[str, object]], loads(content))
         )
 
     @final
-    def _session_get(self, url: str, **kwargs: Any) -> requests.Response:
-        if not getenv("NASTY_DISRESPECT_ROBOTSTXT"):
-            global crawl_delay
-            if crawl_delay is None:
-                response = self._session.get("https://mobile.twitter.com/robots.txt")
-
-                for line in response.text.splitlines():
-                    if line.lower().startswith("crawl-delay:"):
-                        crawl_delay = float(line[len("crawl-delay:") :])
-                        break
-                else:
-                    raise RuntimeError("Could not determine crawl-delay.")
-
-                logger.debug(
-                    "    Determined crawl-delay of {:.2f}s.".format(crawl_delay)
-                )
+    def _session_get(
+        self, url: str, *, session_bootstrap: bool = False, **kwargs: Any
+    ) -> requests.Response:
+        response = self._lookup_get(url, session_bootstrap=session_bootstrap, **kwargs)
+        if response is not None:
+            return response
+
+        request_scheduler.wait(
+            url, self._session.headers, _determine_crawl_delay(self._session)
+        )
+        return self._perform_get(url, **kwargs)
+
+    @final
+    def _lookup_get(
+        self, url: str, *, session_bootstrap: bool = False, **kwargs: Any
+    ) -> Optional[requests.Response]:
+        """Returns the response to a GET request if available without performing it.
+
+        Such responses, e.g., from a cache, need not wait for a slot.
+        """
+
+        response = self._transport.lookup(
+            self._session, url, session_bootstrap=session_bootstrap, **kwargs
+        )
+        if response is None:
+            return None
+        return self._check_response(response)
 
-            sleep(crawl_delay)
+    @final
+    def _perform_get(self, url: str, **kwargs: Any) -> requests.Response:
+        """Performs a GET request on the session without waiting for its slot."""
 
-        response = self._session.get(url, **kwargs)
+        response = self._transport.get(self._session, url, **kwargs)
+        request_scheduler.update(response)
+        return self._check_response(response)
 
+    @final
+    def _check_response(self, response: requests.Response) -> requests.Response:
         status = HTTPStatus(response.status_code)
         logger.debug(
             "    Received {} {} for {}".format(status.value, status.name, response.url)
@@ -397,3 +539,170 @@ class Retriever(Generic[_T_Request], ABC):
             )
 
         return response
+
+
+_PrefetchResult = Union[Optional[_RetrievedTweets], Exception]
+
+
+class _Prefetcher:
+    """Retrieves the upcoming batches of a timeline on a background thread.
+
+    Up to depth batches are buffered, so that fetching and parsing the next batches
+    overlaps with the consumer processing the current one. If the consumer stops
+    early, close() lets the thread exit after the batch it is currently retrieving.
+    """
+
+    def __init__(
+        self, retrieve_next_tweets: Callable[[], Optional[_RetrievedTweets]], depth: int
+    ):
+        self._retrieve_next_tweets: Final = retrieve_next_tweets
+        self._queue: Final["Queue[_PrefetchResult]"] = Queue(maxsize=depth)
+        self._exhausted = False
+        self._closed: Final = Event()
+        self._thread: Final = Thread(
+            target=self._run, name="nasty-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def next(self) -> Optional[_RetrievedTweets]:
+        """Returns the next batch of Tweets or None if there are no more."""
+
+        if self._exhausted:
+            return None
+
+        result = self._queue.get()
+        if result is None or isinstance(result, Exception):
+            self._exhausted = True
+            self._thread.join()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self) -> None:
+        self._exhausted = True
+        self._closed.set()
+        # Unblock the thread if it waits for space in the queue.
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+
+    def _run(self) -> None:
+        # Whatever ends the thread, the consumer must not wait for batches forever.
+        result: _PrefetchResult = RuntimeError("Prefetching stopped unexpectedly.")
+        try:
+            while not self._closed.is_set():
+                retrieved_tweets = self._retrieve_next_tweets()
+                if retrieved_tweets is None:
+                    break
+                self._queue.put(retrieved_tweets)
+            result = None
+        except Exception as e:
+            result = e
+        finally:
+            if not self._closed.is_set():
+                self._queue.put(result)
+
+
+class _FetchAttempts:
+    """Counts consecutive failures while fetching a single batch.
+
+    Decides when it is still worth establishing a new Twitter session and retrying,
+    and when we should give up on the request.
+    """
+
+    def __init__(self) -> None:
+        self._consecutive_retry_errors = 0
+        self._consecutive_rate_limits = 0
+        self._consecutive_forbidden = 0
+        self._consecutive_empty_batches = 0
+
+    def retry_with_new_session(self, exception: Exception) -> bool:
+        """Returns whether to retry after establishing a new Twitter session.
+
+        If False, the request should stop without raising. Re-raises the given
+        exception if it should be propagated.
+        """
+
+        if isinstance(exception, RetryError):
+            self._consecutive_retry_errors += 1
+            if self._consecutive_retry_errors != 3:
+                return True
+            logger.warning("Received 3 consecutive RetryErrors.")
+            return False
+
+        if isinstance(exception, UnexpectedStatusCodeException):
+            if exception.status_code == HTTPStatus.TOO_MANY_REQUESTS:  # HTTP 429
+                self._consecutive_rate_limits += 1
+                if self._consecutive_rate_limits != 3:
+                    return True
+                logger.warning("Received 3 consecutive TOO MANY REQUESTS responses.")
+            elif exception.status_code == HTTPStatus.FORBIDDEN:  # HTTP 403
+                self._consecutive_forbidden += 1
+                if self._consecutive_forbidden != 3:
+                    return True
+                logger.warning("Received 3 consecutive FORBIDDEN responses.")
+
+        raise exception
+
+    def retry_after_empty_batch(self) -> bool:
+        """Returns whether to request another batch after receiving an empty one."""
+
+        # Stop the iteration once the returned batch no longer contains any Tweets.
+        # Ideally, we would like to omit this last request but there seems to be no
+        # way to detect this prior to having the last batch loaded. Additionally,
+        # Twitter will sometimes stop sending results early, which we also can not
+        # detect. Because of this, we only stop loading once we receive empty
+        # batches multiple times in a row.
+        self._consecutive_rate_limits = 0
+        self._consecutive_empty_batches += 1
+        if self._consecutive_empty_batches != 3:
+            return True
+        logger.info("Received 3 consecutive empty batches.")
+        return False
+
+
+def _parse_timeline_stub(html: str) -> Tuple[str, str]:
+    """Extracts the URL of the main JS-script and the guest token from a HTML stub."""
+
+    main_js_url = re.findall(
+        "(https://abs.twimg.com/responsive-web/"
+        "(?:client[-_])?web(?:[-_]legacy)?/main.[a-z0-9]+.js)",
+        html,
+    )[0]
+
+    guest_token = re.findall(
+        'document\\.cookie = decodeURIComponent\\(\\"gt=([0-9]+);', html
+    )[0]
+
+    return main_js_url, guest_token
+
+
+def _parse_main_js(js: str) -> str:
+    """Extracts the bearer token from Twitter's main JS-script."""
+
+    return cast(str, re.findall('.="Web-12",.="([^"]+)"', js)[0])
+
+
+def _determine_crawl_delay(session: requests.Session) -> Optional[float]:
+    """Returns the delay to wait between requests, as given by robots.txt.
+
+    Returns None if robots.txt should not be respected, i.e., if the environment
+    variable NASTY_DISRESPECT_ROBOTSTXT is set. robots.txt is only fetched if the
+    configured RobotsTxtCache does not hold a fresh copy of it.
+    """
+
+    if getenv("NASTY_DISRESPECT_ROBOTSTXT"):
+        return None
+
+    def fetch_robots_txt() -> str:
+        logger.debug("    Fetching robots.txt.")
+        url = "https://mobile.twitter.com/robots.txt"
+        transport = get_transport()
+        response = transport.lookup(session, url)
+        if response is None:
+            response = transport.get(session, url)
+        return response.text
+
+    return get_robots_txt_cache().crawl_delay(fetch_robots_txt)
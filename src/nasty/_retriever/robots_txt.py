@@ -0,0 +1,182 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Callable, Iterator, Mapping, Optional, Tuple, cast
+
+from overrides import overrides
+from typing_extensions import Final
+from xdg import XDG_CACHE_HOME
+
+from .._util.json_ import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None  # type: ignore
+
+logger = getLogger(__name__)
+
+DEFAULT_ROBOTS_TXT_CACHE_FILE: Final = XDG_CACHE_HOME / "nasty" / "robots.txt.json"
+DEFAULT_ROBOTS_TXT_TTL: Final = timedelta(days=1)
+
+
+def parse_crawl_delay(robots_txt: str) -> float:
+    for line in robots_txt.splitlines():
+        if line.lower().startswith("crawl-delay:"):
+            return float(line[len("crawl-delay:") :])
+    raise RuntimeError("Could not determine crawl-delay.")
+
+
+class RobotsTxtCache(ABC):
+    """Provides Twitter's robots.txt, fetching it only if necessary."""
+
+    @abstractmethod
+    def robots_txt(self, fetch_robots_txt: Callable[[], str]) -> str:
+        raise NotImplementedError()
+
+    def crawl_delay(self, fetch_robots_txt: Callable[[], str]) -> float:
+        return parse_crawl_delay(self.robots_txt(fetch_robots_txt))
+
+
+class FixedRobotsTxtCache(RobotsTxtCache):
+    """Never fetches robots.txt and instead always uses the given contents.
+
+    Mainly useful for testing, e.g., FixedRobotsTxtCache("Crawl-delay: 0.1").
+    """
+
+    def __init__(self, robots_txt: str):
+        self._robots_txt: Final = robots_txt
+
+    @overrides
+    def robots_txt(self, fetch_robots_txt: Callable[[], str]) -> str:
+        return self._robots_txt
+
+
+class FileRobotsTxtCache(RobotsTxtCache):
+    """Caches robots.txt in a file, so that it is shared by all processes.
+
+    The file is locked while it is checked and updated, so that of many concurrently
+    starting processes only one fetches robots.txt. Contents are refetched once they
+    are older than the given TTL. Within a process, the contents are additionally kept
+    in memory until they expire, so that the file does not need to be read for every
+    request. If the file can not be accessed, robots.txt is only cached in memory.
+    """
+
+    def __init__(
+        self,
+        file: Path = DEFAULT_ROBOTS_TXT_CACHE_FILE,
+        *,
+        ttl: timedelta = DEFAULT_ROBOTS_TXT_TTL,
+    ):
+        self.file: Final = file
+        self.ttl: Final = ttl
+
+        self._lock: Final = Lock()
+        self._robots_txt: Optional[str] = None
+        self._expires_at = 0.0
+
+    @overrides
+    def robots_txt(self, fetch_robots_txt: Callable[[], str]) -> str:
+        with self._lock:
+            if self._robots_txt is None or self._expires_at <= time():
+                robots_txt, fetched_at = self._read_or_fetch(fetch_robots_txt)
+                self._robots_txt = robots_txt
+                self._expires_at = fetched_at + self.ttl.total_seconds()
+            return self._robots_txt
+
+    def clear(self) -> None:
+        with self._lock:
+            self._robots_txt = None
+            self._expires_at = 0.0
+
+    @contextmanager
+    def _lock_file(self) -> Iterator[None]:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = self.file.parent / (self.file.name + ".lock")
+        with lock_file.open("w") as fout:  # Closing the file releases the lock.
+            if fcntl is not None:
+                fcntl.flock(fout, fcntl.LOCK_EX)
+            yield
+
+    def _read_or_fetch(self, fetch_robots_txt: Callable[[], str]) -> Tuple[str, float]:
+        # Only errors accessing the file are caught, not those of fetching, which are
+        # also OSErrors for requests.
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(self._lock_file())
+                cached = self._read()
+            except OSError as e:
+                self._warn_inaccessible(e)
+                return fetch_robots_txt(), time()
+            if cached is not None:
+                return cached
+
+            robots_txt, fetched_at = fetch_robots_txt(), time()
+            try:
+                self._write(robots_txt, fetched_at)
+            except OSError as e:
+                self._warn_inaccessible(e)
+            return robots_txt, fetched_at
+
+    def _read(self) -> Optional[Tuple[str, float]]:
+        try:
+            cached = cast(
+                Mapping[str, object], loads(self.file.read_text(encoding="UTF-8"))
+            )
+            robots_txt = cast(str, cached["robots_txt"])
+            fetched_at = cast(float, cached["fetched_at"])
+            if fetched_at + self.ttl.total_seconds() > time():
+                logger.debug("    Using cached robots.txt from '{}'.".format(self.file))
+                return robots_txt, fetched_at
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring corrupt robots.txt cache '{}'.".format(self.file))
+        return None
+
+    def _write(self, robots_txt: str, fetched_at: float) -> None:
+        tmp_file = self.file.parent / (".tmp." + self.file.name)
+        tmp_file.write_text(
+            dumps({"robots_txt": robots_txt, "fetched_at": fetched_at}),
+            encoding="UTF-8",
+        )
+        tmp_file.replace(self.file)
+
+    def _warn_inaccessible(self, e: OSError) -> None:
+        logger.warning(
+            "Could not access robots.txt cache '{}': {}".format(self.file, e)
+        )
+
+
+_robots_txt_cache: RobotsTxtCache = FileRobotsTxtCache()
+
+
+def get_robots_txt_cache() -> RobotsTxtCache:
+    return _robots_txt_cache
+
+
+def set_robots_txt_cache(robots_txt_cache: RobotsTxtCache) -> None:
+    """Replaces the cache through which all retrievers obtain robots.txt."""
+
+    global _robots_txt_cache
+    _robots_txt_cache = robots_txt_cache
@@ -14,15 +14,16 @@
 # limitations under the License.
 #
 
+from datetime import datetime
 from logging import getLogger
 from typing import Any, Iterable, Mapping, Optional, Sequence, Type, cast
 
 from overrides import overrides
-from typing_extensions import Final
 
+from .._util.time_ import unix_timestamp
 from .._util.typing_ import checked_cast
 from ..request.search import Search, SearchFilter
-from ..tweet.tweet import TweetId
+from ..tweet.tweet import Tweet, TweetId
 from .retriever import Retriever, RetrieverBatch
 
 logger = getLogger(__name__)
@@ -30,10 +31,7 @@ logger = getLogger(__name__)
 
 class SearchRetrieverBatch(RetrieverBatch):
     @overrides
-    def _tweet_ids(self) -> Iterable[TweetId]:
-        instructions: Final = cast(
-            Sequence[Any], self._json["timeline"]["instructions"]
-        )
+    def _tweet_ids(self, instructions: Sequence[Any]) -> Iterable[TweetId]:
 
         # Search results are contained in instructions. The first batch of a search will
         # look like this:
@@ -296,10 +294,7 @@ class SearchRetrieverBatch(RetrieverBatch):
                 )
 
     @overrides
-    def _next_cursor(self) -> Optional[str]:
-        instructions: Final = cast(
-            Sequence[Any], self._json["timeline"]["instructions"]
-        )
+    def _next_cursor(self, instructions: Sequence[Any]) -> Optional[str]:
 
         # As documented in _tweet_ids_in_batch(), the cursor objects can occur either
         # as part of "addEntries" or replaceEntry". We are only interested in
@@ -396,16 +391,40 @@ class SearchRetriever(Retriever[Search]):
         Does not perform URL escaping.
         """
         result = self._request.query
-        if self._request.since:
+        if isinstance(self._request.since, datetime):
+            result += " since_time:{:d}".format(unix_timestamp(self._request.since))
+        elif self._request.since:
             result += " since:" + self._request.since.isoformat()
-        if self._request.until:
+        if isinstance(self._request.until, datetime):
+            result += " until_time:{:d}".format(unix_timestamp(self._request.until))
+        elif self._request.until:
             result += " until:" + self._request.until.isoformat()
 
         if self._request.lang:
             result += " lang:" + self._request.lang
+        if self._request.since_id:
+            result += " since_id:" + self._request.since_id
 
         return result
 
+    @overrides
+    def _drop_known_tweets(self, tweets: Sequence[Tweet]) -> Sequence[Tweet]:
+        if not self._request.since_id:
+            return tweets
+
+        since_id = int(self._request.since_id)
+        new_tweets = [tweet for tweet in tweets if tweet.id_int > since_id]
+        if len(new_tweets) != len(tweets):
+            logger.debug(
+                "  Dropped {:d} Tweets retrieved before.".format(
+                    len(tweets) - len(new_tweets)
+                )
+            )
+            # With the most recent Tweets first, all following Tweets are known, too.
+            if self._request.filter == SearchFilter.LATEST:
+                self._request_finished = True
+        return new_tweets
+
     def _f_url_param(self) -> Optional[str]:
         return {
             SearchFilter.LATEST: "live",
@@ -17,7 +17,6 @@
 from typing import Any, Iterable, Optional, Sequence, Type, cast
 
 from overrides import overrides
-from typing_extensions import Final
 
 from .._util.typing_ import checked_cast
 from ..request.thread import Thread
@@ -27,7 +26,7 @@ from .conversation_retriever import ConversationRetriever, ConversationRetriever
 
 class ThreadRetrieverBatch(ConversationRetrieverBatch):
     @overrides
-    def _tweet_ids(self) -> Iterable[TweetId]:
+    def _tweet_ids(self, instructions: Sequence[Any]) -> Iterable[TweetId]:
         # TODO: ensure all tweets in a thread are by the same user
 
         # The first conversation batch contains entries for the Tweet with the requested
@@ -88,7 +87,7 @@ class ThreadRetrieverBatch(ConversationRetrieverBatch):
         #         ],
         #     },
         # }
-        for entry in self._parse_instructions():
+        for entry in self._parse_instructions(instructions):
             if entry["entryId"].startswith("tweet-"):
                 # Tweets in the thread look like this:
                 # {
@@ -146,7 +145,7 @@ class ThreadRetrieverBatch(ConversationRetrieverBatch):
                 )
 
     @overrides
-    def _next_cursor(self) -> Optional[str]:
+    def _next_cursor(self, instructions: Sequence[Any]) -> Optional[str]:
         # See the documentation of _tweet_ids_in_batch() on where the cursor entry
         # occurs. It looks like this:
         # {
@@ -162,11 +161,11 @@ class ThreadRetrieverBatch(ConversationRetrieverBatch):
         #         ...
         #     },
         # }
-        instructions = self._parse_instructions()
-        if not instructions:
+        entries = self._parse_instructions(instructions)
+        if not entries:
             return None
 
-        cursor_entry = instructions[-1]
+        cursor_entry = entries[-1]
         if cursor_entry["entryId"].startswith("conversationThread-") and cursor_entry[
             "entryId"
         ].endswith("-show_more_cursor"):
@@ -175,12 +174,9 @@ class ThreadRetrieverBatch(ConversationRetrieverBatch):
             )
         return None
 
-    def _parse_instructions(self) -> Sequence[Any]:
+    def _parse_instructions(self, instructions: Sequence[Any]) -> Sequence[Any]:
         # See the documentation of _tweet_ids_in_batch() on what JSON-structures
         # this navigates.
-        instructions: Final = cast(
-            Sequence[Any], self._json["timeline"]["instructions"]
-        )
         if "addEntries" in instructions[0]:
             entries = instructions[0]["addEntries"]["entries"]
             if not (
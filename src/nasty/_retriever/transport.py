@@ -0,0 +1,388 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from enum import Enum
+from http import HTTPStatus
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from logging import getLogger
+from os import getenv
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from overrides import overrides
+from requests.structures import CaseInsensitiveDict
+from typing_extensions import Final
+from urllib3 import HTTPResponse, Retry
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    HTTPError,
+    MaxRetryError,
+    ProtocolError,
+    ResponseError,
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None  # type: ignore
+
+from .._util.typing_ import checked_cast
+
+logger = getLogger(__name__)
+
+# Status codes on which requests are automatically retried, by all transports.
+RETRY_STATUS_FORCELIST: Final = (
+    HTTPStatus.REQUEST_TIMEOUT,  # HTTP 408
+    HTTPStatus.CONFLICT,  # HTTP 409
+    HTTPStatus.INTERNAL_SERVER_ERROR,  # HTTP 500
+    HTTPStatus.NOT_IMPLEMENTED,  # HTTP 501
+    HTTPStatus.BAD_GATEWAY,  # HTTP 502
+    HTTPStatus.SERVICE_UNAVAILABLE,  # HTTP 503
+    HTTPStatus.GATEWAY_TIMEOUT,  # HTTP 504
+)
+
+# Headers that only apply to a single HTTP/1.1 connection and are forbidden in HTTP/2.
+_CONNECTION_SPECIFIC_HEADERS: Final = frozenset(
+    ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade")
+)
+
+
+def retry_policy() -> Retry:
+    """Returns on which errors and status codes to retry requests, and how often."""
+
+    return Retry(
+        total=5,
+        connect=5,
+        redirect=10,
+        backoff_factor=0.1,
+        raise_on_redirect=True,
+        raise_on_status=True,
+        status_forcelist=[status.value for status in RETRY_STATUS_FORCELIST],
+    )
+
+
+class TransportType(Enum):
+    """How retrievers send their HTTP requests.
+
+    - REQUESTS: Via the requests library over HTTP/1.1, one request in flight per
+        connection. Connections are kept alive and shared across retrievers via the
+        ConnectionPool.
+    - HTTP2: Via the httpx library over HTTP/2, where supported by the server, so that
+        concurrent requests to the same host are multiplexed over a single connection,
+        and repeated headers and query parameters are compressed. Requires the httpx
+        package with HTTP/2 support (pip install nasty[http2]).
+
+    If not explicitly given, the transport is read from the NASTY_TRANSPORT environment
+    variable, defaulting to REQUESTS. Both transports retry requests in the same way,
+    see retry_policy(), and raise the same requests exceptions once retries are
+    exhausted.
+    """
+
+    REQUESTS = "REQUESTS"
+    HTTP2 = "HTTP2"
+
+
+class Transport(ABC):
+    """Sends the HTTP requests of retrievers.
+
+    Headers and cookies are taken from the session of the retriever, and cookies set by
+    responses are stored in it, so that they are independent of the transport.
+    Responses are always returned as requests Responses.
+    """
+
+    def lookup(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+        session_bootstrap: bool = False,
+    ) -> Optional[requests.Response]:
+        """Returns a response without performing the request, e.g., from a cache.
+
+        If None, the request needs to be performed via get(). session_bootstrap marks
+        requests that establish a new Twitter session, whose responses carry
+        short-lived tokens.
+        """
+        return None
+
+    @abstractmethod
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+    ) -> requests.Response:
+        raise NotImplementedError()
+
+
+class RequestsTransport(Transport):
+    @overrides
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+    ) -> requests.Response:
+        return session.get(url, params=params)  # type: ignore
+
+
+class Http2Transport(Transport):
+    """Sends requests over HTTP/2 connections shared by all retrievers of the process.
+
+    Requests are prepared by the session of the retriever, exactly as the
+    RequestsTransport would send them, and then sent via an httpx client. Retries are
+    performed with the urllib3 Retry of retry_policy(), so that the same errors and
+    status codes are retried with the same backoff as with the RequestsTransport.
+    """
+
+    def __init__(self) -> None:
+        if httpx is None:
+            raise ImportError(
+                "The HTTP/2 transport requires the httpx package. Install it via: "
+                "pip install nasty[http2]"
+            )
+
+        self._lock: Final = Lock()
+        self._client: Optional["httpx.Client"] = None
+        self._pid: Optional[int] = None
+
+    @overrides
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+    ) -> requests.Response:
+        request = session.prepare_request(
+            requests.Request("GET", url, params=params)  # type: ignore
+        )
+        prepared_url = checked_cast(str, request.url)
+        headers = {
+            name: value if isinstance(value, str) else value.decode("latin-1")
+            for name, value in request.headers.items()
+            if name.lower() not in _CONNECTION_SPECIFIC_HEADERS
+        }
+
+        retry = retry_policy()
+        while True:
+            try:
+                response = self._get_client().get(
+                    prepared_url, headers=headers, follow_redirects=True
+                )
+            except httpx.TransportError as e:
+                retry = self._increment(retry, prepared_url, error=_as_urllib3_error(e))
+                retry.sleep()
+                continue
+
+            retry_response = HTTPResponse(
+                headers=dict(response.headers.items()), status=response.status_code
+            )
+            if not retry.is_retry(
+                "GET",
+                response.status_code,
+                has_retry_after="Retry-After" in response.headers,
+            ):
+                break
+            retry = self._increment(retry, prepared_url, response=retry_response)
+            retry.sleep(retry_response)
+
+        for history_response in (*response.history, response):
+            for cookie in history_response.cookies.jar:
+                session.cookies.set_cookie(cookie)
+
+        return _as_requests_response(response, request)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+
+    def _get_client(self) -> "httpx.Client":
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._client = httpx.Client(
+                    http2=True,
+                    # Cookies are stored in the session of each retriever, the client
+                    # is shared and must not keep any of them.
+                    cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                    timeout=None,
+                )
+            return self._client
+
+    @classmethod
+    def _increment(
+        cls,
+        retry: Retry,
+        url: str,
+        *,
+        response: Optional[HTTPResponse] = None,
+        error: Optional[Exception] = None,
+    ) -> Retry:
+        """Counts a retry, raising like requests would once retries are exhausted."""
+
+        try:
+            return retry.increment("GET", url, response=response, error=error)
+        except MaxRetryError as e:
+            if isinstance(e.reason, ResponseError):
+                raise requests.exceptions.RetryError(e)
+            raise requests.exceptions.ConnectionError(e)
+
+
+class RedirectingTransport(Transport):
+    """Sends all requests to a server standing in for Twitter, e.g., for benchmarks.
+
+    The scheme and host of each requested URL are replaced by those of base_url, while
+    the path and query are kept, and the request is then performed via the wrapped
+    transport. Returned responses carry the originally requested URL, so that they can
+    not be told apart from responses by Twitter.
+    """
+
+    def __init__(self, transport: Transport, base_url: str):
+        self.transport: Final = transport
+        self.base_url: Final = base_url
+
+    @overrides
+    def lookup(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+        session_bootstrap: bool = False,
+    ) -> Optional[requests.Response]:
+        return self.transport.lookup(
+            session, url, params=params, session_bootstrap=session_bootstrap
+        )
+
+    @overrides
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        *,
+        params: Optional[Mapping[str, object]] = None,
+    ) -> requests.Response:
+        request = session.prepare_request(
+            requests.Request("GET", url, params=params)  # type: ignore
+        )
+        prepared_url = checked_cast(str, request.url)
+        base_url = urlsplit(self.base_url)
+        redirected_url = urlunsplit(
+            urlsplit(prepared_url)._replace(
+                scheme=base_url.scheme, netloc=base_url.netloc
+            )
+        )
+
+        response = self.transport.get(session, redirected_url)
+        response.url = prepared_url
+        response.request = request
+        return response
+
+
+def _as_urllib3_error(error: Exception) -> HTTPError:
+    """Maps httpx errors to the urllib3 errors that Retry classifies."""
+
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return ConnectTimeoutError(str(error))
+    return ProtocolError(str(error), error)
+
+
+def _as_requests_response(
+    response: "httpx.Response", request: requests.PreparedRequest
+) -> requests.Response:
+    result = requests.Response()
+    result.status_code = response.status_code
+    result.reason = response.reason_phrase
+    result.headers = CaseInsensitiveDict(response.headers.items())
+    result._content = response.content
+    result.encoding = response.encoding
+    result.url = str(response.url)
+    result.request = request
+    return result
+
+
+_transports: Dict[Tuple[object, ...], Transport] = {}
+_transports_lock: Final = Lock()
+
+
+def get_transport(transport_type: Optional[TransportType] = None) -> Transport:
+    """Returns the transport of the given type, shared by all retrievers.
+
+    If the NASTY_REDIRECT_URL environment variable is set, all requests are sent to the
+    server at that URL instead, see RedirectingTransport.
+
+    If the NASTY_HTTP_CACHE environment variable gives the path of an HttpCache, the
+    transport is wrapped in a CachingTransport, used in the HttpCacheMode given by
+    NASTY_HTTP_CACHE_MODE (default RECORD). Cached responses expire after the number of
+    seconds given by NASTY_HTTP_CACHE_EXPIRE_AFTER, if set.
+    """
+
+    if transport_type is None:
+        transport_type = TransportType(
+            getenv("NASTY_TRANSPORT", default="REQUESTS").upper()
+        )
+    redirect_url = getenv("NASTY_REDIRECT_URL")
+    http_cache = getenv("NASTY_HTTP_CACHE")
+    http_cache_mode = getenv("NASTY_HTTP_CACHE_MODE", default="RECORD").upper()
+    http_cache_expire_after = getenv("NASTY_HTTP_CACHE_EXPIRE_AFTER")
+
+    with _transports_lock:
+        key: Tuple[object, ...] = (transport_type,)
+        if key not in _transports:
+            if transport_type == TransportType.HTTP2:
+                _transports[key] = Http2Transport()
+            else:
+                _transports[key] = RequestsTransport()
+        transport = _transports[key]
+
+        if redirect_url:
+            key = (transport_type, redirect_url)
+            if key not in _transports:
+                _transports[key] = RedirectingTransport(transport, redirect_url)
+            transport = _transports[key]
+
+        if not http_cache:
+            return transport
+
+        from .http_cache import CachingTransport, HttpCache, HttpCacheMode
+
+        key = (*key, http_cache, http_cache_mode, http_cache_expire_after)
+        if key not in _transports:
+            _transports[key] = CachingTransport(
+                transport,
+                HttpCache(
+                    Path(http_cache),
+                    expire_after=(
+                        timedelta(seconds=float(http_cache_expire_after))
+                        if http_cache_expire_after
+                        else None
+                    ),
+                ),
+                HttpCacheMode(http_cache_mode),
+            )
+        return _transports[key]
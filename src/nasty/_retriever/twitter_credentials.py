@@ -0,0 +1,187 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from logging import getLogger
+from threading import Condition, Lock
+from time import time
+from typing import Callable, List, Mapping, Optional
+
+from typing_extensions import Final
+
+logger = getLogger(__name__)
+
+
+class GuestToken:
+    """A guest token together with what we know about its remaining rate limit.
+
+    The rate limit is read from the X-Rate-Limit-* headers that api.twitter.com sends
+    with each response.
+    """
+
+    def __init__(self, value: str):
+        self.value: Final = value
+        self.num_requests = 0
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[float] = None
+        self.invalidated = False
+
+    def __repr__(self) -> str:
+        return "{}(value={!r}, num_requests={}, remaining={}, reset={})".format(
+            type(self).__name__,
+            self.value,
+            self.num_requests,
+            self.rate_limit_remaining,
+            self.rate_limit_reset,
+        )
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Updates the rate limit information from response headers."""
+
+        self.num_requests += 1
+        if "X-Rate-Limit-Remaining" in headers:
+            self.rate_limit_remaining = int(headers["X-Rate-Limit-Remaining"])
+        if "X-Rate-Limit-Reset" in headers:
+            self.rate_limit_reset = float(headers["X-Rate-Limit-Reset"])
+
+    def remaining(self) -> Optional[int]:
+        """Number of requests left before running into the rate limit.
+
+        None if unknown, i.e., if no request has been performed with this token yet or
+        if its rate limit window has been reset since.
+        """
+
+        if self.rate_limit_reset is not None and self.rate_limit_reset <= time():
+            return None
+        return self.rate_limit_remaining
+
+    def is_exhausted(self, refresh_threshold: int) -> bool:
+        if self.invalidated:
+            return True
+        remaining = self.remaining()
+        return remaining is not None and remaining <= refresh_threshold
+
+
+class TwitterCredentialPool:
+    """Process-wide cache of the credentials needed to access api.twitter.com.
+
+    The bearer token is effectively constant and is thus only fetched once. Guest tokens
+    are shared by all retrievers: up to pool_size tokens are kept at once and each
+    retriever is handed the one with the most remaining requests. Tokens are retired
+    once fewer than refresh_threshold requests remain in their rate limit window, so
+    that a new one is fetched before we run into the rate limit.
+
+    Tokens are fetched without holding the lock, so that retrievers which can use a
+    token already in the pool do not wait for another retriever's session bootstrap.
+    Retrievers that need a token currently being fetched wait for it instead of
+    fetching one themselves.
+    """
+
+    def __init__(self, *, pool_size: int = 4, refresh_threshold: int = 5):
+        if pool_size <= 0:
+            raise ValueError("pool_size must be positive.")
+        if refresh_threshold < 0:
+            raise ValueError("refresh_threshold must not be negative.")
+
+        self.pool_size: Final = pool_size
+        self.refresh_threshold: Final = refresh_threshold
+
+        self._lock: Final = Lock()
+        # Notified whenever a fetch of a token completes, successfully or not.
+        self._fetched: Final = Condition(self._lock)
+        self._bearer_token: Optional[str] = None
+        self._fetching_bearer_token = False
+        self._guest_tokens: List[GuestToken] = []
+        self._num_fetching_guest_tokens = 0
+
+    def bearer_token(self, fetch_bearer_token: Callable[[], str]) -> str:
+        with self._lock:
+            while self._bearer_token is None and self._fetching_bearer_token:
+                self._fetched.wait()
+            if self._bearer_token is not None:
+                return self._bearer_token
+            self._fetching_bearer_token = True
+
+        bearer_token = None
+        try:
+            bearer_token = fetch_bearer_token()
+        finally:
+            with self._lock:
+                self._fetching_bearer_token = False
+                if bearer_token is not None:
+                    self._bearer_token = bearer_token
+                self._fetched.notify_all()
+
+        logger.debug("    Bearer token: {}.".format(bearer_token))
+        return bearer_token
+
+    def guest_token(self, fetch_guest_token: Callable[[], str]) -> GuestToken:
+        with self._lock:
+            while True:
+                self._guest_tokens = [
+                    guest_token
+                    for guest_token in self._guest_tokens
+                    if not guest_token.is_exhausted(self.refresh_threshold)
+                ]
+                num_guest_tokens = (
+                    len(self._guest_tokens) + self._num_fetching_guest_tokens
+                )
+                if num_guest_tokens < self.pool_size:
+                    break
+                if self._guest_tokens:
+                    return self._best_guest_token()
+                self._fetched.wait()
+            self._num_fetching_guest_tokens += 1
+
+        guest_token = None
+        try:
+            guest_token = GuestToken(fetch_guest_token())
+        finally:
+            with self._lock:
+                self._num_fetching_guest_tokens -= 1
+                if guest_token is not None:
+                    self._guest_tokens.append(guest_token)
+                self._fetched.notify_all()
+
+        logger.debug("    New guest token: {}.".format(guest_token.value))
+        return guest_token
+
+    def _best_guest_token(self) -> GuestToken:
+        # Tokens for which we do not know the remaining rate limit have not been
+        # used in their current window yet, so prefer them.
+        return max(
+            self._guest_tokens,
+            key=lambda guest_token: (
+                guest_token.remaining() is None,
+                guest_token.remaining() or 0,
+            ),
+        )
+
+    def is_exhausted(self, guest_token: GuestToken) -> bool:
+        return guest_token.is_exhausted(self.refresh_threshold)
+
+    def invalidate(self, guest_token: GuestToken) -> None:
+        """Retires a guest token, e.g., after Twitter refused a request with it."""
+
+        logger.debug("    Invalidating guest token: {}.".format(guest_token.value))
+        guest_token.invalidated = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bearer_token = None
+            self._guest_tokens = []
+
+
+twitter_credentials: Final = TwitterCredentialPool()
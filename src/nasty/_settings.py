@@ -16,7 +16,7 @@
 
 from logging import getLogger
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Sequence
 
 from nasty_utils import (
     ColoredBraceStyleAdapter,
@@ -37,7 +37,7 @@ def _key_validator(v: object) -> Optional[str]:
     return v
 
 
-class TwitterApiSettings(Settings):
+class TwitterApiCredentials(Settings):
     consumer_api_key: Optional[SecretStr]
     _consumer_api_key_validator: _T_VALIDATOR = validator(
         "consumer_api_key", pre=True, allow_reuse=True
@@ -58,6 +58,30 @@ class TwitterApiSettings(Settings):
         "access_token_secret", pre=True, allow_reuse=True
     )(_key_validator)
 
+    @property
+    def is_complete(self) -> bool:
+        return (
+            self.consumer_api_key is not None and self.consumer_api_secret is not None
+        )
+
+
+class TwitterApiSettings(TwitterApiCredentials):
+    """Credentials for the official Twitter API.
+
+    Additional credentials may be given as a list, e.g., as [[twitter_api.additional]]
+    tables in the settings file, in which case API requests are distributed over all of
+    them to multiply the available rate limits.
+    """
+
+    additional: Sequence[TwitterApiCredentials] = []
+
+    def all_credentials(self) -> Sequence[TwitterApiCredentials]:
+        credentials: List[TwitterApiCredentials] = [self] if self.is_complete else []
+        credentials.extend(
+            credentials_ for credentials_ in self.additional if credentials_.is_complete
+        )
+        return credentials
+
 
 class NastySettings(LoggingSettings):
     class Config(SettingsConfig):
@@ -0,0 +1,234 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import gzip
+import lzma
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Mapping, Optional, Sequence, TextIO, Type, cast
+
+from overrides import overrides
+from typing_extensions import Final
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore
+
+
+class Compression(ABC):
+    """Compression codec with which text files are written and read.
+
+    Each codec is identified by the suffix it appends to file names, so that the
+    codec with which a file was written can be detected when reading it.
+    """
+
+    name: str
+    suffix: str
+
+    @abstractmethod
+    def open(self, file: Path, mode: str) -> TextIO:
+        """Opens the given file in text mode, i.e., mode is either "rt" or "wt"."""
+        raise NotImplementedError()
+
+    def __repr__(self) -> str:
+        return "{}()".format(type(self).__name__)
+
+
+class NoCompression(Compression):
+    name = "none"
+    suffix = ""
+
+    @overrides
+    def open(self, file: Path, mode: str) -> TextIO:
+        return cast(TextIO, file.open(mode, encoding="UTF-8"))
+
+
+class GzipCompression(Compression):
+    name = "gzip"
+    suffix = ".gz"
+
+    def __init__(self, level: int = 6):
+        self.level: Final = level
+
+    def __repr__(self) -> str:
+        return "{}(level={})".format(type(self).__name__, self.level)
+
+    @overrides
+    def open(self, file: Path, mode: str) -> TextIO:
+        return cast(
+            TextIO, gzip.open(file, mode, compresslevel=self.level, encoding="UTF-8")
+        )
+
+
+class XzCompression(Compression):
+    """xz compression via the stdlib's lzma module.
+
+    Compresses well, but is slow both on writing and reading. Only available with a
+    single thread.
+    """
+
+    name = "xz"
+    suffix = ".xz"
+
+    def __init__(self, preset: int = 6):
+        self.preset: Final = preset
+
+    def __repr__(self) -> str:
+        return "{}(preset={})".format(type(self).__name__, self.preset)
+
+    @overrides
+    def open(self, file: Path, mode: str) -> TextIO:
+        # lzma refuses a preset when reading.
+        preset = self.preset if "w" in mode else None
+        return cast(TextIO, lzma.open(file, mode, preset=preset, encoding="UTF-8"))
+
+
+class ZstdCompression(Compression):
+    """Zstandard compression, requires the zstandard package.
+
+    Much faster than xz on both writing and reading at a comparable compression
+    ratio. Compression can use multiple threads (threads=-1 uses one per CPU core).
+    Because Tweets are short and share much of their structure, compression improves
+    considerably with a dictionary trained on sample Tweets, see train_dictionary().
+    Files written with a dictionary can only be read with the same dictionary.
+    """
+
+    name = "zstd"
+    suffix = ".zst"
+
+    def __init__(
+        self, level: int = 3, *, threads: int = 0, dictionary: Optional[bytes] = None
+    ):
+        if zstandard is None:
+            raise ImportError(
+                "zstd compression requires the zstandard package. Install it via: "
+                "pip install nasty[zstd]"
+            )
+
+        self.level: Final = level
+        self.threads: Final = threads
+        self.dictionary: Final = dictionary
+
+        self._dict_data: Final = (
+            zstandard.ZstdCompressionDict(dictionary)
+            if dictionary is not None
+            else None
+        )
+
+    def __getstate__(self) -> Mapping[str, object]:
+        # Compression dictionaries can not be pickled, so reconstruct them.
+        return {
+            "level": self.level,
+            "threads": self.threads,
+            "dictionary": self.dictionary,
+        }
+
+    def __setstate__(self, state: Mapping[str, object]) -> None:
+        self.__init__(  # type: ignore
+            cast(int, state["level"]),
+            threads=cast(int, state["threads"]),
+            dictionary=cast(Optional[bytes], state["dictionary"]),
+        )
+
+    def __repr__(self) -> str:
+        dictionary = "None"
+        if self.dictionary is not None:
+            dictionary = "<{} bytes>".format(len(self.dictionary))
+        return "{}(level={}, threads={}, dictionary={})".format(
+            type(self).__name__, self.level, self.threads, dictionary
+        )
+
+    @classmethod
+    def train_dictionary(cls, samples: Iterable[str], size: int = 112640) -> bytes:
+        """Trains a dictionary on samples, e.g., serialized Tweets of previous runs."""
+
+        if zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package.")
+        return zstandard.train_dictionary(
+            size, [sample.encode("UTF-8") for sample in samples]
+        ).as_bytes()
+
+    @overrides
+    def open(self, file: Path, mode: str) -> TextIO:
+        # (De)compressors are not thread-safe, so create new ones for each file.
+        if "w" in mode:
+            compressor = zstandard.ZstdCompressor(
+                level=self.level, threads=self.threads, dict_data=self._dict_data
+            )
+            return cast(
+                TextIO, zstandard.open(file, mode, cctx=compressor, encoding="UTF-8")
+            )
+
+        decompressor = zstandard.ZstdDecompressor(dict_data=self._dict_data)
+        return cast(
+            TextIO, zstandard.open(file, mode, dctx=decompressor, encoding="UTF-8")
+        )
+
+
+_COMPRESSION_TYPES: Final[Sequence[Type[Compression]]] = [
+    NoCompression,
+    GzipCompression,
+    XzCompression,
+    ZstdCompression,
+]
+_SUFFIX_TO_COMPRESSION_TYPE: Final[Mapping[str, Type[Compression]]] = {
+    type_.suffix: type_ for type_ in _COMPRESSION_TYPES if type_.suffix
+}
+
+
+def compression_suffixes() -> Sequence[str]:
+    return [type_.suffix for type_ in _COMPRESSION_TYPES]
+
+
+def compression_for_file(
+    file: Path, *, preferred: Optional[Compression] = None
+) -> Compression:
+    """Detects the codec with which the given file was written from its suffix.
+
+    If the preferred codec matches the suffix, it is used. This allows to read files
+    written with a specific configuration, e.g., a zstd dictionary.
+    """
+
+    type_ = _SUFFIX_TO_COMPRESSION_TYPE.get(file.suffix, NoCompression)
+    if preferred is not None and isinstance(preferred, type_):
+        return preferred
+    return type_()
+
+
+def compression_from_name(name: str) -> Compression:
+    """Constructs a codec from a name with an optional level, e.g., "xz:9" or "zstd"."""
+
+    name, _, level = name.partition(":")
+    for type_ in _COMPRESSION_TYPES:
+        if type_.name == name:
+            break
+    else:
+        raise ValueError(
+            "Unknown compression '{}'. Valid values are: {}.".format(
+                name, ", ".join(type_.name for type_ in _COMPRESSION_TYPES)
+            )
+        )
+
+    if type_ == ZstdCompression:
+        return ZstdCompression(level=int(level) if level else 3, threads=-1)
+    elif not level:
+        return type_()
+    elif type_ == XzCompression:
+        return XzCompression(preset=int(level))
+    elif type_ == GzipCompression:
+        return GzipCompression(level=int(level))
+    raise ValueError("Compression '{}' does not take a level.".format(name))
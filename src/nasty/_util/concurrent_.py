@@ -0,0 +1,50 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+_T_Item = TypeVar("_T_Item")
+_T_Result = TypeVar("_T_Result")
+
+
+def map_ordered(
+    func: Callable[[_T_Item], _T_Result],
+    items: Iterable[_T_Item],
+    *,
+    max_workers: int,
+) -> Iterator[_T_Result]:
+    """Like map(), but calls func for up to max_workers items concurrently.
+
+    Results are yielded in the order of items. Items are only pulled from the iterable
+    once a worker is available to process them, so that no more than max_workers items
+    and results are held in memory at any time. If func raises, the exception is
+    re-raised in order and no further items are processed.
+    """
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures: Deque["Future[_T_Result]"] = deque()
+        try:
+            for item in items:
+                futures.append(pool.submit(func, item))
+                if len(futures) == max_workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -14,25 +14,36 @@
 # limitations under the License.
 #
 
-import lzma
+import os
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Iterator, TextIO, cast
+from typing import Callable, Iterable, Iterator, Optional, TextIO
+
+from .compression import Compression, NoCompression
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None  # type: ignore
 
 
 @contextmanager
-def _read_file(file: Path, *, use_lzma: bool = False) -> Iterator[TextIO]:
-    if use_lzma:
-        with lzma.open(file, "rt", encoding="UTF-8") as fin:
-            yield cast(TextIO, fin)
-    else:
-        with file.open("r", encoding="UTF-8") as fin:
-            yield fin
+def _read_file(
+    file: Path, *, compression: Optional[Compression] = None
+) -> Iterator[TextIO]:
+    if compression is None:
+        compression = NoCompression()
+    with compression.open(file, "rt") as fin:
+        yield fin
 
 
 @contextmanager
 def _write_file_with_tmp_guard(
-    file: Path, *, overwrite_existing: bool = False, use_lzma: bool = False
+    file: Path,
+    *,
+    overwrite_existing: bool = False,
+    compression: Optional[Compression] = None,
+    before_rename: Optional[Callable[[], None]] = None,
 ) -> Iterator[TextIO]:
     if not overwrite_existing and file.exists():
         raise ValueError(
@@ -42,32 +53,58 @@ def _write_file_with_tmp_guard(
 
     tmp_file = file.parent / (".tmp." + file.name)
 
-    if use_lzma:
-        with lzma.open(tmp_file, "wt", encoding="UTF-8") as fin:
-            yield cast(TextIO, fin)
-    else:
-        with tmp_file.open("w", encoding="UTF-8") as fin:
-            yield fin
+    if compression is None:
+        compression = NoCompression()
+    with compression.open(tmp_file, "wt") as fout:
+        yield fout
 
+    # E.g., to write files the new one refers to before it becomes visible.
+    if before_rename is not None:
+        before_rename()
     tmp_file.rename(file)
 
 
-def read_file(file: Path, *, use_lzma: bool = False) -> str:
-    with _read_file(file, use_lzma=use_lzma) as fin:
+def read_file(file: Path, *, compression: Optional[Compression] = None) -> str:
+    with _read_file(file, compression=compression) as fin:
         return fin.read()
 
 
 def write_file(
-    file: Path, value: str, *, overwrite_existing: bool = False, use_lzma: bool = False
+    file: Path,
+    value: str,
+    *,
+    overwrite_existing: bool = False,
+    compression: Optional[Compression] = None,
 ) -> None:
     with _write_file_with_tmp_guard(
-        file, overwrite_existing=overwrite_existing, use_lzma=use_lzma
+        file, overwrite_existing=overwrite_existing, compression=compression
     ) as fout:
         fout.write(value)
 
 
-def read_lines_file(file: Path, *, use_lzma: bool = False) -> Iterable[str]:
-    with _read_file(file, use_lzma=use_lzma) as fin:
+def append_file(file: Path, value: bytes) -> None:
+    """Appends the value to the file with a single write().
+
+    Locally, opening the file with O_APPEND suffices for appends of multiple processes
+    not to interleave or overwrite each other. Over NFS it does not, as each client
+    determines the end of the file itself. The write is therefore done while holding a
+    POSIX lock on the file, upon which NFS clients revalidate the file with the server,
+    and which they release only after the write was flushed.
+    """
+
+    fd = os.open(str(file), os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+        os.write(fd, value)
+    finally:
+        os.close(fd)  # Also releases the lock.
+
+
+def read_lines_file(
+    file: Path, *, compression: Optional[Compression] = None
+) -> Iterable[str]:
+    with _read_file(file, compression=compression) as fin:
         for line in fin:
             yield line.strip()
 
@@ -77,10 +114,14 @@ def write_lines_file(
     values: Iterable[str],
     *,
     overwrite_existing: bool = False,
-    use_lzma: bool = False,
+    compression: Optional[Compression] = None,
+    before_rename: Optional[Callable[[], None]] = None,
 ) -> None:
     with _write_file_with_tmp_guard(
-        file, overwrite_existing=overwrite_existing, use_lzma=use_lzma
+        file,
+        overwrite_existing=overwrite_existing,
+        compression=compression,
+        before_rename=before_rename,
     ) as fout:
         for value in values:
             fout.write(value)
@@ -16,22 +16,132 @@
 
 import json
 import traceback
-from abc import abstractmethod
+from abc import ABC, abstractmethod
 from datetime import datetime
+from logging import getLogger
+from os import getenv
 from pathlib import Path
-from typing import Iterable, Mapping, Type, TypeVar, cast
+from typing import Iterable, Mapping, Optional, Type, TypeVar, Union, cast
 
 from overrides import overrides
 from typing_extensions import Final
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+from .compression import Compression
 from .consts import NASTY_DATE_TIME_FORMAT
 from .io_ import read_file, read_lines_file, write_file, write_lines_file
 from .typing_ import checked_cast
 
+logger = getLogger(__name__)
+
+
+class JsonCodec(ABC):
+    """Serializes Python objects to JSON strings and back.
+
+    All JSON (de)serialization of Tweets, requests, and Twitter API responses goes
+    through the codec returned by get_json_codec(), so that it can be swapped for a
+    faster implementation.
+    """
+
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj: object, *, indent: bool = False) -> str:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def loads(self, s: Union[str, bytes]) -> object:
+        raise NotImplementedError()
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = "json"
+
+    @overrides
+    def dumps(self, obj: object, *, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+    @overrides
+    def loads(self, s: Union[str, bytes]) -> object:
+        return json.loads(s)
+
+
+class OrjsonJsonCodec(JsonCodec):
+    """JSON codec based on orjson, which is multiple times faster than stdlib json.
+
+    Output differs from stdlib json in that it contains no whitespace between items
+    and that non-ASCII characters are not escaped. orjson refuses to serialize some
+    objects that stdlib json handles, e.g., integers exceeding 64 bit. For these, we
+    fall back to stdlib json.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("orjson is not installed.")
+        self._fallback: Final = StdlibJsonCodec()
+
+    @overrides
+    def dumps(self, obj: object, *, indent: bool = False) -> str:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        try:
+            result = orjson.dumps(obj, option=option)
+        except orjson.JSONEncodeError:
+            return self._fallback.dumps(obj, indent=indent)
+        return result.decode("UTF-8")
+
+    @overrides
+    def loads(self, s: Union[str, bytes]) -> object:
+        return orjson.loads(s)
+
+
+def _default_json_codec() -> JsonCodec:
+    name = getenv("NASTY_JSON_CODEC")
+    if name == StdlibJsonCodec.name or (name is None and orjson is None):
+        return StdlibJsonCodec()
+    elif name in (None, OrjsonJsonCodec.name):
+        return OrjsonJsonCodec()
+    raise ValueError("Unknown JSON codec '{}'.".format(name))
+
+
+_json_codec: JsonCodec = _default_json_codec()
+
+
+def get_json_codec() -> JsonCodec:
+    return _json_codec
+
+
+def set_json_codec(json_codec: JsonCodec) -> None:
+    """Replaces the codec used for all JSON (de)serialization.
+
+    By default, orjson is used if it is installed and stdlib json otherwise. The
+    default can be overwritten by setting the environment variable NASTY_JSON_CODEC to
+    "json" or "orjson".
+    """
+
+    global _json_codec
+    _json_codec = json_codec
+
+
+def dumps(obj: object, *, indent: bool = False) -> str:
+    return _json_codec.dumps(obj, indent=indent)
+
+
+def loads(s: Union[str, bytes]) -> object:
+    return _json_codec.loads(s)
+
+
 _T_JsonSerializable = TypeVar("_T_JsonSerializable", bound="JsonSerializable")
 
 
 class JsonSerializable:
+    __slots__ = ()
+
     @abstractmethod
     def to_json(self) -> Mapping[str, object]:
         raise NotImplementedError()
@@ -96,9 +206,14 @@ class JsonSerializedException(JsonSerializable):
 
 
 def read_json(
-    file: Path, type_: Type[_T_JsonSerializable], *, use_lzma: bool = False
+    file: Path,
+    type_: Type[_T_JsonSerializable],
+    *,
+    compression: Optional[Compression] = None,
 ) -> _T_JsonSerializable:
-    return type_.from_json(json.loads(read_file(file, use_lzma=use_lzma)))
+    return type_.from_json(
+        cast(Mapping[str, object], loads(read_file(file, compression=compression)))
+    )
 
 
 def write_json(
@@ -106,21 +221,24 @@ def write_json(
     value: _T_JsonSerializable,
     *,
     overwrite_existing: bool = False,
-    use_lzma: bool = False,
+    compression: Optional[Compression] = None,
 ) -> None:
     write_file(
         file,
-        json.dumps(value.to_json(), indent=2),
+        dumps(value.to_json(), indent=True),
         overwrite_existing=overwrite_existing,
-        use_lzma=use_lzma,
+        compression=compression,
     )
 
 
 def read_json_lines(
-    file: Path, type_: Type[_T_JsonSerializable], *, use_lzma: bool = False
+    file: Path,
+    type_: Type[_T_JsonSerializable],
+    *,
+    compression: Optional[Compression] = None,
 ) -> Iterable[_T_JsonSerializable]:
-    for line in read_lines_file(file, use_lzma=use_lzma):
-        yield type_.from_json(json.loads(line))
+    for line in read_lines_file(file, compression=compression):
+        yield type_.from_json(cast(Mapping[str, object], loads(line)))
 
 
 def write_jsonl_lines(
@@ -128,11 +246,11 @@ def write_jsonl_lines(
     values: Iterable[_T_JsonSerializable],
     *,
     overwrite_existing: bool = False,
-    use_lzma: bool = False,
+    compression: Optional[Compression] = None,
 ) -> None:
     write_lines_file(
         file,
-        (json.dumps(value.to_json()) for value in values),
+        (dumps(value.to_json()) for value in values),
         overwrite_existing=overwrite_existing,
-        use_lzma=use_lzma,
+        compression=compression,
     )
@@ -15,8 +15,13 @@
 #
 
 from argparse import ArgumentTypeError
-from datetime import date, datetime, timedelta
-from typing import Iterable
+from calendar import timegm
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Mapping
+
+from typing_extensions import Final
+
+from .consts import TWITTER_CREATED_AT_FORMAT
 
 
 # Adapted from https://stackoverflow.com/a/25470943/211404
@@ -30,6 +35,84 @@ def yyyy_mm_dd_date(string: str) -> date:
         )
 
 
+def yyyy_mm_dd_date_or_datetime(string: str) -> date:
+    """Parses dates in YYYY-MM-DD or datetimes in YYYY-MM-DDTHH:MM:SS format."""
+
+    if "T" not in string:
+        return yyyy_mm_dd_date(string)
+    try:
+        return datetime.strptime(string, "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        raise ArgumentTypeError(
+            'Can not parse datetime: "{}". Make sure it is in '
+            "YYYY-MM-DDTHH:MM:SS format.".format(string)
+        )
+
+
+def as_utc_datetime(value: date) -> datetime:
+    """Converts dates to datetimes at midnight, and datetimes to naive UTC ones."""
+
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def unix_timestamp(value: datetime) -> int:
+    """Seconds since the epoch, with naive datetimes taken as UTC."""
+    return timegm(as_utc_datetime(value).timetuple())
+
+
+_MONTHS: Final[Mapping[str, int]] = {
+    month: i + 1
+    for i, month in enumerate("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split())
+}
+
+
+def parse_twitter_created_at(string: str) -> datetime:
+    """Parses timestamps in TWITTER_CREATED_AT_FORMAT much faster than strptime().
+
+    Relies on all fields having fixed widths, e.g., "Sun Jun 23 23:56:00 +0000 2019",
+    and falls back to strptime() for strings that do not look like that.
+    """
+
+    if (
+        len(string) != 30
+        or string[3] != " "
+        or string[7] != " "
+        or string[10] != " "
+        or string[13] != ":"
+        or string[16] != ":"
+        or string[19] != " "
+        or string[25] != " "
+    ):
+        return datetime.strptime(string, TWITTER_CREATED_AT_FORMAT)
+
+    try:
+        offset = string[20:25]
+        tz = timezone.utc
+        if offset != "+0000":
+            offset_minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+            if offset[0] == "-":
+                offset_minutes = -offset_minutes
+            elif offset[0] != "+":
+                raise ValueError()
+            tz = timezone(timedelta(minutes=offset_minutes))
+
+        return datetime(
+            int(string[26:30]),
+            _MONTHS[string[4:7]],
+            int(string[8:10]),
+            int(string[11:13]),
+            int(string[14:16]),
+            int(string[17:19]),
+            tzinfo=tz,
+        )
+    except (KeyError, ValueError):
+        return datetime.strptime(string, TWITTER_CREATED_AT_FORMAT)
+
+
 # Adapted from: https://stackoverflow.com/a/1060352/211404
 def daterange(start_date: date, end_date: date) -> Iterable[date]:
     if start_date > end_date:
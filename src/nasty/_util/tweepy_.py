@@ -14,97 +14,213 @@
 # limitations under the License.
 #
 
+from datetime import timedelta
 from logging import getLogger
-from time import sleep
-from typing import Iterable, Mapping, Optional, cast
+from math import ceil
+from os import getenv
+from threading import Condition, Lock
+from time import time
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Sized,
+    Tuple,
+    cast,
+)
 
 import tweepy
 from more_itertools import chunked
+from typing_extensions import Final
 
-from nasty._settings import NastySettings, TwitterApiSettings
+from nasty._settings import NastySettings, TwitterApiCredentials, TwitterApiSettings
 
 from ..tweet.tweet import Tweet, TweetId
+from .concurrent_ import map_ordered
 
 logger = getLogger(__name__)
 
 
-def _make_tweepy_api(settings: TwitterApiSettings) -> tweepy.API:
-    if settings.consumer_api_key is None or settings.consumer_api_secret is None:
-        raise ValueError(
-            "To use this you need to create a configuration file with your Twitter API "
-            "keys. Copy file config-example.nasty.toml in the nasty source folder "
-            "to ${{XDG_CONFIG_HOME}}/{} and fill out the respective values.".format(
-                NastySettings.Config.search_path
-            )
-        )
+def _make_tweepy_auth(credentials: TwitterApiCredentials) -> tweepy.auth.AuthHandler:
+    assert credentials.consumer_api_key is not None
+    assert credentials.consumer_api_secret is not None
 
     tweepy_auth: tweepy.auth.AuthHandler
-    if settings.access_token is not None and settings.access_token_secret is not None:
+    if (
+        credentials.access_token is not None
+        and credentials.access_token_secret is not None
+    ):
         tweepy_auth = tweepy.OAuthHandler(
-            settings.consumer_api_key.get_secret_value(),
-            settings.consumer_api_secret.get_secret_value(),
+            credentials.consumer_api_key.get_secret_value(),
+            credentials.consumer_api_secret.get_secret_value(),
         )
         tweepy_auth.set_access_token(
-            settings.access_token.get_secret_value(),
-            settings.access_token_secret.get_secret_value(),
+            credentials.access_token.get_secret_value(),
+            credentials.access_token_secret.get_secret_value(),
         )
     else:
         tweepy_auth = tweepy.AppAuthHandler(
-            settings.consumer_api_key.get_secret_value(),
-            settings.consumer_api_secret.get_secret_value(),
+            credentials.consumer_api_key.get_secret_value(),
+            credentials.consumer_api_secret.get_secret_value(),
         )
-    return tweepy.API(tweepy_auth, parser=tweepy.parsers.JSONParser())
+    return tweepy_auth
 
 
-STATUSES_LOOKUP_CHUNK_SIZE = 100
-CHUNK_LOOKUPS_SINCE_LAST_RATE_LIMIT_ERROR = 0
-TWEEPY_API: Optional[tweepy.API] = None
+STATUSES_LOOKUP_CHUNK_SIZE: Final = 100
+# Rate limits per window of statuses/lookup, used until the API reports them.
+STATUSES_LOOKUP_USER_AUTH_LIMIT: Final = 900
+STATUSES_LOOKUP_APP_AUTH_LIMIT: Final = 300
+# Used if a rate limit error does not tell when the rate limit window is reset.
+STATUSES_LOOKUP_RATE_LIMIT_WINDOW: Final = 15 * 60
+# Number of chunks after which statuses_lookup() reports its progress.
+STATUSES_LOOKUP_PROGRESS_INTERVAL: Final = 100
 
 
-def statuses_lookup(
-    tweet_ids: Iterable[TweetId], twitter_api_settings: TwitterApiSettings
-) -> Iterable[Optional[Tweet]]:
-    global CHUNK_LOOKUPS_SINCE_LAST_RATE_LIMIT_ERROR
-    global TWEEPY_API
+class StatusesLookupQuota(NamedTuple):
+    """Rate limit quota aggregated over all credentials used for statuses/lookup."""
+
+    num_credentials: int
+    remaining: int
+    limit: int
+    reset: Optional[float]  # UNIX timestamp of the next reset of any window.
+    seconds_per_request: Optional[float]  # Average latency of requests so far.
+    num_workers: int
+
+    def eta(self, num_tweet_ids: int) -> timedelta:
+        """Estimates the time needed to look up the given number of Tweet-IDs.
+
+        This is the larger of the time the rate limits enforce and the time the
+        requests take at their average latency so far.
+        """
+
+        now = time()
+        num_requests = ceil(num_tweet_ids / STATUSES_LOOKUP_CHUNK_SIZE)
+
+        rate_limit_seconds = 0.0
+        if num_requests > self.remaining:
+            num_windows = ceil((num_requests - self.remaining) / self.limit)
+            reset = self.reset if self.reset is not None else now
+            rate_limit_seconds = (
+                max(reset - now, 0.0)
+                + (num_windows - 1) * STATUSES_LOOKUP_RATE_LIMIT_WINDOW
+            )
+
+        request_seconds = 0.0
+        if self.seconds_per_request is not None:
+            request_seconds = (
+                num_requests * self.seconds_per_request / max(self.num_workers, 1)
+            )
+
+        return timedelta(seconds=round(max(rate_limit_seconds, request_seconds)))
+
+    def __str__(self) -> str:
+        return "{:d} of {:d} requests remaining across {:d} credential(s)".format(
+            self.remaining, self.limit, self.num_credentials
+        )
+
+
+class _StatusesLookupClient:
+    """Credentials for the Twitter API with the state of their rate limit window."""
 
-    if TWEEPY_API is None:
-        TWEEPY_API = _make_tweepy_api(twitter_api_settings)
+    def __init__(self, credentials: TwitterApiCredentials):
+        self.auth: Final = _make_tweepy_auth(credentials)
+        self.limit = (
+            STATUSES_LOOKUP_APP_AUTH_LIMIT
+            if isinstance(self.auth, tweepy.AppAuthHandler)
+            else STATUSES_LOOKUP_USER_AUTH_LIMIT
+        )
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None  # UNIX timestamp.
+
+    def remaining_at(self, now: float) -> int:
+        if self.remaining is None or self.reset is None or self.reset <= now:
+            return self.limit  # Unknown or new window.
+        return self.remaining
+
+    def reset_at(self, now: float) -> float:
+        if self.reset is None or self.reset <= now:
+            return now
+        return self.reset
+
+
+class _StatusesLookupClientPool:
+    """Performs statuses/lookup requests paced by the API's rate limit headers.
+
+    Each request is routed to the client with the most requests remaining in its
+    current rate limit window, according to the x-rate-limit-* headers of its previous
+    responses. Requests are subtracted as soon as they are routed, so that concurrent
+    requests do not overshoot the limit. If all clients are exhausted, requests wait
+    until the first window is reset, instead of running into rate limit errors.
+
+    A new tweepy.API is created for each request, because the API object stores the
+    response of its last request, which we need to read the headers from.
+    """
+
+    def __init__(self, credentials: Sequence[TwitterApiCredentials]):
+        self._clients: Final = [
+            _StatusesLookupClient(credentials_) for credentials_ in credentials
+        ]
+        self._condition: Final = Condition()
+        self._num_requests = 0
+        self._request_seconds = 0.0
+
+    def quota(self) -> StatusesLookupQuota:
+        with self._condition:
+            now = time()
+            resets = [
+                client.reset
+                for client in self._clients
+                if client.reset is not None and client.reset > now
+            ]
+            return StatusesLookupQuota(
+                num_credentials=len(self._clients),
+                remaining=sum(client.remaining_at(now) for client in self._clients),
+                limit=sum(client.limit for client in self._clients),
+                reset=min(resets) if resets else None,
+                seconds_per_request=(
+                    self._request_seconds / self._num_requests
+                    if self._num_requests
+                    else None
+                ),
+                num_workers=num_lookup_workers(),
+            )
 
-    for tweet_ids_chunk in chunked(tweet_ids, STATUSES_LOOKUP_CHUNK_SIZE):
+    def lookup_chunk(self, tweet_ids: Sequence[TweetId]) -> Sequence[Optional[Tweet]]:
         num_retries = 0
         while True:
+            client = self._acquire_client()
+            api = tweepy.API(client.auth, parser=tweepy.parsers.JSONParser())
             exception: Exception
             try:
+                started_at = time()
                 tweets_chunk = cast(
                     Mapping[str, Mapping[str, Optional[Mapping[str, object]]]],
-                    TWEEPY_API.statuses_lookup(
-                        tweet_ids_chunk,
+                    api.statuses_lookup(
+                        tweet_ids,
                         include_entities=True,
                         map_=True,
                         tweet_mode="extended",
                     ),
                 )["id"]
-                CHUNK_LOOKUPS_SINCE_LAST_RATE_LIMIT_ERROR += 1
-                for tweet_id in tweet_ids_chunk:
+                self._update_client(
+                    client, api.last_response, request_seconds=time() - started_at
+                )
+
+                result: List[Optional[Tweet]] = []
+                for tweet_id in tweet_ids:
                     tweet_json = tweets_chunk[tweet_id]
-                    if tweet_json is not None:
-                        yield Tweet(tweet_json)
-                    else:
-                        yield None
-                break
+                    result.append(Tweet(tweet_json) if tweet_json is not None else None)
+                return result
 
             except tweepy.RateLimitError as e:
-                logger.debug(
-                    "Chunk lookups since last rate limit error: {}.".format(
-                        CHUNK_LOOKUPS_SINCE_LAST_RATE_LIMIT_ERROR
-                    )
-                )
-                CHUNK_LOOKUPS_SINCE_LAST_RATE_LIMIT_ERROR = 0
-
-                logger.info("Hit rate limit error. Sleeping for 15mins...")
-                sleep(15 * 60)
-                logger.info("Retrying...")
-                exception = e
+                # Only happens if our information on the rate limit was outdated, so
+                # retry without counting this as a failure.
+                self._update_client(client, e.response, exhausted=True)
+                continue
 
             except Exception as e:
                 logger.exception("Exception occurred.")
@@ -115,3 +231,174 @@ def statuses_lookup(
             if num_retries == 3:
                 logger.error("Maximum number of retries exceeded.")
                 raise exception
+
+    def _acquire_client(self) -> _StatusesLookupClient:
+        with self._condition:
+            while True:
+                now = time()
+                client = max(self._clients, key=lambda c: c.remaining_at(now))
+                if client.remaining_at(now) > 0:
+                    if client.reset is not None and client.reset <= now:
+                        client.remaining = None  # Window was reset.
+                    if client.remaining is not None:
+                        client.remaining -= 1
+                    return client
+
+                reset = min(client.reset_at(now) for client in self._clients)
+                logger.info(
+                    "Rate limits of all {:d} credential(s) exhausted, waiting "
+                    "{:.0f}s.".format(len(self._clients), reset - now)
+                )
+                self._condition.wait(reset - now)
+
+    def _update_client(
+        self,
+        client: _StatusesLookupClient,
+        response: Optional[object],
+        *,
+        exhausted: bool = False,
+        request_seconds: Optional[float] = None,
+    ) -> None:
+        headers = cast(Mapping[str, str], getattr(response, "headers", {}))
+        with self._condition:
+            if request_seconds is not None:
+                self._num_requests += 1
+                self._request_seconds += request_seconds
+
+            if "x-rate-limit-limit" in headers:
+                client.limit = int(headers["x-rate-limit-limit"])
+
+            if "x-rate-limit-reset" in headers:
+                reset = float(headers["x-rate-limit-reset"])
+                if client.reset is None or client.reset != reset:
+                    client.remaining = None  # New rate limit window.
+                client.reset = reset
+            elif exhausted:
+                client.reset = time() + STATUSES_LOOKUP_RATE_LIMIT_WINDOW
+
+            if exhausted:
+                client.remaining = 0
+            elif "x-rate-limit-remaining" in headers:
+                remaining = int(headers["x-rate-limit-remaining"])
+                if client.remaining is not None:
+                    remaining = min(remaining, client.remaining)
+                client.remaining = remaining
+            self._condition.notify_all()
+
+
+# Pools by the credentials they use, so that all lookups with the same credentials
+# share their rate limits, but lookups with other credentials do not use them.
+_client_pools: Dict[
+    Tuple[Tuple[Optional[str], ...], ...], _StatusesLookupClientPool
+] = {}
+_client_pools_lock: Final = Lock()
+_last_client_pool: Optional[_StatusesLookupClientPool] = None
+
+
+def _get_client_pool(
+    twitter_api_settings: TwitterApiSettings,
+) -> _StatusesLookupClientPool:
+    global _last_client_pool
+
+    credentials = twitter_api_settings.all_credentials()
+    if not credentials:
+        raise ValueError(
+            "To use this you need to create a configuration file with your "
+            "Twitter API keys. Copy file config-example.nasty.toml in the nasty "
+            "source folder to ${{XDG_CONFIG_HOME}}/{} and fill out the respective "
+            "values.".format(NastySettings.Config.search_path)
+        )
+
+    key = tuple(
+        tuple(
+            secret.get_secret_value() if secret is not None else None
+            for secret in (
+                credentials_.consumer_api_key,
+                credentials_.consumer_api_secret,
+                credentials_.access_token,
+                credentials_.access_token_secret,
+            )
+        )
+        for credentials_ in credentials
+    )
+    with _client_pools_lock:
+        client_pool = _client_pools.get(key)
+        if client_pool is None:
+            client_pool = _StatusesLookupClientPool(credentials)
+            _client_pools[key] = client_pool
+        _last_client_pool = client_pool
+    return client_pool
+
+
+def statuses_lookup_chunk(
+    tweet_ids: Sequence[TweetId], twitter_api_settings: TwitterApiSettings
+) -> Sequence[Optional[Tweet]]:
+    """Looks up a single chunk of up to STATUSES_LOOKUP_CHUNK_SIZE Tweet-IDs.
+
+    Unlike statuses_lookup(), the chunk is looked up on the calling thread, e.g., for
+    callers that distribute chunks over their own workers.
+    """
+
+    return _get_client_pool(twitter_api_settings).lookup_chunk(tweet_ids)
+
+
+def statuses_lookup(
+    tweet_ids: Iterable[TweetId], twitter_api_settings: TwitterApiSettings
+) -> Iterable[Optional[Tweet]]:
+    """Looks up full Tweets by ID via the official Twitter API.
+
+    Yields None for Tweets that are no longer available. IDs are looked up in chunks of
+    100, of which up to NASTY_NUM_LOOKUP_WORKERS (default 4) are looked up
+    concurrently, distributed over all configured credentials. Tweets are yielded in
+    the order of IDs.
+    """
+
+    client_pool = _get_client_pool(twitter_api_settings)
+    num_tweet_ids = len(tweet_ids) if isinstance(tweet_ids, Sized) else None
+    num_looked_up = 0
+    for tweets_chunk in map_ordered(
+        client_pool.lookup_chunk,
+        chunked(tweet_ids, STATUSES_LOOKUP_CHUNK_SIZE),
+        max_workers=num_lookup_workers(),
+    ):
+        yield from tweets_chunk
+
+        num_looked_up += len(tweets_chunk)
+        if (
+            num_looked_up
+            % (STATUSES_LOOKUP_CHUNK_SIZE * STATUSES_LOOKUP_PROGRESS_INTERVAL)
+            == 0
+        ):
+            log_statuses_lookup_progress(
+                num_looked_up,
+                num_tweet_ids - num_looked_up if num_tweet_ids is not None else None,
+            )
+
+
+def statuses_lookup_quota() -> Optional[StatusesLookupQuota]:
+    """Returns the quota of the credentials used last, None if none were used yet."""
+
+    if _last_client_pool is None:
+        return None
+    return _last_client_pool.quota()
+
+
+def log_statuses_lookup_progress(
+    num_looked_up: int, num_remaining: Optional[int]
+) -> None:
+    quota = statuses_lookup_quota()
+    if quota is None:
+        return
+
+    if num_remaining is None:
+        logger.info("  Looked up {:d} Tweet-IDs, {}.".format(num_looked_up, quota))
+    else:
+        logger.info(
+            "  Looked up {:d} Tweet-IDs, {:d} remaining, {}. ETA: {}.".format(
+                num_looked_up, num_remaining, quota, quota.eta(num_remaining)
+            )
+        )
+
+
+def num_lookup_workers() -> int:
+    return int(getenv("NASTY_NUM_LOOKUP_WORKERS", default="4"))
@@ -14,32 +14,102 @@
 # limitations under the License.
 #
 
+import asyncio
 import hashlib
 import json
-from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from datetime import datetime
+from enum import Enum
+from itertools import chain
 from logging import getLogger
 from os import getenv
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence, Union, overload
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Counter,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+    overload,
+)
 
+from typing_extensions import Final
+
+from .._retriever.connection_pool import connection_pool
+from .._retriever.request_scheduler import request_scheduler
 from .._util.json_ import JsonSerializedException, read_json_lines, write_jsonl_lines
-from ..request.request import Request
+from ..request.request import Request, RequestCheckpoint
+from ..storage.claim_table import ClaimTable
+from ..storage.crawl_delay_table import CrawlDelayTable
 from ..storage.file import FileStorage
+from ..storage.response_archive import get_response_archive, set_response_archive
 from ..storage.storage import Storage
+from ..tweet.tweet import Tweet, TweetId
+from ..tweet.tweet_stream import AsyncTweetStream, TweetStream
 from ._execute_result import _ExecuteResult
-from .batch_entry import BatchEntry
+from .batch_entry import BatchEntry, BatchEntryId
 from .batch_results import BatchResults
 
 logger = getLogger(__name__)
 
+# Number of retrieved Tweets that may wait for being written, see _write_data_async().
+_WRITE_QUEUE_SIZE: Final = 1000
+
+
+class BatchExecutionMode(Enum):
+    """Different ways in which Batch.execute() runs requests concurrently.
+
+    - THREADS: Each concurrently executed request occupies a worker thread, which
+        blocks while waiting for responses and the crawl-delay.
+    - ASYNCIO: All requests are run on a single asyncio event loop. Only the actual
+        HTTP calls and storage operations are offloaded to worker threads, waiting for
+        the crawl-delay does not occupy any thread. Suited for batches with many
+        requests.
+    - PROCESSES: Requests are run by worker processes, so that parsing and
+        compressing Tweets is not serialized by the GIL. Workers claim the entries they
+        execute in a ClaimTable in the results directory, so that processes on
+        multiple hosts sharing that directory can cooperatively execute the same
+        batch, each entry being executed by only one of them. The crawl-delay is
+        shared by all workers via a CrawlDelayTable in the results directory. Only
+        supported with a FileStorage.
+
+    If not explicitly given, the mode is read from the NASTY_EXECUTION_MODE environment
+    variable. In all modes, the number of concurrently executed requests is given by
+    the NASTY_NUM_WORKERS environment variable. HTTP connections are kept alive and
+    shared across requests, with the connection pool sized to the number of workers.
+    In ASYNCIO mode, the number of threads the HTTP calls and storage operations are
+    offloaded to is given separately by the NASTY_NUM_IO_THREADS environment variable
+    (by default the number of CPUs plus four, at most 32).
+
+    If the storage supports checkpoints, Tweets are handed to it in chunks of its
+    checkpoint_interval together with a checkpoint, from which a later execution of a
+    failed or aborted request resumes.
+    """
+
+    THREADS = "THREADS"
+    ASYNCIO = "ASYNCIO"
+    PROCESSES = "PROCESSES"
+
 
 class Batch:
     def __init__(self) -> None:
         self._entries: List[BatchEntry] = []
 
     def append(self, request: Request) -> None:
+        # Intentionally always stdlib json instead of the configured JSON codec, so
+        # that IDs do not change depending on which codec is installed.
         id_ = hashlib.md5(json.dumps(request.to_json()).encode("utf-8")).hexdigest()
         self._entries.append(
             BatchEntry(request, id_=id_, completed_at=None, exception=None)
@@ -56,8 +126,20 @@ class Batch:
         self._entries += read_json_lines(file, BatchEntry)  # TODO Read from storage
 
     def execute(
-        self, storage: Optional[Union[Path, Storage]] = None
+        self,
+        storage: Optional[Union[Path, Storage]] = None,
+        *,
+        mode: Optional[BatchExecutionMode] = None,
+        incremental: bool = False,
     ) -> Optional[BatchResults]:
+        """Executes all requests of the batch, skipping those completed previously.
+
+        If incremental is set, requests completed previously are not skipped, but
+        refreshed instead: only Tweets newer than the most recent Tweet retrieved by
+        the previous execution are retrieved and added to the stored ones. This is
+        only supported for Search requests, others are still skipped.
+        """
+
         logger.debug(
             "Started executing batch of {:d} requests.".format(len(self._entries))
         )
@@ -69,16 +151,32 @@ class Batch:
                 storage = Path(storage)
             storage = FileStorage(path=storage)
 
-        num_workers = int(getenv("NASTY_NUM_WORKERS", default="1"))
-        with ThreadPoolExecutor(max_workers=num_workers) as pool:
-            futures = (
-                pool.submit(self._execute_entry, entry, storage)
-                for entry in self._entries
-            )
-            result_counter = Counter(
-                future.result() for future in as_completed(futures)
+        if mode is None:
+            mode = BatchExecutionMode(
+                getenv("NASTY_EXECUTION_MODE", default="THREADS").upper()
             )
 
+        num_workers = int(getenv("NASTY_NUM_WORKERS", default="1"))
+        connection_pool.resize(num_workers)
+        # The pool is shared by all batches executed in the process.
+        pool_stats_before = connection_pool.stats()
+        set_response_archive(storage.response_archive())
+        try:
+            if mode == BatchExecutionMode.ASYNCIO:
+                result_counter = self._execute_asyncio(
+                    storage, num_workers, incremental
+                )
+            elif mode == BatchExecutionMode.PROCESSES:
+                result_counter = self._execute_processes(
+                    storage, num_workers, incremental
+                )
+            else:
+                result_counter = self._execute_threads(
+                    storage, num_workers, incremental
+                )
+        finally:
+            set_response_archive(None)
+
         logger.info(
             "Executing batch completed. "
             "{:d} successful, {:d} skipped, {:d} failed.".format(
@@ -87,40 +185,493 @@ class Batch:
                 result_counter[_ExecuteResult.FAIL],
             )
         )
+        scheduler_stats = request_scheduler.stats()
+        logger.debug(
+            "  {:d} requests performed, {:d} of which had to wait "
+            "(mean wait {:.2f}s, max wait {:.2f}s).".format(
+                scheduler_stats.num_requests,
+                scheduler_stats.num_delayed_requests,
+                scheduler_stats.mean_wait_time,
+                scheduler_stats.max_wait_time,
+            )
+        )
+        # In PROCESSES mode, connections are pooled per worker process instead.
+        pool_stats = connection_pool.stats().since(pool_stats_before)
+        if pool_stats.num_requests:  # Not counted with the HTTP/2 transport.
+            logger.debug(
+                "  {:d} HTTP connections opened, {:d} reused.".format(
+                    pool_stats.num_opened_connections,
+                    pool_stats.num_reused_connections,
+                )
+            )
         if result_counter[_ExecuteResult.FAIL]:
             logger.error("Some requests failed!")
             return None
         return BatchResults(storage)
 
-    @classmethod
-    def _execute_entry(cls, entry: BatchEntry, storage: Storage) -> _ExecuteResult:
-        logger.debug("Executing request: {}".format(entry.request.to_json()))
+    def replay(
+        self,
+        storage: Optional[Union[Path, FileStorage]] = None,
+        *,
+        num_workers: Optional[int] = None,
+    ) -> Optional[BatchResults]:
+        """Rebuilds the data of all requests from their archived responses.
+
+        Requires that the requests were executed with a storage archiving responses,
+        see FileStorage. Instead of contacting Twitter, each batch request is answered
+        with the response archived for its cursor, from which the Tweets are parsed
+        again, e.g., after the parsing of responses was extended. All requests are
+        replayed, regardless of whether they were completed, and their previous data
+        is only replaced once all of their Tweets were parsed. Tweets added by
+        incremental executions are replayed from the responses of the refreshing
+        requests. Replaying is CPU-bound, so requests are replayed in num_workers
+        processes (default: one per CPU core).
+        """
+
+        logger.debug(
+            "Started replaying batch of {:d} requests.".format(len(self._entries))
+        )
+
+        if not storage:
+            storage = FileStorage()
+        if isinstance(storage, Path) or isinstance(storage, str):
+            if isinstance(storage, str):
+                storage = Path(storage)
+            storage = FileStorage(path=storage)
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(min(num_workers, len(self._entries)), 1)
+
+        result_counter: Counter[_ExecuteResult] = Counter()
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            futures = [
+                pool.submit(_replay_entries, self._entries[i::num_workers], storage)
+                for i in range(num_workers)
+            ]
+            for future in as_completed(futures):
+                result_counter.update(future.result())
 
+        # Entries were replayed on copies in the workers.
+        storage.refresh()
+        for entry in self._entries:
+            prev_execution_entry = storage.read_entry(entry)
+            if prev_execution_entry is not None:
+                entry.completed_at = prev_execution_entry.completed_at
+                entry.exception = prev_execution_entry.exception
+
+        logger.info(
+            "Replaying batch completed. {:d} successful, {:d} failed.".format(
+                result_counter[_ExecuteResult.SUCCESS],
+                result_counter[_ExecuteResult.FAIL],
+            )
+        )
+        if result_counter[_ExecuteResult.FAIL]:
+            logger.error("Some requests failed!")
+            return None
+        return BatchResults(storage)
+
+    def _execute_threads(
+        self, storage: Storage, num_workers: int, incremental: bool
+    ) -> Counter[_ExecuteResult]:
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            futures = (
+                pool.submit(self._execute_entry, entry, storage, incremental)
+                for entry in self._entries
+            )
+            return Counter(future.result() for future in as_completed(futures))
+
+    def _execute_asyncio(
+        self, storage: Storage, num_workers: int, incremental: bool
+    ) -> Counter[_ExecuteResult]:
+        num_io_threads = int(
+            getenv("NASTY_NUM_IO_THREADS", default=str(_default_num_io_threads()))
+        )
+        loop = asyncio.new_event_loop()
+        try:
+            # Without checkpoints, each executing entry occupies a thread writing its
+            # data for its whole duration, see _write_data_async(). These get their
+            # own executor, so that they can not starve the HTTP calls.
+            pool = ThreadPoolExecutor(max_workers=num_io_threads)
+            write_pool = ThreadPoolExecutor(max_workers=num_workers)
+            with pool, write_pool:
+                loop.set_default_executor(pool)
+                return loop.run_until_complete(
+                    self._execute_entries_async(
+                        storage, num_workers, write_pool, incremental
+                    )
+                )
+        finally:
+            loop.close()
+
+    async def _execute_entries_async(
+        self,
+        storage: Storage,
+        num_workers: int,
+        write_executor: Executor,
+        incremental: bool,
+    ) -> Counter[_ExecuteResult]:
+        semaphore = asyncio.Semaphore(num_workers)
+
+        async def execute_entry(entry: BatchEntry) -> _ExecuteResult:
+            async with semaphore:
+                return await self._execute_entry_async(
+                    entry, storage, write_executor, incremental
+                )
+
+        return Counter(
+            await asyncio.gather(*(execute_entry(entry) for entry in self._entries))
+        )
+
+    def _execute_processes(
+        self, storage: Storage, num_workers: int, incremental: bool
+    ) -> Counter[_ExecuteResult]:
+        if not isinstance(storage, FileStorage):
+            raise ValueError("BatchExecutionMode.PROCESSES requires a FileStorage.")
+
+        started_at = datetime.now()
+        results: Dict[BatchEntryId, _ExecuteResult] = {}
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            futures = [
+                pool.submit(
+                    _execute_claimed_entries,
+                    self._entries,
+                    storage,
+                    started_at,
+                    # Let workers start at different positions, so that they do not
+                    # all contend for the same entries.
+                    len(self._entries) * i // num_workers,
+                    incremental,
+                )
+                for i in range(num_workers)
+            ]
+            for future in as_completed(futures):
+                for entry_id, result in future.result().items():
+                    # Entries are only skipped by workers that did not execute them.
+                    if results.get(entry_id) in (None, _ExecuteResult.SKIP):
+                        results[entry_id] = result
+
+        # Entries were executed on copies in the workers.
+        storage.refresh()
+        for entry in self._entries:
+            prev_execution_entry = storage.read_entry(entry)
+            if prev_execution_entry is not None:
+                entry.exception = prev_execution_entry.exception
+
+        num_other_workers = len({entry.id for entry in self._entries} - set(results))
+        if num_other_workers:
+            logger.info(
+                "{:d} requests were executed by workers of other batch "
+                "executions.".format(num_other_workers)
+            )
+        return Counter(results.values())
+
+    @classmethod
+    def _is_entry_completed(cls, entry: BatchEntry, storage: Storage) -> bool:
         if storage.entry_exists(entry):
             prev_execution_entry = storage.read_entry(entry)
             if prev_execution_entry:
                 entry.completed_at = prev_execution_entry.completed_at
+                entry.newest_tweet_id = prev_execution_entry.newest_tweet_id
 
             if entry.completed_at:
                 logger.debug("  Skipping request, because files entry completed.")
-                return _ExecuteResult.SKIP
+                return True
             else:
                 logger.debug("  Executing request, because entry is not completed.")
 
+        return False
+
+    @classmethod
+    def _execute_entry(
+        cls, entry: BatchEntry, storage: Storage, incremental: bool = False
+    ) -> _ExecuteResult:
+        logger.debug("Executing request: {}".format(entry.request.to_json()))
+
+        if cls._is_entry_completed(entry, storage):
+            if incremental:
+                return cls._refresh_entry(entry, storage)
+            return _ExecuteResult.SKIP
+
+        result = _ExecuteResult.SUCCESS
+        try:
+            resume_checkpoint = storage.read_checkpoint(entry)
+            tweet_stream = entry.request.request(checkpoint=resume_checkpoint)
+            # Tweets before the checkpoint are not seen, so the newest one is unknown.
+            entry.newest_tweet_id = None
+            try:
+                if storage.checkpoint_interval is None:
+                    storage.write_data(
+                        entry,
+                        cls._track_newest_tweet_id(
+                            entry, tweet_stream, resume_checkpoint
+                        ),
+                    )
+                else:
+                    tweets: List[Tweet] = []
+                    for tweet in cls._track_newest_tweet_id(
+                        entry, tweet_stream, resume_checkpoint
+                    ):
+                        tweets.append(tweet)
+                        checkpoint = cls._due_checkpoint(tweets, tweet_stream, storage)
+                        if checkpoint is not None:
+                            storage.write_checkpoint(entry, tweets, checkpoint)
+                            tweets = []
+                    storage.write_data(entry, tweets)
+            finally:
+                # Stops prefetching, if the Tweets could not be stored.
+                tweet_stream.close()
+            entry.completed_at = datetime.now()
+            entry.exception = None  # Clear exception of a previous failed execution.
+
+        except Exception as e:
+            logger.exception("  Request execution failed with exception.")
+            entry.exception = JsonSerializedException.from_exception(e)
+            result = _ExecuteResult.FAIL
+
+        storage.write_entry(entry)
+        return result
+
+    @classmethod
+    async def _execute_entry_async(
+        cls,
+        entry: BatchEntry,
+        storage: Storage,
+        write_executor: Executor,
+        incremental: bool = False,
+    ) -> _ExecuteResult:
+        logger.debug("Executing request: {}".format(entry.request.to_json()))
+
+        loop = asyncio.get_event_loop()
+        if await loop.run_in_executor(None, cls._is_entry_completed, entry, storage):
+            if incremental:
+                return await loop.run_in_executor(
+                    None, cls._refresh_entry, entry, storage
+                )
+            return _ExecuteResult.SKIP
+
         result = _ExecuteResult.SUCCESS
         try:
-            tweet_stream = entry.request.request()
-            storage.write_data(entry, tweet_stream)
+            resume_checkpoint = await loop.run_in_executor(
+                None, storage.read_checkpoint, entry
+            )
+            tweet_stream = entry.request.request_async(checkpoint=resume_checkpoint)
+            entry.newest_tweet_id = None
+            try:
+                if storage.checkpoint_interval is None:
+                    await cls._write_data_async(
+                        entry,
+                        storage,
+                        write_executor,
+                        cls._track_newest_tweet_id_async(
+                            entry, tweet_stream, resume_checkpoint
+                        ),
+                    )
+                else:
+                    tweets: List[Tweet] = []
+                    async for tweet in cls._track_newest_tweet_id_async(
+                        entry, tweet_stream, resume_checkpoint
+                    ):
+                        tweets.append(tweet)
+                        checkpoint = cls._due_checkpoint(tweets, tweet_stream, storage)
+                        if checkpoint is not None:
+                            await loop.run_in_executor(
+                                None,
+                                storage.write_checkpoint,
+                                entry,
+                                tweets,
+                                checkpoint,
+                            )
+                            tweets = []
+                    await loop.run_in_executor(None, storage.write_data, entry, tweets)
+            finally:
+                tweet_stream.close()
             entry.completed_at = datetime.now()
+            entry.exception = None  # Clear exception of a previous failed execution.
 
         except Exception as e:
             logger.exception("  Request execution failed with exception.")
             entry.exception = JsonSerializedException.from_exception(e)
             result = _ExecuteResult.FAIL
 
+        await loop.run_in_executor(None, storage.write_entry, entry)
+        return result
+
+    @classmethod
+    def _refresh_entry(cls, entry: BatchEntry, storage: Storage) -> _ExecuteResult:
+        """Adds the Tweets posted since the previous execution of a completed entry."""
+
+        since_id = entry.newest_tweet_id
+        if since_id is None:
+            since_id = max(storage.read_data_ids(entry), key=int, default=None)
+
+        request = entry.request.newer_request(since_id)
+        if request is None:
+            logger.debug("  Skipping request, because it can not be refreshed.")
+            return _ExecuteResult.SKIP
+        logger.debug("  Refreshing request with Tweets after {}.".format(since_id))
+
+        result = _ExecuteResult.SUCCESS
+        try:
+            tweets = list(request.request())
+            if tweets:
+                storage.append_data(entry, tweets)
+                response_archive = get_response_archive()
+                if response_archive is not None:
+                    response_archive.write_refresh(entry.request, request)
+            for tweet in tweets:
+                since_id = _newer_tweet_id(since_id, tweet)
+            logger.debug("  Added {:d} new Tweets.".format(len(tweets)))
+
+            entry.newest_tweet_id = since_id
+            entry.completed_at = datetime.now()
+            entry.exception = None
+
+        except Exception as e:
+            logger.exception("  Request refresh failed with exception.")
+            entry.exception = JsonSerializedException.from_exception(e)
+            result = _ExecuteResult.FAIL
+
+        storage.write_entry(entry)
+        return result
+
+    @classmethod
+    def _replay_entry(cls, entry: BatchEntry, storage: Storage) -> _ExecuteResult:
+        """Replaces the data of an entry with the Tweets of its archived responses."""
+
+        logger.debug("Replaying request: {}".format(entry.request.to_json()))
+
+        # Keep the entry completed should the replay fail.
+        prev_execution_entry = storage.read_entry(entry)
+        if prev_execution_entry is not None:
+            entry.completed_at = prev_execution_entry.completed_at
+
+        result = _ExecuteResult.SUCCESS
+        try:
+            response_archive = get_response_archive()
+            assert response_archive is not None
+            # Tweets of later refreshes were placed before the earlier ones.
+            replayed_requests = list(
+                reversed(response_archive.refreshes(entry.request))
+            )
+            replayed_requests.append(entry.request)
+
+            entry.newest_tweet_id = None
+            storage.replace_data(
+                entry,
+                cls._track_newest_tweet_id(
+                    entry,
+                    chain.from_iterable(
+                        request.request() for request in replayed_requests
+                    ),
+                    None,
+                ),
+            )
+            logger.debug("  Replayed {:d} requests.".format(len(replayed_requests)))
+
+            entry.completed_at = datetime.now()
+            entry.exception = None
+
+        except Exception as e:
+            logger.exception("  Request replay failed with exception.")
+            entry.exception = JsonSerializedException.from_exception(e)
+            result = _ExecuteResult.FAIL
+
         storage.write_entry(entry)
         return result
 
+    @classmethod
+    def _track_newest_tweet_id(
+        cls,
+        entry: BatchEntry,
+        tweets: Iterable[Tweet],
+        resume_checkpoint: Optional[RequestCheckpoint],
+    ) -> Iterator[Tweet]:
+        for tweet in tweets:
+            if resume_checkpoint is None:
+                entry.newest_tweet_id = _newer_tweet_id(entry.newest_tweet_id, tweet)
+            yield tweet
+
+    @classmethod
+    async def _track_newest_tweet_id_async(
+        cls,
+        entry: BatchEntry,
+        tweets: AsyncIterable[Tweet],
+        resume_checkpoint: Optional[RequestCheckpoint],
+    ) -> AsyncIterator[Tweet]:
+        async for tweet in tweets:
+            if resume_checkpoint is None:
+                entry.newest_tweet_id = _newer_tweet_id(entry.newest_tweet_id, tweet)
+            yield tweet
+
+    @classmethod
+    async def _write_data_async(
+        cls,
+        entry: BatchEntry,
+        storage: Storage,
+        write_executor: Executor,
+        tweets: AsyncIterable[Tweet],
+    ) -> None:
+        """Hands the Tweets to storage.write_data() while they are retrieved.
+
+        write_data() runs on a thread of the given executor, consuming the Tweets from
+        a bounded queue that is filled on the event loop, so that the Tweets of a
+        request are never all held in memory at once.
+        """
+
+        loop = asyncio.get_event_loop()
+        queue: "asyncio.Queue[Optional[Tweet]]" = asyncio.Queue(
+            maxsize=_WRITE_QUEUE_SIZE
+        )
+        completed = False
+
+        def queued_tweets() -> Iterator[Tweet]:
+            while True:
+                tweet = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+                if tweet is None:
+                    if not completed:
+                        raise RuntimeError("Retrieving Tweets was aborted.")
+                    return
+                yield tweet
+
+        writer = loop.run_in_executor(
+            write_executor, storage.write_data, entry, queued_tweets()
+        )
+        try:
+            async for tweet in tweets:
+                put = asyncio.ensure_future(queue.put(tweet))
+                await asyncio.wait([put, writer], return_when=asyncio.FIRST_COMPLETED)
+                if not put.done():  # Writing failed before all Tweets were consumed.
+                    put.cancel()
+                    break
+            completed = True
+        finally:
+            if not writer.done():
+                await queue.put(None)
+            # Writing then fails as well, which must not mask the original exception.
+            await asyncio.wait([writer])
+        await writer
+
+    @classmethod
+    def _due_checkpoint(
+        cls,
+        tweets: Sequence[Tweet],
+        tweet_stream: Union[TweetStream, AsyncTweetStream],
+        storage: Storage,
+    ) -> Optional[RequestCheckpoint]:
+        """Returns a checkpoint if the given Tweets should be handed to the storage.
+
+        Because checkpoints are only available between batches, this happens at the
+        end of the first batch after checkpoint_interval Tweets were collected.
+        """
+
+        if (
+            storage.checkpoint_interval is None
+            or len(tweets) < storage.checkpoint_interval
+        ):
+            return None
+        return tweet_stream.checkpoint()
+
     def __len__(self) -> int:
         return len(self._entries)
 
@@ -145,3 +696,71 @@ class Batch:
 
     def __repr__(self) -> str:
         return repr(self._entries)
+
+
+def _default_num_io_threads() -> int:
+    # Same as the default of ThreadPoolExecutor since Python 3.8.
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _newer_tweet_id(tweet_id: Optional[TweetId], tweet: Tweet) -> TweetId:
+    if tweet_id is None or tweet.id_int > int(tweet_id):
+        return tweet.id
+    return tweet_id
+
+
+def _execute_claimed_entries(
+    entries: Sequence[BatchEntry],
+    storage: FileStorage,
+    started_at: datetime,
+    start_index: int,
+    incremental: bool,
+) -> Mapping[BatchEntryId, _ExecuteResult]:
+    """Executes all entries not claimed by other workers, run in worker processes.
+
+    Entries that completed or failed in any worker since started_at are not executed
+    again. Otherwise, each worker would refresh all completed entries once more in
+    incremental executions, as their claims are released after being executed.
+    """
+
+    set_response_archive(storage.response_archive())
+    request_scheduler.set_crawl_delay_table(CrawlDelayTable(storage.path))
+    claim_table = ClaimTable(storage.path)
+    results: Dict[BatchEntryId, _ExecuteResult] = {}
+    try:
+        for entry in list(entries[start_index:]) + list(entries[:start_index]):
+            if not claim_table.try_claim(entry.id):
+                continue
+            try:
+                storage.refresh()
+                prev_execution_entry = storage.read_entry(entry)
+                if prev_execution_entry is not None and (
+                    (
+                        prev_execution_entry.completed_at is not None
+                        and prev_execution_entry.completed_at >= started_at
+                    )
+                    or (
+                        prev_execution_entry.exception is not None
+                        and prev_execution_entry.exception.time >= started_at
+                    )
+                ):
+                    continue
+                results[entry.id] = Batch._execute_entry(entry, storage, incremental)
+            finally:
+                claim_table.release(entry.id)
+    finally:
+        claim_table.close()
+        request_scheduler.set_crawl_delay_table(None)
+    return results
+
+
+def _replay_entries(
+    entries: Sequence[BatchEntry], storage: FileStorage
+) -> Counter[_ExecuteResult]:
+    """Replays the given entries from the response archive, run in worker processes."""
+
+    set_response_archive(storage.response_archive(replay=True))
+    try:
+        return Counter(Batch._replay_entry(entry, storage) for entry in entries)
+    finally:
+        set_response_archive(None)
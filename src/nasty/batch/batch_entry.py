@@ -25,6 +25,7 @@ from .._util.consts import NASTY_DATE_TIME_FORMAT
 from .._util.json_ import JsonSerializable, JsonSerializedException
 from .._util.typing_ import checked_cast
 from ..request.request import Request
+from ..tweet.tweet import TweetId
 
 BatchEntryId = str
 
@@ -37,11 +38,16 @@ class BatchEntry(JsonSerializable):
         id_: BatchEntryId,
         completed_at: Optional[datetime],
         exception: Optional[JsonSerializedException],
+        newest_tweet_id: Optional[TweetId] = None,
     ):
         self.request: Final = request
         self.id: Final = id_
         self.completed_at = completed_at
         self.exception = exception
+        # ID of the most recent Tweet retrieved, from which incremental executions
+        # resume. None if unknown, e.g., because the execution resumed from a
+        # checkpoint.
+        self.newest_tweet_id = newest_tweet_id
 
     def __eq__(self, other: object) -> bool:
         return type(self) == type(other) and self.__dict__ == other.__dict__
@@ -52,12 +58,30 @@ class BatchEntry(JsonSerializable):
 
     @property
     def data_file_name(self) -> Path:
-        return Path("{:s}.data.jsonl.xz".format(self.id))
+        return self.data_file_name_with_suffix(".xz")
+
+    def data_file_name_with_suffix(self, suffix: str) -> Path:
+        """Name of the data file when written with the compression of that suffix."""
+        return Path("{:s}.data.jsonl{:s}".format(self.id, suffix))
+
+    @property
+    def partial_data_file_name(self) -> Path:
+        """Uncompressed Tweets of an execution that has not completed yet."""
+        return Path("{:s}.partial.jsonl".format(self.id))
+
+    @property
+    def checkpoint_file_name(self) -> Path:
+        return Path("{:s}.checkpoint.json".format(self.id))
 
     @property
     def ids_file_name(self) -> Path:
         return Path("{:s}.ids".format(self.id))
 
+    @property
+    def refs_file_name(self) -> Path:
+        """IDs of the Tweets of the entry, if they are stored in a TweetStore."""
+        return Path("{:s}.refs".format(self.id))
+
     @overrides
     def to_json(self) -> Mapping[str, object]:
         obj = {
@@ -68,6 +92,8 @@ class BatchEntry(JsonSerializable):
             obj["completed_at"] = self.completed_at.strftime(NASTY_DATE_TIME_FORMAT)
         if self.exception is not None:
             obj["exception"] = self.exception.to_json()
+        if self.newest_tweet_id is not None:
+            obj["newest_tweet_id"] = self.newest_tweet_id
         return obj
 
     @classmethod
@@ -90,4 +116,9 @@ class BatchEntry(JsonSerializable):
                 if "exception" in obj
                 else None
             ),
+            newest_tweet_id=(
+                checked_cast(str, obj["newest_tweet_id"])
+                if "newest_tweet_id" in obj
+                else None
+            ),
         )
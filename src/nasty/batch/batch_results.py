@@ -14,37 +14,100 @@
 # limitations under the License.
 #
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from itertools import chain
 from logging import getLogger
 from operator import itemgetter
+from os import getenv
 from pathlib import Path
 from typing import (
+    BinaryIO,
     Callable,
     Counter,
+    Dict,
     Iterable,
     Iterator,
+    List,
     Optional,
     Sequence,
     Tuple,
     Union,
-    cast,
     overload,
 )
 
-from more_itertools import groupby_transform, spy, unzip
+from more_itertools import chunked, groupby_transform
 
 from nasty._settings import TwitterApiSettings
 from nasty.storage.file import FileStorage
 from nasty.storage.storage import Storage
+from nasty.storage.tweet_index import TweetIndex
 
+from .._util.concurrent_ import map_ordered
 from .._util.io_ import write_lines_file
-from .._util.json_ import write_json, write_jsonl_lines
-from .._util.tweepy_ import statuses_lookup
+from .._util.json_ import dumps
+from .._util.tweepy_ import (
+    STATUSES_LOOKUP_CHUNK_SIZE,
+    STATUSES_LOOKUP_PROGRESS_INTERVAL,
+    log_statuses_lookup_progress,
+    num_lookup_workers,
+    statuses_lookup_chunk,
+)
 from ..tweet.tweet import Tweet, TweetId
 from ._execute_result import _ExecuteResult
 from .batch_entry import BatchEntry
 
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    _pyarrow_installed = False
+else:
+    _pyarrow_installed = True
+
 logger = getLogger(__name__)
 
+
+class ExportFormat(Enum):
+    """File formats to which BatchResults.export() can write Tweets.
+
+    - PARQUET: Compressed columnar files, readable by most analytics tools.
+    - ARROW: Uncompressed Arrow IPC files, which can be memory-mapped for the fastest
+        loading, e.g., via pyarrow.dataset(path, format="arrow").
+    """
+
+    PARQUET = "PARQUET"
+    ARROW = "ARROW"
+
+    @property
+    def suffix(self) -> str:
+        return "." + self.name.lower()
+
+
+class ExportPartitioning(Enum):
+    """How BatchResults.export() distributes Tweets over files.
+
+    - ENTRY: One file per entry, named after the entry ID.
+    - DATE: One directory per day on which Tweets were created, named
+        date=<YYYY-MM-DD> (Hive-style), with one file per entry. If the Tweets of an
+        entry are spread over more than EXPORT_MAX_OPEN_WRITERS days, some of them
+        may get multiple files per entry, named <entry-id>.<n>.
+    """
+
+    ENTRY = "ENTRY"
+    DATE = "DATE"
+
+
+# Number of Tweets buffered per file before they are written as a row group.
+EXPORT_BATCH_SIZE = 10000
+# Number of files an entry is exported to at once. Beyond that, the file least
+# recently written to is finished, and its partition continued in a new file.
+EXPORT_MAX_OPEN_WRITERS = 16
+# Contains a marker file for each exported entry.
+EXPORTED_DIR_NAME = ".exported"
+
 # TODO Implement storage for BatchResults
 class BatchResults(Sequence[BatchEntry]):
     def __init__(self, results_storage: Optional[Union[Path, Storage]]):
@@ -58,6 +121,7 @@ class BatchResults(Sequence[BatchEntry]):
 
         self._results_storage = results_storage
         self._entries = self._results_storage.entries()
+        self._tweet_index: Optional[TweetIndex] = None
 
     def tweets(self, entry: BatchEntry) -> Iterable[Tweet]:
         return self._results_storage.read_data(entry)
@@ -65,29 +129,55 @@ class BatchResults(Sequence[BatchEntry]):
     def tweet_ids(self, entry: BatchEntry) -> Iterable[TweetId]:
         return self._results_storage.read_data_ids(entry)
 
-    # TODO Update with storage API
+    def get_tweet(self, tweet_id: TweetId) -> Optional[Tweet]:
+        """Looks up a single Tweet of any entry by its ID, None if there is none.
+
+        Uses a TweetIndex, which is built or updated on the first lookup.
+        """
+        return self.tweet_index().get_tweet(tweet_id)
+
+    def contains(self, tweet_id: TweetId) -> bool:
+        """Whether any entry retrieved the Tweet with the given ID."""
+        return tweet_id in self.tweet_index()
+
+    def tweet_index(self) -> TweetIndex:
+        if self._tweet_index is None:
+            if not isinstance(self._results_storage, FileStorage):
+                raise ValueError("Tweet lookups by ID require a FileStorage.")
+            self._tweet_index = TweetIndex(self._results_storage.path)
+            self._tweet_index.update(self._results_storage)
+        return self._tweet_index
+
     def _transform(
         self,
-        new_results_storage: Optional[Path],
+        new_results_dir: Optional[Path],
         transform_name: str,
         transform_func: Callable[..., Counter[_ExecuteResult]],
         **transform_kwargs: object,
     ) -> Optional["BatchResults"]:
-        results_dir = self._results_dir
+        if not isinstance(self._results_storage, FileStorage):
+            raise ValueError(
+                "{} batch results requires them to be stored in a FileStorage.".format(
+                    transform_name
+                )
+            )
+
+        results_dir = self._results_storage.path
         if new_results_dir is not None:
             results_dir = new_results_dir
 
         logger.debug(
             "{} batch results from '{}' to '{}'.".format(
-                transform_name, self._results_dir, results_dir
+                transform_name, self._results_storage.path, results_dir
             )
         )
 
-        same_dir = results_dir.exists() and results_dir.samefile(self._results_dir)
-        if not same_dir:
-            Path.mkdir(results_dir, exist_ok=True, parents=True)
+        same_dir = results_dir.exists() and results_dir.samefile(
+            self._results_storage.path
+        )
+        target = self._results_storage if same_dir else FileStorage(results_dir)
 
-        result_counter = transform_func(results_dir, **transform_kwargs)
+        result_counter = transform_func(target, **transform_kwargs)
         logger.info(
             "  {} batch results completed. {:d} successful, {:d} skipped, {:d} "
             "failed.".format(
@@ -102,34 +192,29 @@ class BatchResults(Sequence[BatchEntry]):
             logger.error("  {} failed .".format(transform_name))
             return None
         if not same_dir:
-            return BatchResults(results_dir)
+            return BatchResults(target)
         return self
 
-    # TODO Update with storage API
     def idify(self, new_results_dir: Optional[Path] = None) -> Optional["BatchResults"]:
         return self._transform(new_results_dir, "Idifying", self._transform_idify)
 
-    # TODO Update with storage API
-    def _transform_idify(self, results_dir: Path) -> Counter[_ExecuteResult]:
+    def _transform_idify(self, target: FileStorage) -> Counter[_ExecuteResult]:
         result_counter = Counter[_ExecuteResult]()
         for entry in self:
             try:
-                ids_file = results_dir / entry.ids_file_name
-                meta_file = results_dir / entry.meta_file_name
-
-                if ids_file.exists() and meta_file.exists():
+                ids_file = target.path / entry.ids_file_name
+                if ids_file.exists() and target.read_entry(entry) is not None:
                     result_counter[_ExecuteResult.SKIP] += 1
                     continue
 
                 write_lines_file(ids_file, self.tweet_ids(entry))
-                write_json(meta_file, entry, overwrite_existing=True)
+                target.write_entry(entry)
                 result_counter[_ExecuteResult.SUCCESS] += 1
             except Exception:
                 logger.exception("  Entry '{}' failed with exception.".format(entry.id))
                 result_counter[_ExecuteResult.FAIL] += 1
         return result_counter
 
-    # TODO Update with storage API
     def unidify(
         self,
         twitter_api_settings: TwitterApiSettings,
@@ -142,62 +227,164 @@ class BatchResults(Sequence[BatchEntry]):
             twitter_api_settings=twitter_api_settings,
         )
 
-    # TODO Update with storage API
     def _transform_unidify(
-        self,
-        results_dir: Path,
-        twitter_api_settings: TwitterApiSettings,
+        self, target: FileStorage, twitter_api_settings: TwitterApiSettings
     ) -> Counter[_ExecuteResult]:
+        """Looks up the Tweets of all entries not yet present in target.
+
+        Tweet-IDs are streamed in chunks, of which up to NASTY_NUM_LOOKUP_WORKERS are
+        looked up concurrently, so that neither all Tweet-IDs nor all Tweets need to be
+        held in memory. Entries are written as soon as all of their chunks completed.
+        """
+
         result_counter = Counter[_ExecuteResult]()
 
-        head, entries_tweet_ids = spy(
-            self._iter_entries_tweet_ids(results_dir, result_counter)
-        )
-        if not head:  # Check if any entries with Tweet-IDs exist (else unzip fails).
-            return result_counter
+        pending_entries = []
+        for entry in self:
+            if target.entry_exists(entry):
+                result_counter[_ExecuteResult.SKIP] += 1
+            else:
+                pending_entries.append(entry)
 
-        entries, tweet_ids = cast(
-            Tuple[Iterator[BatchEntry], Iterator[TweetId]], unzip(entries_tweet_ids)
+        # Counted upfront to be able to report an ETA, which is cheap compared to
+        # looking the Tweets up.
+        num_tweet_ids = sum(
+            1 for entry in pending_entries for _ in self.tweet_ids(entry)
         )
-        for entry, tweets in groupby_transform(
-            zip(entries, statuses_lookup(tweet_ids, twitter_api_settings)),
+        num_looked_up = 0
+        progress_interval = (
+            STATUSES_LOOKUP_CHUNK_SIZE * STATUSES_LOOKUP_PROGRESS_INTERVAL
+        )
+
+        def lookup_chunk(
+            entry_and_chunk: Tuple[BatchEntry, Sequence[TweetId]]
+        ) -> Tuple[BatchEntry, Sequence[Optional[Tweet]]]:
+            entry, tweet_ids_chunk = entry_and_chunk
+            if not tweet_ids_chunk:
+                return entry, []
+            # Chunks are already looked up concurrently here, so do not let
+            # statuses_lookup() start further workers for each of them.
+            return entry, statuses_lookup_chunk(tweet_ids_chunk, twitter_api_settings)
+
+        for entry, tweets_chunks in groupby_transform(
+            map_ordered(
+                lookup_chunk,
+                self._iter_entries_tweet_ids_chunks(pending_entries),
+                max_workers=num_lookup_workers(),
+            ),
             keyfunc=itemgetter(0),
             valuefunc=itemgetter(1),
         ):
-            write_jsonl_lines(
-                results_dir / entry.data_file_name,
-                (tweet for tweet in tweets if tweet is not None),
-                use_lzma=True,
-            )
-            write_json(
-                results_dir / entry.meta_file_name, entry, overwrite_existing=True
-            )
+            num_entry_tweet_ids = 0
+
+            def entry_tweets() -> Iterator[Tweet]:
+                nonlocal num_entry_tweet_ids
+                for tweets_chunk in tweets_chunks:
+                    num_entry_tweet_ids += len(tweets_chunk)
+                    yield from (tweet for tweet in tweets_chunk if tweet is not None)
+
+            target.write_data(entry, entry_tweets())
+            target.write_entry(entry)
             result_counter[_ExecuteResult.SUCCESS] += 1
 
-        return result_counter
+            if (num_looked_up + num_entry_tweet_ids) // progress_interval > (
+                num_looked_up // progress_interval
+            ):
+                log_statuses_lookup_progress(
+                    num_looked_up + num_entry_tweet_ids,
+                    num_tweet_ids - num_looked_up - num_entry_tweet_ids,
+                )
+            num_looked_up += num_entry_tweet_ids
 
-    # TODO Update with storage API
-    def _iter_entries_tweet_ids(
-        self, results_dir: Path, result_counter: Counter[_ExecuteResult]
-    ) -> Iterable[Tuple[BatchEntry, TweetId]]:
-        for entry in self:
-            meta_file = results_dir / entry.meta_file_name
-            data_file = results_dir / entry.data_file_name
-            if data_file.exists() and meta_file.exists():
-                result_counter[_ExecuteResult.SKIP] += 1
-                continue
+        return result_counter
 
+    def _iter_entries_tweet_ids_chunks(
+        self, entries: Iterable[BatchEntry]
+    ) -> Iterable[Tuple[BatchEntry, Sequence[TweetId]]]:
+        for entry in entries:
             is_entry_empty = True
-            for tweet in self.tweet_ids(entry):
+            for tweet_ids_chunk in chunked(
+                self.tweet_ids(entry), STATUSES_LOOKUP_CHUNK_SIZE
+            ):
                 is_entry_empty = False
-                yield entry, tweet
+                yield entry, tweet_ids_chunk
 
             if is_entry_empty:
-                write_jsonl_lines(results_dir / entry.data_file_name, [], use_lzma=True)
-                write_json(
-                    results_dir / entry.meta_file_name, entry, overwrite_existing=True
+                # Still yielded, so that a data file is written for the entry.
+                yield entry, []
+
+    def export(
+        self,
+        out_dir: Path,
+        *,
+        format_: ExportFormat = ExportFormat.PARQUET,
+        partitioning: ExportPartitioning = ExportPartitioning.ENTRY,
+        num_workers: Optional[int] = None,
+    ) -> bool:
+        """Converts the Tweets of all entries into a columnar dataset in out_dir.
+
+        Each row holds the core fields of a Tweet in flat columns, alongside the ID of
+        the entry it belongs to and its raw JSON. Tweets are streamed in batches of
+        EXPORT_BATCH_SIZE, so memory use does not depend on the size of entries.
+        Entries are exported by num_workers processes (defaulting to the
+        NASTY_NUM_WORKERS environment variable), which requires results stored in a
+        FileStorage. Entries exported before are skipped.
+
+        Returns whether all entries were exported successfully.
+        """
+
+        if not _pyarrow_installed:
+            raise ImportError(
+                "Exporting requires the pyarrow package. Install it via: "
+                "pip install nasty[arrow]"
+            )
+        if num_workers is None:
+            num_workers = int(getenv("NASTY_NUM_WORKERS", default="1"))
+
+        logger.debug(
+            "Exporting batch results to '{}' as {} partitioned by {}.".format(
+                out_dir, format_.name, partitioning.name
+            )
+        )
+        (out_dir / EXPORTED_DIR_NAME).mkdir(parents=True, exist_ok=True)
+
+        result_counter = Counter[_ExecuteResult]()
+        if num_workers == 1:
+            for entry in self:
+                result_counter[
+                    _export_entry(
+                        self._results_storage, entry, out_dir, format_, partitioning
+                    )
+                ] += 1
+        else:
+            if not isinstance(self._results_storage, FileStorage):
+                raise ValueError(
+                    "Exporting with multiple workers requires a FileStorage."
                 )
-                result_counter[_ExecuteResult.SUCCESS] += 1
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                futures = [
+                    pool.submit(
+                        _export_entry,
+                        self._results_storage,
+                        entry,
+                        out_dir,
+                        format_,
+                        partitioning,
+                    )
+                    for entry in self
+                ]
+                for future in futures:
+                    result_counter[future.result()] += 1
+
+        logger.info(
+            "  Exporting batch results completed. {:d} successful, {:d} skipped, {:d} "
+            "failed.".format(
+                result_counter[_ExecuteResult.SUCCESS],
+                result_counter[_ExecuteResult.SKIP],
+                result_counter[_ExecuteResult.FAIL],
+            )
+        )
+        return not result_counter[_ExecuteResult.FAIL]
 
     def __len__(self) -> int:
         return len(self._entries)
@@ -223,3 +410,196 @@ class BatchResults(Sequence[BatchEntry]):
 
     def __repr__(self) -> str:
         return repr(self._entries)
+
+
+class _ExportWriter:
+    """Writes rows to a single file of an export, buffered in batches.
+
+    Rows are written to a temporary file, which is only renamed to the actual file on
+    commit(), so that an aborted export does not leave partial files behind. finish()
+    completes the temporary file and releases its buffers before that.
+    """
+
+    def __init__(self, file: Path, format_: ExportFormat):
+        self.file = file
+        self._tmp_file = file.parent / (".tmp." + file.name)
+        self._schema = pyarrow.schema(
+            [
+                ("id", pyarrow.int64()),
+                ("created_at", pyarrow.timestamp("s", tz="UTC")),
+                ("user_id", pyarrow.int64()),
+                ("user_screen_name", pyarrow.string()),
+                ("text", pyarrow.string()),
+                ("lang", pyarrow.string()),
+                ("retweet_count", pyarrow.int64()),
+                ("favorite_count", pyarrow.int64()),
+                ("reply_count", pyarrow.int64()),
+                ("quote_count", pyarrow.int64()),
+                ("entry_id", pyarrow.string()),
+                ("json", pyarrow.string()),
+            ]
+        )
+        self._columns: Dict[str, List[object]] = {
+            name: [] for name in self._schema.names
+        }
+
+        file.parent.mkdir(parents=True, exist_ok=True)
+        self._sink: Optional[BinaryIO] = None
+        self._finished = False
+        if format_ == ExportFormat.PARQUET:
+            self._writer = pyarrow.parquet.ParquetWriter(
+                str(self._tmp_file), self._schema
+            )
+        else:
+            self._sink = self._tmp_file.open("wb")
+            self._writer = pyarrow.ipc.new_file(self._sink, self._schema)
+
+    def append(self, tweet: Tweet, entry: BatchEntry) -> None:
+        user = tweet.user
+        json = tweet.to_json()
+        columns = self._columns
+        columns["id"].append(tweet.id_int)
+        columns["created_at"].append(tweet.created_at)
+        columns["user_id"].append(int(user.id))
+        columns["user_screen_name"].append(user.screen_name)
+        columns["text"].append(tweet.text)
+        columns["lang"].append(json.get("lang"))
+        columns["retweet_count"].append(json.get("retweet_count"))
+        columns["favorite_count"].append(json.get("favorite_count"))
+        columns["reply_count"].append(json.get("reply_count"))
+        columns["quote_count"].append(json.get("quote_count"))
+        columns["entry_id"].append(entry.id)
+        columns["json"].append(dumps(json))
+
+        if len(columns["id"]) == EXPORT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._columns["id"]:
+            return
+        self._writer.write_table(
+            pyarrow.Table.from_pydict(self._columns, schema=self._schema)
+        )
+        for values in self._columns.values():
+            values.clear()
+
+    def finish(self) -> None:
+        self.flush()
+        self._close()
+
+    def commit(self) -> None:
+        self.finish()
+        self._tmp_file.replace(self.file)
+
+    def discard(self) -> None:
+        """Removes the temporary file, if it was not committed."""
+
+        try:
+            self._close()
+        finally:
+            if self._tmp_file.exists():
+                self._tmp_file.unlink()
+
+    def _close(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            self._writer.close()
+        finally:
+            if self._sink is not None:
+                self._sink.close()
+
+
+class _ExportWriters:
+    """The writers of an entry's export by partition.
+
+    At most EXPORT_MAX_OPEN_WRITERS are kept open. If further partitions are written
+    to, the least recently written to writer is finished and a later Tweet of its
+    partition goes to an additional file, named with a counter after the entry ID.
+    """
+
+    def __init__(self, entry: BatchEntry, out_dir: Path, format_: ExportFormat):
+        self._entry = entry
+        self._out_dir = out_dir
+        self._format = format_
+
+        # Least recently written to first.
+        self._writers: "OrderedDict[str, _ExportWriter]" = OrderedDict()
+        self._finished_writers: List[_ExportWriter] = []
+        self._num_partition_files = Counter[str]()
+
+    def open(self, partition: str) -> _ExportWriter:
+        num_files = self._num_partition_files[partition]
+        self._num_partition_files[partition] += 1
+        file_name = self._entry.id + (".{:d}".format(num_files) if num_files else "")
+        writer = _ExportWriter(
+            self._out_dir / partition / (file_name + self._format.suffix), self._format
+        )
+        self._writers[partition] = writer
+        if len(self._writers) > EXPORT_MAX_OPEN_WRITERS:
+            _, evicted_writer = self._writers.popitem(last=False)
+            evicted_writer.finish()
+            self._finished_writers.append(evicted_writer)
+        return writer
+
+    def append(self, partition: str, tweet: Tweet) -> None:
+        writer = self._writers.get(partition)
+        if writer is None:
+            writer = self.open(partition)
+        else:
+            self._writers.move_to_end(partition)
+        writer.append(tweet, self._entry)
+
+    def commit(self) -> None:
+        self._finished_writers.extend(self._writers.values())
+        self._writers.clear()
+        for writer in self._finished_writers:
+            writer.commit()
+
+    def discard(self) -> None:
+        """Removes the temporary files of all writers that were not committed."""
+
+        for writer in chain(self._writers.values(), self._finished_writers):
+            try:
+                writer.discard()
+            except Exception:
+                logger.exception("  Could not remove '{}'.".format(writer.file))
+
+
+def _export_entry(
+    storage: Storage,
+    entry: BatchEntry,
+    out_dir: Path,
+    format_: ExportFormat,
+    partitioning: ExportPartitioning,
+) -> _ExecuteResult:
+    """Exports a single entry, module-level so that it can run in worker processes."""
+
+    marker_file = out_dir / EXPORTED_DIR_NAME / entry.id
+    if marker_file.exists():
+        return _ExecuteResult.SKIP
+
+    writers = _ExportWriters(entry, out_dir, format_)
+    try:
+        if partitioning == ExportPartitioning.ENTRY:
+            # Also written for entries without Tweets.
+            writers.open("")
+
+        for tweet in storage.read_data(entry):
+            partition = ""
+            if partitioning == ExportPartitioning.DATE:
+                partition = "date={:%Y-%m-%d}".format(tweet.created_at)
+            writers.append(partition, tweet)
+
+        writers.commit()
+        marker_file.touch()
+        return _ExecuteResult.SUCCESS
+
+    except Exception:
+        logger.exception("  Entry '{}' failed with exception.".format(entry.id))
+        return _ExecuteResult.FAIL
+
+    finally:
+        # Only leaves temporary files behind, if the export failed.
+        writers.discard()
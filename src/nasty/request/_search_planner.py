@@ -0,0 +1,226 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import date, datetime, time, timedelta
+from logging import getLogger
+from math import ceil
+from typing import Iterator, List, NamedTuple, Sequence
+
+from typing_extensions import Final
+
+from .._util.time_ import as_utc_datetime
+from .search import Search, SearchFilter
+
+logger = getLogger(__name__)
+
+# Number of Tweets retrieved to estimate the density of a time window. Retrieved in a
+# single HTTP request.
+PROBE_SIZE: Final = 100
+
+# Granularities in which windows are split, from coarsest to finest.
+_SPLIT_UNITS: Final = (timedelta(days=1), timedelta(hours=1), timedelta(minutes=1))
+
+
+class _Window(NamedTuple):
+    """Time window of a search, with the (estimated) number of Tweets in it.
+
+    If exact, all Tweets of the window were retrieved when probing, so that num_tweets
+    is not just an estimate.
+    """
+
+    since: datetime
+    until: datetime
+    num_tweets: float
+    exact: bool
+
+
+class SearchPlanner:
+    """Splits the time range of a search into windows of similar numbers of Tweets.
+
+    Starting with the whole time range, each window is probed for its most recent
+    Tweets. If there are fewer than PROBE_SIZE, the window is known completely.
+    Otherwise, the probed Tweets determine the number of Tweets in the minutes they
+    span exactly, and the number in the remaining, older part of the window is
+    extrapolated from the density of the oldest probed Tweets. Parts estimated to
+    contain more than max_window_tweets are recursively split into days, hours, or
+    minutes and probed again. Finally, adjacent windows are merged as long as they
+    contain at most max_window_tweets together, and windows without any Tweets are
+    dropped. This way, dense time ranges do not hit the depth limit of the search
+    timeline, while sparse ones do not waste requests on mostly empty windows.
+
+    The planned requests keep max_tweets of the search, so that windows are at most
+    max_tweets Tweets large, if it is set.
+    """
+
+    def __init__(self, search: Search, *, max_window_tweets: int):
+        if search.since is None or search.until is None:
+            raise ValueError("Need both since and until date for planning.")
+        if max_window_tweets < PROBE_SIZE:
+            raise ValueError(
+                "max_window_tweets must be at least {:d}.".format(PROBE_SIZE)
+            )
+        if search.max_tweets is not None:
+            if search.max_tweets < PROBE_SIZE:
+                raise ValueError(
+                    "Need max_tweets of either None or at least {:d} for "
+                    "planning.".format(PROBE_SIZE)
+                )
+            # Otherwise, the requests of larger windows would miss Tweets.
+            max_window_tweets = min(max_window_tweets, search.max_tweets)
+
+        self.search: Final = search
+        self.max_window_tweets: Final = max_window_tweets
+        self.num_probes = 0
+
+    def plan(self) -> Sequence[Search]:
+        assert self.search.since is not None and self.search.until is not None
+        windows = self._merge_windows(
+            self._split_window(
+                as_utc_datetime(self.search.since), as_utc_datetime(self.search.until)
+            )
+        )
+        requests = [
+            self._window_request(window)
+            for window in windows
+            if not (window.exact and window.num_tweets == 0)
+        ]
+
+        logger.info(
+            "Planned {:d} requests for an estimated {:d} Tweets ({:d} probes).".format(
+                len(requests),
+                round(sum(window.num_tweets for window in windows)),
+                self.num_probes,
+            )
+        )
+        return requests
+
+    def _split_window(self, since: datetime, until: datetime) -> Iterator[_Window]:
+        """Yields the windows the given one is split into, in chronological order."""
+
+        created_ats = self._probe_window(since, until)
+        if len(created_ats) < PROBE_SIZE:
+            yield _Window(since, until, len(created_ats), exact=True)
+            return
+
+        # Tweets are retrieved most recent first, so that all Tweets after the oldest
+        # one were retrieved.
+        oldest_half = created_ats[len(created_ats) // 2 :]
+        density = len(oldest_half) / max(
+            (oldest_half[0] - oldest_half[-1]).total_seconds(), 1.0
+        )
+        cut = _next_minute(oldest_half[-1])
+        if cut >= until:
+            yield from self._split_estimated_window(since, until, density)
+            return
+
+        yield from self._split_estimated_window(since, cut, density)
+        yield _Window(
+            cut,
+            until,
+            sum(1 for created_at in created_ats if created_at >= cut),
+            exact=True,
+        )
+
+    def _split_estimated_window(
+        self, since: datetime, until: datetime, density: float
+    ) -> Iterator[_Window]:
+        window = _Window(
+            since, until, density * (until - since).total_seconds(), exact=False
+        )
+        if window.num_tweets <= self.max_window_tweets:
+            yield window
+            return
+
+        num_parts = ceil(window.num_tweets / self.max_window_tweets)
+        step = _split_step((until - since) / num_parts)
+        if step >= until - since:
+            logger.warning(
+                "Can not split time window {} - {} with an estimated {:d} Tweets "
+                "further.".format(since, until, round(window.num_tweets))
+            )
+            yield window
+            return
+
+        part_since = since
+        while part_since < until:
+            part_until = min(part_since + step, until)
+            yield from self._split_window(part_since, part_until)
+            part_since = part_until
+
+    def _probe_window(self, since: datetime, until: datetime) -> Sequence[datetime]:
+        """Returns when the most recent Tweets of the window were written."""
+
+        self.num_probes += 1
+        probe = Search(
+            self.search.query,
+            since=since,
+            until=until,
+            filter_=SearchFilter.LATEST,
+            lang=self.search.lang,
+            max_tweets=PROBE_SIZE,
+            batch_size=PROBE_SIZE,
+        )
+        return sorted(
+            (as_utc_datetime(tweet.created_at) for tweet in probe.request()),
+            reverse=True,
+        )
+
+    def _merge_windows(self, windows: Iterator[_Window]) -> Sequence[_Window]:
+        merged: List[_Window] = []
+        for window in windows:
+            if (
+                merged
+                and merged[-1].num_tweets + window.num_tweets <= self.max_window_tweets
+            ):
+                prev_window = merged.pop()
+                window = _Window(
+                    prev_window.since,
+                    window.until,
+                    prev_window.num_tweets + window.num_tweets,
+                    prev_window.exact and window.exact,
+                )
+            merged.append(window)
+        return merged
+
+    def _window_request(self, window: _Window) -> Search:
+        return Search(
+            self.search.query,
+            since=_date_if_midnight(window.since),
+            until=_date_if_midnight(window.until),
+            filter_=self.search.filter,
+            lang=self.search.lang,
+            since_id=self.search.since_id,
+            max_tweets=self.search.max_tweets,
+            batch_size=self.search.batch_size,
+            meta=self.search.meta,
+        )
+
+
+def _split_step(length: timedelta) -> timedelta:
+    """Rounds the length down to a multiple of the coarsest unit it spans."""
+
+    for unit in _SPLIT_UNITS:
+        if length >= unit:
+            return unit * (length // unit)
+    return _SPLIT_UNITS[-1]
+
+
+def _next_minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+
+def _date_if_midnight(value: datetime) -> date:
+    return value.date() if value.time() == time() else value
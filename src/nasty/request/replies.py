@@ -14,15 +14,32 @@
 # limitations under the License.
 #
 
+from typing import Optional
+
 from overrides import overrides
 
 from ..tweet.conversation_tweet_stream import ConversationTweetStream
+from ..tweet.tweet_stream import AsyncTweetStream
 from .conversation_request import ConversationRequest
+from .request import RequestCheckpoint
 
 
 class Replies(ConversationRequest):
     @overrides
-    def request(self) -> ConversationTweetStream:
+    def request(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> ConversationTweetStream:
+        from .._retriever.replies_retriever import RepliesRetriever
+
+        return RepliesRetriever(self, checkpoint=checkpoint).tweet_stream
+
+    @overrides
+    def request_async(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> AsyncTweetStream:
+        from .._retriever.async_retriever import AsyncRetriever
         from .._retriever.replies_retriever import RepliesRetriever
 
-        return RepliesRetriever(self).tweet_stream
+        return AsyncRetriever(
+            RepliesRetriever(self, checkpoint=checkpoint)
+        ).tweet_stream
@@ -21,12 +21,42 @@ from overrides import overrides
 from typing_extensions import Final, final
 
 from .._util.json_ import JsonSerializable
-from ..tweet.tweet_stream import TweetStream
+from .._util.typing_ import checked_cast
+from ..tweet.tweet import TweetId
+from ..tweet.tweet_stream import AsyncTweetStream, TweetStream
 
 DEFAULT_MAX_TWEETS: Final = 100
 DEFAULT_BATCH_SIZE: Final = 20
 
 
+class RequestCheckpoint(JsonSerializable):
+    """Position in the timeline of a request from which its retrieval can resume.
+
+    :param cursor: Twitter's cursor for the batch following the checkpoint.
+    :param num_tweets: Number of Tweets retrieved before the checkpoint. Counts
+        towards the max_tweets of the resumed request.
+    """
+
+    def __init__(self, cursor: str, num_tweets: int):
+        self.cursor: Final = cursor
+        self.num_tweets: Final = num_tweets
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) == type(other) and self.__dict__ == other.__dict__
+
+    @overrides
+    def to_json(self) -> Mapping[str, object]:
+        return {"cursor": self.cursor, "num_tweets": self.num_tweets}
+
+    @classmethod
+    @overrides
+    def from_json(cls, obj: Mapping[str, object]) -> "RequestCheckpoint":
+        return cls(
+            cursor=checked_cast(str, obj["cursor"]),
+            num_tweets=checked_cast(int, obj["num_tweets"]),
+        )
+
+
 class Request(ABC, JsonSerializable):
     def __init__(self, *, max_tweets: Optional[int], batch_size: int):
         """Construct a new timeline view.
@@ -99,5 +129,25 @@ class Request(ABC, JsonSerializable):
         raise RuntimeError("Unknown request type: '{}'.".format(obj["type"]))
 
     @abstractmethod
-    def request(self) -> TweetStream:
+    def request(self, *, checkpoint: Optional[RequestCheckpoint] = None) -> TweetStream:
+        """Retrieves the Tweets of the request.
+
+        :param checkpoint: If given, resume the request from this checkpoint of a
+            previous retrieval, i.e., only Tweets after it are returned.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def request_async(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> AsyncTweetStream:
         raise NotImplementedError()
+
+    def newer_request(self, since_id: Optional[TweetId]) -> Optional["Request"]:
+        """Returns a request for only the Tweets newer than the given Tweet ID.
+
+        Used to incrementally refresh the results of a previous execution. If since_id
+        is None, the returned request is not restricted. Returns None if the request
+        type does not support this.
+        """
+        return None
@@ -14,17 +14,18 @@
 # limitations under the License.
 #
 
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
 from typing import Dict, Mapping, Optional, Sequence, cast
 
 from overrides import overrides
 from typing_extensions import Final
 
-from .._util.time_ import daterange, yyyy_mm_dd_date
+from .._util.time_ import as_utc_datetime, daterange, yyyy_mm_dd_date_or_datetime
 from .._util.typing_ import checked_cast
-from ..tweet.tweet_stream import TweetStream
-from .request import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TWEETS, Request
+from ..tweet.tweet import TweetId
+from ..tweet.tweet_stream import AsyncTweetStream, TweetStream
+from .request import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TWEETS, Request, RequestCheckpoint
 
 
 class SearchFilter(Enum):
@@ -53,6 +54,7 @@ class SearchFilter(Enum):
 
 
 DEFAULT_FILTER = SearchFilter.TOP
+DEFAULT_MAX_WINDOW_TWEETS: Final = 5000
 
 
 class Search(Request):
@@ -64,6 +66,7 @@ class Search(Request):
         until: Optional[date] = None,
         filter_: SearchFilter = DEFAULT_FILTER,
         lang: Optional[str] = None,
+        since_id: Optional[TweetId] = None,
         max_tweets: Optional[int] = DEFAULT_MAX_TWEETS,
         batch_size: int = DEFAULT_BATCH_SIZE,
         meta: Optional[Mapping[str, str]] = None,
@@ -78,15 +81,29 @@ class Search(Request):
             There is no guarantee that the query string will be contained in the Tweet
             text. It could also be part of the name of the authoring user, or even the
             title of a linked external website.
-        :param since: Only find Tweets written after this date (inclusive).
-        :param until: Only find Tweets written before this date (exclusive).
+        :param since: Only find Tweets written after this date (inclusive). May also
+            be a datetime (naive ones are taken as UTC), to restrict the search to a
+            time of day with a precision of seconds.
+        :param until: Only find Tweets written before this date (exclusive). May also
+            be a datetime, see since.
         :param filter_: Method to sort/filter Tweets.
         :param lang: Only search Tweets written in this language. These are directly
             passed to Twitter and it's undocumented what arguments they except here.
             Presumably ISO 3166-1 alpha-2 and alpha-3 codes should work.
+        :param since_id: Only find Tweets newer than the Tweet with this ID
+            (exclusive). Allows to only retrieve Tweets that were posted since a
+            previous execution of the request, see newer_request().
         """
 
-        if since is not None and until is not None and since >= until:
+        if isinstance(since, datetime):
+            since = as_utc_datetime(since).replace(microsecond=0)
+        if isinstance(until, datetime):
+            until = as_utc_datetime(until).replace(microsecond=0)
+        if (
+            since is not None
+            and until is not None
+            and as_utc_datetime(since) >= as_utc_datetime(until)
+        ):
             raise ValueError("since date must be before until date.")
 
         super().__init__(max_tweets=max_tweets, batch_size=batch_size)
@@ -99,6 +116,7 @@ class Search(Request):
         if lang == "":
             lang = None
         self.lang: Final = lang
+        self.since_id: Final = since_id
 
     @overrides
     def to_json(self) -> Mapping[str, object]:
@@ -113,6 +131,8 @@ class Search(Request):
         obj["filter"] = self.filter.to_json()
         if self.lang:
             obj["lang"] = self.lang
+        if self.since_id:
+            obj["since_id"] = self.since_id
         if self.meta:
             obj["meta"] = self.meta
         obj.update(super().to_json())
@@ -125,17 +145,20 @@ class Search(Request):
         return cls(
             query=checked_cast(str, obj["query"]),
             since=(
-                yyyy_mm_dd_date(checked_cast(str, obj["since"]))
+                yyyy_mm_dd_date_or_datetime(checked_cast(str, obj["since"]))
                 if "since" in obj
                 else None
             ),
             until=(
-                yyyy_mm_dd_date(checked_cast(str, obj["until"]))
+                yyyy_mm_dd_date_or_datetime(checked_cast(str, obj["until"]))
                 if "until" in obj
                 else None
             ),
             filter_=SearchFilter.from_json(cast(str, obj["filter"])),
             lang=(cast(Optional[str], obj["lang"]) if "lang" in obj else None),
+            since_id=(
+                checked_cast(str, obj["since_id"]) if "since_id" in obj else None
+            ),
             max_tweets=(
                 cast(Optional[int], obj["max_tweets"])
                 if "max_tweets" in obj
@@ -150,10 +173,33 @@ class Search(Request):
         )
 
     @overrides
-    def request(self) -> TweetStream:
+    def request(self, *, checkpoint: Optional[RequestCheckpoint] = None) -> TweetStream:
         from .._retriever.search_retriever import SearchRetriever
 
-        return SearchRetriever(self).tweet_stream
+        return SearchRetriever(self, checkpoint=checkpoint).tweet_stream
+
+    @overrides
+    def request_async(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> AsyncTweetStream:
+        from .._retriever.async_retriever import AsyncRetriever
+        from .._retriever.search_retriever import SearchRetriever
+
+        return AsyncRetriever(SearchRetriever(self, checkpoint=checkpoint)).tweet_stream
+
+    @overrides
+    def newer_request(self, since_id: Optional[TweetId]) -> "Search":
+        return Search(
+            self.query,
+            since=self.since,
+            until=self.until,
+            filter_=self.filter,
+            lang=self.lang,
+            since_id=since_id if since_id is not None else self.since_id,
+            max_tweets=self.max_tweets,
+            batch_size=self.batch_size,
+            meta=self.meta,
+        )
 
     def to_daily_requests(self) -> Sequence["Search"]:
         if self.since is None or self.until is None:
@@ -168,9 +214,29 @@ class Search(Request):
                 until=date_ + timedelta(days=1),
                 filter_=self.filter,
                 lang=self.lang,
+                since_id=self.since_id,
                 max_tweets=self.max_tweets,
                 batch_size=self.batch_size,
                 meta=self.meta,
             )
             for date_ in daterange(self.since, self.until - timedelta(days=1))
         ]
+
+    def to_adaptive_requests(
+        self, *, max_window_tweets: int = DEFAULT_MAX_WINDOW_TWEETS
+    ) -> Sequence["Search"]:
+        """Splits the request into time windows of up to max_window_tweets Tweets.
+
+        Unlike to_daily_requests(), the windows adapt to how many Tweets match the
+        query: busy days are split into hours or minutes, while quiet days are merged
+        and days without any Tweets are skipped. Estimating the number of Tweets
+        requires probing Twitter, see SearchPlanner.
+
+        Like the windows of to_daily_requests(), each window keeps max_tweets, which
+        thus also caps max_window_tweets. Set max_tweets to None to plan windows of
+        up to max_window_tweets Tweets.
+        """
+
+        from ._search_planner import SearchPlanner
+
+        return SearchPlanner(self, max_window_tweets=max_window_tweets).plan()
@@ -14,15 +14,30 @@
 # limitations under the License.
 #
 
+from typing import Optional
+
 from overrides import overrides
 
 from ..tweet.conversation_tweet_stream import ConversationTweetStream
+from ..tweet.tweet_stream import AsyncTweetStream
 from .conversation_request import ConversationRequest
+from .request import RequestCheckpoint
 
 
 class Thread(ConversationRequest):
     @overrides
-    def request(self) -> ConversationTweetStream:
+    def request(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> ConversationTweetStream:
+        from .._retriever.thread_retriever import ThreadRetriever
+
+        return ThreadRetriever(self, checkpoint=checkpoint).tweet_stream
+
+    @overrides
+    def request_async(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> AsyncTweetStream:
+        from .._retriever.async_retriever import AsyncRetriever
         from .._retriever.thread_retriever import ThreadRetriever
 
-        return ThreadRetriever(self).tweet_stream
+        return AsyncRetriever(ThreadRetriever(self, checkpoint=checkpoint)).tweet_stream
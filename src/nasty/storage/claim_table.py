@@ -0,0 +1,178 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import socket
+from contextlib import contextmanager
+from datetime import timedelta
+from logging import getLogger
+from pathlib import Path
+from threading import Event, Lock, Thread
+from time import time
+from typing import Iterator, Mapping, Optional, Set, cast
+
+from typing_extensions import Final
+
+from .._util.json_ import dumps, loads
+from ..batch.batch_entry import BatchEntryId
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None  # type: ignore
+
+logger = getLogger(__name__)
+
+CLAIMS_DIR_NAME: Final = "claims"
+DEFAULT_CLAIM_TIMEOUT: Final = timedelta(minutes=10)
+
+
+class ClaimTable:
+    """Claims on entries by workers executing them, stored in a results directory.
+
+    Each claim is a file created with O_EXCL, so that of all workers trying to claim an
+    entry only one succeeds, even if they run on different hosts sharing the directory
+    over NFS. While held, claims are periodically touched by a background thread. A
+    claim is considered stale and may be broken by other workers, if its worker
+    process no longer exists on the same host, or if it was not touched within the
+    timeout, e.g., because its host crashed.
+    """
+
+    def __init__(self, path: Path, *, timeout: timedelta = DEFAULT_CLAIM_TIMEOUT):
+        self.path: Final = path / CLAIMS_DIR_NAME
+        self.timeout: Final = timeout
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._host: Final = socket.gethostname()
+        self._pid: Final = os.getpid()
+
+        self._lock: Final = Lock()
+        self._held: Set[BatchEntryId] = set()
+        self._heartbeat_stop: Final = Event()
+        self._heartbeat_thread: Optional[Thread] = None
+
+    def try_claim(self, entry_id: BatchEntryId) -> bool:
+        """Returns whether the entry was claimed, i.e., no other worker holds it."""
+
+        if self._create_claim_file(entry_id):
+            return True
+
+        with self._lock_claims():
+            if not self._is_stale(entry_id):
+                return False
+            logger.info("  Breaking stale claim on entry {}.".format(entry_id))
+            try:
+                self._claim_file(entry_id).unlink()
+            except FileNotFoundError:
+                pass
+            return self._create_claim_file(entry_id)
+
+    def release(self, entry_id: BatchEntryId) -> None:
+        with self._lock:
+            self._held.discard(entry_id)
+        try:
+            self._claim_file(entry_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Stops touching held claims, without releasing them."""
+
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+
+    def _claim_file(self, entry_id: BatchEntryId) -> Path:
+        return self.path / "{:s}.claim".format(entry_id)
+
+    def _create_claim_file(self, entry_id: BatchEntryId) -> bool:
+        try:
+            fd = os.open(
+                str(self._claim_file(entry_id)), os.O_WRONLY | os.O_CREAT | os.O_EXCL
+            )
+        except FileExistsError:
+            return False
+        try:
+            os.write(
+                fd,
+                dumps(
+                    {"host": self._host, "pid": self._pid, "claimed_at": time()}
+                ).encode("UTF-8"),
+            )
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            self._held.add(entry_id)
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = Thread(
+                    target=self._heartbeat, name="nasty-claims", daemon=True
+                )
+                self._heartbeat_thread.start()
+        return True
+
+    def _is_stale(self, entry_id: BatchEntryId) -> bool:
+        claim_file = self._claim_file(entry_id)
+        try:
+            touched_at = claim_file.stat().st_mtime
+            owner = cast(
+                Mapping[str, object], loads(claim_file.read_text(encoding="UTF-8"))
+            )
+        except FileNotFoundError:
+            return True  # Released in the meantime.
+        except ValueError:
+            # Claim file is still being written, unless the writer crashed.
+            return touched_at + self.timeout.total_seconds() < time()
+
+        if owner["host"] == self._host and not _is_process_alive(
+            cast(int, owner["pid"])
+        ):
+            return True
+        return touched_at + self.timeout.total_seconds() < time()
+
+    def _heartbeat(self) -> None:
+        interval = self.timeout.total_seconds() / 4
+        while not self._heartbeat_stop.wait(interval):
+            with self._lock:
+                held = list(self._held)
+            for entry_id in held:
+                try:
+                    os.utime(str(self._claim_file(entry_id)))
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def _lock_claims(self) -> Iterator[None]:
+        """Serializes breaking stale claims across all workers."""
+
+        # Closing the file releases the lock.
+        with (self.path / ".lock").open("w") as fout:
+            if fcntl is not None:
+                fcntl.flock(fout, fcntl.LOCK_EX)
+            yield
+
+
+def _is_process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        return True  # On Windows, os.kill() would terminate the process.
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, but belongs to another user.
+    return True
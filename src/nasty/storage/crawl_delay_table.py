@@ -0,0 +1,94 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, MutableMapping, cast
+
+from typing_extensions import Final
+
+from .._util.json_ import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows.
+    fcntl = None  # type: ignore
+
+logger = getLogger(__name__)
+
+CRAWL_DELAYS_FILE_NAME: Final = "crawl_delays.json"
+
+
+class CrawlDelayTable:
+    """Next free crawl-delay slot per host, shared by workers of a results directory.
+
+    Workers reserve slots from a JSON file in the directory, which is read and
+    rewritten while holding an exclusive lock on it, so that requests of all worker
+    processes together are spaced crawl-delay seconds apart, even if they run on
+    different hosts sharing the directory over NFS. Slots are UNIX timestamps, so that
+    they can be compared across processes. Across hosts, this requires their clocks to
+    be synchronized (e.g., via NTP).
+
+    Without file locking (on Windows), the file is still shared, but processes may
+    occasionally reserve the same slot.
+    """
+
+    def __init__(self, path: Path):
+        self.file: Final = path / CRAWL_DELAYS_FILE_NAME
+
+        self._lock: Final = Lock()
+
+    def reserve(self, host: str, earliest: float, crawl_delay: float) -> float:
+        """Reserves the next slot for a request to the host, not before earliest.
+
+        Returns the slot as UNIX timestamp.
+        """
+
+        with self._lock, self._locked_next_slots() as next_slots:
+            slot = max(earliest, next_slots.get(host, earliest))
+            next_slots[host] = slot + crawl_delay
+            return slot
+
+    @contextmanager
+    def _locked_next_slots(self) -> Iterator[MutableMapping[str, float]]:
+        fd = os.open(str(self.file), os.O_RDWR | os.O_CREAT)
+        try:
+            if fcntl is not None:
+                # POSIX locks instead of flock(), because NFS clients forward those to
+                # the server.
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            content = b""
+            while True:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    break
+                content += chunk
+            try:
+                next_slots = cast(Dict[str, float], loads(content)) if content else {}
+            except ValueError:
+                logger.warning("Ignoring corrupt file '{}'.".format(self.file))
+                next_slots = {}
+
+            yield next_slots
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, dumps(next_slots).encode("UTF-8"))
+        finally:
+            os.close(fd)  # Also releases the lock.
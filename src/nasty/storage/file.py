@@ -13,28 +13,96 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
+from itertools import chain
 from logging import getLogger
+from os import getenv
 from pathlib import Path
 from tempfile import mkdtemp
-from typing import Iterable, Optional, Sequence
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple, cast
 
+from typing_extensions import Final
+
+from .._util.compression import (
+    Compression,
+    ZstdCompression,
+    compression_for_file,
+    compression_from_name,
+    compression_suffixes,
+)
+from .._util.io_ import read_file, write_file, write_lines_file
 from .._util.json_ import (
+    dumps,
+    loads,
     read_json,
     read_json_lines,
     read_lines_file,
     write_json,
-    write_jsonl_lines,
 )
-from ..batch.batch_entry import BatchEntry
-from ..tweet.tweet import Tweet, TweetId
-from ..tweet.tweet_stream import TweetStream
+from ..batch.batch_entry import BatchEntry, BatchEntryId
+from ..request.request import RequestCheckpoint
+from ..tweet.tweet import Tweet, TweetId, User, UserId
+from .manifest import Manifest, ManifestRecord
+from .response_archive import ResponseArchive
 from .storage import Storage
+from .tweet_store import TweetStore
+from .user_store import UserStore, split_user
 
 logger = getLogger(__name__)
 
+ZSTD_DICTIONARY_FILE_NAME: Final = "zstd.dict"
+DEFAULT_CHECKPOINT_INTERVAL: Final = 0
+
 
 class FileStorage(Storage):
-    def __init__(self, path: Optional[Path] = None, use_lzma: bool = True):
+    """Stores each entry as a JSON meta file and a compressed JSONL data file.
+
+    Data files are written with the given compression. If none is given, it is read
+    from the NASTY_COMPRESSION environment variable (e.g., "xz:9", "zstd", "gzip", or
+    "none"), defaulting to xz. When reading, the compression of each data file is
+    detected from its suffix, so that directories containing files written with
+    different compressions can be read. If data files are compressed with a zstd
+    dictionary, the dictionary is stored alongside them so that they can be read
+    without having to pass it explicitly.
+
+    Additionally, the state of all entries is recorded in a Manifest, from which
+    entries(), entry_exists() and read_entry() are answered without having to read
+    the individual meta files.
+
+    If checkpoints are enabled, the Tweets retrieved so far are appended to an
+    uncompressed partial data file every checkpoint_interval Tweets while an entry is
+    executed, alongside a checkpoint file holding the cursor to resume from. If not
+    given, the interval is read from the NASTY_CHECKPOINT_INTERVAL environment
+    variable, with 0 (the default) disabling checkpoints. Once the entry completes,
+    the partial data file is compressed into the actual data file.
+
+    If deduplicate is set (or the NASTY_DEDUPLICATE environment variable is "1"),
+    Tweets are instead stored in a TweetStore shared by all entries, so that Tweets
+    retrieved by multiple entries are only stored once. Each entry then only stores
+    the IDs of its Tweets in a refs file, through which read_data() resolves them.
+
+    If normalize_users is set (or the NASTY_NORMALIZE_USERS environment variable is
+    "1"), the users of Tweets are instead stored in a UserStore shared by all entries,
+    in the latest version that was retrieved. Stored Tweets then only contain the ID of
+    their user in a "user_id_str" field, and read_data() returns Tweets that resolve
+    their user from the UserStore on first access. Tweets stored with their user
+    embedded can still be read, also from the same directory or data file.
+
+    If archive_responses is set (or the NASTY_ARCHIVE_RESPONSES environment variable is
+    "1"), the raw responses from which Tweets were parsed are kept in a ResponseArchive
+    in the directory, so that the data files can later be rebuilt from them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        compression: Optional[Compression] = None,
+        *,
+        checkpoint_interval: Optional[int] = None,
+        deduplicate: Optional[bool] = None,
+        archive_responses: Optional[bool] = None,
+        normalize_users: Optional[bool] = None,
+    ):
         super().__init__()
 
         if not path:
@@ -42,76 +110,515 @@ class FileStorage(Storage):
         else:
             self.path = path
 
-        self.use_lzma = use_lzma
+        if compression is None:
+            compression = compression_from_name(
+                getenv("NASTY_COMPRESSION", default="xz")
+            )
+        self.compression: Final = compression
+
+        if checkpoint_interval is None:
+            checkpoint_interval = int(
+                getenv(
+                    "NASTY_CHECKPOINT_INTERVAL",
+                    default=str(DEFAULT_CHECKPOINT_INTERVAL),
+                )
+            )
+        self.checkpoint_interval = checkpoint_interval or None
 
-        logger.debug("  Saving results to '{}'.".format(self.path))
+        if deduplicate is None:
+            deduplicate = getenv("NASTY_DEDUPLICATE", default="0") == "1"
+        self.deduplicate: Final = deduplicate
+
+        if archive_responses is None:
+            archive_responses = getenv("NASTY_ARCHIVE_RESPONSES", default="0") == "1"
+        self.archive_responses: Final = archive_responses
+
+        if normalize_users is None:
+            normalize_users = getenv("NASTY_NORMALIZE_USERS", default="0") == "1"
+        self.normalize_users: Final = normalize_users
+
+        logger.debug(
+            "  Saving results to '{}' with {}.".format(self.path, self.compression)
+        )
         Path.mkdir(self.path, exist_ok=True, parents=True)
 
-    def entry_exists(self, entry: BatchEntry) -> bool:
-        meta_file = self.path / entry.meta_file_name
-        data_file = self.path / entry.data_file_name
+        self._zstd_dictionary_file: Final = self.path / ZSTD_DICTIONARY_FILE_NAME
+        if isinstance(compression, ZstdCompression) and compression.dictionary:
+            self._write_zstd_dictionary(compression.dictionary)
 
-        if meta_file.exists():
-            prev_execution_entry = read_json(meta_file, BatchEntry)
+        self._manifest: Final = Manifest(self.path, self._records_from_meta_files)
+        self._written_data: Dict[BatchEntryId, ManifestRecord] = {}
+        self._tweet_store: Optional[TweetStore] = None
+        self._user_store: Optional[UserStore] = None
 
-            if data_file.exists():
-                logger.debug("  Request entry files already exist.")
-                entry.completed_at = prev_execution_entry.completed_at
-                return True
+    def __getstate__(self) -> Mapping[str, object]:
+        # Allows to pass the storage to worker processes, each of which then opens the
+        # directory itself.
+        return {
+            "path": self.path,
+            "compression": self.compression,
+            "checkpoint_interval": self.checkpoint_interval or 0,
+            "deduplicate": self.deduplicate,
+            "archive_responses": self.archive_responses,
+            "normalize_users": self.normalize_users,
+        }
 
-            logger.debug(
-                "  Entry request has stray files associated from previous "
-                "execution: {}".format(prev_execution_entry.exception)
+    def __setstate__(self, state: Mapping[str, object]) -> None:
+        self.__init__(  # type: ignore
+            cast(Path, state["path"]),
+            cast(Compression, state["compression"]),
+            checkpoint_interval=cast(int, state["checkpoint_interval"]),
+            deduplicate=cast(bool, state["deduplicate"]),
+            archive_responses=cast(bool, state["archive_responses"]),
+            normalize_users=cast(bool, state["normalize_users"]),
+        )
+
+    def refresh(self) -> None:
+        """Picks up entries written by other processes since the last refresh."""
+        self._manifest.refresh()
+        if self._tweet_store is not None:
+            self._tweet_store.refresh()
+        if self._user_store is not None:
+            self._user_store.refresh()
+
+    @property
+    def tweet_store(self) -> TweetStore:
+        # Also created if not deduplicating, to read entries that were.
+        if self._tweet_store is None:
+            self._tweet_store = TweetStore(
+                self.path, self.compression, resolve_user=self._resolve_user
             )
+        return self._tweet_store
 
-        return False
+    @property
+    def user_store(self) -> UserStore:
+        # Also created if not normalizing users, to read Tweets that were.
+        if self._user_store is None:
+            self._user_store = UserStore(self.path, self.compression)
+        return self._user_store
 
-    def read_entry(self, entry: BatchEntry) -> Optional[BatchEntry]:
-        meta_file = self.path / entry.meta_file_name
-        data_file = self.path / entry.data_file_name
+    def _resolve_user(self, user_id: UserId) -> User:
+        return self.user_store.get(user_id)
 
-        if meta_file.exists():
-            execution_entry = read_json(meta_file, BatchEntry)
+    def _tweet_lines(
+        self, tweet_jsons: Iterable[Mapping[str, object]], users: Dict[UserId, User]
+    ) -> Iterator[str]:
+        """Serializes the Tweets, collecting their users if normalizing users."""
 
-            if data_file.exists():
-                entry.completed_at = execution_entry.completed_at
+        for tweet_json in tweet_jsons:
+            if self.normalize_users:
+                tweet_json = split_user(tweet_json, users)
+            yield dumps(tweet_json)
 
-            return execution_entry
+    def _store_users(self, entry: BatchEntry, users: Mapping[UserId, User]) -> None:
+        # Called before the data file is moved into place, so that a data file never
+        # refers to users that are not stored.
+        if users:
+            self.user_store.add(
+                self.user_store.unused_segment(entry.id), users.values()
+            )
 
-        return None
+    def _records_from_meta_files(self) -> Iterator[ManifestRecord]:
+        for meta_file in self.path.iterdir():
+            if not meta_file.name.endswith(".meta.json"):
+                continue
+            entry = read_json(meta_file, BatchEntry)
+            data_file = self._find_data_file(entry)
+            if data_file is None:
+                yield ManifestRecord(entry)
+            else:
+                yield ManifestRecord(
+                    entry,
+                    data_file=data_file.name,
+                    data_file_size=data_file.stat().st_size,
+                )
+
+    def _write_zstd_dictionary(self, dictionary: bytes) -> None:
+        if self._zstd_dictionary_file.exists():
+            if self._zstd_dictionary_file.read_bytes() != dictionary:
+                raise ValueError(
+                    "Directory '{}' already contains a different zstd dictionary. "
+                    "Files compressed with it could no longer be read.".format(
+                        self.path
+                    )
+                )
+            return
+        self._zstd_dictionary_file.write_bytes(dictionary)
+
+    def _find_data_file(self, entry: BatchEntry) -> Optional[Path]:
+        """Returns the data file of the entry, regardless of its compression.
+
+        For entries stored deduplicated, this is their refs file.
+        """
+
+        data_files = self._data_files(entry)
+        return data_files[0] if data_files else None
+
+    def _data_files(self, entry: BatchEntry) -> Sequence[Path]:
+        """Returns all existing data files of the entry, preferred one first."""
+
+        suffixes = [self.compression.suffix] + [
+            suffix
+            for suffix in compression_suffixes()
+            if suffix != self.compression.suffix
+        ]
+        return [
+            data_file
+            for data_file in [self.path / entry.refs_file_name]
+            + [
+                self.path / entry.data_file_name_with_suffix(suffix)
+                for suffix in suffixes
+            ]
+            if data_file.exists()
+        ]
+
+    def _data_file_compression(self, data_file: Path) -> Compression:
+        compression = compression_for_file(data_file, preferred=self.compression)
+        if (
+            isinstance(compression, ZstdCompression)
+            and compression.dictionary is None
+            and self._zstd_dictionary_file.exists()
+        ):
+            compression = ZstdCompression(
+                dictionary=self._zstd_dictionary_file.read_bytes()
+            )
+        return compression
+
+    def entry_exists(self, entry: BatchEntry) -> bool:
+        record = self._manifest.get(entry.id)
+        if record is None:
+            return False
+
+        if record.data_file is not None:
+            logger.debug("  Request entry files already exist.")
+            entry.completed_at = record.entry.completed_at
+            return True
+
+        if record.entry.exception is not None:
+            logger.debug(
+                "  Retrying request, previous execution failed with: {}".format(
+                    record.entry.exception
+                )
+            )
+        return False
+
+    def read_entry(self, entry: BatchEntry) -> Optional[BatchEntry]:
+        record = self._manifest.get(entry.id)
+        if record is None:
+            return None
+
+        if record.data_file is not None:
+            entry.completed_at = record.entry.completed_at
+        return record.entry
 
     def write_entry(self, entry: BatchEntry) -> None:
+        # Overwrite meta files of previous failed executions of this entry.
         meta_file = self.path / entry.meta_file_name
-        write_json(meta_file, entry)
+        write_json(meta_file, entry, overwrite_existing=True)
+
+        written_data = self._written_data.pop(entry.id, None)
+        if written_data is None:
+            # Keep data written previously, e.g., if an entry is idified in-place.
+            written_data = self._manifest.get(entry.id)
+        if written_data is None or written_data.data_file is None:
+            self._manifest.append(ManifestRecord(entry))
+        else:
+            self._manifest.append(
+                ManifestRecord(
+                    entry,
+                    data_file=written_data.data_file,
+                    num_tweets=written_data.num_tweets,
+                    data_file_size=written_data.data_file_size,
+                )
+            )
 
     def entries(self) -> Sequence[BatchEntry]:
-        entries: Sequence[BatchEntry] = [
-            read_json(meta_file, BatchEntry)
-            for meta_file in self.path.iterdir()
-            if meta_file.name.endswith(".meta.json")
-        ]
-        return entries
+        return [record.entry for record in self._manifest.records()]
 
-    def write_data(self, entry: BatchEntry, tweet_stream: TweetStream) -> None:
-        data_file = self.path / entry.data_file_name
-        write_jsonl_lines(data_file, tweet_stream, use_lzma=self.use_lzma)
+    def manifest_records(self) -> Sequence[ManifestRecord]:
+        return self._manifest.records()
+
+    def write_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        self._write_data(entry, tweets)
+
+    def replace_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        # Tweets of an interrupted execution are superseded by the new ones.
+        for file in [
+            self.path / entry.checkpoint_file_name,
+            self.path / entry.partial_data_file_name,
+        ]:
+            if file.exists():
+                file.unlink()
+
+        prev_data_files = self._data_files(entry)
+        data_file = self._write_data(entry, tweets, overwrite_existing=True)
+        # Data written previously with another compression or deduplication setting.
+        for prev_data_file in prev_data_files:
+            if prev_data_file != data_file:
+                prev_data_file.unlink()
+
+    def _write_data(
+        self,
+        entry: BatchEntry,
+        tweets: Iterable[Tweet],
+        *,
+        overwrite_existing: bool = False,
+    ) -> Path:
+        data_file = self.path / entry.data_file_name_with_suffix(
+            self.compression.suffix
+        )
+        if self.deduplicate:
+            data_file = self.path / entry.refs_file_name
+        partial_data_file = self.path / entry.partial_data_file_name
+        checkpoint_file = self.path / entry.checkpoint_file_name
+
+        # Tweets up to the last checkpoint have already been written to the partial
+        # data file.
+        checkpointed_lines: Iterable[str] = []
+        read_checkpoint_file = self._read_checkpoint_file(entry)
+        if read_checkpoint_file is not None:
+            checkpointed_lines = _read_partial_data_file_lines(
+                partial_data_file, read_checkpoint_file[1]
+            )
+
+        users: Dict[UserId, User] = {}
+        lines: Iterable[str]
+        if self.normalize_users:
+            # Partial data files always embed users, see write_checkpoint().
+            lines = self._tweet_lines(
+                chain(
+                    (
+                        cast(Mapping[str, object], loads(line))
+                        for line in checkpointed_lines
+                    ),
+                    (tweet.to_json() for tweet in tweets),
+                ),
+                users,
+            )
+        else:
+            lines = chain(
+                checkpointed_lines, (dumps(tweet.to_json()) for tweet in tweets)
+            )
+
+        num_tweets = 0
+
+        def count_lines() -> Iterator[str]:
+            nonlocal num_tweets
+            for line in lines:
+                num_tweets += 1
+                yield line
+
+        if self.deduplicate:
+            tweet_ids = self.tweet_store.add(
+                entry.id,
+                (
+                    Tweet(cast(Mapping[str, object], loads(line)))
+                    for line in count_lines()
+                ),
+            )
+            write_lines_file(
+                data_file,
+                tweet_ids,
+                overwrite_existing=True,
+                before_rename=lambda: self._store_users(entry, users),
+            )
+        else:
+            write_lines_file(
+                data_file,
+                count_lines(),
+                overwrite_existing=overwrite_existing,
+                compression=self.compression,
+                before_rename=lambda: self._store_users(entry, users),
+            )
+
+        for file in [checkpoint_file, partial_data_file]:
+            if file.exists():
+                file.unlink()
+
+        # Only recorded in the manifest once the entry itself is written.
+        self._written_data[entry.id] = ManifestRecord(
+            entry,
+            data_file=data_file.name,
+            num_tweets=num_tweets,
+            data_file_size=data_file.stat().st_size,
+        )
+        return data_file
+
+    def append_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        prev_data_file = self._find_data_file(entry)
+        if prev_data_file is None:
+            self.write_data(entry, tweets)
+            return
+
+        num_tweets = 0
+        users: Dict[UserId, User] = {}
+        lines: Iterable[str]
+        compression: Optional[Compression] = None
+        if prev_data_file.name == entry.refs_file_name.name:
+            data_file = prev_data_file
+            tweets = list(tweets)
+            if not tweets:
+                return
+            if self.normalize_users:
+                tweets = [Tweet(split_user(tweet.to_json(), users)) for tweet in tweets]
+            lines = chain(
+                self.tweet_store.add(entry.id, tweets), read_lines_file(prev_data_file)
+            )
+        else:
+            data_file = self.path / entry.data_file_name_with_suffix(
+                self.compression.suffix
+            )
+            compression = self.compression
+            lines = chain(
+                self._tweet_lines((tweet.to_json() for tweet in tweets), users),
+                read_lines_file(
+                    prev_data_file,
+                    compression=self._data_file_compression(prev_data_file),
+                ),
+            )
+
+        def count_lines() -> Iterator[str]:
+            nonlocal num_tweets
+            for line in lines:
+                num_tweets += 1
+                yield line
+
+        # Written to a temporary file first, so the previous data can be read lazily.
+        write_lines_file(
+            data_file,
+            count_lines(),
+            overwrite_existing=True,
+            compression=compression,
+            before_rename=lambda: self._store_users(entry, users),
+        )
+        if data_file != prev_data_file:
+            prev_data_file.unlink()
+
+        self._written_data[entry.id] = ManifestRecord(
+            entry,
+            data_file=data_file.name,
+            num_tweets=num_tweets,
+            data_file_size=data_file.stat().st_size,
+        )
+
+    def response_archive(self, *, replay: bool = False) -> Optional[ResponseArchive]:
+        if not replay and not self.archive_responses:
+            return None
+        return ResponseArchive(self.path, self.compression, replay=replay)
+
+    def read_checkpoint(self, entry: BatchEntry) -> Optional[RequestCheckpoint]:
+        partial_data_file = self.path / entry.partial_data_file_name
+
+        read_checkpoint_file = self._read_checkpoint_file(entry)
+        if read_checkpoint_file is None:
+            # Tweets written before the first checkpoint can not be resumed from.
+            if partial_data_file.exists():
+                partial_data_file.unlink()
+            return None
+
+        checkpoint, partial_data_file_size = read_checkpoint_file
+        # Drop Tweets that were written after the checkpoint, as they will be retrieved
+        # again when resuming.
+        with partial_data_file.open("r+b") as fout:
+            fout.truncate(partial_data_file_size)
+
+        logger.debug(
+            "  Resuming request from checkpoint after {:d} Tweets.".format(
+                checkpoint.num_tweets
+            )
+        )
+        return checkpoint
+
+    def write_checkpoint(
+        self, entry: BatchEntry, tweets: Iterable[Tweet], checkpoint: RequestCheckpoint
+    ) -> None:
+        partial_data_file = self.path / entry.partial_data_file_name
+        checkpoint_file = self.path / entry.checkpoint_file_name
+
+        with partial_data_file.open("a", encoding="UTF-8") as fout:
+            for tweet in tweets:
+                fout.write(dumps(tweet.to_json()))
+                fout.write("\n")
+            fout.flush()
+            os.fsync(fout.fileno())
+            partial_data_file_size = fout.tell()
+
+        # Written only after the Tweets are on disk, so that a checkpoint never refers
+        # to Tweets that were not persisted.
+        write_file(
+            checkpoint_file,
+            dumps(
+                {
+                    "checkpoint": checkpoint.to_json(),
+                    "partial_data_file_size": partial_data_file_size,
+                }
+            ),
+            overwrite_existing=True,
+        )
+
+    def _read_checkpoint_file(
+        self, entry: BatchEntry
+    ) -> Optional[Tuple[RequestCheckpoint, int]]:
+        checkpoint_file = self.path / entry.checkpoint_file_name
+        partial_data_file = self.path / entry.partial_data_file_name
+        if not checkpoint_file.exists() or not partial_data_file.exists():
+            return None
+
+        obj = cast(Mapping[str, object], loads(read_file(checkpoint_file)))
+        return (
+            RequestCheckpoint.from_json(cast(Mapping[str, object], obj["checkpoint"])),
+            cast(int, obj["partial_data_file_size"]),
+        )
 
     def read_data(self, entry: BatchEntry) -> Iterable[Tweet]:
-        data_file = self.path / entry.data_file_name
+        data_file = self._find_data_file(entry)
         ids_file = self.path / entry.ids_file_name
 
-        if not data_file.exists() and ids_file.exists():
-            raise ValueError("Tweet data not available. Did you forget to unidify?")
+        if data_file is None:
+            if ids_file.exists():
+                raise ValueError("Tweet data not available. Did you forget to unidify?")
+            raise FileNotFoundError(
+                "No data file for entry '{}' in '{}'.".format(entry.id, self.path)
+            )
+
+        if data_file.name == entry.refs_file_name.name:
+            yield from self.tweet_store.get(read_lines_file(data_file))
+            return
 
-        yield from read_json_lines(data_file, Tweet, use_lzma=self.use_lzma)
+        yield from (
+            Tweet(cast(Mapping[str, object], loads(line)), self._resolve_user)
+            for line in read_lines_file(
+                data_file, compression=self._data_file_compression(data_file)
+            )
+        )
 
     def read_data_ids(self, entry: BatchEntry) -> Iterable[TweetId]:
-        data_file = self.path / entry.data_file_name
         ids_file = self.path / entry.ids_file_name
 
         if ids_file.exists():
             yield from read_lines_file(ids_file)
-        else:
-            yield from (
-                tweet.id for tweet in read_json_lines(data_file, Tweet, use_lzma=True)
+            return
+
+        data_file = self._find_data_file(entry)
+        if data_file is None:
+            raise FileNotFoundError(
+                "No data file for entry '{}' in '{}'.".format(entry.id, self.path)
+            )
+        if data_file.name == entry.refs_file_name.name:
+            yield from read_lines_file(data_file)
+            return
+
+        yield from (
+            tweet.id
+            for tweet in read_json_lines(
+                data_file, Tweet, compression=self._data_file_compression(data_file)
             )
+        )
+
+
+def _read_partial_data_file_lines(file: Path, size: int) -> Iterator[str]:
+    """Reads the lines of a partial data file up to its checkpointed size."""
+
+    with file.open("rb") as fin:
+        while fin.tell() < size:
+            yield fin.readline().decode("UTF-8").rstrip("\n")
@@ -0,0 +1,168 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence, cast
+
+from overrides import overrides
+from typing_extensions import Final
+
+from .._util.io_ import append_file
+from .._util.json_ import JsonSerializable, dumps, loads
+from ..batch.batch_entry import BatchEntry, BatchEntryId
+
+logger = getLogger(__name__)
+
+MANIFEST_FILE_NAME: Final = "manifest.jsonl"
+
+
+class ManifestRecord(JsonSerializable):
+    """State of a single entry as recorded in the manifest.
+
+    data_file is None as long as no data was written for the entry.
+    """
+
+    def __init__(
+        self,
+        entry: BatchEntry,
+        *,
+        data_file: Optional[str] = None,
+        num_tweets: Optional[int] = None,
+        data_file_size: Optional[int] = None,
+    ):
+        self.entry: Final = entry
+        self.data_file: Final = data_file
+        self.num_tweets: Final = num_tweets
+        self.data_file_size: Final = data_file_size
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) == type(other) and self.__dict__ == other.__dict__
+
+    @property
+    def status(self) -> str:
+        if self.entry.completed_at is not None and self.data_file is not None:
+            return "completed"
+        elif self.entry.exception is not None:
+            return "failed"
+        return "pending"
+
+    @overrides
+    def to_json(self) -> Mapping[str, object]:
+        obj: Dict[str, object] = {
+            "id": self.entry.id,
+            "status": self.status,
+            "entry": self.entry.to_json(),
+        }
+        if self.data_file is not None:
+            obj["data_file"] = self.data_file
+            obj["num_tweets"] = self.num_tweets
+            obj["data_file_size"] = self.data_file_size
+        return obj
+
+    @classmethod
+    @overrides
+    def from_json(cls, obj: Mapping[str, object]) -> "ManifestRecord":
+        return cls(
+            BatchEntry.from_json(cast(Mapping[str, object], obj["entry"])),
+            data_file=cast(Optional[str], obj.get("data_file")),
+            num_tweets=cast(Optional[int], obj.get("num_tweets")),
+            data_file_size=cast(Optional[int], obj.get("data_file_size")),
+        )
+
+
+class Manifest:
+    """Append-only index of all entries stored in a results directory.
+
+    Each call to append() adds one JSON line with the current state of an entry, so
+    that the latest line of each entry wins. All records are kept in memory, so that
+    looking up entries does not require touching the file system. Lines are written
+    with append_file(), which keeps concurrent writers from interleaving their lines,
+    also over NFS. A partially written last line, e.g., after
+    a crash, is ignored.
+
+    If no manifest exists yet, it is initialized with the records returned by
+    initial_records, which allows to migrate directories written before manifests
+    were introduced.
+    """
+
+    def __init__(
+        self, path: Path, initial_records: Callable[[], Iterable[ManifestRecord]]
+    ):
+        self.file: Final = path / MANIFEST_FILE_NAME
+
+        self._lock: Final = Lock()
+        self._records: Dict[BatchEntryId, ManifestRecord] = {}
+        self._read_offset = 0
+
+        if not self.file.exists():
+            self._initialize(initial_records())
+        self.refresh()
+
+    def get(self, entry_id: BatchEntryId) -> Optional[ManifestRecord]:
+        with self._lock:
+            return self._records.get(entry_id)
+
+    def records(self) -> Sequence[ManifestRecord]:
+        with self._lock:
+            return list(self._records.values())
+
+    def append(self, record: ManifestRecord) -> None:
+        line = (dumps(record.to_json()) + "\n").encode("UTF-8")
+        with self._lock:
+            append_file(self.file, line)
+            self._records[record.entry.id] = record
+
+    def refresh(self) -> None:
+        """Reads records appended since the last refresh, e.g., by other processes."""
+
+        with self._lock, self.file.open("rb") as fin:
+            fin.seek(self._read_offset)
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    break  # Incomplete line, probably still being written.
+                self._read_offset += len(line)
+                try:
+                    record = ManifestRecord.from_json(
+                        cast(Mapping[str, object], loads(line))
+                    )
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(
+                        "Ignoring corrupt line in manifest '{}'.".format(self.file)
+                    )
+                    continue
+                self._records[record.entry.id] = record
+
+    def _initialize(self, records: Iterable[ManifestRecord]) -> None:
+        tmp_file = self.file.parent / ".tmp.{}.{}".format(os.getpid(), self.file.name)
+        with tmp_file.open("w", encoding="UTF-8") as fout:
+            for record in records:
+                fout.write(dumps(record.to_json()))
+                fout.write("\n")
+
+        # Another process might have created the manifest in the meantime, in which
+        # case we must not overwrite records it might have appended already.
+        try:
+            os.link(str(tmp_file), str(self.file))
+        except FileExistsError:
+            pass
+        except OSError:  # File system does not support hard links.
+            if not self.file.exists():
+                tmp_file.replace(self.file)
+                return
+        tmp_file.unlink()
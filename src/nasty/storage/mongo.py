@@ -16,18 +16,29 @@
 from logging import getLogger
 from typing import Iterable, Optional, Sequence
 
-from pymongo import MongoClient
+from more_itertools import chunked
+from pymongo import ASCENDING, MongoClient
 from pymongo.operations import UpdateOne
 
 from ..batch.batch_entry import BatchEntry
 from ..tweet.tweet import Tweet, TweetId
-from ..tweet.tweet_stream import TweetStream
 from .storage import Storage
 
 logger = getLogger(__name__)
 
 
 class MongoStorage(Storage):
+    """Stores entries and Tweets in MongoDB.
+
+    Each Tweet is stored once in the data collection, no matter how many entries
+    retrieved it. Which Tweets belong to which entry is stored separately in the
+    entry_tweets collection, in the order in which they were retrieved. Tweets written
+    before this mapping was introduced are owned by the entry in their entry_id field.
+    """
+
+    # Number of Tweets fetched per query when resolving the Tweets of an entry.
+    _READ_CHUNK_SIZE = 1000
+
     def __init__(
         self,
         host: str = "localhost",
@@ -45,16 +56,26 @@ class MongoStorage(Storage):
 
         self._entries = self._database["entries"]
         self._data = self._database["data"]
+        self._entry_tweets = self._database["entry_tweets"]
+        self._entry_tweets.create_index(
+            [("entry_id", ASCENDING), ("position", ASCENDING)]
+        )
 
         logger.debug("  Saving results to '{}'.".format(self._database))
 
+    def _has_data(self, entry: BatchEntry) -> bool:
+        return bool(
+            self._entry_tweets.count_documents({"entry_id": entry.id}, limit=1) != 0
+            or self._data.count_documents({"entry_id": entry.id}, limit=1) != 0
+        )
+
     def entry_exists(self, entry: BatchEntry) -> bool:
         if self._entries.count_documents({"id": entry.id}, limit=1) != 0:
             prev_execution_entry = BatchEntry.from_json(
                 self._entries.find_one({"id": entry.id})
             )
 
-            if self._data.count_documents({"entry_id": entry.id}, limit=1) != 0:
+            if self._has_data(entry):
                 logger.debug("  Request entry files already exist.")
                 entry.completed_at = prev_execution_entry.completed_at
                 return True
@@ -72,7 +93,7 @@ class MongoStorage(Storage):
                 self._entries.find_one({"id": entry.id})
             )
 
-            if self._data.count_documents({"entry_id": entry.id}, limit=1) != 0:
+            if self._has_data(entry):
                 entry.completed_at = execution_entry.completed_at
 
             return execution_entry
@@ -90,35 +111,83 @@ class MongoStorage(Storage):
         ]
         return entries
 
-    def write_data(self, entry: BatchEntry, tweet_stream: TweetStream) -> None:
+    def write_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
         upserts = []
-        for tweet in tweet_stream:
+        mappings = []
+        for position, tweet in enumerate(tweets):
             j = dict(tweet.to_json())
             j["_id"] = tweet.id
-            j["entry_id"] = entry.id
 
             upserts.append(
                 UpdateOne({"_id": tweet.id}, {"$setOnInsert": j}, upsert=True)
             )
+            mappings.append(
+                UpdateOne(
+                    {"_id": "{}:{}".format(entry.id, tweet.id)},
+                    {
+                        "$set": {
+                            "entry_id": entry.id,
+                            "tweet_id": tweet.id,
+                            "position": position,
+                        }
+                    },
+                    upsert=True,
+                )
+            )
 
         if upserts:
             self._data.bulk_write(upserts)
+            self._entry_tweets.bulk_write(mappings)
+
+    def replace_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        # Retrieve all Tweets before writing any, so that a failed retrieval leaves
+        # the previous data untouched.
+        tweets = list(tweets)
+        self.write_data(entry, tweets)
+
+        # Tweets stay in the data collection, as other entries may still refer to
+        # them. Only the rows mapping Tweets no longer retrieved to the entry are
+        # dropped, after the new ones were written.
+        self._entry_tweets.delete_many(
+            {"entry_id": entry.id, "tweet_id": {"$nin": [tweet.id for tweet in tweets]}}
+        )
 
     def read_data(self, entry: BatchEntry) -> Iterable[Tweet]:
-        if (
-            self._entries.count_documents({"id": entry.id}, limit=1) != 1
-            and self._data.count_documents({"entry_id": entry.id}, limit=1) != 1
-        ):
+        if self._entries.count_documents(
+            {"id": entry.id}, limit=1
+        ) != 1 and not self._has_data(entry):
             raise ValueError("Tweet data not available. Did you forget to unidify?")
 
-        for j in self._data.find(
-            {"entry_id": entry.id}, {"_id": False, "entry_id": False}
-        ):
-            yield Tweet(j)
+        if self._entry_tweets.count_documents({"entry_id": entry.id}, limit=1) == 0:
+            for j in self._data.find(
+                {"entry_id": entry.id}, {"_id": False, "entry_id": False}
+            ):
+                yield Tweet(j)
+            return
+
+        for tweet_ids in chunked(self.read_data_ids(entry), self._READ_CHUNK_SIZE):
+            tweets = {
+                j["_id"]: j
+                for j in self._data.find(
+                    {"_id": {"$in": tweet_ids}}, {"entry_id": False}
+                )
+            }
+            for tweet_id in tweet_ids:
+                yield Tweet(
+                    {
+                        key: value
+                        for key, value in tweets[tweet_id].items()
+                        if key != "_id"
+                    }
+                )
 
     def read_data_ids(self, entry: BatchEntry) -> Iterable[TweetId]:
-
-        for j in self._data.find(
-            {"entry_id": entry.id}, {"_id": False, "entry_id": False}
-        ):
-            yield j.id
+        if self._entry_tweets.count_documents({"entry_id": entry.id}, limit=1) == 0:
+            for j in self._data.find({"entry_id": entry.id}, {"_id": True}):
+                yield TweetId(j["_id"])
+            return
+
+        for j in self._entry_tweets.find(
+            {"entry_id": entry.id}, {"_id": False, "tweet_id": True}
+        ).sort("position", ASCENDING):
+            yield TweetId(j["tweet_id"])
@@ -0,0 +1,177 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Dict, List, Mapping, Optional, Sequence, cast
+
+from typing_extensions import Final
+
+from .._util.compression import Compression, compression_for_file
+from .._util.io_ import read_file
+from .._util.json_ import dumps, loads
+from ..request.request import Request
+
+logger = getLogger(__name__)
+
+RESPONSE_ARCHIVE_DIR_NAME: Final = "responses"
+_OBJECTS_DIR_NAME: Final = "objects"
+
+
+class ResponseNotArchivedException(LookupError):
+    def __init__(self, request: Request, cursor: Optional[str]):
+        self.request: Final = request
+        self.cursor: Final = cursor
+
+        super().__init__(
+            "No archived response for cursor {} of request {}.".format(
+                cursor, request.to_json()
+            )
+        )
+
+
+class ResponseArchive:
+    """Stores the raw responses to the batch requests of all executed requests.
+
+    Responses are compressed and stored content-addressed, i.e., named after the
+    SHA-256 of their content, so that identical responses are only stored once. For
+    each request, an append-only index records which response was received for which
+    cursor (None for the first batch), together with the request itself. Index lines
+    are appended with a single write(), so that multiple processes can share an
+    archive.
+
+    If replay is set, the archive is only read from. Retrievers then answer each batch
+    request with the response archived for its cursor instead of contacting Twitter,
+    so that Tweets can be parsed again from the original responses.
+
+    Responses to requests refreshing an entry incrementally are archived for the
+    refreshing request. So that they can be replayed for the entry, each refresh is
+    additionally recorded in the index of the refreshed request, see write_refresh().
+    """
+
+    def __init__(self, path: Path, compression: Compression, *, replay: bool = False):
+        self.path: Final = path / RESPONSE_ARCHIVE_DIR_NAME
+        self.compression: Final = compression
+        self.replay: Final = replay
+        (self.path / _OBJECTS_DIR_NAME).mkdir(parents=True, exist_ok=True)
+
+        self._lock: Final = Lock()
+        self._indices: Dict[str, Mapping[Optional[str], str]] = {}
+
+    def write(self, request: Request, cursor: Optional[str], content: bytes) -> None:
+        digest = hashlib.sha256(content).hexdigest()
+        if self._find_object_file(digest) is None:
+            object_file = self._object_file(digest, self.compression.suffix)
+            object_file.parent.mkdir(exist_ok=True)
+            # Identical responses may be written concurrently, so that each writer
+            # needs its own temporary file.
+            tmp_file = object_file.parent / ".tmp.{}.{:d}.{:d}".format(
+                object_file.name, os.getpid(), get_ident()
+            )
+            with self.compression.open(tmp_file, "wt") as fout:
+                fout.write(content.decode("UTF-8"))
+            os.replace(str(tmp_file), str(object_file))
+
+        line = dumps({"request": request.to_json(), "cursor": cursor, "digest": digest})
+        with self._index_file(request).open("a", encoding="UTF-8") as fout:
+            fout.write(line + "\n")
+
+    def write_refresh(self, request: Request, refresh_request: Request) -> None:
+        """Records that Tweets retrieved by refresh_request were added to request."""
+
+        line = dumps(
+            {"request": request.to_json(), "refresh": refresh_request.to_json()}
+        )
+        with self._index_file(request).open("a", encoding="UTF-8") as fout:
+            fout.write(line + "\n")
+
+    def refreshes(self, request: Request) -> Sequence[Request]:
+        """Returns the requests whose Tweets were added to request, oldest first."""
+
+        refreshes: List[Request] = []
+        index_file = self._index_file(request)
+        if index_file.exists():
+            with index_file.open("r", encoding="UTF-8") as fin:
+                for line in fin:
+                    obj = cast(Mapping[str, Mapping[str, object]], loads(line))
+                    if "refresh" in obj:
+                        refreshes.append(Request.from_json(obj["refresh"]))
+        return refreshes
+
+    def read(self, request: Request, cursor: Optional[str]) -> bytes:
+        """Returns the last response archived for the cursor of the request."""
+
+        digest = self._index(request).get(cursor)
+        object_file = self._find_object_file(digest) if digest is not None else None
+        if object_file is None:
+            raise ResponseNotArchivedException(request, cursor)
+
+        return read_file(
+            object_file,
+            compression=compression_for_file(object_file, preferred=self.compression),
+        ).encode("UTF-8")
+
+    def _index(self, request: Request) -> Mapping[Optional[str], str]:
+        key = _request_key(request)
+        with self._lock:
+            if key not in self._indices:
+                index: Dict[Optional[str], str] = {}
+                index_file = self._index_file(request)
+                if index_file.exists():
+                    with index_file.open("r", encoding="UTF-8") as fin:
+                        for line in fin:
+                            obj = cast(Mapping[str, str], loads(line))
+                            if "digest" in obj:
+                                index[obj["cursor"]] = obj["digest"]
+                self._indices[key] = index
+            return self._indices[key]
+
+    def _index_file(self, request: Request) -> Path:
+        return self.path / "{}.jsonl".format(_request_key(request))
+
+    def _object_file(self, digest: str, suffix: str) -> Path:
+        return self.path / _OBJECTS_DIR_NAME / digest[:2] / (digest + suffix)
+
+    def _find_object_file(self, digest: str) -> Optional[Path]:
+        # The compression may have been changed between executions.
+        for object_file in (self.path / _OBJECTS_DIR_NAME / digest[:2]).glob(
+            digest + "*"
+        ):
+            return object_file
+        return None
+
+
+def _request_key(request: Request) -> str:
+    # Same as the ID of a BatchEntry for the request.
+    return hashlib.md5(json.dumps(request.to_json()).encode("utf-8")).hexdigest()
+
+
+_response_archive: Optional[ResponseArchive] = None
+
+
+def get_response_archive() -> Optional[ResponseArchive]:
+    return _response_archive
+
+
+def set_response_archive(response_archive: Optional[ResponseArchive]) -> None:
+    """Sets the archive to which all retrievers write (or from which they replay)."""
+
+    global _response_archive
+    _response_archive = response_archive
@@ -14,14 +14,20 @@
 # limitations under the License.
 #
 from abc import abstractmethod
+from itertools import chain
 from typing import Iterable, Optional, Sequence
 
 from ..batch.batch_entry import BatchEntry
+from ..request.request import RequestCheckpoint
 from ..tweet.tweet import Tweet, TweetId
-from ..tweet.tweet_stream import TweetStream
+from .response_archive import ResponseArchive
 
 
 class Storage(object):
+    # Number of Tweets after which a checkpoint should be written during execution. None
+    # if the storage does not support checkpoints.
+    checkpoint_interval: Optional[int] = None
+
     @abstractmethod
     def entry_exists(self, entry: BatchEntry) -> bool:
         raise NotImplementedError()
@@ -39,9 +45,49 @@ class Storage(object):
         raise NotImplementedError()
 
     @abstractmethod
-    def write_data(self, entry: BatchEntry, tweet_stream: TweetStream) -> None:
+    def write_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        raise NotImplementedError()
+
+    def append_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        """Adds Tweets newer than the ones written previously for the entry.
+
+        The new Tweets are placed before the previous ones, so that entries that list
+        the most recent Tweets first stay in that order.
+        """
+        previous_tweets = list(self.read_data(entry))
+        self.write_data(entry, chain(tweets, previous_tweets))
+
+    @abstractmethod
+    def replace_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        """Replaces all data written previously for the entry with the given Tweets.
+
+        The previous data is only dropped once all Tweets were written, so that it is
+        not lost if retrieving or writing them fails.
+        """
         raise NotImplementedError()
 
+    def read_checkpoint(self, entry: BatchEntry) -> Optional[RequestCheckpoint]:
+        """Returns the last checkpoint of a previous, uncompleted execution."""
+        return None
+
+    def write_checkpoint(
+        self, entry: BatchEntry, tweets: Iterable[Tweet], checkpoint: RequestCheckpoint
+    ) -> None:
+        """Stores the Tweets retrieved since the previous checkpoint.
+
+        A later write_data() of the entry then only receives the Tweets retrieved after
+        the last checkpoint.
+        """
+        raise NotImplementedError()
+
+    def response_archive(self, *, replay: bool = False) -> Optional[ResponseArchive]:
+        """Returns the archive of raw responses kept alongside the data, if any.
+
+        If replay is set, the archive is returned for replaying, even if no new
+        responses are archived.
+        """
+        return None
+
     @abstractmethod
     def read_data(self, entry: BatchEntry) -> Iterable[Tweet]:
         raise NotImplementedError()
@@ -0,0 +1,338 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import heapq
+import mmap
+import zlib
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from struct import Struct
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    cast,
+)
+
+from more_itertools import chunked
+from typing_extensions import Final
+
+from .._util.io_ import read_lines_file, write_lines_file
+from .._util.json_ import dumps, loads
+from .._util.typing_ import checked_cast
+from ..batch.batch_entry import BatchEntryId
+from ..tweet.tweet import Tweet, TweetId
+from .file import FileStorage
+from .manifest import ManifestRecord
+
+logger = getLogger(__name__)
+
+TWEET_INDEX_DIR_NAME: Final = "tweet_index"
+TWEETS_PER_BLOCK: Final = 16
+
+# Tweet-ID, entry number, offset of block in the entry's block file, position of the
+# Tweet within the block.
+_Record = Tuple[int, int, int, int]
+_RECORD_STRUCT: Final = Struct("<QIQH")
+# Magic bytes and number of indexed entries.
+_INDEX_HEADER_STRUCT: Final = Struct("<8sQ")
+_INDEX_MAGIC: Final = b"NASTYIDX"
+_BLOCK_HEADER_STRUCT: Final = Struct("<I")
+
+
+class TweetIndex:
+    """On-disk index to look up single Tweets of a results directory by their ID.
+
+    For each indexed entry, its Tweets are copied into a block file, in which every
+    TWEETS_PER_BLOCK Tweets are compressed independently, so that a single Tweet can
+    be read by decompressing only its block. The index itself is a file of fixed-size
+    records sorted by Tweet-ID, each pointing to the block of a Tweet. It is
+    memory-mapped and binary searched, so that lookups neither read the whole index
+    nor decompress data files.
+
+    update() indexes entries that were written since the last update. Entries whose
+    data changed since they were indexed (according to their data file, number of
+    Tweets, and data file size in the Manifest), e.g., because they were refreshed
+    incrementally or replayed, are indexed again under a new entry number. As records
+    of Tweets retrieved by multiple entries are only kept for one of them, the index
+    is then rebuilt from the block files of all other entries. Only a single process
+    may update an index at a time.
+    """
+
+    # Number of decompressed blocks kept in memory.
+    _BLOCK_CACHE_SIZE: Final = 8
+
+    def __init__(self, path: Path):
+        self.path: Final = path / TWEET_INDEX_DIR_NAME
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._index_file: Final = self.path / "index.bin"
+        self._entries_file: Final = self.path / "entries.txt"
+
+        # ID and state of the data (see _data_state()) of the entry of each number.
+        # Entries that were indexed again keep an empty ID at their previous number.
+        self._entries: List[Tuple[BatchEntryId, str]] = []
+        self._index: Optional[mmap.mmap] = None
+        self._num_records = 0
+        self._block_files: Dict[int, mmap.mmap] = {}
+        self._blocks: "OrderedDict[Tuple[int, int], Sequence[bytes]]" = OrderedDict()
+        self._open_index()
+
+    def __len__(self) -> int:
+        return self._num_records
+
+    def __contains__(self, tweet_id: object) -> bool:
+        return isinstance(tweet_id, str) and self._find(tweet_id) is not None
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        for block_file in self._block_files.values():
+            block_file.close()
+        self._block_files.clear()
+        self._blocks.clear()
+
+    def get_tweet(self, tweet_id: TweetId) -> Optional[Tweet]:
+        record = self._find(tweet_id)
+        if record is None:
+            return None
+        _, entry_number, block_offset, position = record
+
+        key = (entry_number, block_offset)
+        block = self._blocks.get(key)
+        if block is None:
+            block = self._read_block(entry_number, block_offset)
+            self._blocks[key] = block
+            if len(self._blocks) > self._BLOCK_CACHE_SIZE:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(key)
+        return Tweet(loads(block[position]))  # type: ignore
+
+    def update(self, storage: FileStorage) -> int:
+        """Indexes all entries of storage not indexed yet, or whose data changed.
+
+        Returns the number of newly indexed entries.
+        """
+
+        entry_numbers = {
+            entry_id: entry_number
+            for entry_number, (entry_id, _) in enumerate(self._entries)
+            if entry_id
+        }
+        new_records: List[_Record] = []
+        stale_entry_numbers: Set[int] = set()
+        num_new_entries = 0
+        for record in storage.manifest_records():
+            entry = record.entry
+            data_state = _data_state(record)
+            entry_number = entry_numbers.get(entry.id)
+            if entry_number is not None:
+                if self._entries[entry_number][1] == data_state:
+                    continue
+                stale_entry_numbers.add(entry_number)
+                self._entries[entry_number] = (BatchEntryId(""), "")
+            if not data_state:
+                continue
+
+            entry_number = len(self._entries)
+            new_records.extend(
+                self._write_block_file(entry_number, storage.read_data(entry))
+            )
+            self._entries.append((entry.id, data_state))
+            num_new_entries += 1
+
+        if num_new_entries or stale_entry_numbers:
+            new_records.sort()
+            self._write_index(new_records, stale_entry_numbers)
+            logger.debug(
+                "Indexed {:d} new entries, {:d} Tweets in total.".format(
+                    num_new_entries, self._num_records
+                )
+            )
+        return num_new_entries
+
+    def _find(self, tweet_id: TweetId) -> Optional[_Record]:
+        try:
+            id_int = int(tweet_id)
+        except ValueError:
+            return None
+        if self._index is None:
+            return None
+
+        record_size = _RECORD_STRUCT.size
+        low = 0
+        high = self._num_records
+        while low < high:
+            middle = (low + high) // 2
+            record: _Record = _RECORD_STRUCT.unpack_from(
+                self._index, _INDEX_HEADER_STRUCT.size + middle * record_size
+            )
+            if record[0] < id_int:
+                low = middle + 1
+            elif record[0] > id_int:
+                high = middle
+            else:
+                return record
+        return None
+
+    def _block_file(self, entry_number: int) -> Path:
+        return self.path / "{:d}.blocks".format(entry_number)
+
+    def _write_block_file(
+        self, entry_number: int, tweets: Iterable[Tweet]
+    ) -> List[_Record]:
+        block_file = self._block_file(entry_number)
+        tmp_file = block_file.parent / (".tmp." + block_file.name)
+        records: List[_Record] = []
+        with tmp_file.open("wb") as fout:
+            for block_tweets in chunked(tweets, TWEETS_PER_BLOCK):
+                block_offset = fout.tell()
+                data = zlib.compress(
+                    "\n".join(dumps(tweet.to_json()) for tweet in block_tweets).encode(
+                        "UTF-8"
+                    )
+                )
+                fout.write(_BLOCK_HEADER_STRUCT.pack(len(data)))
+                fout.write(data)
+                records.extend(
+                    (tweet.id_int, entry_number, block_offset, position)
+                    for position, tweet in enumerate(block_tweets)
+                )
+        tmp_file.replace(block_file)
+        return records
+
+    def _read_block(self, entry_number: int, block_offset: int) -> Sequence[bytes]:
+        block_file = self._block_files.get(entry_number)
+        if block_file is None:
+            with self._block_file(entry_number).open("rb") as fin:
+                block_file = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            self._block_files[entry_number] = block_file
+
+        (length,) = _BLOCK_HEADER_STRUCT.unpack_from(block_file, block_offset)
+        data_offset = block_offset + _BLOCK_HEADER_STRUCT.size
+        return zlib.decompress(block_file[data_offset : data_offset + length]).split(
+            b"\n"
+        )
+
+    def _read_block_file_records(self, entry_number: int) -> List[_Record]:
+        records: List[_Record] = []
+        with self._block_file(entry_number).open("rb") as fin:
+            data = fin.read()
+        block_offset = 0
+        while block_offset < len(data):
+            (length,) = _BLOCK_HEADER_STRUCT.unpack_from(data, block_offset)
+            data_offset = block_offset + _BLOCK_HEADER_STRUCT.size
+            block = zlib.decompress(data[data_offset : data_offset + length])
+            for position, line in enumerate(block.split(b"\n")):
+                tweet_id = checked_cast(
+                    str, cast(Mapping[str, object], loads(line))["id_str"]
+                )
+                records.append((int(tweet_id), entry_number, block_offset, position))
+            block_offset = data_offset + length
+        records.sort()
+        return records
+
+    def _iter_records(self) -> Iterator[_Record]:
+        if self._index is None:
+            return
+        # Released explicitly, as the index can not be closed while views exist.
+        with memoryview(self._index) as view:
+            yield from _RECORD_STRUCT.iter_unpack(view[_INDEX_HEADER_STRUCT.size :])
+
+    def _write_index(
+        self, new_records: Sequence[_Record], stale_entry_numbers: Set[int]
+    ) -> None:
+        # The entries file is written first, but only the number of entries recorded
+        # in the index header is read, so that a crash in between does not leave
+        # entries marked as indexed without their records. Entries indexed again
+        # would then be indexed a third time on the next update.
+        write_lines_file(
+            self._entries_file,
+            (
+                "{}\t{}".format(entry_id, data_state)
+                for entry_id, data_state in self._entries
+            ),
+            overwrite_existing=True,
+        )
+
+        old_records: Iterable[_Record] = self._iter_records()
+        if stale_entry_numbers:
+            # The dropped records of stale entries may have been the only ones of
+            # Tweets also retrieved by other entries.
+            new_entry_numbers = {record[1] for record in new_records}
+            old_records = heapq.merge(
+                *(
+                    self._read_block_file_records(entry_number)
+                    for entry_number, (entry_id, _) in enumerate(self._entries)
+                    if entry_id and entry_number not in new_entry_numbers
+                )
+            )
+
+        tmp_file = self.path / (".tmp." + self._index_file.name)
+        with tmp_file.open("wb") as fout:
+            fout.write(_INDEX_HEADER_STRUCT.pack(_INDEX_MAGIC, len(self._entries)))
+            previous_id = None
+            for record in heapq.merge(old_records, new_records):
+                # Keep only the first of Tweets retrieved by multiple entries.
+                if record[0] == previous_id:
+                    continue
+                previous_id = record[0]
+                fout.write(_RECORD_STRUCT.pack(*record))
+
+        self.close()
+        tmp_file.replace(self._index_file)
+        self._open_index()
+        for entry_number in stale_entry_numbers:
+            self._block_file(entry_number).unlink()
+
+    def _open_index(self) -> None:
+        self._entries = []
+        self._num_records = 0
+        if not self._index_file.exists():
+            return
+
+        with self._index_file.open("rb") as fin:
+            self._index = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_entries = _INDEX_HEADER_STRUCT.unpack_from(self._index)
+        if magic != _INDEX_MAGIC:
+            raise ValueError("'{}' is not a Tweet index.".format(self._index_file))
+        self._num_records = (
+            len(self._index) - _INDEX_HEADER_STRUCT.size
+        ) // _RECORD_STRUCT.size
+        for line in list(read_lines_file(self._entries_file))[:num_entries]:
+            # Indices written before data states were recorded only list entry IDs,
+            # so that their entries are indexed again.
+            entry_id, _, data_state = line.partition("\t")
+            self._entries.append((BatchEntryId(entry_id), data_state))
+
+
+def _data_state(record: ManifestRecord) -> str:
+    """Identifies the data of an entry, empty if it has none."""
+
+    if record.data_file is None:
+        return ""
+    return "{}\t{}\t{}".format(
+        record.data_file, record.num_tweets, record.data_file_size
+    )
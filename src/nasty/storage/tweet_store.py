@@ -0,0 +1,198 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    cast,
+)
+
+from typing_extensions import Final
+
+from .._util.compression import Compression, compression_for_file
+from .._util.io_ import append_file, read_lines_file, write_lines_file
+from .._util.json_ import dumps, loads
+from ..tweet.tweet import Tweet, TweetId, User, UserId
+
+logger = getLogger(__name__)
+
+TWEET_STORE_DIR_NAME: Final = "tweets"
+TWEET_STORE_INDEX_FILE_NAME: Final = "index.tsv"
+
+
+class TweetStore:
+    """Stores each Tweet once, no matter how many entries retrieved it.
+
+    Tweets are addressed by their ID. Each call to add() writes the Tweets not yet
+    stored as a new compressed segment file and appends the segment of each of them
+    to an append-only index, which is kept in memory. Like the Manifest, index lines
+    are appended with a single write(), so that multiple processes can share a store.
+    If two processes add the same Tweet concurrently, it is stored twice, in which
+    case the first index line wins.
+
+    Tweets are stored as given by their to_json(), i.e., possibly with only the ID of
+    their user, which is then resolved via resolve_user when reading them.
+    """
+
+    # Number of decompressed segments kept in memory while resolving Tweets.
+    _SEGMENT_CACHE_SIZE: Final = 4
+
+    def __init__(
+        self,
+        path: Path,
+        compression: Compression,
+        *,
+        resolve_user: Optional[Callable[[UserId], User]] = None,
+    ):
+        self.path: Final = path / TWEET_STORE_DIR_NAME
+        self.compression: Final = compression
+        self.resolve_user: Final = resolve_user
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._index_file: Final = self.path / TWEET_STORE_INDEX_FILE_NAME
+        self._lock: Final = Lock()
+        self._index: Dict[TweetId, str] = {}
+        self._read_offset = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def __contains__(self, tweet_id: object) -> bool:
+        with self._lock:
+            return tweet_id in self._index
+
+    def _unused_segment(self, segment: str) -> str:
+        """Returns the segment name, numbered if a segment of that name exists."""
+
+        name = segment
+        num = 1
+        while any(self.path.glob("{}.jsonl*".format(name))):
+            name = "{}.{:d}".format(segment, num)
+            num += 1
+        return name
+
+    def add(self, segment: str, tweets: Iterable[Tweet]) -> Sequence[TweetId]:
+        """Stores the Tweets not yet stored, and yields the IDs of all of them.
+
+        The segment name should be unique to the caller, e.g., the ID of the entry the
+        Tweets belong to. If a segment of that name exists, the new one is numbered,
+        so that segments referenced by the index are never overwritten or deleted.
+        """
+
+        self.refresh()
+        segment_file = self.path / "{}.jsonl{}".format(
+            self._unused_segment(segment), self.compression.suffix
+        )
+        tweet_ids: List[TweetId] = []
+        new_tweet_ids: List[TweetId] = []
+        new_tweet_ids_set: Set[TweetId] = set()
+
+        def new_tweet_lines() -> Iterator[str]:
+            for tweet in tweets:
+                tweet_ids.append(tweet.id)
+                if tweet.id not in self and tweet.id not in new_tweet_ids_set:
+                    new_tweet_ids.append(tweet.id)
+                    new_tweet_ids_set.add(tweet.id)
+                    yield dumps(tweet.to_json())
+
+        write_lines_file(segment_file, new_tweet_lines(), compression=self.compression)
+        if not new_tweet_ids:
+            # Not referenced by the index, as the segment was unused.
+            segment_file.unlink()
+        else:
+            self._append_index(segment_file.name, new_tweet_ids)
+
+        logger.debug(
+            "  Stored {:d} of {:d} Tweets, the others were already stored.".format(
+                len(new_tweet_ids), len(tweet_ids)
+            )
+        )
+        return tweet_ids
+
+    def get(self, tweet_ids: Iterable[TweetId]) -> Iterator[Tweet]:
+        """Yields the Tweets with the given IDs, in the same order."""
+
+        segments: "OrderedDict[str, Mapping[TweetId, Tweet]]" = OrderedDict()
+        for tweet_id in tweet_ids:
+            with self._lock:
+                segment = self._index.get(tweet_id)
+            if segment is None:
+                self.refresh()
+                with self._lock:
+                    segment = self._index.get(tweet_id)
+                if segment is None:
+                    raise KeyError(
+                        "Tweet {} is not contained in '{}'.".format(tweet_id, self.path)
+                    )
+
+            tweets = segments.get(segment)
+            if tweets is None:
+                tweets = self._read_segment(segment)
+                segments[segment] = tweets
+                if len(segments) > self._SEGMENT_CACHE_SIZE:
+                    segments.popitem(last=False)
+            else:
+                segments.move_to_end(segment)
+            yield tweets[tweet_id]
+
+    def refresh(self) -> None:
+        """Reads index lines appended since the last refresh, e.g., by others."""
+
+        if not self._index_file.exists():
+            return
+        with self._lock, self._index_file.open("rb") as fin:
+            fin.seek(self._read_offset)
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    break  # Incomplete line, probably still being written.
+                self._read_offset += len(line)
+                tweet_id, _, segment = line.decode("UTF-8").rstrip("\n").partition("\t")
+                self._index.setdefault(TweetId(tweet_id), segment)
+
+    def _append_index(self, segment: str, tweet_ids: Iterable[TweetId]) -> None:
+        lines = "".join("{}\t{}\n".format(tweet_id, segment) for tweet_id in tweet_ids)
+        with self._lock:
+            append_file(self._index_file, lines.encode("UTF-8"))
+            for tweet_id in tweet_ids:
+                self._index.setdefault(tweet_id, segment)
+
+    def _read_segment(self, segment: str) -> Mapping[TweetId, Tweet]:
+        segment_file = self.path / segment
+        return {
+            tweet.id: tweet
+            for tweet in (
+                Tweet(cast(Mapping[str, object], loads(line)), self.resolve_user)
+                for line in read_lines_file(
+                    segment_file,
+                    compression=compression_for_file(
+                        segment_file, preferred=self.compression
+                    ),
+                )
+            )
+        }
@@ -0,0 +1,221 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Mapping, Tuple, cast
+
+from typing_extensions import Final
+
+from .._util.compression import Compression, compression_for_file
+from .._util.io_ import append_file, write_lines_file
+from .._util.json_ import dumps, read_json_lines
+from ..tweet.tweet import User, UserId
+
+logger = getLogger(__name__)
+
+USER_STORE_DIR_NAME: Final = "users"
+USER_STORE_INDEX_FILE_NAME: Final = "index.tsv"
+
+
+class UserStore:
+    """Stores each user once, in the latest version that was retrieved.
+
+    Users are addressed by their ID. Each call to add() writes the users that are not
+    yet stored, or whose JSON changed since, as a new compressed segment file, and
+    appends the segment and a digest of the JSON of each of them to an append-only
+    index. The last index line of a user wins, so that later versions of a user
+    replace earlier ones. Like the TweetStore, index lines are appended with a single
+    write(), so that multiple processes can share a store.
+
+    Resolved users are kept in an in-memory LRU cache of cache_size users. On a miss,
+    the whole segment of the user is read and all users whose latest version it
+    contains are cached, as Tweets of the same entry mostly share segments.
+    """
+
+    def __init__(
+        self, path: Path, compression: Compression, *, cache_size: int = 10000
+    ):
+        self.path: Final = path / USER_STORE_DIR_NAME
+        self.compression: Final = compression
+        self.cache_size: Final = cache_size
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._index_file: Final = self.path / USER_STORE_INDEX_FILE_NAME
+        self._lock: Final = Lock()
+        self._index: Dict[UserId, Tuple[str, str]] = {}
+        self._read_offset = 0
+        self._cache: "OrderedDict[UserId, User]" = OrderedDict()
+        self.refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            return user_id in self._index
+
+    def unused_segment(self, segment: str) -> str:
+        """Returns the segment name, numbered if a segment of that name exists."""
+
+        name = segment
+        num = 1
+        while any(self.path.glob("{}.jsonl*".format(name))):
+            name = "{}.{:d}".format(segment, num)
+            num += 1
+        return name
+
+    def add(self, segment: str, users: Iterable[User]) -> None:
+        """Stores the users that are not stored in the same version yet.
+
+        If a user is given multiple times, the last version is stored. The segment
+        name must be unique to the caller, e.g., the ID of the entry the users were
+        retrieved for.
+        """
+
+        self.refresh()
+        latest_users: Dict[UserId, User] = {}
+        for user in users:
+            latest_users[user.id] = user
+
+        new_digests: Dict[UserId, str] = {}
+        lines: List[str] = []
+        with self._lock:
+            for user_id, user in latest_users.items():
+                line = dumps(user.to_json())
+                digest = hashlib.md5(line.encode("UTF-8")).hexdigest()
+                stored = self._index.get(user_id)
+                if stored is None or stored[1] != digest:
+                    new_digests[user_id] = digest
+                    lines.append(line)
+
+        logger.debug(
+            "  Stored {:d} of {:d} users, the others were already stored.".format(
+                len(new_digests), len(latest_users)
+            )
+        )
+        if not new_digests:
+            return
+
+        segment_file = self.path / "{}.jsonl{}".format(segment, self.compression.suffix)
+        write_lines_file(
+            segment_file, lines, overwrite_existing=True, compression=self.compression
+        )
+        self._append_index(
+            {
+                user_id: (segment_file.name, digest)
+                for user_id, digest in new_digests.items()
+            }
+        )
+
+    def get(self, user_id: UserId) -> User:
+        """Returns the latest stored version of the user with the given ID."""
+
+        with self._lock:
+            user = self._cache.get(user_id)
+            if user is not None:
+                self._cache.move_to_end(user_id)
+                return user
+            stored = self._index.get(user_id)
+        if stored is None:
+            self.refresh()
+            with self._lock:
+                stored = self._index.get(user_id)
+            if stored is None:
+                raise KeyError(
+                    "User {} is not contained in '{}'.".format(user_id, self.path)
+                )
+
+        segment = stored[0]
+        users = self._read_segment(segment)
+        with self._lock:
+            for segment_user in users.values():
+                if self._index.get(segment_user.id, ("", ""))[0] == segment:
+                    self._cache[segment_user.id] = segment_user
+                    self._cache.move_to_end(segment_user.id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return users[user_id]
+
+    def refresh(self) -> None:
+        """Reads index lines appended since the last refresh, e.g., by others."""
+
+        if not self._index_file.exists():
+            return
+        with self._lock, self._index_file.open("rb") as fin:
+            fin.seek(self._read_offset)
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    break  # Incomplete line, probably still being written.
+                self._read_offset += len(line)
+                user_id, segment, digest = line.decode("UTF-8").rstrip("\n").split("\t")
+                self._set_index(UserId(user_id), segment, digest)
+
+    def _append_index(self, users: Mapping[UserId, Tuple[str, str]]) -> None:
+        lines = "".join(
+            "{}\t{}\t{}\n".format(user_id, segment, digest)
+            for user_id, (segment, digest) in users.items()
+        )
+        with self._lock:
+            append_file(self._index_file, lines.encode("UTF-8"))
+            for user_id, (segment, digest) in users.items():
+                self._set_index(user_id, segment, digest)
+
+    def _set_index(self, user_id: UserId, segment: str, digest: str) -> None:
+        # Needs to hold the lock.
+        if self._index.get(user_id) != (segment, digest):
+            self._index[user_id] = (segment, digest)
+            self._cache.pop(user_id, None)
+
+    def _read_segment(self, segment: str) -> Mapping[UserId, User]:
+        segment_file = self.path / segment
+        return {
+            user.id: user
+            for user in read_json_lines(
+                segment_file,
+                User,
+                compression=compression_for_file(
+                    segment_file, preferred=self.compression
+                ),
+            )
+        }
+
+
+def split_user(
+    tweet_json: Mapping[str, object], users: Dict[UserId, User]
+) -> Mapping[str, object]:
+    """Replaces the user embedded in the Tweet JSON by its ID in "user_id_str".
+
+    The user is added to users. The ID takes the position of the user, so that the key
+    order is kept when embedding the user again, see Tweet.to_json().
+    """
+
+    if "user" not in tweet_json:
+        return tweet_json
+
+    user = User(cast(Mapping[str, object], tweet_json["user"]))
+    users[user.id] = user
+    obj: Dict[str, object] = {}
+    for key, value in tweet_json.items():
+        if key == "user":
+            obj["user_id_str"] = user.id
+        else:
+            obj[key] = value
+    return obj
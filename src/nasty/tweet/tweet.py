@@ -15,23 +15,44 @@
 #
 
 from datetime import datetime
-from typing import Mapping, cast
+from typing import Callable, Dict, Mapping, Optional, cast
 
 from overrides import overrides
 from typing_extensions import Final
 
-from .._util.consts import TWITTER_CREATED_AT_FORMAT
 from .._util.json_ import JsonSerializable
+from .._util.time_ import parse_twitter_created_at
 from .._util.typing_ import checked_cast
 
 TweetId = str
+UserId = str
 
 
 class Tweet(JsonSerializable):
-    """Data class to wrap Tweet JSON objects."""
+    """Data class to wrap Tweet JSON objects.
 
-    def __init__(self, json: Mapping[str, object]):
+    Derived fields are computed lazily on first access and then memoized, so that
+    accessing them repeatedly is cheap. Tweets are hashed by their ID, and comparing
+    Tweets with different IDs does not need to compare their JSON.
+
+    Instead of embedding the full user object, the JSON may only contain the ID of the
+    user in a "user_id_str" field, e.g., if it was read from a storage that stores each
+    user only once. The user is then looked up via resolve_user when first accessed,
+    and embedded again by to_json().
+    """
+
+    __slots__ = ("json", "_created_at", "_id_int", "_user", "_resolve_user")
+
+    def __init__(
+        self,
+        json: Mapping[str, object],
+        resolve_user: Optional[Callable[[UserId], "User"]] = None,
+    ):
         self.json: Final = json
+        self._created_at: Optional[datetime] = None
+        self._id_int: Optional[int] = None
+        self._user: Optional[User] = None
+        self._resolve_user = resolve_user
 
     @overrides
     def __repr__(self) -> str:
@@ -46,25 +67,51 @@ class Tweet(JsonSerializable):
 
     @overrides
     def __eq__(self, other: object) -> bool:
-        return type(self) == type(other) and self.__dict__ == other.__dict__
+        # Compares the JSON as given, without resolving users, so that a Tweet that
+        # only contains the ID of its user never equals one with it embedded.
+        return type(self) == type(other) and self.json == other.json
+
+    def __hash__(self) -> int:
+        return hash(self.id)
 
     @property
     def created_at(self) -> datetime:
-        return datetime.strptime(
-            checked_cast(str, self.json["created_at"]), TWITTER_CREATED_AT_FORMAT
-        )
+        if self._created_at is None:
+            self._created_at = parse_twitter_created_at(
+                checked_cast(str, self.json["created_at"])
+            )
+        return self._created_at
 
     @property
     def id(self) -> TweetId:
         return checked_cast(TweetId, self.json["id_str"])
 
+    @property
+    def id_int(self) -> int:
+        """The ID as an int, e.g., as a compact key or for sorting chronologically."""
+        if self._id_int is None:
+            self._id_int = int(self.id)
+        return self._id_int
+
     @property
     def text(self) -> str:
         return checked_cast(str, self.json["full_text"])
 
     @property
     def user(self) -> "User":
-        return User(cast(Mapping[str, object], self.json["user"]))
+        if self._user is None:
+            if "user" in self.json:
+                self._user = User(cast(Mapping[str, object], self.json["user"]))
+            elif self._resolve_user is not None:
+                self._user = self._resolve_user(
+                    checked_cast(UserId, self.json["user_id_str"])
+                )
+            else:
+                raise ValueError(
+                    "Tweet {} only contains the ID of its user, which can not be "
+                    "resolved without a user store.".format(self.id)
+                )
+        return self._user
 
     @property
     def url(self) -> str:
@@ -72,7 +119,18 @@ class Tweet(JsonSerializable):
 
     @overrides
     def to_json(self) -> Mapping[str, object]:
-        return self.json
+        if "user" in self.json or self._resolve_user is None:
+            return self.json
+
+        # Embed the user at the position of its ID, so that the key order (and thus
+        # the serialized JSON) is the same as before the user was split off.
+        obj: Dict[str, object] = {}
+        for key, value in self.json.items():
+            if key == "user_id_str":
+                obj["user"] = self.user.to_json()
+            else:
+                obj[key] = value
+        return obj
 
     @classmethod
     @overrides
@@ -80,12 +138,11 @@ class Tweet(JsonSerializable):
         return cls(obj)
 
 
-UserId = str
-
-
 class User(JsonSerializable):
     """Data class to wrap Twitter user JSON objects."""
 
+    __slots__ = ("json",)
+
     def __init__(self, json: Mapping[str, object]):
         self.json: Final = json
 
@@ -101,7 +158,18 @@ class User(JsonSerializable):
 
     @overrides
     def __eq__(self, other: object) -> bool:
-        return type(self) == type(other) and self.__dict__ == other.__dict__
+        if self is other:
+            return True
+        if type(self) != type(other):
+            return False
+        other_json = other.json
+        return self.json is other_json or (
+            self.json.get("id_str") == other_json.get("id_str")
+            and self.json == other_json
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.id)
 
     @property
     def id(self) -> UserId:
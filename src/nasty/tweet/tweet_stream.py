@@ -15,10 +15,20 @@
 #
 
 from abc import ABC, abstractmethod
-from typing import Iterable, Iterator
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
 from .tweet import Tweet
 
+if TYPE_CHECKING:
+    from ..request.request import RequestCheckpoint
+
 
 class TweetStream(ABC, Iterator[Tweet], Iterable[Tweet]):
     def __iter__(self) -> Iterator[Tweet]:
@@ -27,3 +37,33 @@ class TweetStream(ABC, Iterator[Tweet], Iterable[Tweet]):
     @abstractmethod
     def __next__(self) -> Tweet:
         raise NotImplementedError()
+
+    def close(self) -> None:
+        """Stops retrieving Tweets, e.g., if the stream is not consumed completely.
+
+        Releases resources like prefetching threads. No more Tweets are returned.
+        """
+
+    def checkpoint(self) -> Optional["RequestCheckpoint"]:
+        """Returns a checkpoint directly after the last returned Tweet, if possible.
+
+        Checkpoints are only available between batches of retrieved Tweets, otherwise
+        and if the stream can not be resumed, None is returned.
+        """
+        return None
+
+
+class AsyncTweetStream(ABC, AsyncIterator[Tweet], AsyncIterable[Tweet]):
+    def __aiter__(self) -> AsyncIterator[Tweet]:
+        return self
+
+    @abstractmethod
+    async def __anext__(self) -> Tweet:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """See TweetStream.close()."""
+
+    def checkpoint(self) -> Optional["RequestCheckpoint"]:
+        """See TweetStream.checkpoint()."""
+        return None
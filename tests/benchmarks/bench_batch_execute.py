@@ -0,0 +1,185 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures the throughput of Batch.execute against a local mock of Twitter.
+
+Executes the same batch of Search requests with each execution mode and number of
+workers, and with each storage backend. The MockTwitter runs in a separate process,
+delays all responses, and injects occasional errors, so that the numbers reflect the
+retrievers and storage, but not Twitter's crawl-delay. Reports Tweets per second, the
+percentiles of the time between receiving a batch and requesting the next one of the
+same timeline (i.e., how long processing a batch took), and the CPU time per Tweet
+spent in this process and its worker processes.
+
+Run via: python -m tests.benchmarks.bench_batch_execute
+"""
+
+import os
+import resource
+from functools import partial
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Mapping, Sequence, cast
+
+import requests
+
+from nasty._retriever.request_scheduler import request_scheduler
+from nasty._retriever.robots_txt import FileRobotsTxtCache, set_robots_txt_cache
+from nasty._retriever.twitter_credentials import twitter_credentials
+from nasty._util.compression import compression_from_name, zstandard
+from nasty.batch.batch import Batch, BatchExecutionMode
+from nasty.request.search import Search
+from nasty.storage.file import FileStorage
+from nasty.storage.storage import Storage
+
+from ..util.mock_twitter import MockTwitter
+
+_NUM_REQUESTS = 32
+_NUM_TWEETS = 500  # Per request.
+_NUM_WORKERS = (1, 4, 16)
+_MOCK_TWITTER_KWARGS: Mapping[str, object] = {
+    "num_tweets": _NUM_TWEETS,
+    "latency": 0.02,
+    "rate_limit_rate": 0.005,
+    "forbidden_rate": 0.005,
+    "server_error_rate": 0.01,
+}
+
+
+def _serve_mock_twitter(kwargs: Mapping[str, object], conn: Connection) -> None:
+    mock_twitter = MockTwitter(**kwargs)  # type: ignore
+    conn.send(mock_twitter.url)
+    mock_twitter.serve_forever()
+
+
+def _file_storage(compression: str, deduplicate: bool, path: Path) -> FileStorage:
+    return FileStorage(
+        path, compression_from_name(compression), deduplicate=deduplicate
+    )
+
+
+def _cpu_time() -> float:
+    # Worker processes are included once they have terminated.
+    return sum(
+        usage.ru_utime + usage.ru_stime
+        for usage in (
+            resource.getrusage(resource.RUSAGE_SELF),
+            resource.getrusage(resource.RUSAGE_CHILDREN),
+        )
+    )
+
+
+def _percentile(values: Sequence[float], percentile: int) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) * percentile // 100, len(values) - 1)]
+
+
+def _benchmark(
+    name: str,
+    mode: BatchExecutionMode,
+    num_workers: int,
+    storage: Callable[[Path], Storage],
+) -> None:
+    conn, server_conn = Pipe()
+    server = Process(
+        target=_serve_mock_twitter,
+        args=(_MOCK_TWITTER_KWARGS, server_conn),
+        daemon=True,
+    )
+    server.start()
+    url = conn.recv()
+
+    with TemporaryDirectory() as tmp_dir:
+        os.environ["NASTY_REDIRECT_URL"] = url
+        os.environ["NASTY_NUM_WORKERS"] = str(num_workers)
+        # Worker processes that do not inherit the RobotsTxtCache must not overwrite
+        # the cached robots.txt of Twitter either.
+        os.environ["XDG_CACHE_HOME"] = tmp_dir
+        set_robots_txt_cache(FileRobotsTxtCache(Path(tmp_dir) / "robots.txt.json"))
+        twitter_credentials.clear()
+        request_scheduler.clear()
+
+        batch = Batch()
+        for i in range(_NUM_REQUESTS):
+            batch.append(Search("query{:d}".format(i), max_tweets=None))
+
+        cpu_time = _cpu_time()
+        wall_time = perf_counter()
+        results = batch.execute(storage(Path(tmp_dir) / "results"), mode=mode)
+        wall_time = perf_counter() - wall_time
+        cpu_time = _cpu_time() - cpu_time
+
+        stats = cast(Mapping[str, object], requests.get(url + "/_mock/stats").json())
+        num_tweets = (
+            sum(len(list(results.tweets(entry))) for entry in results)
+            if results is not None
+            else 0
+        )
+
+    server.terminate()
+    server.join()
+
+    turnarounds = cast(Sequence[float], stats["batch_turnarounds"])
+    status_codes = cast(Mapping[str, int], stats["status_codes"])
+    print(  # noqa: T001
+        "{:>30}: {:>7.0f} Tweets/s, batch turnaround p50 {:>5.1f}ms, "
+        "p90 {:>5.1f}ms, p99 {:>6.1f}ms, {:>5.0f}us CPU/Tweet, {:>3d} errors{}".format(
+            name,
+            num_tweets / wall_time,
+            _percentile(turnarounds, 50) * 1000,
+            _percentile(turnarounds, 90) * 1000,
+            _percentile(turnarounds, 99) * 1000,
+            cpu_time / max(num_tweets, 1) * 1e6,
+            sum(count for status, count in status_codes.items() if status != "200"),
+            "" if results is not None else " (some requests failed)",
+        )
+    )
+
+
+def main() -> None:
+    for mode in BatchExecutionMode:
+        for num_workers in _NUM_WORKERS:
+            _benchmark(
+                "{} x{:d}".format(mode.name, num_workers),
+                mode,
+                num_workers,
+                partial(_file_storage, "none", False),
+            )
+
+    compressions = ["none", "gzip", "xz"]
+    if zstandard is not None:
+        compressions.append("zstd")
+    else:
+        print("zstandard is not installed, skipping zstd.")  # noqa: T001
+    for compression in compressions:
+        for deduplicate in (False, True):
+            _benchmark(
+                "FileStorage {}{}".format(
+                    compression, " deduplicated" if deduplicate else ""
+                ),
+                BatchExecutionMode.THREADS,
+                _NUM_WORKERS[-1],
+                partial(_file_storage, compression, deduplicate),
+            )
+
+
+if __name__ == "__main__":
+    main()
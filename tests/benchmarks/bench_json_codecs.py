@@ -0,0 +1,73 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compares the throughput of the available JSON codecs on Tweet JSON.
+
+Run via: python -m tests.benchmarks.bench_json_codecs
+"""
+
+from timeit import timeit
+from typing import List, Mapping
+
+from nasty._util.json_ import JsonCodec, OrjsonJsonCodec, StdlibJsonCodec, orjson
+
+from ..test_tweet import tweet_jsons
+
+_NUM_TWEETS = 10000
+_NUM_REPEATS = 3
+
+
+def _benchmark(codec: JsonCodec, tweets: List[Mapping[str, object]]) -> None:
+    lines = [codec.dumps(tweet) for tweet in tweets]
+    num_bytes = sum(len(line.encode("UTF-8")) for line in lines)
+
+    dumps_time = min(
+        timeit(lambda: [codec.dumps(tweet) for tweet in tweets], number=1)
+        for _ in range(_NUM_REPEATS)
+    )
+    loads_time = min(
+        timeit(lambda: [codec.loads(line) for line in lines], number=1)
+        for _ in range(_NUM_REPEATS)
+    )
+
+    print(  # noqa: T001
+        "{:>8}: dumps {:>9.0f} Tweets/s ({:>6.1f} MB/s), "
+        "loads {:>9.0f} Tweets/s ({:>6.1f} MB/s)".format(
+            codec.name,
+            len(tweets) / dumps_time,
+            num_bytes / dumps_time / 1e6,
+            len(tweets) / loads_time,
+            num_bytes / loads_time / 1e6,
+        )
+    )
+
+
+def main() -> None:
+    tweet_json_values = list(tweet_jsons.values())
+    tweets = [tweet_json_values[i % len(tweet_json_values)] for i in range(_NUM_TWEETS)]
+
+    codecs: List[JsonCodec] = [StdlibJsonCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonJsonCodec())
+    else:
+        print("orjson is not installed, skipping it.")  # noqa: T001
+
+    for codec in codecs:
+        _benchmark(codec, tweets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures how fast batch responses are parsed and how much of them is retained.
+
+Responses of Search, Replies, and Thread timelines are generated by the MockTwitter
+from the Tweet JSON used in the tests. For each response and JSON codec, reports how
+many Tweets per second are decoded (JSON only) and parsed into a RetrieverBatch, and
+how much memory a parsed batch retains compared to the decoded response.
+
+Run via: python -m tests.benchmarks.bench_retriever_batch
+"""
+
+import gc
+import json
+import tracemalloc
+from timeit import timeit
+from typing import Any, Callable, List, Mapping, Sequence, Type, cast
+
+from nasty._retriever.replies_retriever import RepliesRetrieverBatch
+from nasty._retriever.retriever import RetrieverBatch
+from nasty._retriever.search_retriever import SearchRetrieverBatch
+from nasty._retriever.thread_retriever import ThreadRetrieverBatch
+from nasty._util.json_ import JsonCodec, OrjsonJsonCodec, StdlibJsonCodec, orjson
+
+from ..util.mock_twitter import MockTwitter
+
+_BATCH_SIZE = 100
+_NUM_REPEATS = 5
+_NUM_BATCHES = 20
+_TWEET_ID = "1142944425502543875"
+
+
+def _thread_response(replies_response: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Rearranges the Tweets of a Replies response like a thread by their author."""
+
+    tweet_ids = [
+        entry["content"]["timelineModule"]["items"][0]["item"]["content"]["tweet"]["id"]
+        for entry in replies_response["timeline"]["instructions"][0]["addEntries"][
+            "entries"
+        ]
+        if entry["entryId"].startswith("conversationThread-")
+    ]
+    items: List[Mapping[str, object]] = [
+        {
+            "entryId": "tweet-" + tweet_id,
+            "item": {"content": {"tweet": {"id": tweet_id, "displayType": "Tweet"}}},
+        }
+        for tweet_id in tweet_ids
+    ]
+    items.append(
+        {
+            "entryId": "conversationThread-{}-show_more_cursor".format(tweet_ids[0]),
+            "item": {"content": {"timelineCursor": {"value": "scroll:0"}}},
+        }
+    )
+    return {
+        "globalObjects": replies_response["globalObjects"],
+        "timeline": {
+            "id": "Conversation-" + _TWEET_ID,
+            "instructions": [
+                {
+                    "addEntries": {
+                        "entries": [
+                            {"entryId": "tweet-" + _TWEET_ID},
+                            {
+                                "entryId": "conversationThread-" + tweet_ids[0],
+                                "content": {"timelineModule": {"items": items}},
+                            },
+                        ]
+                    }
+                }
+            ],
+        },
+    }
+
+
+def _retained_bytes(func: Callable[[], object]) -> int:
+    """Returns how many bytes the object returned by func keeps allocated."""
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objs = [func() for _ in range(_NUM_BATCHES)]
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return (after - before) // _NUM_BATCHES
+
+
+def _benchmark(
+    name: str,
+    codec: JsonCodec,
+    batch_type: Type[RetrieverBatch],
+    content: bytes,
+) -> None:
+    def decode() -> Mapping[str, Mapping[str, object]]:
+        return cast(Mapping[str, Mapping[str, object]], codec.loads(content))
+
+    def parse() -> RetrieverBatch:
+        return batch_type(decode())
+
+    num_tweets = len(parse().tweets)
+    decode_time = min(timeit(decode, number=_NUM_BATCHES) for _ in range(_NUM_REPEATS))
+    parse_time = min(timeit(parse, number=_NUM_BATCHES) for _ in range(_NUM_REPEATS))
+
+    print(  # noqa: T001
+        "{:>8} {:>6}: decode {:>7.0f} Tweets/s, parse {:>7.0f} Tweets/s, "
+        "retains {:>5.0f} KB of {:>5.0f} KB decoded".format(
+            name,
+            codec.name,
+            num_tweets * _NUM_BATCHES / decode_time,
+            num_tweets * _NUM_BATCHES / parse_time,
+            _retained_bytes(parse) / 1024,
+            _retained_bytes(decode) / 1024,
+        )
+    )
+
+
+def main() -> None:
+    with MockTwitter(num_tweets=_BATCH_SIZE) as mock_twitter:
+        _, _, search_response = mock_twitter.respond(
+            "/2/search/adaptive.json", {"q": "trump", "count": str(_BATCH_SIZE)}
+        )
+        _, _, replies_response = mock_twitter.respond(
+            "/2/timeline/conversation/{}.json".format(_TWEET_ID),
+            {"count": str(_BATCH_SIZE)},
+        )
+    responses: Sequence[Any] = [
+        ("Search", SearchRetrieverBatch, search_response),
+        ("Replies", RepliesRetrieverBatch, replies_response),
+        ("Thread", ThreadRetrieverBatch, _thread_response(replies_response)),
+    ]
+
+    codecs: List[JsonCodec] = [StdlibJsonCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonJsonCodec())
+    else:
+        print("orjson is not installed, skipping it.")  # noqa: T001
+
+    for name, batch_type, response in responses:
+        content = json.dumps(response).encode("UTF-8")
+        for codec in codecs:
+            _benchmark(name, codec, batch_type, content)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Measures the throughput of the Tweet accessors.
+
+Each accessor is measured on fresh Tweets (first access) and on Tweets whose derived
+fields were already computed (repeated access).
+
+Run via: python -m tests.benchmarks.bench_tweet
+"""
+
+from datetime import datetime
+from timeit import timeit
+from typing import Callable, List, Mapping
+
+from nasty._util.consts import TWITTER_CREATED_AT_FORMAT
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
+
+_NUM_TWEETS = 100000
+_NUM_REPEATS = 3
+
+
+def _benchmark(
+    name: str,
+    func: Callable[[Tweet], object],
+    tweet_jsons_: List[Mapping[str, object]],
+) -> None:
+    def first_access() -> None:
+        for tweet in [Tweet(tweet_json) for tweet_json in tweet_jsons_]:
+            func(tweet)
+
+    tweets = [Tweet(tweet_json) for tweet_json in tweet_jsons_]
+    for tweet in tweets:
+        func(tweet)
+
+    def repeated_access() -> None:
+        for tweet in tweets:
+            func(tweet)
+
+    first_access_time = min(timeit(first_access, number=1) for _ in range(_NUM_REPEATS))
+    repeated_access_time = min(
+        timeit(repeated_access, number=1) for _ in range(_NUM_REPEATS)
+    )
+
+    print(  # noqa: T001
+        "{:>20}: first access {:>10.0f} Tweets/s, repeated access {:>10.0f} "
+        "Tweets/s".format(
+            name,
+            len(tweet_jsons_) / first_access_time,
+            len(tweet_jsons_) / repeated_access_time,
+        )
+    )
+
+
+def main() -> None:
+    tweet_json_values = list(tweet_jsons.values())
+    tweet_jsons_ = [
+        tweet_json_values[i % len(tweet_json_values)] for i in range(_NUM_TWEETS)
+    ]
+
+    _benchmark("Tweet()", lambda tweet: None, tweet_jsons_)
+    _benchmark("id", lambda tweet: tweet.id, tweet_jsons_)
+    _benchmark("id_int", lambda tweet: tweet.id_int, tweet_jsons_)
+    _benchmark("created_at", lambda tweet: tweet.created_at, tweet_jsons_)
+    _benchmark(
+        "created_at strptime",
+        lambda tweet: datetime.strptime(
+            tweet.json["created_at"], TWITTER_CREATED_AT_FORMAT  # type: ignore
+        ),
+        tweet_jsons_,
+    )
+    _benchmark("user", lambda tweet: tweet.user, tweet_jsons_)
+    _benchmark("url", lambda tweet: tweet.url, tweet_jsons_)
+    _benchmark("hash", hash, tweet_jsons_)
+    # Equal Tweets not sharing their JSON, the worst case.
+    other_tweet = Tweet(dict(tweet_json_values[0]))
+    _benchmark("eq", lambda tweet: tweet == other_tweet, tweet_jsons_)
+
+
+if __name__ == "__main__":
+    main()
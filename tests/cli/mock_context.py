@@ -18,6 +18,7 @@ from pathlib import Path
 from typing import Optional
 
 from nasty._settings import TwitterApiSettings
+from nasty.batch.batch_results import ExportFormat, ExportPartitioning
 from nasty.request.request import Request
 from nasty.tweet.tweet import Tweet
 from nasty.tweet.tweet_stream import TweetStream
@@ -54,6 +55,8 @@ class MockBatchContext:
     def __init__(self) -> None:
         self.load_args = None
         self.execute_args = None
+        self.execute_incremental = None
+        self.replay_args = None
 
         class MockBatch:
             @staticmethod
@@ -61,8 +64,13 @@ class MockBatchContext:
                 self.load_args = (file,)
 
             @staticmethod
-            def execute(results_dir: Optional[Path]) -> None:
+            def execute(results_dir: Optional[Path], *, incremental: bool) -> None:
                 self.execute_args = (results_dir,)
+                self.execute_incremental = incremental
+
+            @staticmethod
+            def replay(results_dir: Optional[Path]) -> None:
+                self.replay_args = (results_dir,)
 
         self.MockBatch = MockBatch
 
@@ -72,6 +80,7 @@ class MockBatchResultsContext:
         self.init_args = None
         self.idify_args = None
         self.unidify_args = None
+        self.export_args = None
 
         class MockBatchResults:
             @staticmethod
@@ -89,4 +98,13 @@ class MockBatchResultsContext:
             ) -> None:
                 self.unidify_args = (results_dir,)
 
+            @staticmethod
+            def export(
+                out_dir: Path,
+                *,
+                format_: ExportFormat,
+                partitioning: ExportPartitioning,
+            ) -> None:
+                self.export_args = (out_dir, format_, partitioning)
+
         self.MockBatchResults = MockBatchResults
@@ -44,9 +44,33 @@ def test_correct_call(
 
     assert mock_context.load_args == (batch_file,)
     assert mock_context.execute_args == (results_dir,)
+    assert mock_context.execute_incremental is False
     assert capsys.readouterr().out == ""
 
 
+def test_incremental(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    mock_context = MockBatchContext()
+    monkeypatch.setattr(
+        nasty._cli,
+        nasty._cli.Batch.__name__,  # type: ignore
+        mock_context.MockBatch,
+    )
+
+    batch_file = tmp_path / "batch.jsonl"
+    results_dir = tmp_path / "out"
+    main(
+        "batch",
+        "--batch-file",
+        str(batch_file),
+        "--results-dir",
+        str(results_dir),
+        "--incremental",
+    )
+
+    assert mock_context.execute_args == (results_dir,)
+    assert mock_context.execute_incremental is True
+
+
 def test_no_batch_file(tmp_path: Path) -> None:
     batch_file = tmp_path / "batch.jsonl"
     results_dir = tmp_path / "out"
@@ -59,3 +83,26 @@ def test_no_batch_file(tmp_path: Path) -> None:
             "--results-dir",
             str(results_dir),
         )
+
+
+def test_replay(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    mock_context = MockBatchContext()
+    monkeypatch.setattr(
+        nasty._cli,
+        nasty._cli.Batch.__name__,  # type: ignore
+        mock_context.MockBatch,
+    )
+
+    batch_file = tmp_path / "batch.jsonl"
+    results_dir = tmp_path / "out"
+    main(
+        "batch",
+        "--batch-file",
+        str(batch_file),
+        "--results-dir",
+        str(results_dir),
+        "--replay",
+    )
+
+    assert mock_context.replay_args == (results_dir,)
+    assert mock_context.execute_args is None
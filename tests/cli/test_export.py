@@ -0,0 +1,65 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+
+from _pytest.monkeypatch import MonkeyPatch
+
+import nasty._cli
+from nasty import main
+from nasty.batch.batch_results import ExportFormat, ExportPartitioning
+
+from .mock_context import MockBatchResultsContext
+
+
+def test_export(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    in_dir = tmp_path / "in"
+    out_dir = tmp_path / "out"
+
+    mock_context = MockBatchResultsContext()
+    monkeypatch.setattr(
+        nasty._cli,
+        nasty._cli.BatchResults.__name__,  # type: ignore
+        mock_context.MockBatchResults,
+    )
+
+    main("export", "--in-dir", str(in_dir), "--out-dir", str(out_dir))
+
+    assert mock_context.init_args == (in_dir,)
+    assert mock_context.export_args == (
+        out_dir,
+        ExportFormat.PARQUET,
+        ExportPartitioning.ENTRY,
+    )
+
+
+def test_export_format_partitioning(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    mock_context = MockBatchResultsContext()
+    monkeypatch.setattr(
+        nasty._cli,
+        nasty._cli.BatchResults.__name__,  # type: ignore
+        mock_context.MockBatchResults,
+    )
+
+    main(
+        "export", "-i", str(tmp_path), "-o", str(tmp_path), "-f", "ARROW", "-p", "DATE"
+    )
+
+    assert mock_context.export_args == (
+        tmp_path,
+        ExportFormat.ARROW,
+        ExportPartitioning.DATE,
+    )
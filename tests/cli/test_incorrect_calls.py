@@ -39,6 +39,12 @@ logger = getLogger(__name__)
         "search --query trump --to-batch file --daily",
         "search --query trump --since 2019-03-21 --to-batch file --daily",
         "search --query trump --until 2019-03-21 --to-batch file --daily",
+        "search --query trump --since 2019-03-21 --until 2019-03-22 --adaptive",
+        "search --query trump --since 2019-03-21 --to-batch file --adaptive",
+        "search --query trump --since 2019-03-21 --until 2019-03-22 --to-batch file "
+        "--daily --adaptive",
+        "search --query trump --since 2019-03-21 --until 2019-03-22 --to-batch file "
+        "--adaptive --max-window-tweets five",
         "replies 332308211321425920",
         "replies --tweet-id 332308211321425920 --max-tweets five",
         "replies --tweet-id 332308211321425920 --batch-size 3.0",
@@ -53,6 +59,7 @@ logger = getLogger(__name__)
         "batch --batch-file batch.jsonl --results-dir",
         "batch --results-dir",
         "batch --batch-file --results-dir out/",
+        "batch --batch-file batch.jsonl --results-dir out/ --incremental --replay",
         "idify --in-dir",
         "idify --out-dir",
         "idify --out-dir out/",
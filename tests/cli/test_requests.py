@@ -14,8 +14,7 @@
 # limitations under the License.
 #
 
-import json
-from datetime import date
+from datetime import date, datetime
 from logging import getLogger
 from pathlib import Path
 from typing import List, Mapping, Optional, Sequence, Type
@@ -26,6 +25,7 @@ from _pytest.monkeypatch import MonkeyPatch
 from typing_extensions import Final
 
 from nasty import main
+from nasty._util.json_ import dumps
 from nasty.batch.batch import Batch
 from nasty.request.replies import Replies
 from nasty.request.request import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TWEETS, Request
@@ -66,6 +66,7 @@ def _make_args(  # noqa: C901
     request: Request,
     to_batch: Optional[Path] = None,
     daily: bool = False,
+    adaptive: bool = False,
 ) -> Sequence[str]:
     args: List[str] = []
 
@@ -105,6 +106,11 @@ def _make_args(  # noqa: C901
             raise ValueError("daily can only be used for Search-requests.")
         args += ["--daily"]
 
+    if adaptive:
+        if not isinstance(request, Search):
+            raise ValueError("adaptive can only be used for Search-requests.")
+        args += ["--adaptive"]
+
     return args
 
 
@@ -150,7 +156,7 @@ def test_correct_call_results(
     assert mock_context.request == request_
     assert not mock_context.remaining_result_tweets
     assert capsys.readouterr().out == (
-        json.dumps(mock_context.RESULT_TWEET.to_json()) + "\n"
+        dumps(mock_context.RESULT_TWEET.to_json()) + "\n"
     ) * min(10, num_results)
 
 
@@ -225,3 +231,35 @@ def test_correct_call_to_batch_daily(capsys: CaptureFixture, tmp_path: Path) ->
         assert batch_entry.id
         assert batch_entry.completed_at is None
         assert batch_entry.exception is None
+
+
+def test_correct_call_to_batch_adaptive(
+    monkeypatch: MonkeyPatch, capsys: CaptureFixture, tmp_path: Path
+) -> None:
+    batch_file = tmp_path / "batch.jsonl"
+    request = Search("trump", since=date(2019, 1, 1), until=date(2019, 2, 1))
+    adaptive_requests = [
+        Search("trump", since=date(2019, 1, 1), until=datetime(2019, 1, 5, 12)),
+        Search("trump", since=datetime(2019, 1, 5, 12), until=date(2019, 2, 1)),
+    ]
+
+    def mock_to_adaptive_requests(
+        self: Search, *, max_window_tweets: int
+    ) -> Sequence[Search]:
+        assert self == request
+        assert 1000 == max_window_tweets
+        return adaptive_requests
+
+    monkeypatch.setattr(
+        Search, Search.to_adaptive_requests.__name__, mock_to_adaptive_requests
+    )
+    main(
+        *_make_args(request, to_batch=batch_file, adaptive=True),
+        "--max-window-tweets",
+        "1000",
+    )
+
+    assert capsys.readouterr().out == ""
+    batch = Batch()
+    batch.load(batch_file)
+    assert adaptive_requests == [batch_entry.request for batch_entry in batch]
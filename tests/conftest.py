@@ -22,6 +22,8 @@ from _pytest.fixtures import FixtureRequest
 from _pytest.monkeypatch import MonkeyPatch
 from nasty_utils import LoggingSettings
 
+from nasty._retriever.request_scheduler import request_scheduler
+from nasty._retriever.twitter_credentials import twitter_credentials
 from nasty._settings import NastySettings
 
 from .util.requests_cache import RequestsCache
@@ -67,3 +69,11 @@ def activate_requests_cache(
 @pytest.fixture(autouse=True)
 def disrespect_robotstxt(monkeypatch: MonkeyPatch) -> None:
     monkeypatch.setenv("NASTY_DISRESPECT_ROBOTSTXT", "1")
+
+
+@pytest.fixture(autouse=True)
+def clear_retriever_state() -> None:
+    # Establish a fresh Twitter session per test, so that cached requests match, and
+    # do not let rate limits or crawl-delays of previous tests delay it.
+    twitter_credentials.clear()
+    request_scheduler.clear()
@@ -0,0 +1,117 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from typing import Iterator
+
+import pytest
+import requests
+
+from nasty._retriever.connection_pool import ConnectionPool
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        body = (self.headers.get("Cookie") or "").encode("UTF-8")
+        self.send_response(200)
+        if self.path == "/set-cookie":
+            self.send_header("Set-Cookie", "session=1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    server = _ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.requests_cache_disabled
+def test_reuse_across_sessions(server_url: str) -> None:
+    pool = ConnectionPool()
+    sessions = [requests.Session() for _ in range(3)]
+    for session in sessions:
+        pool.mount(session)
+
+    assert "" == sessions[0].get(server_url + "/set-cookie").text
+    for session in sessions:
+        session.get(server_url)
+        session.close()  # Must not close the shared connections.
+
+    # Cookies stay separate for each session.
+    assert "session=1" == sessions[0].get(server_url).text
+    assert "" == sessions[1].get(server_url).text
+
+    stats = pool.stats()
+    assert 6 == stats.num_requests
+    assert 1 == stats.num_opened_connections
+    assert 5 == stats.num_reused_connections
+
+
+@pytest.mark.requests_cache_disabled
+def test_concurrent_requests(server_url: str) -> None:
+    num_workers = 4
+    pool = ConnectionPool()
+    pool.resize(num_workers)
+
+    def get(_: int) -> int:
+        session = requests.Session()
+        pool.mount(session)
+        return session.get(server_url).status_code
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        assert [200] * 40 == list(executor.map(get, range(40)))
+
+    stats = pool.stats()
+    assert 40 == stats.num_requests
+    assert stats.num_opened_connections <= pool.pool_maxsize
+    assert 40 - stats.num_opened_connections == stats.num_reused_connections
+
+
+@pytest.mark.requests_cache_disabled
+def test_resize_closes_connections(server_url: str) -> None:
+    pool = ConnectionPool()
+    session = requests.Session()
+    pool.mount(session)
+    session.get(server_url)
+    stats_before = pool.stats()
+
+    pool.resize(pool.pool_maxsize + 1)
+    session.get(server_url)  # Still uses the previous adapter.
+    pool.mount(session)
+    session.get(server_url)
+
+    stats = pool.stats().since(stats_before)
+    assert 2 == stats.num_requests
+    assert 2 == stats.num_opened_connections
+    assert 0 == stats.num_reused_connections
@@ -0,0 +1,167 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from typing import Iterator
+
+import pytest
+import requests
+
+from nasty._retriever.connection_pool import connection_pool
+from nasty._retriever.http_cache import (
+    CachingTransport,
+    HttpCache,
+    HttpCacheMissException,
+    HttpCacheMode,
+)
+from nasty._retriever.transport import RequestsTransport
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    """Responds with the number of requests so far, and the status given as path."""
+
+    protocol_version = "HTTP/1.1"
+    num_requests = 0
+    lock = Lock()
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.lock:
+            type(self).num_requests += 1
+            num_requests = self.num_requests
+
+        status = int(self.path.split("?")[0][1:] or "200")
+        body = str(num_requests).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Set-Cookie", "session={}".format(num_requests))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    _CountingHandler.num_requests = 0
+    server = _ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    connection_pool.mount(session)
+    return session
+
+
+def _get(
+    transport: CachingTransport,
+    url: str,
+    *,
+    session_bootstrap: bool = False,
+    **kwargs: object,
+) -> str:
+    session = _session()
+    response = transport.lookup(  # type: ignore
+        session, url, session_bootstrap=session_bootstrap, **kwargs
+    )
+    if response is None:
+        response = transport.get(session, url, **kwargs)  # type: ignore
+    return response.text
+
+
+@pytest.mark.requests_cache_disabled
+def test_record_replay(server_url: str, tmp_path: Path) -> None:
+    cache = HttpCache(tmp_path / "cache.sqlite")
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "1" == _get(transport, server_url + "/", params={"a": "1", "b": "2"})
+    assert "1" == _get(transport, server_url + "/", params={"b": "2", "a": "1"})
+    assert "2" == _get(transport, server_url + "/", params={"a": "2"})
+    assert 2 == len(cache)
+
+    # Tokens only identify the client, and must not prevent matching.
+    session = _session()
+    session.headers["Authorization"] = "Bearer other"
+    session.headers["X-Guest-Token"] = "other"
+    response = transport.lookup(session, server_url + "/?a=2")
+    assert response is not None
+    assert "2" == response.text
+    assert "2" == session.cookies["session"]
+
+    # Responses survive reopening the cache.
+    transport = CachingTransport(
+        RequestsTransport(), HttpCache(tmp_path / "cache.sqlite"), HttpCacheMode.REPLAY
+    )
+    assert "1" == _get(transport, server_url + "/?b=2&a=1")
+    with pytest.raises(HttpCacheMissException):
+        _get(transport, server_url + "/?a=3")
+    assert 2 == _CountingHandler.num_requests
+
+
+@pytest.mark.requests_cache_disabled
+def test_regenerate(server_url: str, tmp_path: Path) -> None:
+    cache = HttpCache(tmp_path / "cache.sqlite")
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "1" == _get(transport, server_url + "/")
+
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.REGENERATE)
+    assert "2" == _get(transport, server_url + "/")
+    assert 1 == len(cache)
+
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "2" == _get(transport, server_url + "/")
+
+
+@pytest.mark.requests_cache_disabled
+def test_expire_after(server_url: str, tmp_path: Path) -> None:
+    cache = HttpCache(tmp_path / "cache.sqlite", expire_after=timedelta())
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "1" == _get(transport, server_url + "/")
+    assert "2" == _get(transport, server_url + "/")
+
+
+@pytest.mark.requests_cache_disabled
+def test_errors_not_recorded(server_url: str, tmp_path: Path) -> None:
+    cache = HttpCache(tmp_path / "cache.sqlite")
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "1" == _get(transport, server_url + "/429")
+    assert "2" == _get(transport, server_url + "/429")
+    assert 0 == len(cache)
+
+
+@pytest.mark.requests_cache_disabled
+def test_session_bootstrap(server_url: str, tmp_path: Path) -> None:
+    cache = HttpCache(tmp_path / "cache.sqlite")
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.RECORD)
+    assert "1" == _get(transport, server_url + "/", session_bootstrap=True)
+    assert "2" == _get(transport, server_url + "/", session_bootstrap=True)
+    assert "2" == _get(transport, server_url + "/")
+
+    transport = CachingTransport(RequestsTransport(), cache, HttpCacheMode.REPLAY)
+    assert "2" == _get(transport, server_url + "/", session_bootstrap=True)
+    assert 2 == _CountingHandler.num_requests
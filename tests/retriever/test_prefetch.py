@@ -0,0 +1,160 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+from threading import Event
+from time import sleep
+from typing import Callable, Iterator, List, Optional
+
+import pytest
+
+from nasty._retriever.async_retriever import _AsyncPrefetcher
+from nasty._retriever.retriever import _Prefetcher, _RetrievedTweets
+
+_NUM_BATCHES = 5
+
+
+def _make_retrieve_next_tweets(
+    num_retrieved: List[int], *, fail: bool = False
+) -> Callable[[], Optional[_RetrievedTweets]]:
+    def batches() -> Iterator[Optional[_RetrievedTweets]]:
+        for _ in range(_NUM_BATCHES):
+            num_retrieved[0] += 1
+            # Tweets are not inspected by the prefetcher, so save constructing them.
+            tweets = [object()] * num_retrieved[0]
+            yield _RetrievedTweets(tweets, None)  # type: ignore
+        if fail:
+            raise ValueError("Failed to retrieve batch.")
+        while True:
+            yield None
+
+    iterator = batches()
+    return lambda: next(iterator)
+
+
+def test_prefetch() -> None:
+    num_retrieved = [0]
+    prefetcher = _Prefetcher(_make_retrieve_next_tweets(num_retrieved), 2)
+
+    lengths = []
+    while True:
+        retrieved_tweets = prefetcher.next()
+        if retrieved_tweets is None:
+            break
+        lengths.append(len(retrieved_tweets.tweets))
+    assert list(range(1, _NUM_BATCHES + 1)) == lengths
+    assert prefetcher.next() is None
+
+
+def test_prefetch_bounded() -> None:
+    num_retrieved = [0]
+    retrieve_next_tweets = _make_retrieve_next_tweets(num_retrieved)
+    depth = 2
+    blocked = Event()
+
+    def retrieve_next_tweets_signaling() -> Optional[_RetrievedTweets]:
+        retrieved_tweets = retrieve_next_tweets()
+        if num_retrieved[0] == depth + 1:
+            blocked.set()
+        return retrieved_tweets
+
+    prefetcher = _Prefetcher(retrieve_next_tweets_signaling, depth)
+    # One batch more than the depth is retrieved, which then waits to be queued.
+    assert blocked.wait(timeout=5)
+    sleep(0.1)
+    assert depth + 1 == num_retrieved[0]
+    assert prefetcher.next() is not None
+
+
+def test_prefetch_exception() -> None:
+    prefetcher = _Prefetcher(_make_retrieve_next_tweets([0], fail=True), 2)
+    for _ in range(_NUM_BATCHES):
+        assert prefetcher.next() is not None
+    with pytest.raises(ValueError):
+        prefetcher.next()
+    assert prefetcher.next() is None
+
+
+def test_prefetch_async() -> None:
+    retrieve_next_tweets = _make_retrieve_next_tweets([0], fail=True)
+
+    async def retrieve_next_tweets_async() -> Optional[_RetrievedTweets]:
+        return retrieve_next_tweets()
+
+    async def consume() -> List[int]:
+        prefetcher = _AsyncPrefetcher(retrieve_next_tweets_async, 2)
+        lengths = []
+        with pytest.raises(ValueError):
+            while True:
+                retrieved_tweets = await prefetcher.next()
+                assert retrieved_tweets is not None
+                lengths.append(len(retrieved_tweets.tweets))
+        assert await prefetcher.next() is None
+        return lengths
+
+    loop = asyncio.new_event_loop()
+    try:
+        lengths = loop.run_until_complete(consume())
+    finally:
+        loop.close()
+    assert list(range(1, _NUM_BATCHES + 1)) == lengths
+
+
+def test_prefetch_close() -> None:
+    num_retrieved = [0]
+    prefetcher = _Prefetcher(_make_retrieve_next_tweets(num_retrieved), 1)
+    assert prefetcher.next() is not None
+
+    # The thread is blocked queueing the next batch, until the prefetcher is closed.
+    prefetcher.close()
+    prefetcher._thread.join(timeout=5)
+    assert not prefetcher._thread.is_alive()
+    assert num_retrieved[0] < _NUM_BATCHES
+    assert prefetcher.next() is None
+
+
+@pytest.mark.filterwarnings("ignore:Exception in thread")
+def test_prefetch_interrupted() -> None:
+    def retrieve_next_tweets() -> Optional[_RetrievedTweets]:
+        raise KeyboardInterrupt()
+
+    # The thread dies, but the consumer is still notified.
+    prefetcher = _Prefetcher(retrieve_next_tweets, 2)
+    with pytest.raises(RuntimeError):
+        prefetcher.next()
+
+
+def test_prefetch_async_close() -> None:
+    num_retrieved = [0]
+    retrieve_next_tweets = _make_retrieve_next_tweets(num_retrieved)
+
+    async def retrieve_next_tweets_async() -> Optional[_RetrievedTweets]:
+        return retrieve_next_tweets()
+
+    async def consume() -> None:
+        prefetcher = _AsyncPrefetcher(retrieve_next_tweets_async, 1)
+        assert await prefetcher.next() is not None
+        prefetcher.close()
+        assert await prefetcher.next() is None
+        await asyncio.sleep(0.1)
+        assert prefetcher._task.cancelled()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(consume())
+    finally:
+        loop.close()
+    assert num_retrieved[0] < _NUM_BATCHES
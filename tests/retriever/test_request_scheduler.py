@@ -0,0 +1,161 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import monotonic, time
+from typing import Mapping
+
+import requests
+
+from nasty._retriever.request_scheduler import RequestScheduler
+from nasty.storage.crawl_delay_table import CrawlDelayTable
+
+_URL = "https://api.twitter.com/2/search/adaptive.json"
+_HEADERS = {"X-Guest-Token": "123"}
+
+
+def _make_response(
+    url: str, request_headers: Mapping[str, str], remaining: int, reset: float
+) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.request = requests.Request("GET", url, headers=request_headers).prepare()
+    response.headers.update(
+        {"X-Rate-Limit-Remaining": str(remaining), "X-Rate-Limit-Reset": str(reset)}
+    )
+    return response
+
+
+def test_crawl_delay_across_threads() -> None:
+    scheduler = RequestScheduler()
+    num_requests = 5
+    crawl_delay = 0.05
+
+    start = monotonic()
+    with ThreadPoolExecutor(max_workers=num_requests) as executor:
+        for _ in range(num_requests):
+            executor.submit(scheduler.wait, _URL, _HEADERS, crawl_delay)
+    assert (num_requests - 1) * crawl_delay <= monotonic() - start
+
+    stats = scheduler.stats()
+    assert 0 == stats.queue_depth
+    assert num_requests == stats.num_requests
+    assert num_requests - 1 == stats.num_delayed_requests
+    assert stats.max_wait_time >= (num_requests - 1.5) * crawl_delay
+
+
+def test_crawl_delay_table(tmp_path: Path) -> None:
+    # Stand-ins for the schedulers of two processes sharing a results directory.
+    schedulers = [RequestScheduler(), RequestScheduler()]
+    for scheduler in schedulers:
+        scheduler.set_crawl_delay_table(CrawlDelayTable(tmp_path))
+    num_requests = 6
+    crawl_delay = 0.05
+
+    start = monotonic()
+    for i in range(num_requests):
+        schedulers[i % 2].wait(_URL, _HEADERS, crawl_delay)
+    assert (num_requests - 1) * crawl_delay <= monotonic() - start
+    assert num_requests - 1 == sum(
+        scheduler.stats().num_delayed_requests for scheduler in schedulers
+    )
+
+
+def test_crawl_delay_table_reserved_without_lock(tmp_path: Path) -> None:
+    scheduler = RequestScheduler()
+
+    class _CheckingCrawlDelayTable(CrawlDelayTable):
+        def reserve(self, host: str, earliest: float, crawl_delay: float) -> float:
+            # Otherwise, all threads would wait for the file I/O of the table.
+            assert not scheduler._lock.locked()
+            return super().reserve(host, earliest, crawl_delay)
+
+    scheduler.set_crawl_delay_table(_CheckingCrawlDelayTable(tmp_path))
+    scheduler.wait(_URL, _HEADERS, 0.01)
+    scheduler.wait(_URL, _HEADERS, 0.01)
+    assert 1 == scheduler.stats().num_delayed_requests
+
+
+def test_crawl_delay_per_host() -> None:
+    scheduler = RequestScheduler()
+    scheduler.wait(_URL, _HEADERS, 60)
+    scheduler.wait("https://mobile.twitter.com/robots.txt", _HEADERS, 60)
+    assert 0 == scheduler.stats().num_delayed_requests
+
+
+def test_no_crawl_delay() -> None:
+    scheduler = RequestScheduler()
+    for _ in range(10):
+        scheduler.wait(_URL, _HEADERS, None)
+    assert 0 == scheduler.stats().num_delayed_requests
+
+
+def test_rate_limit_waits_for_reset() -> None:
+    scheduler = RequestScheduler()
+    scheduler.update(_make_response(_URL, _HEADERS, 2, time() + 0.2))
+
+    start = monotonic()
+    scheduler.wait(_URL, _HEADERS, None)
+    scheduler.wait(_URL, _HEADERS, None)
+    assert monotonic() - start < 0.1
+    scheduler.wait(_URL, _HEADERS, None)
+    assert 0.1 < monotonic() - start
+    assert 1 == scheduler.stats().num_delayed_requests
+
+
+def test_rate_limit_stays_exhausted() -> None:
+    scheduler = RequestScheduler()
+    reset = time() + 0.2
+    scheduler.update(_make_response(_URL, _HEADERS, 0, reset))
+    # A late response of a request sent before the budget was exhausted.
+    scheduler.update(_make_response(_URL, _HEADERS, 5, reset))
+
+    start = monotonic()
+    scheduler.wait(_URL, _HEADERS, None)
+    assert 0.1 < monotonic() - start
+
+
+def test_rate_limit_per_guest_token() -> None:
+    scheduler = RequestScheduler()
+    scheduler.update(_make_response(_URL, _HEADERS, 0, time() + 60))
+
+    scheduler.wait(_URL, {"X-Guest-Token": "456"}, None)
+    assert 0 == scheduler.stats().num_delayed_requests
+
+
+def test_wait_async() -> None:
+    scheduler = RequestScheduler()
+    num_requests = 5
+    crawl_delay = 0.05
+
+    async def wait_all() -> None:
+        await asyncio.gather(
+            *(
+                scheduler.wait_async(_URL, _HEADERS, crawl_delay)
+                for _ in range(num_requests)
+            )
+        )
+
+    loop = asyncio.new_event_loop()
+    start = monotonic()
+    try:
+        loop.run_until_complete(wait_all())
+    finally:
+        loop.close()
+    assert (num_requests - 1) * crawl_delay <= monotonic() - start
+    assert num_requests - 1 == scheduler.stats().num_delayed_requests
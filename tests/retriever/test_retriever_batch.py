@@ -0,0 +1,83 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from typing import Any, Iterator, Mapping
+
+import pytest
+
+from nasty._retriever.replies_retriever import RepliesRetrieverBatch
+from nasty._retriever.search_retriever import SearchRetrieverBatch
+
+from ..util.mock_twitter import MockTwitter
+
+
+@pytest.fixture(scope="module")
+def mock_twitter() -> Iterator[MockTwitter]:
+    mock_twitter = MockTwitter(num_tweets=30)
+    yield mock_twitter
+    mock_twitter.close()
+
+
+def _search_response(mock_twitter: MockTwitter, **params: str) -> Mapping[str, Any]:
+    _, _, response = mock_twitter.respond(
+        "/2/search/adaptive.json", {"q": "trump", "count": "20", **params}
+    )
+    return response  # type: ignore
+
+
+def test_search_batch(mock_twitter: MockTwitter) -> None:
+    response = _search_response(mock_twitter)
+    batch = SearchRetrieverBatch(response)  # type: ignore
+
+    assert 20 == len(batch.tweets)
+    assert "scroll:20" == batch.next_cursor
+    for tweet in batch.tweets:
+        assert "user_id" not in tweet.json
+        assert "user_id_str" not in tweet.json
+        assert tweet.user.id == tweet.json["user"]["id_str"]  # type: ignore
+    # Only the Tweets and the cursor are kept, not the response.
+    assert {"tweets", "next_cursor"} == set(vars(batch))
+
+    batch = SearchRetrieverBatch(_search_response(mock_twitter, cursor="scroll:20"))
+    assert 10 == len(batch.tweets)
+    assert "scroll:40" == batch.next_cursor
+
+    batch = SearchRetrieverBatch(_search_response(mock_twitter, cursor="scroll:40"))
+    assert 0 == len(batch.tweets)
+    assert "scroll:60" == batch.next_cursor
+
+
+def test_search_batch_repeated_tweet(mock_twitter: MockTwitter) -> None:
+    response = _search_response(mock_twitter)
+    entries = response["timeline"]["instructions"][0]["addEntries"]["entries"]
+    entries.insert(1, entries[0])
+
+    batch = SearchRetrieverBatch(response)  # type: ignore
+    assert 21 == len(batch.tweets)
+    assert batch.tweets[0] == batch.tweets[1]
+    assert "user" in batch.tweets[1].json
+
+
+def test_replies_batch(mock_twitter: MockTwitter) -> None:
+    _, _, response = mock_twitter.respond(
+        "/2/timeline/conversation/1142944425502543875.json", {"count": "20"}
+    )
+    batch = RepliesRetrieverBatch(response)  # type: ignore
+
+    assert 20 == len(batch.tweets)
+    assert "scroll:20" == batch.next_cursor
+    assert 0 == batch.num_tombstones
+    assert {"tweets", "next_cursor", "num_tombstones"} == set(vars(batch))
@@ -0,0 +1,109 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+import requests
+
+from nasty._retriever.robots_txt import (
+    FileRobotsTxtCache,
+    FixedRobotsTxtCache,
+    parse_crawl_delay,
+)
+
+_ROBOTS_TXT = "User-agent: *\nDisallow: /search/realtime\nCrawl-delay: 1\n"
+
+
+def _make_fetch_robots_txt(fetches: List[str]) -> Callable[[], str]:
+    def fetch_robots_txt() -> str:
+        fetches.append(_ROBOTS_TXT)
+        return _ROBOTS_TXT
+
+    return fetch_robots_txt
+
+
+def test_parse_crawl_delay() -> None:
+    assert 1.0 == parse_crawl_delay(_ROBOTS_TXT)
+    with pytest.raises(RuntimeError):
+        parse_crawl_delay("User-agent: *\n")
+
+
+def test_fixed() -> None:
+    cache = FixedRobotsTxtCache("Crawl-delay: 0.5")
+    assert 0.5 == cache.crawl_delay(lambda: pytest.fail("Should not fetch."))
+
+
+def test_file_shared(tmp_path: Path) -> None:
+    fetches: List[str] = []
+    fetch_robots_txt = _make_fetch_robots_txt(fetches)
+    file = tmp_path / "robots.txt.json"
+
+    assert 1.0 == FileRobotsTxtCache(file).crawl_delay(fetch_robots_txt)
+    assert 1.0 == FileRobotsTxtCache(file).crawl_delay(fetch_robots_txt)
+    assert 1 == len(fetches)
+
+
+def test_file_expired(tmp_path: Path) -> None:
+    fetches: List[str] = []
+    fetch_robots_txt = _make_fetch_robots_txt(fetches)
+    cache = FileRobotsTxtCache(tmp_path / "robots.txt.json", ttl=timedelta(0))
+
+    cache.crawl_delay(fetch_robots_txt)
+    cache.crawl_delay(fetch_robots_txt)
+    assert 2 == len(fetches)
+
+
+def test_file_corrupt(tmp_path: Path) -> None:
+    fetches: List[str] = []
+    fetch_robots_txt = _make_fetch_robots_txt(fetches)
+    file = tmp_path / "robots.txt.json"
+    file.write_text("{", encoding="UTF-8")
+
+    assert 1.0 == FileRobotsTxtCache(file).crawl_delay(fetch_robots_txt)
+    assert 1 == len(fetches)
+    assert 1.0 == FileRobotsTxtCache(file).crawl_delay(fetch_robots_txt)
+    assert 1 == len(fetches)
+
+
+def test_file_inaccessible(tmp_path: Path) -> None:
+    fetches: List[str] = []
+    fetch_robots_txt = _make_fetch_robots_txt(fetches)
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("", encoding="UTF-8")
+    cache = FileRobotsTxtCache(not_a_dir / "robots.txt.json")
+
+    assert 1.0 == cache.crawl_delay(fetch_robots_txt)
+    assert 1.0 == cache.crawl_delay(fetch_robots_txt)
+    assert 1 == len(fetches)
+
+
+def test_file_fetch_failed(tmp_path: Path) -> None:
+    fetches: List[str] = []
+
+    def fetch_robots_txt() -> str:
+        fetches.append(_ROBOTS_TXT)
+        raise requests.ConnectionError()
+
+    # Errors of fetching are also OSErrors, but must not be mistaken for inaccessible
+    # cache files.
+    cache = FileRobotsTxtCache(tmp_path / "robots.txt.json")
+    with pytest.raises(requests.ConnectionError):
+        cache.crawl_delay(fetch_robots_txt)
+    assert 1 == len(fetches)
+    assert not (tmp_path / "robots.txt.json").exists()
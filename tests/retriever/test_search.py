@@ -14,14 +14,20 @@
 # limitations under the License.
 #
 
+import asyncio
 import json
 import re
 from datetime import date, datetime, timedelta, timezone
-from typing import Any, Tuple, cast
+from typing import Any, List, Optional, Sequence, Tuple, cast
 
 import pytest
 
+from nasty._retriever.async_retriever import AsyncRetriever
+from nasty._retriever.search_retriever import SearchRetriever
 from nasty.request.search import Search, SearchFilter
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
 
 
 @pytest.mark.parametrize("max_tweets", [1, 10, 100, 1000], ids=repr)
@@ -276,6 +282,76 @@ def test_lang_invalid() -> None:
     )
 
 
+# -- test_since_id_* -------------------------------------------------------------------
+
+
+def test_since_id() -> None:
+    tweets = list(Search("trump", max_tweets=50, filter_=SearchFilter.LATEST).request())
+    since_id = tweets[25].id
+    newer_tweets = list(
+        Search(
+            "trump", since_id=since_id, max_tweets=50, filter_=SearchFilter.LATEST
+        ).request()
+    )
+    assert newer_tweets
+    for tweet in newer_tweets:
+        assert tweet.id_int > int(since_id)
+
+
+@pytest.mark.parametrize("filter_", [SearchFilter.TOP, SearchFilter.LATEST], ids=repr)
+def test_since_id_drop_known_tweets(filter_: SearchFilter) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = [Tweet(dict(tweet_json, id_str=str(tweet_id))) for tweet_id in [5, 3, 4]]
+
+    retriever = SearchRetriever(Search("q", filter_=filter_, since_id="3"))
+    assert "q since_id:3" == retriever._q_url_param()
+    assert [tweets[0]] == retriever._drop_known_tweets(tweets[:2])
+    # Only with the most recent Tweets first, no new Tweets can follow.
+    assert (filter_ == SearchFilter.LATEST) == retriever._request_finished
+
+
+class _FakeBatch:
+    def __init__(self, tweets: Sequence[Tweet], next_cursor: Optional[str]):
+        self.tweets = tweets
+        self.next_cursor = next_cursor
+
+
+@pytest.mark.parametrize("filter_", [SearchFilter.TOP, SearchFilter.LATEST], ids=repr)
+def test_since_id_drop_known_tweets_async(filter_: SearchFilter) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = {
+        tweet_id: Tweet(dict(tweet_json, id_str=str(tweet_id)))
+        for tweet_id in [1, 2, 3, 5]
+    }
+    # The first batch only contains Tweets that were retrieved before.
+    batches = iter(
+        [
+            _FakeBatch([tweets[3], tweets[2]], "1"),
+            _FakeBatch([tweets[5], tweets[1]], None),
+        ]
+    )
+
+    retriever = SearchRetriever(Search("q", filter_=filter_, since_id="3"))
+    retriever._needs_new_twitter_session = lambda: False  # type: ignore
+    async_retriever = AsyncRetriever(retriever)
+
+    async def fetch_batch() -> _FakeBatch:
+        return next(batches)
+
+    async_retriever._fetch_batch = fetch_batch  # type: ignore
+
+    async def consume() -> List[Tweet]:
+        return [tweet async for tweet in async_retriever.tweet_stream]
+
+    loop = asyncio.new_event_loop()
+    try:
+        new_tweets = loop.run_until_complete(consume())
+    finally:
+        loop.close()
+    # Only with the most recent Tweets first, no new Tweets can follow.
+    assert ([] if filter_ == SearchFilter.LATEST else [tweets[5]]) == new_tweets
+
+
 # -- test_special_msg_* ----------------------------------------------------------------
 
 
@@ -0,0 +1,146 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from typing import Iterator, Tuple
+
+import pytest
+import requests
+from requests.exceptions import RetryError
+
+from nasty._retriever.connection_pool import connection_pool
+from nasty._retriever.transport import Transport, TransportType, get_transport
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Responds to /<status>/<n> with the status for the first n requests, then 200."""
+
+    protocol_version = "HTTP/1.1"
+    num_requests: Counter = Counter()  # type: ignore
+    lock = Lock()
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.lock:
+            self.num_requests[self.path] += 1
+            num_requests = self.num_requests[self.path]
+
+        status = 200
+        if self.path != "/set-cookie":
+            failing_status, num_failing = map(
+                int, self.path.split("?")[0][1:].split("/")
+            )
+            if num_requests <= num_failing:
+                status = failing_status
+
+        body = "{} {}".format(
+            self.headers.get("Cookie") or "", self.headers.get("X-Test") or ""
+        ).encode("UTF-8")
+        self.send_response(status)
+        if self.path == "/set-cookie":
+            self.send_header("Set-Cookie", "session=1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    _FlakyHandler.num_requests.clear()
+    server = _ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=[TransportType.REQUESTS, TransportType.HTTP2])
+def transport_and_session(
+    request: pytest.FixtureRequest,
+) -> Tuple[Transport, requests.Session]:
+    if request.param == TransportType.HTTP2:
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+    session = requests.Session()
+    connection_pool.mount(session)
+    return get_transport(request.param), session
+
+
+@pytest.mark.requests_cache_disabled
+def test_session_state(
+    server_url: str, transport_and_session: Tuple[Transport, requests.Session]
+) -> None:
+    transport, session = transport_and_session
+    session.headers["X-Test"] = "header"
+
+    response = transport.get(session, server_url + "/set-cookie")
+    assert 200 == response.status_code
+    assert " header" == response.text
+    assert "session" in session.cookies
+
+    response = transport.get(session, server_url + "/200/0", params={"a": "b"})
+    assert "session=1 header" == response.text
+    assert server_url + "/200/0?a=b" == response.url
+    assert "header" == response.request.headers["X-Test"]
+
+    # Cookies are only stored in the session, not in the transport.
+    assert "" == transport.get(requests.Session(), server_url + "/200/0").text.strip()
+
+
+@pytest.mark.requests_cache_disabled
+@pytest.mark.parametrize("status", [500, 503, 504])
+def test_retry_status(
+    status: int,
+    server_url: str,
+    transport_and_session: Tuple[Transport, requests.Session],
+) -> None:
+    transport, session = transport_and_session
+    path = "/{}/2".format(status)
+    assert 200 == transport.get(session, server_url + path).status_code
+    assert 3 == _FlakyHandler.num_requests[path]
+
+
+@pytest.mark.requests_cache_disabled
+def test_retry_exhausted(
+    server_url: str, transport_and_session: Tuple[Transport, requests.Session]
+) -> None:
+    transport, session = transport_and_session
+    with pytest.raises(RetryError):
+        transport.get(session, server_url + "/502/10")
+    assert 6 == _FlakyHandler.num_requests["/502/10"]
+
+
+@pytest.mark.requests_cache_disabled
+@pytest.mark.parametrize("status", [403, 404, 429])
+def test_no_retry_status(
+    status: int,
+    server_url: str,
+    transport_and_session: Tuple[Transport, requests.Session],
+) -> None:
+    transport, session = transport_and_session
+    path = "/{}/1".format(status)
+    assert status == transport.get(session, server_url + path).status_code
+    assert 1 == _FlakyHandler.num_requests[path]
@@ -0,0 +1,136 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from threading import Event, Thread
+from time import sleep, time
+from typing import Callable
+
+from nasty._retriever.twitter_credentials import TwitterCredentialPool
+
+
+def _make_fetch_guest_token() -> Callable[[], str]:
+    counter = count()
+    return lambda: str(next(counter))
+
+
+def test_bearer_token_cached() -> None:
+    pool = TwitterCredentialPool()
+    assert "bearer" == pool.bearer_token(lambda: "bearer")
+    assert "bearer" == pool.bearer_token(lambda: "other")
+
+
+def test_guest_tokens_shared() -> None:
+    pool = TwitterCredentialPool(pool_size=2)
+    fetch_guest_token = _make_fetch_guest_token()
+
+    guest_tokens = [pool.guest_token(fetch_guest_token) for _ in range(5)]
+    assert {"0", "1"} == {guest_token.value for guest_token in guest_tokens}
+
+
+def test_guest_token_most_remaining() -> None:
+    pool = TwitterCredentialPool(pool_size=2)
+    fetch_guest_token = _make_fetch_guest_token()
+
+    guest_token0 = pool.guest_token(fetch_guest_token)
+    guest_token1 = pool.guest_token(fetch_guest_token)
+    reset = str(time() + 60)
+    guest_token0.update({"X-Rate-Limit-Remaining": "100", "X-Rate-Limit-Reset": reset})
+    guest_token1.update({"X-Rate-Limit-Remaining": "50", "X-Rate-Limit-Reset": reset})
+    assert guest_token0 is pool.guest_token(fetch_guest_token)
+
+
+def test_guest_token_refreshed_before_exhausted() -> None:
+    pool = TwitterCredentialPool(pool_size=1, refresh_threshold=5)
+    fetch_guest_token = _make_fetch_guest_token()
+
+    guest_token = pool.guest_token(fetch_guest_token)
+    guest_token.update(
+        {"X-Rate-Limit-Remaining": "6", "X-Rate-Limit-Reset": str(time() + 60)}
+    )
+    assert not pool.is_exhausted(guest_token)
+    assert guest_token is pool.guest_token(fetch_guest_token)
+
+    guest_token.update(
+        {"X-Rate-Limit-Remaining": "5", "X-Rate-Limit-Reset": str(time() + 60)}
+    )
+    assert pool.is_exhausted(guest_token)
+    assert "1" == pool.guest_token(fetch_guest_token).value
+
+
+def test_guest_token_rate_limit_window_reset() -> None:
+    pool = TwitterCredentialPool(pool_size=1)
+    guest_token = pool.guest_token(_make_fetch_guest_token())
+    guest_token.update(
+        {"X-Rate-Limit-Remaining": "0", "X-Rate-Limit-Reset": str(time() - 1)}
+    )
+    assert guest_token.remaining() is None
+    assert not pool.is_exhausted(guest_token)
+
+
+def test_guest_token_invalidate() -> None:
+    pool = TwitterCredentialPool(pool_size=1)
+    fetch_guest_token = _make_fetch_guest_token()
+
+    guest_token = pool.guest_token(fetch_guest_token)
+    pool.invalidate(guest_token)
+    assert pool.is_exhausted(guest_token)
+    assert "1" == pool.guest_token(fetch_guest_token).value
+
+
+def test_fetch_outside_lock() -> None:
+    pool = TwitterCredentialPool(pool_size=2)
+    pool.guest_token(lambda: "0")
+    pool.bearer_token(lambda: "bearer")
+
+    fetching = Event()
+    fetched = Event()
+
+    def fetch_slow_guest_token() -> str:
+        fetching.set()
+        assert fetched.wait(timeout=10)
+        return "1"
+
+    thread = Thread(target=pool.guest_token, args=(fetch_slow_guest_token,))
+    thread.start()
+    try:
+        assert fetching.wait(timeout=10)
+        # Neither the bearer token nor the guest token in the pool wait for the slow
+        # fetch, and no further guest token is fetched while the pool is full.
+        assert "bearer" == pool.bearer_token(lambda: "other")
+        assert "0" == pool.guest_token(lambda: "2").value
+    finally:
+        fetched.set()
+        thread.join()
+    assert {"0", "1"} >= {pool.guest_token(lambda: "2").value for _ in range(4)}
+
+
+def test_bearer_token_fetched_once() -> None:
+    pool = TwitterCredentialPool()
+    fetches = count()
+
+    def fetch_bearer_token() -> str:
+        next(fetches)
+        sleep(0.1)
+        return "bearer"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        bearer_tokens = list(
+            executor.map(lambda _: pool.bearer_token(fetch_bearer_token), range(4))
+        )
+    assert ["bearer"] * 4 == bearer_tokens
+    assert 1 == next(fetches)
@@ -0,0 +1,32 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from typing import Callable
+
+import pytest
+
+from nasty.batch.batch_entry import BatchEntry
+from nasty.request.search import Search
+
+
+@pytest.fixture
+def make_entry() -> Callable[..., BatchEntry]:
+    """Returns a factory of not yet executed entries, each with its own request."""
+
+    def make_entry(id_: str = "abc") -> BatchEntry:
+        return BatchEntry(Search(id_), id_=id_, completed_at=None, exception=None)
+
+    return make_entry
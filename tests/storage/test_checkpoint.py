@@ -0,0 +1,200 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import Callable, Iterable, List, Mapping, Optional, Sequence
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from overrides import overrides
+
+from nasty._util.compression import NoCompression, XzCompression
+from nasty.batch.batch import Batch, BatchExecutionMode
+from nasty.batch.batch_entry import BatchEntry
+from nasty.request.request import Request, RequestCheckpoint
+from nasty.storage.file import FileStorage
+from nasty.tweet.tweet import Tweet
+from nasty.tweet.tweet_stream import AsyncTweetStream, TweetStream
+
+from ..test_tweet import tweet_jsons
+
+_TWEETS: Sequence[Tweet] = [
+    Tweet(tweet_json) for tweet_json in list(tweet_jsons.values()) * 10
+]
+
+
+def test_write_data_after_checkpoints(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(tmp_path, XzCompression(), checkpoint_interval=2)
+    entry = make_entry()
+    assert storage.read_checkpoint(entry) is None
+
+    storage.write_checkpoint(entry, _TWEETS[:2], RequestCheckpoint("2", 2))
+    storage.write_checkpoint(entry, _TWEETS[2:4], RequestCheckpoint("4", 4))
+    assert RequestCheckpoint("4", 4) == storage.read_checkpoint(entry)
+
+    storage.write_data(entry, _TWEETS[4:])
+    assert list(_TWEETS) == list(storage.read_data(entry))
+    assert storage.read_checkpoint(entry) is None
+    assert not (tmp_path / entry.partial_data_file_name).exists()
+    assert not (tmp_path / entry.checkpoint_file_name).exists()
+
+
+def test_checkpoint_interval(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.delenv("NASTY_CHECKPOINT_INTERVAL", raising=False)
+    assert FileStorage(tmp_path).checkpoint_interval is None
+
+    monkeypatch.setenv("NASTY_CHECKPOINT_INTERVAL", "1000")
+    assert 1000 == FileStorage(tmp_path).checkpoint_interval
+
+
+def test_read_checkpoint_drops_uncheckpointed_tweets(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(tmp_path, NoCompression(), checkpoint_interval=2)
+    entry = make_entry()
+    storage.write_checkpoint(entry, _TWEETS[:2], RequestCheckpoint("2", 2))
+
+    # Simulate a crash after writing Tweets but before writing their checkpoint.
+    partial_data_file = tmp_path / entry.partial_data_file_name
+    with partial_data_file.open("a", encoding="UTF-8") as fout:
+        fout.write('{"id_str": "123", "full_te')
+
+    assert RequestCheckpoint("2", 2) == storage.read_checkpoint(entry)
+    storage.write_data(entry, _TWEETS[2:])
+    assert list(_TWEETS) == list(storage.read_data(entry))
+
+
+class _FakeTweetStream(TweetStream):
+    def __init__(self, request: "_FakeRequest", position: int):
+        self._request = request
+        self._position = position
+
+    @overrides
+    def __next__(self) -> Tweet:
+        if self._position == self._request.fail_at:
+            self._request.fail_at = None
+            raise ValueError("Simulated failure.")
+        if self._position == len(_TWEETS):
+            raise StopIteration()
+        self._position += 1
+        return _TWEETS[self._position - 1]
+
+    @overrides
+    def checkpoint(self) -> Optional[RequestCheckpoint]:
+        if self._position % _FakeRequest.BATCH_SIZE:
+            return None
+        return RequestCheckpoint(str(self._position), self._position)
+
+
+class _FakeAsyncTweetStream(AsyncTweetStream):
+    def __init__(self, tweet_stream: _FakeTweetStream):
+        self._tweet_stream = tweet_stream
+
+    @overrides
+    async def __anext__(self) -> Tweet:
+        try:
+            return next(self._tweet_stream)
+        except StopIteration:
+            raise StopAsyncIteration()
+
+    @overrides
+    def checkpoint(self) -> Optional[RequestCheckpoint]:
+        return self._tweet_stream.checkpoint()
+
+
+class _FakeRequest(Request):
+    """Returns _TWEETS in batches of BATCH_SIZE, failing once at fail_at."""
+
+    BATCH_SIZE = 2
+
+    def __init__(self, fail_at: Optional[int], name: str = ""):
+        super().__init__(max_tweets=None, batch_size=self.BATCH_SIZE)
+        self.fail_at = fail_at
+        self.name = name
+        self.checkpoints: List[Optional[RequestCheckpoint]] = []
+
+    @overrides
+    def to_json(self) -> Mapping[str, object]:
+        return {"type": type(self).__name__, "name": self.name}
+
+    @classmethod
+    @overrides
+    def from_json(cls, obj: Mapping[str, object]) -> "_FakeRequest":
+        raise NotImplementedError()
+
+    @overrides
+    def request(self, *, checkpoint: Optional[RequestCheckpoint] = None) -> TweetStream:
+        self.checkpoints.append(checkpoint)
+        return _FakeTweetStream(self, checkpoint.num_tweets if checkpoint else 0)
+
+    @overrides
+    def request_async(
+        self, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> AsyncTweetStream:
+        return _FakeAsyncTweetStream(self.request(checkpoint=checkpoint))
+
+
+# Checkpoints of requests executed in worker processes can not be inspected.
+@pytest.mark.parametrize(
+    "mode",
+    [BatchExecutionMode.THREADS, BatchExecutionMode.ASYNCIO],
+    ids=lambda mode: mode.name,
+)
+def test_execute_resumes_from_checkpoint(
+    mode: BatchExecutionMode, tmp_path: Path
+) -> None:
+    request = _FakeRequest(fail_at=5)
+    batch = Batch()
+    batch.append(request)
+    storage = FileStorage(tmp_path, XzCompression(), checkpoint_interval=3)
+
+    assert batch.execute(storage, mode=mode) is None
+    assert batch.execute(storage, mode=mode) is not None
+
+    # Checkpoints are only written at the end of batches.
+    assert [None, RequestCheckpoint("4", 4)] == request.checkpoints
+    assert list(_TWEETS) == list(storage.read_data(batch[0]))
+    assert len(_TWEETS) == storage.manifest_records()[0].num_tweets
+
+
+class _StreamingFileStorage(FileStorage):
+    def __init__(self, path: Path):
+        super().__init__(path, XzCompression(), checkpoint_interval=0)
+        self.num_written_lists = 0
+
+    @overrides
+    def write_data(self, entry: BatchEntry, tweets: Iterable[Tweet]) -> None:
+        if isinstance(tweets, list):
+            self.num_written_lists += 1
+        super().write_data(entry, tweets)
+
+
+def test_execute_asyncio_streams_data(tmp_path: Path) -> None:
+    request = _FakeRequest(fail_at=5)
+    batch = Batch()
+    batch.append(request)
+    storage = _StreamingFileStorage(tmp_path)
+
+    assert batch.execute(storage, mode=BatchExecutionMode.ASYNCIO) is None
+    assert not (tmp_path / batch[0].data_file_name).exists()
+    assert batch.execute(storage, mode=BatchExecutionMode.ASYNCIO) is not None
+
+    # Without checkpoints, Tweets are handed to the storage while being retrieved.
+    assert [None, None] == request.checkpoints
+    assert not storage.num_written_lists
+    assert list(_TWEETS) == list(storage.read_data(batch[0]))
@@ -0,0 +1,151 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import multiprocessing
+import os
+import subprocess
+import sys
+from pathlib import Path
+from time import time
+from typing import Optional
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from nasty._util.compression import XzCompression
+from nasty._util.json_ import dumps
+from nasty.batch.batch import Batch, BatchExecutionMode
+from nasty.request.request import RequestCheckpoint
+from nasty.request.search import Search
+from nasty.storage.claim_table import CLAIMS_DIR_NAME, ClaimTable
+from nasty.storage.file import FileStorage
+from nasty.tweet.tweet_stream import TweetStream
+
+from .test_checkpoint import _TWEETS, _FakeRequest
+
+
+def test_claim(tmp_path: Path) -> None:
+    claim_table1 = ClaimTable(tmp_path)
+    claim_table2 = ClaimTable(tmp_path)
+
+    assert claim_table1.try_claim("a")
+    assert not claim_table2.try_claim("a")  # Owned by this process, which is alive.
+    assert claim_table2.try_claim("b")
+
+    claim_table1.release("a")
+    assert claim_table2.try_claim("a")
+
+    claim_table1.close()
+    claim_table2.close()
+
+
+def _write_claim_file(path: Path, host: str, pid: int, touched_at: float) -> None:
+    claim_file = path / CLAIMS_DIR_NAME / "a.claim"
+    claim_file.write_text(
+        dumps({"host": host, "pid": pid, "claimed_at": touched_at}), encoding="UTF-8"
+    )
+    os.utime(str(claim_file), (touched_at, touched_at))
+
+
+def test_stale_dead_process(tmp_path: Path) -> None:
+    claim_table = ClaimTable(tmp_path)
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    _write_claim_file(tmp_path, claim_table._host, process.pid, time())
+    assert claim_table.try_claim("a")
+    claim_table.close()
+
+
+def test_stale_timeout(tmp_path: Path) -> None:
+    claim_table = ClaimTable(tmp_path)
+
+    _write_claim_file(tmp_path, "other-host", 1, time())
+    assert not claim_table.try_claim("a")
+
+    _write_claim_file(tmp_path, "other-host", 1, time() - 3600)
+    assert claim_table.try_claim("a")
+    claim_table.close()
+
+
+def _fake_search_request(
+    _self: Search, *, checkpoint: Optional[RequestCheckpoint] = None
+) -> TweetStream:
+    return _FakeRequest(fail_at=None).request(checkpoint=checkpoint)
+
+
+# Workers need to inherit the patched Search.request().
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="Requires worker processes to be forked.",
+)
+def test_execute_processes(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("NASTY_NUM_WORKERS", "3")
+    monkeypatch.setattr(Search, "request", _fake_search_request)
+    batch = Batch()
+    for i in range(8):
+        batch.append(Search(str(i)))
+    storage = FileStorage(tmp_path, XzCompression(preset=1), checkpoint_interval=3)
+
+    assert batch.execute(storage, mode=BatchExecutionMode.PROCESSES) is not None
+    for entry in batch:
+        assert entry.completed_at is not None
+        assert list(_TWEETS) == list(storage.read_data(entry))
+    assert not list((tmp_path / CLAIMS_DIR_NAME).glob("*.claim"))
+
+    # Executing again skips all entries.
+    assert batch.execute(storage, mode=BatchExecutionMode.PROCESSES) is not None
+
+
+def _logging_search_request(
+    self: Search, *, checkpoint: Optional[RequestCheckpoint] = None
+) -> TweetStream:
+    if self.since_id is None:
+        return _fake_search_request(self, checkpoint=checkpoint)
+    with Path(os.environ["NASTY_TEST_REFRESH_LOG"]).open("a") as fout:
+        fout.write(self.query + "\n")
+    # No Tweets were posted since the previous execution.
+    return _FakeRequest(fail_at=None).request(
+        checkpoint=RequestCheckpoint(str(len(_TWEETS)), len(_TWEETS))
+    )
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="Requires worker processes to be forked.",
+)
+def test_execute_processes_incremental(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    refresh_log = tmp_path / "refresh.log"
+    monkeypatch.setenv("NASTY_TEST_REFRESH_LOG", str(refresh_log))
+    monkeypatch.setenv("NASTY_NUM_WORKERS", "3")
+    monkeypatch.setattr(Search, "request", _logging_search_request)
+    batch = Batch()
+    for i in range(8):
+        batch.append(Search(str(i)))
+    storage = FileStorage(tmp_path / "results", XzCompression(preset=1))
+
+    assert batch.execute(storage, mode=BatchExecutionMode.PROCESSES) is not None
+    assert not refresh_log.exists()
+
+    # Each entry is refreshed by only one of the workers.
+    assert (
+        batch.execute(storage, mode=BatchExecutionMode.PROCESSES, incremental=True)
+        is not None
+    )
+    refreshed_queries = refresh_log.read_text(encoding="UTF-8").split()
+    assert sorted(str(i) for i in range(8)) == sorted(refreshed_queries)
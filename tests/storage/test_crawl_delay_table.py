@@ -0,0 +1,47 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+from nasty.storage.crawl_delay_table import CRAWL_DELAYS_FILE_NAME, CrawlDelayTable
+
+
+def test_reserve(tmp_path: Path) -> None:
+    crawl_delay_table1 = CrawlDelayTable(tmp_path)
+    crawl_delay_table2 = CrawlDelayTable(tmp_path)
+
+    assert 100.0 == crawl_delay_table1.reserve("a", 100.0, 5.0)
+    assert 105.0 == crawl_delay_table2.reserve("a", 100.0, 5.0)
+    assert 120.0 == crawl_delay_table1.reserve("a", 120.0, 5.0)
+    assert 100.0 == crawl_delay_table2.reserve("b", 100.0, 5.0)
+
+    # A corrupt file, e.g., after a crash while writing, resets all slots.
+    (tmp_path / CRAWL_DELAYS_FILE_NAME).write_text("{", encoding="UTF-8")
+    assert 100.0 == crawl_delay_table1.reserve("a", 100.0, 5.0)
+
+
+def _reserve_slots(path: Path, num_slots: int) -> Sequence[float]:
+    crawl_delay_table = CrawlDelayTable(path)
+    return [crawl_delay_table.reserve("a", 0.0, 1.0) for _ in range(num_slots)]
+
+
+def test_reserve_across_processes(tmp_path: Path) -> None:
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(_reserve_slots, tmp_path, 25) for _ in range(4)]
+        slots = sorted(slot for future in futures for slot in future.result())
+    assert [float(i) for i in range(100)] == slots
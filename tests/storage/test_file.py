@@ -0,0 +1,127 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from nasty._util.compression import (
+    Compression,
+    GzipCompression,
+    NoCompression,
+    XzCompression,
+    ZstdCompression,
+    compression_from_name,
+)
+from nasty._util.json_ import dumps
+from nasty.batch.batch_entry import BatchEntry
+from nasty.storage.file import ZSTD_DICTIONARY_FILE_NAME, FileStorage
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
+
+_TWEETS: Sequence[Tweet] = [Tweet(tweet_json) for tweet_json in tweet_jsons.values()]
+
+
+def _checked_preset(compression: Compression) -> int:
+    assert isinstance(compression, XzCompression)
+    return compression.preset
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [NoCompression(), GzipCompression(), XzCompression(preset=1), ZstdCompression()],
+    ids=repr,
+)
+def test_roundtrip(
+    compression: Compression, tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(tmp_path, compression)
+    entry = make_entry()
+    storage.write_data(entry, _TWEETS)
+
+    assert (tmp_path / entry.data_file_name_with_suffix(compression.suffix)).exists()
+    assert list(_TWEETS) == list(storage.read_data(entry))
+    assert [tweet.id for tweet in _TWEETS] == list(storage.read_data_ids(entry))
+
+
+def test_detect_compression(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    xz_entry, zstd_entry = make_entry("xz"), make_entry("zstd")
+    FileStorage(tmp_path, XzCompression()).write_data(xz_entry, _TWEETS)
+    FileStorage(tmp_path, ZstdCompression()).write_data(zstd_entry, _TWEETS)
+
+    storage = FileStorage(tmp_path, GzipCompression())
+    assert list(_TWEETS) == list(storage.read_data(xz_entry))
+    assert list(_TWEETS) == list(storage.read_data(zstd_entry))
+
+
+def test_zstd_dictionary(tmp_path: Path, make_entry: Callable[..., BatchEntry]) -> None:
+    dictionary = ZstdCompression.train_dictionary(
+        [dumps(tweet.to_json()) for tweet in _TWEETS * 100], size=4096
+    )
+    entry = make_entry()
+    FileStorage(tmp_path, ZstdCompression(dictionary=dictionary)).write_data(
+        entry, _TWEETS
+    )
+    assert dictionary == (tmp_path / ZSTD_DICTIONARY_FILE_NAME).read_bytes()
+
+    # Dictionary is picked up from the directory, even if not configured.
+    assert list(_TWEETS) == list(FileStorage(tmp_path).read_data(entry))
+
+    with pytest.raises(ValueError):
+        FileStorage(tmp_path, ZstdCompression(dictionary=b"other" + dictionary))
+
+
+def test_compression_from_env(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("NASTY_COMPRESSION", "gzip:1")
+    storage = FileStorage(tmp_path)
+    assert isinstance(storage.compression, GzipCompression)
+    assert 1 == storage.compression.level
+
+
+def test_compression_from_name() -> None:
+    assert isinstance(compression_from_name("none"), NoCompression)
+    assert 9 == _checked_preset(compression_from_name("xz:9"))
+    assert isinstance(compression_from_name("zstd"), ZstdCompression)
+    with pytest.raises(ValueError):
+        compression_from_name("bzip2")
+    with pytest.raises(ValueError):
+        compression_from_name("none:1")
+
+
+def test_replace_data(tmp_path: Path, make_entry: Callable[..., BatchEntry]) -> None:
+    entry = make_entry()
+    FileStorage(tmp_path, GzipCompression()).write_data(entry, _TWEETS)
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+
+    def failing_tweets() -> Iterator[Tweet]:
+        yield _TWEETS[0]
+        raise ValueError()
+
+    # The previous data is kept if the Tweets can not be retrieved completely.
+    with pytest.raises(ValueError):
+        storage.replace_data(entry, failing_tweets())
+    assert list(_TWEETS) == list(storage.read_data(entry))
+
+    storage.replace_data(entry, _TWEETS[:1])
+    assert list(_TWEETS[:1]) == list(storage.read_data(entry))
+    assert [entry.data_file_name_with_suffix(".xz").name] == [
+        file.name for file in tmp_path.glob("*.data.*")
+    ]
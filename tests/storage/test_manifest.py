@@ -0,0 +1,100 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from nasty._util.compression import XzCompression
+from nasty._util.json_ import JsonSerializedException, write_json, write_jsonl_lines
+from nasty.batch.batch_entry import BatchEntry
+from nasty.storage.file import FileStorage
+from nasty.storage.manifest import MANIFEST_FILE_NAME, Manifest, ManifestRecord
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
+
+
+def _checked_record(record: object) -> ManifestRecord:
+    assert isinstance(record, ManifestRecord)
+    return record
+
+
+def test_append(tmp_path: Path, make_entry: Callable[..., BatchEntry]) -> None:
+    manifest = Manifest(tmp_path, lambda: [])
+    failed_entry = make_entry("a")
+    failed_entry.exception = JsonSerializedException.from_exception(ValueError())
+    manifest.append(ManifestRecord(failed_entry))
+
+    completed_entry = make_entry("a")
+    completed_entry.completed_at = datetime.now()
+    completed_record = ManifestRecord(
+        completed_entry, data_file="a.data.jsonl.xz", num_tweets=1, data_file_size=10
+    )
+    manifest.append(completed_record)
+    manifest.append(ManifestRecord(make_entry("b")))
+
+    for manifest in [manifest, Manifest(tmp_path, lambda: [])]:
+        assert 2 == len(manifest.records())
+        assert completed_record == manifest.get("a")
+        assert "completed" == completed_record.status
+        assert "pending" == _checked_record(manifest.get("b")).status
+        assert manifest.get("c") is None
+
+
+def test_incomplete_line(tmp_path: Path, make_entry: Callable[..., BatchEntry]) -> None:
+    manifest = Manifest(tmp_path, lambda: [])
+    manifest.append(ManifestRecord(make_entry("a")))
+    with (tmp_path / MANIFEST_FILE_NAME).open("a", encoding="UTF-8") as fout:
+        fout.write('{"id": "b", "sta')
+
+    assert ["a"] == [
+        record.entry.id for record in Manifest(tmp_path, lambda: []).records()
+    ]
+
+
+def test_refresh(tmp_path: Path, make_entry: Callable[..., BatchEntry]) -> None:
+    manifest1 = Manifest(tmp_path, lambda: [])
+    manifest2 = Manifest(tmp_path, lambda: [])
+    manifest1.append(ManifestRecord(make_entry("a")))
+
+    assert manifest2.get("a") is None
+    manifest2.refresh()
+    assert manifest2.get("a") is not None
+
+
+def test_migrate_meta_files(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    completed_entry = make_entry("a")
+    completed_entry.completed_at = datetime.now()
+    write_json(tmp_path / completed_entry.meta_file_name, completed_entry)
+    write_jsonl_lines(
+        tmp_path / completed_entry.data_file_name,
+        [Tweet(tweet_json) for tweet_json in tweet_jsons.values()],
+        compression=XzCompression(),
+    )
+    failed_entry = make_entry("b")
+    write_json(tmp_path / failed_entry.meta_file_name, failed_entry)
+
+    storage = FileStorage(tmp_path)
+    assert (tmp_path / MANIFEST_FILE_NAME).exists()
+    assert {"a", "b"} == {entry.id for entry in storage.entries()}
+
+    entry = make_entry("a")
+    assert storage.entry_exists(entry)
+    assert completed_entry.completed_at == entry.completed_at
+    assert not storage.entry_exists(make_entry("b"))
@@ -0,0 +1,81 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+
+import pytest
+
+from nasty._util.compression import GzipCompression, XzCompression
+from nasty.request.search import Search
+from nasty.storage.response_archive import ResponseArchive, ResponseNotArchivedException
+
+
+def test_write_and_read(tmp_path: Path) -> None:
+    archive = ResponseArchive(tmp_path, XzCompression(preset=1))
+    request = Search("q")
+    archive.write(request, None, b'{"batch": 1}')
+    archive.write(request, "cursor-1", '{"batch": "ä"}'.encode("UTF-8"))
+    archive.write(Search("other"), None, b'{"batch": 1}')
+
+    # Identical responses are only stored once.
+    assert 2 == len(list((archive.path / "objects").glob("*/*.xz")))
+    assert 2 == len(list(archive.path.glob("*.jsonl")))
+
+    replay_archive = ResponseArchive(tmp_path, XzCompression(preset=1), replay=True)
+    assert b'{"batch": 1}' == replay_archive.read(request, None)
+    assert '{"batch": "ä"}'.encode("UTF-8") == replay_archive.read(request, "cursor-1")
+    assert b'{"batch": 1}' == replay_archive.read(Search("other"), None)
+
+
+def test_read_last_response(tmp_path: Path) -> None:
+    archive = ResponseArchive(tmp_path, XzCompression(preset=1))
+    request = Search("q")
+    archive.write(request, "cursor", b"{}")
+    archive.write(request, "cursor", b'{"retried": true}')
+
+    assert b'{"retried": true}' == archive.read(request, "cursor")
+
+
+def test_read_other_compression(tmp_path: Path) -> None:
+    request = Search("q")
+    ResponseArchive(tmp_path, GzipCompression()).write(request, None, b"{}")
+    assert b"{}" == ResponseArchive(tmp_path, XzCompression(), replay=True).read(
+        request, None
+    )
+
+
+def test_read_not_archived(tmp_path: Path) -> None:
+    archive = ResponseArchive(tmp_path, XzCompression(preset=1))
+    archive.write(Search("q"), None, b"{}")
+
+    with pytest.raises(ResponseNotArchivedException):
+        archive.read(Search("q"), "cursor")
+    with pytest.raises(ResponseNotArchivedException):
+        archive.read(Search("other"), None)
+
+
+def test_refreshes(tmp_path: Path) -> None:
+    archive = ResponseArchive(tmp_path, XzCompression(preset=1))
+    request = Search("q")
+    archive.write(request, None, b"{}")
+    archive.write_refresh(request, Search("q", since_id="1"))
+    archive.write_refresh(request, Search("q", since_id="2"))
+
+    assert [Search("q", since_id="1"), Search("q", since_id="2")] == list(
+        archive.refreshes(request)
+    )
+    assert [] == list(archive.refreshes(Search("other")))
+    assert b"{}" == archive.read(request, None)
@@ -0,0 +1,110 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import Sequence
+
+from nasty._util.compression import XzCompression
+from nasty.batch.batch_entry import BatchEntry
+from nasty.batch.batch_results import BatchResults
+from nasty.request.search import Search
+from nasty.storage.file import FileStorage
+from nasty.storage.tweet_index import TweetIndex
+from nasty.tweet.tweet import Tweet, TweetId
+
+from ..test_tweet import tweet_jsons
+
+_TWEET_JSON = next(iter(tweet_jsons.values()))
+_TWEETS: Sequence[Tweet] = [
+    Tweet(dict(_TWEET_JSON, id_str=str(tweet_id), full_text=str(tweet_id)))
+    for tweet_id in range(1, 101)
+]
+
+
+def _write_entry(storage: FileStorage, id_: str, tweets: Sequence[Tweet]) -> BatchEntry:
+    entry = BatchEntry(Search(id_), id_=id_, completed_at=None, exception=None)
+    storage.write_data(entry, tweets)
+    storage.write_entry(entry)
+    return entry
+
+
+def test_get_tweet(tmp_path: Path) -> None:
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+    _write_entry(storage, "a", _TWEETS[:60])
+    _write_entry(storage, "b", [])
+    _write_entry(storage, "c", list(reversed(_TWEETS[40:90])))
+
+    index = TweetIndex(tmp_path)
+    assert 3 == index.update(storage)
+    assert 90 == len(index)
+    for tweet in _TWEETS[:90]:
+        assert tweet.id in index
+        assert tweet == index.get_tweet(tweet.id)
+    for tweet_id in ["0", "91", "foo", str(1 << 70)]:
+        assert TweetId(tweet_id) not in index
+        assert index.get_tweet(TweetId(tweet_id)) is None
+
+    # Reopened indices are up to date, until new entries are written.
+    index.close()
+    index = TweetIndex(tmp_path)
+    assert 0 == index.update(storage)
+    assert _TWEETS[89] == index.get_tweet(_TWEETS[89].id)
+
+    _write_entry(storage, "d", _TWEETS[85:])
+    assert 1 == index.update(storage)
+    assert 100 == len(index)
+    for tweet in _TWEETS:
+        assert tweet == index.get_tweet(tweet.id)
+
+
+def test_batch_results(tmp_path: Path) -> None:
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+    _write_entry(storage, "a", _TWEETS)
+
+    results = BatchResults(storage)
+    assert results.contains(_TWEETS[42].id)
+    assert not results.contains(TweetId("101"))
+    assert _TWEETS[42] == results.get_tweet(_TWEETS[42].id)
+    assert results.get_tweet(TweetId("101")) is None
+
+
+def test_update_changed_entry(tmp_path: Path) -> None:
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+    entry = _write_entry(storage, "a", _TWEETS[:50])
+    _write_entry(storage, "b", _TWEETS[40:60])
+
+    index = TweetIndex(tmp_path)
+    assert 2 == index.update(storage)
+
+    storage.replace_data(entry, _TWEETS[20:30])
+    storage.write_entry(entry)
+    assert 1 == index.update(storage)
+    assert 30 == len(index)
+    for tweet in _TWEETS[:20] + _TWEETS[30:40] + _TWEETS[60:]:
+        assert tweet.id not in index
+    for tweet in _TWEETS[20:30] + _TWEETS[40:60]:
+        assert tweet == index.get_tweet(tweet.id)
+
+    # Reopened indices remember the state of the data they indexed.
+    index.close()
+    index = TweetIndex(tmp_path)
+    assert 0 == index.update(storage)
+    storage.append_data(entry, _TWEETS[90:])
+    storage.write_entry(entry)
+    assert 1 == index.update(storage)
+    for tweet in _TWEETS[20:30] + _TWEETS[40:60] + _TWEETS[90:]:
+        assert tweet == index.get_tweet(tweet.id)
+    assert 2 == len(list(tmp_path.glob("**/*.blocks")))
@@ -0,0 +1,104 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import Callable, Sequence
+
+import pytest
+
+from nasty._util.compression import XzCompression
+from nasty.batch.batch_entry import BatchEntry
+from nasty.storage.file import FileStorage
+from nasty.storage.tweet_store import TweetStore
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
+
+_TWEET_JSON = next(iter(tweet_jsons.values()))
+_TWEETS: Sequence[Tweet] = [
+    Tweet(dict(_TWEET_JSON, id_str=str(tweet_id))) for tweet_id in range(1, 31)
+]
+
+
+def test_add_and_get(tmp_path: Path) -> None:
+    store = TweetStore(tmp_path, XzCompression(preset=1))
+    assert [tweet.id for tweet in _TWEETS[:20]] == list(store.add("a", _TWEETS[:20]))
+    assert [tweet.id for tweet in _TWEETS[10:]] == list(store.add("b", _TWEETS[10:]))
+    assert 30 == len(store)
+
+    # Only Tweets not stored previously are written again.
+    assert 2 == len(list(store.path.glob("*.jsonl.xz")))
+    assert list(_TWEETS[5:25]) == list(store.get(tweet.id for tweet in _TWEETS[5:25]))
+
+    # Reopening reads the index from disk.
+    store = TweetStore(tmp_path, XzCompression(preset=1))
+    assert _TWEETS[29].id in store
+    assert list(reversed(_TWEETS)) == list(
+        store.get(tweet.id for tweet in reversed(_TWEETS))
+    )
+
+    with pytest.raises(KeyError):
+        list(store.get(["31"]))
+
+
+def test_add_same_segment(tmp_path: Path) -> None:
+    store = TweetStore(tmp_path, XzCompression(preset=1))
+    store.add("a", _TWEETS[:20])
+
+    # All Tweets are already stored, which must not remove the segment of the first
+    # call, as it is still referenced by the index.
+    store.add("a", _TWEETS[:20])
+    store.add("a", _TWEETS[10:])
+    assert 2 == len(list(store.path.glob("*.jsonl.xz")))
+    assert list(_TWEETS) == list(store.get(tweet.id for tweet in _TWEETS))
+
+
+def test_file_storage_deduplicate(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(tmp_path, XzCompression(preset=1), deduplicate=True)
+    entries = [make_entry("a"), make_entry("b"), make_entry("c")]
+    entries_tweets = [_TWEETS[:20], _TWEETS[10:], []]
+    for entry, tweets in zip(entries, entries_tweets):
+        storage.write_data(entry, tweets)
+        storage.write_entry(entry)
+
+    assert 30 == len(storage.tweet_store)
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+    for entry, tweets in zip(entries, entries_tweets):
+        assert storage.entry_exists(entry)
+        assert list(tweets) == list(storage.read_data(entry))
+        assert [tweet.id for tweet in tweets] == list(storage.read_data_ids(entry))
+
+    # Entries written without deduplication can be read from the same directory.
+    storage.write_data(make_entry("d"), _TWEETS)
+    assert list(_TWEETS) == list(storage.read_data(make_entry("d")))
+
+
+def test_file_storage_deduplicate_rewrite(
+    tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(tmp_path, XzCompression(preset=1), deduplicate=True)
+    entry = make_entry("a")
+    storage.write_data(entry, _TWEETS[:20])
+
+    # E.g., rerun after a crash before the entry itself was written. All Tweets are
+    # already stored, which must not remove the segment still referenced by them.
+    storage.write_data(entry, _TWEETS[:20])
+    storage.append_data(entry, _TWEETS[:5])
+    storage.write_entry(entry)
+    assert 1 == len(list(storage.tweet_store.path.glob("*.jsonl.xz")))
+    assert list(_TWEETS[:5]) + list(_TWEETS[:20]) == list(storage.read_data(entry))
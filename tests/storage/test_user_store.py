@@ -0,0 +1,147 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Sequence, cast
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from nasty._util.compression import XzCompression
+from nasty.batch.batch_entry import BatchEntry
+from nasty.storage.file import FileStorage
+from nasty.storage.user_store import UserStore
+from nasty.tweet.tweet import Tweet, User
+
+from ..test_tweet import tweet_jsons
+
+_TWEET_JSON = next(iter(tweet_jsons.values()))
+_USER_JSON = cast(Mapping[str, object], _TWEET_JSON["user"])
+_TWEETS: Sequence[Tweet] = [
+    Tweet(
+        dict(
+            _TWEET_JSON,
+            id_str=str(tweet_id),
+            user=dict(_USER_JSON, id_str=str(tweet_id % 3)),
+        )
+    )
+    for tweet_id in range(1, 31)
+]
+
+
+def test_add_and_get(tmp_path: Path) -> None:
+    store = UserStore(tmp_path, XzCompression(preset=1), cache_size=1)
+    users = [User(dict(_USER_JSON, id_str=str(user_id))) for user_id in range(3)]
+    store.add("a", users)
+    store.add("b", users[:2])
+    assert 3 == len(store)
+
+    # Users are only written again if they changed.
+    assert 1 == len(list(store.path.glob("*.jsonl.xz")))
+    renamed_user = User(dict(_USER_JSON, id_str="1", name="renamed"))
+    store.add("c", [users[1], renamed_user])
+    assert 2 == len(list(store.path.glob("*.jsonl.xz")))
+    assert users[0] == store.get("0")
+    assert renamed_user == store.get("1")
+
+    # Reopening reads the index from disk, where the latest version wins.
+    store = UserStore(tmp_path, XzCompression(preset=1))
+    assert "2" in store
+    assert [users[0], renamed_user, users[2]] == [
+        store.get(user_id) for user_id in ["0", "1", "2"]
+    ]
+
+    with pytest.raises(KeyError):
+        store.get("3")
+
+
+def test_tweet_resolves_user(tmp_path: Path) -> None:
+    tweet_json = dict(_TWEETS[0].json)
+    user_json = tweet_json.pop("user")
+    tweet_json["user_id_str"] = "1"
+    with pytest.raises(ValueError):
+        Tweet(tweet_json).user
+
+    store = UserStore(tmp_path, XzCompression(preset=1))
+    store.add("a", [User(user_json)])  # type: ignore
+    tweet = Tweet(tweet_json, store.get)
+    assert _TWEETS[0].user == tweet.user
+    assert _TWEETS[0] != tweet
+    assert _TWEETS[0].to_json() == tweet.to_json()
+    assert "user_id_str" not in tweet.to_json()
+
+
+@pytest.mark.parametrize("deduplicate", [False, True])
+def test_file_storage_normalize_users(
+    deduplicate: bool, tmp_path: Path, make_entry: Callable[..., BatchEntry]
+) -> None:
+    storage = FileStorage(
+        tmp_path,
+        XzCompression(preset=1),
+        deduplicate=deduplicate,
+        normalize_users=True,
+    )
+    entries = [make_entry("a"), make_entry("b")]
+    entries_tweets = [_TWEETS[:20], _TWEETS[10:]]
+    for entry, tweets in zip(entries, entries_tweets):
+        storage.write_data(entry, tweets)
+        storage.write_entry(entry)
+    storage.append_data(entries[0], _TWEETS[25:])
+
+    assert 3 == len(storage.user_store)
+    storage = FileStorage(tmp_path, XzCompression(preset=1))
+    # Read Tweets only contain the IDs of their users, which to_json() resolves.
+    assert [tweet.to_json() for tweet in list(_TWEETS[25:]) + list(_TWEETS[:20])] == [
+        tweet.to_json() for tweet in storage.read_data(entries[0])
+    ]
+    for tweet in storage.read_data(entries[1]):
+        assert "user" not in tweet.json
+        assert _TWEETS[int(tweet.id) - 1].user == tweet.user
+
+    # Entries written with embedded users can be read from the same directory.
+    storage.write_data(make_entry("c"), _TWEETS)
+    assert list(_TWEETS) == list(storage.read_data(make_entry("c")))
+
+
+@pytest.mark.parametrize("deduplicate", [False, True])
+def test_file_storage_users_stored_first(
+    deduplicate: bool,
+    monkeypatch: MonkeyPatch,
+    tmp_path: Path,
+    make_entry: Callable[..., BatchEntry],
+) -> None:
+    storage = FileStorage(
+        tmp_path,
+        XzCompression(preset=1),
+        deduplicate=deduplicate,
+        normalize_users=True,
+    )
+    entry = make_entry("a")
+    storage.write_data(entry, _TWEETS[:10])
+
+    def mock_add(segment: str, users: Iterable[User]) -> None:
+        raise OSError()
+
+    # Data files never refer to users that could not be stored.
+    monkeypatch.setattr(storage.user_store, UserStore.add.__name__, mock_add)
+    with pytest.raises(OSError):
+        storage.write_data(make_entry("b"), _TWEETS)
+    assert not list(tmp_path.glob("b.*"))
+    with pytest.raises(OSError):
+        storage.append_data(entry, _TWEETS[10:])
+    assert [tweet.id for tweet in _TWEETS[:10]] == [
+        tweet.id for tweet in storage.read_data(entry)
+    ]
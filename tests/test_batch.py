@@ -17,24 +17,31 @@
 import json
 from datetime import date, datetime
 from http import HTTPStatus
+from itertools import chain
 from pathlib import Path
-from typing import Sequence
+from typing import Iterator, List, Mapping, Optional, Sequence, Tuple, cast
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 import responses
 from _pytest.logging import LogCaptureFixture
 from _pytest.monkeypatch import MonkeyPatch
+from requests import PreparedRequest
 
 from nasty._util.io_ import read_file, read_lines_file, write_file
 from nasty._util.json_ import JsonSerializedException, read_json, write_json
 from nasty._util.typing_ import checked_cast
-from nasty.batch.batch import Batch
+from nasty.batch.batch import Batch, BatchExecutionMode
 from nasty.batch.batch_entry import BatchEntry
 from nasty.batch.batch_results import BatchResults
 from nasty.request.replies import Replies
-from nasty.request.request import Request
+from nasty.request.request import Request, RequestCheckpoint
 from nasty.request.search import Search, SearchFilter
 from nasty.request.thread import Thread
+from nasty.storage.file import FileStorage
+from nasty.tweet.tweet import Tweet, TweetId
+
+from .test_tweet import tweet_jsons
 
 REQUESTS: Sequence[Request] = [
     Search("q"),
@@ -181,6 +188,22 @@ def test_execute_success_parallel(tmp_path: Path, monkeypatch: MonkeyPatch) -> N
     _assert_results_dir_structure(tmp_path, list(batch))
 
 
+def test_execute_success_asyncio(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("NASTY_NUM_WORKERS", "16")
+    batch = Batch()
+    for i in range(16):
+        batch.append(
+            Search(
+                "trump",
+                since=date(2019, 1, i + 1),
+                until=date(2019, 1, i + 2),
+                max_tweets=50,
+            )
+        )
+    assert batch.execute(tmp_path, mode=BatchExecutionMode.ASYNCIO)
+    _assert_results_dir_structure(tmp_path, list(batch))
+
+
 def test_execute_success_empty(tmp_path: Path) -> None:
     # Random string that currently does not match any Tweet.
     unknown_word = "c9dde8b5451149e683d4f07e4c4348ef"
@@ -284,6 +307,55 @@ def test_execute_skipping(tmp_path: Path, caplog: LogCaptureFixture) -> None:
     assert data_stat1.st_mtime_ns == data_stat2.st_mtime_ns
 
 
+@pytest.mark.parametrize("deduplicate", [False, True])
+def test_incremental_refresh(
+    deduplicate: bool, tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = [Tweet(dict(tweet_json, id_str=str(tweet_id))) for tweet_id in range(1, 9)]
+    posted_tweets: List[Tweet] = []
+    requested_since_ids: List[Optional[TweetId]] = []
+
+    def mock_request(
+        self: Search, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> Iterator[Tweet]:
+        requested_since_ids.append(self.since_id)
+        return iter(
+            tweet
+            for tweet in reversed(posted_tweets)
+            if self.since_id is None or tweet.id_int > int(self.since_id)
+        )
+
+    monkeypatch.setattr(Search, Search.request.__name__, mock_request)
+    storage = FileStorage(tmp_path, checkpoint_interval=0, deduplicate=deduplicate)
+
+    def execute(*, incremental: bool) -> Sequence[Tweet]:
+        batch = Batch()
+        batch.append(Search("q", filter_=SearchFilter.LATEST))
+        results = batch.execute(storage, incremental=incremental)
+        assert results is not None
+        return list(results.tweets(results[0]))
+
+    posted_tweets[:] = tweets[:3]
+    assert tweets[2::-1] == execute(incremental=True)
+    assert [None] == requested_since_ids
+
+    posted_tweets[:] = tweets[:5]
+    assert tweets[2::-1] == execute(incremental=False)
+    assert [None] == requested_since_ids
+
+    assert tweets[4::-1] == execute(incremental=True)
+    assert [None, "3"] == requested_since_ids
+
+    assert tweets[4::-1] == execute(incremental=True)
+    assert [None, "3", "5"] == requested_since_ids
+
+    posted_tweets[:] = tweets
+    assert tweets[::-1] == execute(incremental=True)
+    assert [None, "3", "5", "5"] == requested_since_ids
+    assert "8" == storage.entries()[0].newest_tweet_id
+
+
 @pytest.mark.requests_cache_disabled
 @responses.activate
 def test_execute_exception_internal_server_error(tmp_path: Path) -> None:
@@ -307,3 +379,171 @@ def test_execute_exception_internal_server_error(tmp_path: Path) -> None:
     assert batch_entry == read_json(tmp_path / batch_entry.meta_file_name, BatchEntry)
     assert batch_entry.exception is not None
     assert batch_entry.exception.type == "UnexpectedStatusCodeException"
+
+
+@pytest.mark.requests_cache_disabled
+@responses.activate
+def test_execute_exception_internal_server_error_asyncio(tmp_path: Path) -> None:
+    responses.add(
+        responses.GET,
+        "https://mobile.twitter.com/robots.txt",
+        body="Crawl-delay: 1",
+    )
+    responses.add(
+        responses.GET,
+        "https://mobile.twitter.com/search",
+        match_querystring=False,
+        status=HTTPStatus.INTERNAL_SERVER_ERROR.value,
+    )
+
+    batch = Batch()
+    batch.append(Search("trump", max_tweets=50))
+    assert not batch.execute(tmp_path, mode=BatchExecutionMode.ASYNCIO)
+    batch_entry = batch[0]
+    assert batch_entry == read_json(tmp_path / batch_entry.meta_file_name, BatchEntry)
+    assert batch_entry.exception is not None
+    assert batch_entry.exception.type == "UnexpectedStatusCodeException"
+
+
+def _add_search_responses(
+    rsps: responses.RequestsMock,
+    tweet_json: Mapping[str, object],
+    *,
+    num_tweets: int = 50,
+    first_tweet_id: int = 1,
+) -> None:
+    """Mocks Twitter's search for num_tweets Tweets, retrieved in batches of 20."""
+
+    rsps.add(
+        responses.GET, "https://mobile.twitter.com/robots.txt", body="Crawl-delay: 0"
+    )
+    rsps.add(
+        responses.GET,
+        "https://mobile.twitter.com/search",
+        match_querystring=False,
+        body=(
+            '<script src="https://abs.twimg.com/responsive-web/client-web/main.a1.js">'
+            '</script>document.cookie = decodeURIComponent("gt=123;'
+        ),
+    )
+    rsps.add(
+        responses.GET,
+        "https://abs.twimg.com/responsive-web/client-web/main.a1.js",
+        body='a="Web-12",b="BEARER"',
+    )
+
+    user_json = cast(Mapping[str, object], tweet_json["user"])
+
+    def adaptive(request: PreparedRequest) -> Tuple[int, Mapping[str, str], str]:
+        page = int(parse_qs(urlparse(request.url).query).get("cursor", ["0"])[0])
+        tweet_ids = [
+            str(first_tweet_id + i)
+            for i in range(page * 20, min(page * 20 + 20, num_tweets))
+        ]
+        entries: List[Mapping[str, object]] = [
+            {
+                "entryId": "sq-I-t-" + tweet_id,
+                "content": {"item": {"content": {"tweet": {"id": tweet_id}}}},
+            }
+            for tweet_id in tweet_ids
+        ]
+        entries.append(
+            {
+                "entryId": "sq-cursor-bottom",
+                "content": {"operation": {"cursor": {"value": str(page + 1)}}},
+            }
+        )
+        tweets = {}
+        for tweet_id in tweet_ids:
+            tweets[tweet_id] = {
+                key: value for key, value in tweet_json.items() if key != "user"
+            }
+            tweets[tweet_id].update(id_str=tweet_id, user_id_str=user_json["id_str"])
+        body = {
+            "globalObjects": {
+                "tweets": tweets,
+                "users": {user_json["id_str"]: user_json},
+            },
+            "timeline": {"instructions": [{"addEntries": {"entries": entries}}]},
+        }
+        return 200, {}, json.dumps(body)
+
+    rsps.add_callback(
+        responses.GET,
+        "https://api.twitter.com/2/search/adaptive.json",
+        match_querystring=False,
+        callback=adaptive,
+    )
+
+
+@pytest.mark.requests_cache_disabled
+@pytest.mark.parametrize("deduplicate", [False, True])
+def test_replay(deduplicate: bool, tmp_path: Path) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    storage = FileStorage(
+        tmp_path, deduplicate=deduplicate, checkpoint_interval=0, archive_responses=True
+    )
+    batch = Batch()
+    batch.append(Search("q1", max_tweets=50))
+    batch.append(Search("q2", max_tweets=30))
+
+    # robots.txt and the bearer token may already be cached.
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        _add_search_responses(rsps, tweet_json)
+        results = batch.execute(storage)
+    assert results is not None
+    tweet_ids = [[tweet.id for tweet in results.tweets(entry)] for entry in results]
+
+    # No responses are registered, so any request to Twitter fails.
+    with responses.RequestsMock():
+        results = batch.replay(tmp_path, num_workers=2)
+    assert results is not None
+    assert tweet_ids == [
+        [tweet.id for tweet in results.tweets(entry)] for entry in results
+    ]
+    assert [str(i) for i in range(1, 51)] == tweet_ids[0]
+    assert all(entry.completed_at is not None for entry in results)
+
+
+@pytest.mark.requests_cache_disabled
+def test_replay_incremental(tmp_path: Path) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    storage = FileStorage(tmp_path, checkpoint_interval=0, archive_responses=True)
+    batch = Batch()
+    batch.append(Search("q", filter_=SearchFilter.LATEST))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        _add_search_responses(rsps, tweet_json)
+        assert batch.execute(storage) is not None
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        _add_search_responses(rsps, tweet_json, num_tweets=10, first_tweet_id=51)
+        assert batch.execute(storage, incremental=True) is not None
+
+    # Tweets added by the refresh are replayed from its responses.
+    with responses.RequestsMock():
+        results = batch.replay(tmp_path, num_workers=1)
+    assert results is not None
+    assert [str(i) for i in chain(range(51, 61), range(1, 51))] == [
+        tweet.id for tweet in results.tweets(results[0])
+    ]
+    entry = storage.read_entry(batch[0])
+    assert entry is not None
+    assert "60" == entry.newest_tweet_id
+
+
+@pytest.mark.requests_cache_disabled
+def test_replay_not_archived(tmp_path: Path) -> None:
+    storage = FileStorage(tmp_path, checkpoint_interval=0)
+    batch = Batch()
+    batch.append(Search("q", max_tweets=50))
+    storage.write_data(batch[0], [])
+    batch[0].completed_at = datetime.now()
+    storage.write_entry(batch[0])
+
+    assert batch.replay(storage, num_workers=1) is None
+    entry = storage.read_entry(batch[0])
+    assert entry is not None
+    assert entry.completed_at is not None
+    assert entry.exception is not None
+    assert entry.exception.type == "ResponseNotArchivedException"
+    assert [] == list(storage.read_data(entry))
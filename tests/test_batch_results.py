@@ -16,20 +16,26 @@
 
 from itertools import permutations
 from pathlib import Path
-from typing import Callable, Iterable, Mapping, Optional
+from typing import Callable, Iterable, Iterator, Mapping, Optional, Sequence
 
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
 import nasty.batch.batch_results
 from nasty._settings import NastySettings, TwitterApiSettings
+from nasty._util.json_ import loads
 from nasty.batch.batch import Batch
-from nasty.batch.batch_results import BatchResults
+from nasty.batch.batch_entry import BatchEntry
+from nasty.batch.batch_results import BatchResults, ExportFormat, ExportPartitioning
 from nasty.request.replies import Replies
 from nasty.request.request import Request
+from nasty.request.search import Search
 from nasty.request.thread import Thread
+from nasty.storage.file import FileStorage
 from nasty.tweet.tweet import Tweet, TweetId
 
+from .test_tweet import tweet_jsons
+
 
 def _make_batch_results(
     settings: NastySettings,
@@ -134,13 +140,13 @@ def test_double_unidify(settings: NastySettings, tmp_path: Path) -> None:
 
 def _mock_statuses_lookup(
     tweets: Mapping[TweetId, Tweet]
-) -> Callable[[Iterable[TweetId], TwitterApiSettings], Iterable[Optional[Tweet]]]:
-    def statuses_lookup(
-        tweet_ids: Iterable[TweetId], twitter_api_settings: TwitterApiSettings
-    ) -> Iterable[Tweet]:
-        return (tweets[tweet_id] for tweet_id in tweet_ids)
+) -> Callable[[Sequence[TweetId], TwitterApiSettings], Sequence[Optional[Tweet]]]:
+    def statuses_lookup_chunk(
+        tweet_ids: Sequence[TweetId], twitter_api_settings: TwitterApiSettings
+    ) -> Sequence[Tweet]:
+        return [tweets[tweet_id] for tweet_id in tweet_ids]
 
-    return statuses_lookup
+    return statuses_lookup_chunk
 
 
 @pytest.mark.parametrize(
@@ -180,7 +186,7 @@ def test_unidify_fail_and_restart(
 
     monkeypatch.setattr(
         nasty.batch.batch_results,
-        nasty.batch.batch_results.statuses_lookup.__name__,  # type: ignore
+        nasty.batch.batch_results.statuses_lookup_chunk.__name__,  # type: ignore
         _mock_statuses_lookup(tweets_truncated),
     )
 
@@ -192,7 +198,7 @@ def test_unidify_fail_and_restart(
 
     monkeypatch.setattr(
         nasty.batch.batch_results,
-        nasty.batch.batch_results.statuses_lookup.__name__,  # type: ignore
+        nasty.batch.batch_results.statuses_lookup_chunk.__name__,  # type: ignore
         _mock_statuses_lookup(tweets),
     )
 
@@ -202,3 +208,163 @@ def test_unidify_fail_and_restart(
     assert tweets == {
         tweet.id: tweet for entry in unidified for tweet in unidified.tweets(entry)
     }
+
+
+def test_unidify_chunked(
+    settings: NastySettings, monkeypatch: MonkeyPatch, tmp_path: Path
+) -> None:
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = [
+        Tweet(dict(tweet_json, id_str=str(tweet_id))) for tweet_id in range(1, 400)
+    ]
+    entries_tweets = [tweets[:250], [], tweets[250:255], tweets[255:]]
+
+    storage = FileStorage(tmp_path / "execute")
+    for i, tweets_ in enumerate(entries_tweets):
+        entry = BatchEntry(
+            Search("q{}".format(i)), id_=str(i), completed_at=None, exception=None
+        )
+        storage.write_data(entry, tweets_)
+        storage.write_entry(entry)
+    idified = BatchResults(storage).idify(tmp_path / "idify")
+    assert idified is not None
+
+    monkeypatch.setenv("NASTY_NUM_LOOKUP_WORKERS", "3")
+    monkeypatch.setattr(
+        nasty.batch.batch_results,
+        nasty.batch.batch_results.statuses_lookup_chunk.__name__,  # type: ignore
+        _mock_statuses_lookup({tweet.id: tweet for tweet in tweets}),
+    )
+    unidified = idified.unidify(settings.twitter_api, tmp_path / "unidify")
+    assert unidified is not None
+    assert len(entries_tweets) == len(unidified)
+    for entry in unidified:
+        assert entries_tweets[int(entry.id)] == list(unidified.tweets(entry))
+
+
+@pytest.mark.parametrize("format_", list(ExportFormat), ids=repr)
+@pytest.mark.parametrize("partitioning", list(ExportPartitioning), ids=repr)
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_export(
+    format_: ExportFormat,
+    partitioning: ExportPartitioning,
+    num_workers: int,
+    tmp_path: Path,
+) -> None:
+    pyarrow_dataset = pytest.importorskip("pyarrow.dataset")
+
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = [
+        Tweet(
+            dict(
+                tweet_json,
+                id_str=str(tweet_id),
+                created_at="Sun Jun {:02d} 23:56:00 +0000 2019".format(
+                    tweet_id % 3 + 1
+                ),
+            )
+        )
+        for tweet_id in range(1, 101)
+    ]
+    entries_tweets = [tweets[:60], [], tweets[40:]]
+
+    storage = FileStorage(tmp_path / "execute")
+    for i, tweets_ in enumerate(entries_tweets):
+        entry = BatchEntry(
+            Search("q{}".format(i)), id_=str(i), completed_at=None, exception=None
+        )
+        storage.write_data(entry, tweets_)
+        storage.write_entry(entry)
+
+    out_dir = tmp_path / "export"
+    results = BatchResults(storage)
+    assert results.export(
+        out_dir, format_=format_, partitioning=partitioning, num_workers=num_workers
+    )
+
+    dataset = pyarrow_dataset.dataset(
+        str(out_dir), format=format_.name.lower(), partitioning="hive"
+    )
+    table = dataset.to_table().sort_by([("entry_id", "ascending"), ("id", "ascending")])
+    assert [
+        (str(i), tweet.id_int)
+        for i, tweets_ in enumerate(entries_tweets)
+        for tweet in tweets_
+    ] == list(zip(table["entry_id"].to_pylist(), table["id"].to_pylist()))
+    created_ats = table["created_at"].to_pylist()
+    assert [tweet.created_at for tweet in tweets[:60]] == created_ats[:60]
+    assert tweets[0] == Tweet(loads(table["json"][0].as_py()))
+    if partitioning == ExportPartitioning.DATE:
+        assert {"2019-06-01", "2019-06-02", "2019-06-03"} == set(
+            table["date"].to_pylist()
+        )
+
+    # Exported entries are skipped.
+    if partitioning == ExportPartitioning.ENTRY:
+        exported_file = out_dir / "0{}".format(format_.suffix)
+        exported_file.unlink()
+        assert results.export(out_dir, format_=format_, partitioning=partitioning)
+        assert not exported_file.exists()
+
+
+@pytest.mark.parametrize("format_", list(ExportFormat), ids=repr)
+def test_export_max_open_writers(
+    format_: ExportFormat, monkeypatch: MonkeyPatch, tmp_path: Path
+) -> None:
+    pyarrow_dataset = pytest.importorskip("pyarrow.dataset")
+
+    tweet_json = next(iter(tweet_jsons.values()))
+    tweets = [
+        Tweet(
+            dict(
+                tweet_json,
+                id_str=str(tweet_id),
+                created_at="Sun Jun {:02d} 23:56:00 +0000 2019".format(
+                    tweet_id % 3 + 1
+                ),
+            )
+        )
+        for tweet_id in range(1, 31)
+    ]
+    storage = FileStorage(tmp_path / "execute")
+    entry = BatchEntry(Search("q"), id_="0", completed_at=None, exception=None)
+    storage.write_data(entry, tweets)
+    storage.write_entry(entry)
+
+    # Days alternate with every Tweet, so that writers are finished all the time.
+    monkeypatch.setattr(nasty.batch.batch_results, "EXPORT_MAX_OPEN_WRITERS", 2)
+    out_dir = tmp_path / "export"
+    assert BatchResults(storage).export(
+        out_dir, format_=format_, partitioning=ExportPartitioning.DATE, num_workers=1
+    )
+
+    dataset = pyarrow_dataset.dataset(
+        str(out_dir), format=format_.name.lower(), partitioning="hive"
+    )
+    assert [tweet.id_int for tweet in tweets] == sorted(
+        dataset.to_table()["id"].to_pylist()
+    )
+    assert 3 < len(list(out_dir.glob("date=*/0*")))
+    assert not list(out_dir.glob("**/.tmp.*"))
+
+
+def test_export_failed(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+
+    tweet_json = next(iter(tweet_jsons.values()))
+    storage = FileStorage(tmp_path / "execute")
+    entry = BatchEntry(Search("q"), id_="0", completed_at=None, exception=None)
+    storage.write_data(entry, [Tweet(tweet_json)])
+    storage.write_entry(entry)
+
+    def mock_read_data(entry: BatchEntry) -> Iterator[Tweet]:
+        yield Tweet(tweet_json)
+        raise ValueError()
+
+    monkeypatch.setattr(storage, FileStorage.read_data.__name__, mock_read_data)
+    out_dir = tmp_path / "export"
+    for partitioning in ExportPartitioning:
+        assert not BatchResults(storage).export(
+            out_dir, partitioning=partitioning, num_workers=1
+        )
+    assert not [file for file in out_dir.glob("**/*") if file.is_file()]
@@ -14,15 +14,20 @@
 # limitations under the License.
 #
 
-from datetime import date, timedelta
-from typing import Mapping, Tuple, Type
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Mapping, Optional, Tuple, Type
 
 import pytest
+from _pytest.monkeypatch import MonkeyPatch
 
+from nasty._retriever.search_retriever import SearchRetriever
 from nasty.request.replies import Replies
-from nasty.request.request import Request
-from nasty.request.search import Search
+from nasty.request.request import Request, RequestCheckpoint
+from nasty.request.search import Search, SearchFilter
 from nasty.request.thread import Thread
+from nasty.tweet.tweet import Tweet
+
+from .test_tweet import tweet_jsons
 
 
 @pytest.mark.parametrize(
@@ -47,6 +52,8 @@ def test_illegal_args(args: Tuple[Type[Request], Mapping[str, object]]) -> None:
     "request_",
     [
         Search("q"),
+        Search("q", since_id="332308211321425920"),
+        Search("q", since=datetime(2010, 1, 1, 12, 30), until=date(2010, 1, 2)),
         Replies("332308211321425920", max_tweets=None),
         Thread("332308211321425920", max_tweets=123, batch_size=456),
     ],
@@ -56,6 +63,19 @@ def test_json_conversion(request_: Request) -> None:
     assert request_ == request_.from_json(request_.to_json())
 
 
+def test_newer_request() -> None:
+    search = Search("q", since=date(2010, 1, 1), filter_=SearchFilter.LATEST)
+    newer_search = search.newer_request("332308211321425920")
+    assert "332308211321425920" == newer_search.since_id
+    assert search == Search.from_json(
+        {k: v for k, v in newer_search.to_json().items() if k != "since_id"}
+    )
+    assert search == search.newer_request(None)
+
+    assert Replies("332308211321425920").newer_request("1") is None
+    assert Thread("332308211321425920").newer_request("1") is None
+
+
 @pytest.mark.parametrize(
     "search",
     [Search("q", since=date(2010, 1, 1), until=date(2010, 2, 1))],
@@ -83,3 +103,109 @@ def test_search_to_daily_requests(search: Search) -> None:
 def test_search_into_daily_requests_illegal_args(search: Search) -> None:
     with pytest.raises(ValueError):
         search.to_daily_requests()
+
+
+def test_search_datetime_window() -> None:
+    search = Search(
+        "q", since=datetime(2010, 1, 1, 12, 30), until=datetime(2010, 1, 1, 13)
+    )
+    assert "2010-01-01T12:30:00" == search.to_json()["since"]
+    assert (
+        "q since_time:1262349000 until_time:1262350800"
+        == SearchRetriever(search)._q_url_param()
+    )
+
+    with pytest.raises(ValueError):
+        Search("q", since=datetime(2010, 1, 1, 12), until=date(2010, 1, 1))
+
+
+def _mock_timeline(monkeypatch: MonkeyPatch) -> List[Tweet]:
+    """Mocks searches to return Tweets of a timeline with busy and quiet days."""
+
+    tweet_json = next(iter(tweet_jsons.values()))
+    created_ats = [
+        datetime(2010, 1, 1, 1) + timedelta(hours=i) for i in range(0, 24, 8)
+    ]  # Quiet day.
+    created_ats += [
+        datetime(2010, 1, 2) + timedelta(seconds=i) for i in range(0, 86400, 12)
+    ]  # Busy day, with 7200 Tweets.
+    # 2010-01-03 has no Tweets.
+    created_ats += [datetime(2010, 1, 4, 12, i) for i in range(10)]
+    timeline = [
+        Tweet(
+            dict(
+                tweet_json,
+                id_str=str(i),
+                created_at=created_at.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+            )
+        )
+        for i, created_at in enumerate(created_ats)
+    ]
+
+    def mock_request(
+        self: Search, *, checkpoint: Optional[RequestCheckpoint] = None
+    ) -> Iterator[Tweet]:
+        assert self.since is not None and self.until is not None
+        return iter(_window_tweets(timeline, self)[: self.max_tweets])
+
+    monkeypatch.setattr(Search, Search.request.__name__, mock_request)
+    return timeline
+
+
+def _window_tweets(timeline: List[Tweet], search: Search) -> List[Tweet]:
+    assert search.since is not None and search.until is not None
+    since, until = search.since, search.until
+    if not isinstance(since, datetime):
+        since = datetime.combine(since, datetime.min.time())
+    if not isinstance(until, datetime):
+        until = datetime.combine(until, datetime.min.time())
+    return [
+        tweet
+        for tweet in reversed(timeline)
+        if since <= tweet.created_at.replace(tzinfo=None) < until
+    ]
+
+
+def test_search_to_adaptive_requests(monkeypatch: MonkeyPatch) -> None:
+    timeline = _mock_timeline(monkeypatch)
+    search = Search(
+        "q", since=date(2010, 1, 1), until=date(2010, 1, 5), max_tweets=None
+    )
+
+    requests = search.to_adaptive_requests(max_window_tweets=1000)
+    num_tweets = [len(_window_tweets(timeline, request)) for request in requests]
+    assert len(timeline) == sum(num_tweets)
+    assert len(timeline) == sum(len(list(request.request())) for request in requests)
+    assert all(0 < n <= 1000 for n in num_tweets)
+    # The busy day needs at least 8 requests, quiet days are merged into its first and
+    # last window.
+    assert 8 <= len(requests) <= 12
+    assert date(2010, 1, 1) == requests[0].since
+    assert isinstance(requests[1].since, datetime)
+
+    # Large windows need no splitting at all.
+    assert [search] == search.to_adaptive_requests(max_window_tweets=10000)
+
+
+def test_search_to_adaptive_requests_max_tweets(monkeypatch: MonkeyPatch) -> None:
+    timeline = _mock_timeline(monkeypatch)
+    search = Search("q", since=date(2010, 1, 2), until=date(2010, 1, 3), max_tweets=500)
+
+    requests = search.to_adaptive_requests()
+    assert all(
+        0 < len(_window_tweets(timeline, request)) <= 500 for request in requests
+    )
+    assert 7200 == sum(len(list(request.request())) for request in requests)
+
+
+def test_search_to_adaptive_requests_illegal_args() -> None:
+    with pytest.raises(ValueError):
+        Search("q").to_adaptive_requests()
+    with pytest.raises(ValueError):
+        Search(
+            "q", since=date(2010, 1, 1), until=date(2010, 1, 2)
+        ).to_adaptive_requests(max_window_tweets=10)
+    with pytest.raises(ValueError):
+        Search(
+            "q", since=date(2010, 1, 1), until=date(2010, 1, 2), max_tweets=10
+        ).to_adaptive_requests()
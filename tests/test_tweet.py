@@ -14,8 +14,12 @@
 # limitations under the License.
 #
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
+import pytest
+
+from nasty._util.consts import TWITTER_CREATED_AT_FORMAT
+from nasty._util.time_ import parse_twitter_created_at
 from nasty.tweet.tweet import Tweet, User
 
 tweet_jsons = {
@@ -249,3 +253,50 @@ def test_1142944425502543875() -> None:
     assert "TomSteyer" == user.screen_name
     assert "https://twitter.com/TomSteyer" == user.url
     assert user == User.from_json(user.to_json())
+    assert 1142944425502543875 == tweet.id_int
+
+
+def test_memoized() -> None:
+    tweet = Tweet(tweet_jsons["1142944425502543875"])
+    assert tweet.created_at is tweet.created_at
+    assert tweet.user is tweet.user
+    assert not hasattr(tweet, "__dict__")
+
+
+def test_hash_and_eq() -> None:
+    tweet_json = tweet_jsons["1142944425502543875"]
+    other_tweet_json = dict(tweet_json, id_str="1")
+
+    tweet = Tweet(tweet_json)
+    assert tweet == Tweet(dict(tweet_json))
+    assert hash(tweet) == hash(Tweet(dict(tweet_json)))
+    assert tweet != Tweet(other_tweet_json)
+    assert tweet != Tweet(dict(tweet_json, full_text=""))
+    assert 2 == len({tweet, Tweet(dict(tweet_json)), Tweet(other_tweet_json)})
+
+
+@pytest.mark.parametrize(
+    "string",
+    [
+        "Sun Jun 23 23:56:00 +0000 2019",
+        "Mon Jan 01 00:00:00 +0000 2007",
+        "Tue Dec 31 23:59:59 +0530 2019",
+        "Wed Feb 29 12:30:01 -0800 2012",
+        "Thu Mar 5 1:02:03 +0000 2020",  # Not fixed width.
+    ],
+)
+def test_parse_twitter_created_at(string: str) -> None:
+    expected = datetime.strptime(string, TWITTER_CREATED_AT_FORMAT)
+    parsed = parse_twitter_created_at(string)
+    assert expected == parsed
+    assert expected.utcoffset() == parsed.utcoffset()
+    assert parsed.utcoffset() is not None
+
+
+def test_parse_twitter_created_at_invalid() -> None:
+    with pytest.raises(ValueError):
+        parse_twitter_created_at("Sun Foo 23 23:56:00 +0000 2019")
+    assert (
+        timedelta()
+        == parse_twitter_created_at("Sun Jun 23 23:56:00 +0000 2019").utcoffset()
+    )
@@ -0,0 +1,408 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import re
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from logging import getLogger
+from random import Random
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic, sleep, time
+from types import TracebackType
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+from urllib.parse import parse_qs, urlsplit
+from zlib import crc32
+
+from typing_extensions import Final
+
+from ..test_tweet import tweet_jsons
+
+logger = getLogger(__name__)
+
+_MAIN_JS_PATH: Final = "/responsive-web/client-web/main.0123abcd.js"
+_BEARER_TOKEN: Final = "MOCKBEARERTOKEN"
+_CONVERSATION_PATH: Final = re.compile("/2/timeline/conversation/([0-9]+).json")
+
+# Tweets of a timeline are created one minute apart, counting back from this date.
+_NEWEST_CREATED_AT: Final = datetime(2020, 1, 1, tzinfo=timezone.utc)
+_NUM_USERS: Final = 100
+
+
+class MockTwitterStats(NamedTuple):
+    num_requests: int
+    num_tweets: int
+    status_codes: Mapping[str, int]
+    # Seconds between answering a batch of a timeline and receiving the request for its
+    # next batch, i.e., how long the client took to process the batch.
+    batch_turnarounds: Sequence[float]
+
+
+class MockTwitter:
+    """Local HTTP server standing in for the parts of Twitter used by retrievers.
+
+    Serves robots.txt, the HTML stubs of search and status pages, the main JS-script
+    carrying the bearer token, search/adaptive.json for Search requests, and
+    timeline/conversation/<id>.json for Replies requests. Each timeline consists of
+    num_tweets Tweets, derived from the Tweet JSON used in the tests, which are paged
+    through via cursors like Twitter does. Once a search timeline is exhausted, empty
+    batches with further cursors are returned. Batch requests fail at the given rates
+    with 429 TOO MANY REQUESTS, 403 FORBIDDEN, or 503 SERVICE UNAVAILABLE, and all
+    responses are delayed by latency seconds.
+
+    Retrievers are pointed to the server by setting the environment variable
+    NASTY_REDIRECT_URL to its url. Can be used as a context manager, which serves
+    requests on a background thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        num_tweets: int = 1000,
+        latency: float = 0.0,
+        crawl_delay: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        forbidden_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        self.num_tweets: Final = num_tweets
+        self.latency: Final = latency
+        self.crawl_delay: Final = crawl_delay
+        self.rate_limit_rate: Final = rate_limit_rate
+        self.forbidden_rate: Final = forbidden_rate
+        self.server_error_rate: Final = server_error_rate
+
+        self._lock: Final = Lock()
+        self._random: Final = Random(seed)
+        self._num_requests = 0
+        self._num_tweets = 0
+        self._status_codes: MutableMapping[str, int] = {}
+        self._batch_sent_at: Dict[Tuple[str, str], float] = {}
+        self._batch_turnarounds: List[float] = []
+
+        self._server: Final = _ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.mock_twitter = self
+        self._thread: Optional[Thread] = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{:d}".format(self._server.server_address[1])
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> None:
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockTwitter":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def stats(self) -> MockTwitterStats:
+        with self._lock:
+            return MockTwitterStats(
+                num_requests=self._num_requests,
+                num_tweets=self._num_tweets,
+                status_codes=dict(self._status_codes),
+                batch_turnarounds=list(self._batch_turnarounds),
+            )
+
+    def respond(
+        self, path: str, params: Mapping[str, str]
+    ) -> Tuple[HTTPStatus, str, object]:
+        """Returns status code, content type, and body of the response to a request."""
+
+        if self.latency:
+            sleep(self.latency)
+
+        if path == "/robots.txt":
+            return (
+                HTTPStatus.OK,
+                "text/plain",
+                "User-agent: *\nCrawl-delay: {}\n".format(self.crawl_delay),
+            )
+        elif path == "/search" or path.startswith("/_/status/"):
+            return HTTPStatus.OK, "text/html", self._timeline_stub()
+        elif path == _MAIN_JS_PATH:
+            return (
+                HTTPStatus.OK,
+                "application/javascript",
+                'a="Web-12",b="{}"'.format(_BEARER_TOKEN),
+            )
+        elif path == "/_mock/stats":
+            return HTTPStatus.OK, "application/json", self.stats()._asdict()
+
+        conversation_match = _CONVERSATION_PATH.fullmatch(path)
+        if path == "/2/search/adaptive.json":
+            timeline = params["q"]
+        elif conversation_match:
+            timeline = conversation_match.group(1)
+        else:
+            return HTTPStatus.NOT_FOUND, "text/plain", ""
+
+        status = self._draw_status()
+        if status != HTTPStatus.OK:
+            return status, "application/json", {"errors": [{"code": status.value}]}
+
+        cursor = params.get("cursor")
+        offset = int(cursor.split(":")[-1]) if cursor else 0
+        count = int(params.get("count", "20"))
+        tweet_ids = [
+            _tweet_id(timeline, i)
+            for i in range(offset, min(offset + count, self.num_tweets))
+        ]
+        next_cursor = "scroll:{:d}".format(offset + count)
+
+        self._track_batch(path, timeline, cursor is not None, len(tweet_ids))
+        if conversation_match:
+            body = self._conversation_batch(timeline, tweet_ids, next_cursor)
+        else:
+            body = self._search_batch(tweet_ids, next_cursor, first=cursor is None)
+        return HTTPStatus.OK, "application/json", body
+
+    def track_response(self, status: HTTPStatus) -> None:
+        with self._lock:
+            self._num_requests += 1
+            self._status_codes[str(status.value)] = (
+                self._status_codes.get(str(status.value), 0) + 1
+            )
+
+    def _draw_status(self) -> HTTPStatus:
+        with self._lock:
+            value = self._random.random()
+        for status, rate in (
+            (HTTPStatus.TOO_MANY_REQUESTS, self.rate_limit_rate),
+            (HTTPStatus.FORBIDDEN, self.forbidden_rate),
+            (HTTPStatus.SERVICE_UNAVAILABLE, self.server_error_rate),
+        ):
+            if value < rate:
+                return status
+            value -= rate
+        return HTTPStatus.OK
+
+    def _track_batch(
+        self, path: str, timeline: str, has_cursor: bool, num_tweets: int
+    ) -> None:
+        now = monotonic()
+        with self._lock:
+            self._num_tweets += num_tweets
+            sent_at = self._batch_sent_at.get((path, timeline))
+            if has_cursor and sent_at is not None:
+                self._batch_turnarounds.append(now - sent_at)
+            self._batch_sent_at[(path, timeline)] = now
+
+    def _timeline_stub(self) -> str:
+        return (
+            '<html><head><script src="https://abs.twimg.com{}"></script></head>'
+            '<body><script>document.cookie = decodeURIComponent("gt={:d}; '
+            'Max-Age=10800; Domain=.twitter.com; Path=/; Secure");</script></body>'
+            "</html>".format(_MAIN_JS_PATH, int(time() * 1000))
+        )
+
+    def _global_objects(self, tweet_ids: Sequence[str]) -> Mapping[str, object]:
+        tweets = {}
+        users = {}
+        for i, tweet_id in enumerate(tweet_ids):
+            tweet = deepcopy(_TEMPLATE_TWEET)
+            user = deepcopy(_TEMPLATE_USER)
+            user_id = str(1000 + int(tweet_id) % _NUM_USERS)
+            user["id"] = int(user_id)
+            user["id_str"] = user_id
+            tweet["id"] = int(tweet_id)
+            tweet["id_str"] = tweet_id
+            tweet["created_at"] = (
+                _NEWEST_CREATED_AT - timedelta(minutes=_tweet_offset(tweet_id))
+            ).strftime("%a %b %d %H:%M:%S +0000 %Y")
+            tweet["user_id"] = int(user_id)
+            tweet["user_id_str"] = user_id
+            tweets[tweet_id] = tweet
+            users[user_id] = user
+        return {"tweets": tweets, "users": users}
+
+    def _search_batch(
+        self, tweet_ids: Sequence[str], next_cursor: str, *, first: bool
+    ) -> Mapping[str, object]:
+        entries: List[Mapping[str, object]] = [
+            {
+                "entryId": "sq-I-t-" + tweet_id,
+                "sortIndex": str(999999 - i),
+                "content": {
+                    "item": {
+                        "content": {"tweet": {"id": tweet_id, "displayType": "Tweet"}}
+                    }
+                },
+            }
+            for i, tweet_id in enumerate(tweet_ids)
+        ]
+        cursor_entries = [
+            {
+                "entryId": "sq-cursor-" + cursor_type.lower(),
+                "sortIndex": "0",
+                "content": {
+                    "operation": {"cursor": {"value": value, "cursorType": cursor_type}}
+                },
+            }
+            for cursor_type, value in (("Top", "refresh:0"), ("Bottom", next_cursor))
+        ]
+
+        # The first batch contains the cursors as entries, following ones replace them.
+        instructions: List[Mapping[str, object]]
+        if first:
+            instructions = [{"addEntries": {"entries": entries + cursor_entries}}]
+        else:
+            instructions = [{"addEntries": {"entries": entries}}] + [
+                {
+                    "replaceEntry": {
+                        "entryIdToReplace": cursor_entry["entryId"],
+                        "entry": cursor_entry,
+                    }
+                }
+                for cursor_entry in cursor_entries
+            ]
+        return {
+            "globalObjects": self._global_objects(tweet_ids),
+            "timeline": {"id": "search-0", "instructions": instructions},
+        }
+
+    def _conversation_batch(
+        self, tweet_id: str, reply_ids: Sequence[str], next_cursor: str
+    ) -> Mapping[str, object]:
+        entries: List[Mapping[str, object]] = [
+            {
+                "entryId": "conversationThread-" + reply_id,
+                "sortIndex": str(999999 - i),
+                "content": {
+                    "timelineModule": {
+                        "items": [
+                            {
+                                "entryId": "tweet-" + reply_id,
+                                "item": {
+                                    "content": {
+                                        "tweet": {
+                                            "id": reply_id,
+                                            "displayType": "Tweet",
+                                        }
+                                    }
+                                },
+                            }
+                        ]
+                    }
+                },
+            }
+            for i, reply_id in enumerate(reply_ids)
+        ]
+        # Unlike search timelines, conversations end without a cursor.
+        if reply_ids and _tweet_offset(reply_ids[-1]) < self.num_tweets - 1:
+            entries.append(
+                {
+                    "entryId": "cursor-bottom-0",
+                    "sortIndex": "0",
+                    "content": {
+                        "operation": {
+                            "cursor": {"value": next_cursor, "cursorType": "Bottom"}
+                        }
+                    },
+                }
+            )
+        return {
+            "globalObjects": self._global_objects(reply_ids),
+            "timeline": {
+                "id": "Conversation-" + tweet_id,
+                "instructions": [{"addEntries": {"entries": entries}}],
+            },
+        }
+
+
+_TEMPLATE_TWEET: Final = {
+    name: value
+    for name, value in tweet_jsons["1142944425502543875"].items()
+    if name != "user"
+}
+_TEMPLATE_USER: Final = tweet_jsons["1142944425502543875"]["user"]
+
+
+def _tweet_id(timeline: str, offset: int) -> str:
+    """Returns the ID of the Tweet at the offset of the timeline, newest first.
+
+    IDs are unique across timelines, and the offset can be recovered from them.
+    """
+
+    return str((((1 << 32) + crc32(timeline.encode("UTF-8"))) << 24) - offset)
+
+
+def _tweet_offset(tweet_id: str) -> int:
+    return -int(tweet_id) % (1 << 24)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    mock_twitter: MockTwitter
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _ThreadingHTTPServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, content_type, body = self.server.mock_twitter.respond(url.path, params)
+        self.server.mock_twitter.track_response(status)
+
+        content = (body if isinstance(body, str) else json.dumps(body)).encode("UTF-8")
+        self.send_response(status.value)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        if url.path.startswith("/2/"):
+            self.send_header("X-Rate-Limit-Limit", "180")
+            self.send_header("X-Rate-Limit-Remaining", "179")
+            self.send_header("X-Rate-Limit-Reset", str(int(time()) + 900))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
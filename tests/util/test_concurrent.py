@@ -0,0 +1,66 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from threading import Lock
+from time import sleep
+from typing import Iterator
+
+import pytest
+
+from nasty._util.concurrent_ import map_ordered
+
+
+def test_order() -> None:
+    def func(item: int) -> int:
+        # Later items finish first.
+        sleep((10 - item) / 1000)
+        return 2 * item
+
+    assert [2 * item for item in range(10)] == list(
+        map_ordered(func, range(10), max_workers=4)
+    )
+
+
+def test_bounded() -> None:
+    lock = Lock()
+    num_pulled = 0
+    num_yielded = 0
+
+    def items() -> Iterator[int]:
+        nonlocal num_pulled
+        for item in range(100):
+            with lock:
+                assert num_pulled - num_yielded <= 4
+                num_pulled += 1
+            yield item
+
+    for _ in map_ordered(lambda item: item, items(), max_workers=4):
+        with lock:
+            num_yielded += 1
+    assert 100 == num_yielded
+
+
+def test_exception() -> None:
+    def func(item: int) -> int:
+        if item == 5:
+            raise KeyError(item)
+        return item
+
+    results = []
+    with pytest.raises(KeyError):
+        for result in map_ordered(func, range(10), max_workers=3):
+            results.append(result)
+    assert list(range(5)) == results
@@ -0,0 +1,72 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from typing import Iterator, List
+
+import pytest
+
+from nasty._util.json_ import (
+    JsonCodec,
+    OrjsonJsonCodec,
+    StdlibJsonCodec,
+    dumps,
+    get_json_codec,
+    loads,
+    orjson,
+    set_json_codec,
+)
+from nasty.tweet.tweet import Tweet
+
+from ..test_tweet import tweet_jsons
+
+
+def _codecs() -> List[JsonCodec]:
+    codecs: List[JsonCodec] = [StdlibJsonCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonJsonCodec())
+    return codecs
+
+
+@pytest.fixture(params=_codecs(), ids=lambda codec: codec.name)
+def codec(request: pytest.FixtureRequest) -> Iterator[JsonCodec]:
+    prev_codec = get_json_codec()
+    set_json_codec(request.param)
+    yield request.param
+    set_json_codec(prev_codec)
+
+
+def test_roundtrip(codec: JsonCodec) -> None:
+    for tweet_json in tweet_jsons.values():
+        assert tweet_json == loads(dumps(tweet_json))
+        assert tweet_json == loads(dumps(tweet_json, indent=True))
+        assert tweet_json == loads(dumps(tweet_json).encode("UTF-8"))
+        assert Tweet(tweet_json) == Tweet(loads(dumps(Tweet(tweet_json).to_json())))
+
+
+def test_interoperable(codec: JsonCodec) -> None:
+    for other_codec in _codecs():
+        for tweet_json in tweet_jsons.values():
+            assert tweet_json == other_codec.loads(codec.dumps(tweet_json))
+
+
+def test_big_int(codec: JsonCodec) -> None:
+    obj = {"big": 1 << 70}
+    assert obj == loads(dumps(obj))
+
+
+def test_invalid(codec: JsonCodec) -> None:
+    with pytest.raises(ValueError):
+        loads("{")
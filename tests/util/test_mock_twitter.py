@@ -0,0 +1,55 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from nasty.batch.batch import Batch
+from nasty.request.replies import Replies
+from nasty.request.search import Search
+
+from .mock_twitter import MockTwitter
+
+
+@pytest.mark.requests_cache_disabled
+def test_batch(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    with MockTwitter(num_tweets=45, server_error_rate=0.3) as mock_twitter:
+        monkeypatch.setenv("NASTY_REDIRECT_URL", mock_twitter.url)
+
+        batch = Batch()
+        batch.append(Search("trump", max_tweets=None, batch_size=20))
+        batch.append(Search("obama", max_tweets=None, batch_size=20))
+        batch.append(Replies("1142944425502543875", max_tweets=None, batch_size=20))
+        results = batch.execute(tmp_path)
+        stats = mock_twitter.stats()
+
+    assert results is not None
+    tweet_ids = set()
+    for entry in results:
+        tweets = list(results.tweets(entry))
+        assert 45 == len(tweets)
+        assert (
+            sorted(tweets, key=lambda tweet: tweet.created_at, reverse=True) == tweets
+        )
+        tweet_ids.update(tweet.id for tweet in tweets)
+    assert 3 * 45 == len(tweet_ids)
+
+    # Search timelines end after three empty batches, conversations without a cursor.
+    assert 2 * (3 + 3 - 1) + (3 - 1) == len(stats.batch_turnarounds)
+    assert 3 * 45 == stats.num_tweets
+    assert 0 < stats.status_codes["503"]
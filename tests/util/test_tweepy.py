@@ -0,0 +1,105 @@
+#
+# Copyright 2019-2020 Lukas Schmelzeisen
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import timedelta
+from time import time
+
+from nasty._settings import TwitterApiSettings
+from nasty._util.tweepy_ import (
+    STATUSES_LOOKUP_RATE_LIMIT_WINDOW,
+    StatusesLookupQuota,
+    _get_client_pool,
+)
+
+
+def test_all_credentials() -> None:
+    settings = TwitterApiSettings.load_from_str(
+        """
+        consumer_api_key = "Enter Twitter consumer API key here"
+        consumer_api_secret = "Enter Twitter consumer API secret key here"
+
+        [[additional]]
+        consumer_api_key = "key1"
+        consumer_api_secret = "secret1"
+
+        [[additional]]
+        consumer_api_key = "key2"
+        consumer_api_secret = "secret2"
+        access_token = "token2"
+        access_token_secret = "token-secret2"
+        """
+    )
+    credentials = settings.all_credentials()
+    assert 2 == len(credentials)
+    assert credentials[0].consumer_api_key is not None
+    assert "key1" == credentials[0].consumer_api_key.get_secret_value()
+    assert credentials[0].access_token is None
+    assert credentials[1].access_token is not None
+    assert "token2" == credentials[1].access_token.get_secret_value()
+
+
+def _make_quota(
+    *,
+    remaining: int,
+    reset_in: float = 0.0,
+    seconds_per_request: float = 0.0,
+    num_workers: int = 1,
+) -> StatusesLookupQuota:
+    return StatusesLookupQuota(
+        num_credentials=2,
+        remaining=remaining,
+        limit=1800,
+        reset=time() + reset_in if reset_in else None,
+        seconds_per_request=seconds_per_request,
+        num_workers=num_workers,
+    )
+
+
+def test_quota_eta_within_remaining() -> None:
+    assert timedelta() == _make_quota(remaining=100).eta(100 * 100)
+    assert timedelta(seconds=25) == _make_quota(
+        remaining=100, seconds_per_request=1.0, num_workers=4
+    ).eta(100 * 100)
+
+
+def test_quota_eta_rate_limited() -> None:
+    # Remaining requests suffice until the reset, after which one window is needed.
+    eta = _make_quota(remaining=100, reset_in=60).eta(1000 * 100)
+    assert abs(eta - timedelta(seconds=60)) <= timedelta(seconds=1)
+
+    # Three more windows are needed after the reset.
+    eta = _make_quota(remaining=0, reset_in=60).eta(5000 * 100)
+    expected = timedelta(seconds=60 + 2 * STATUSES_LOOKUP_RATE_LIMIT_WINDOW)
+    assert abs(eta - expected) <= timedelta(seconds=1)
+
+
+def test_client_pool_per_credentials() -> None:
+    def settings(access_token: str) -> TwitterApiSettings:
+        return TwitterApiSettings.load_from_str(
+            """
+            consumer_api_key = "key"
+            consumer_api_secret = "secret"
+            access_token = "{}"
+            access_token_secret = "token-secret"
+            """.format(
+                access_token
+            )
+        )
+
+    client_pool = _get_client_pool(settings("token1"))
+    assert client_pool is _get_client_pool(settings("token1"))
+    assert client_pool is not _get_client_pool(settings("token2"))
+    assert client_pool is _get_client_pool(settings("token1"))
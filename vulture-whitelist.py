@@ -10,6 +10,8 @@ description  # unused variable (src/nasty/_cli.py:131)
 _since_validator  # unused function (src/nasty/_cli.py:150)
 _until_validator  # unused function (src/nasty/_cli.py:161)
 _daily_validator  # unused function (src/nasty/_cli.py:196)
+_adaptive_validator  # unused function (src/nasty/_cli.py:220)
+_replay_validator  # unused function (src/nasty/_cli.py:370)
 title  # unused variable (src/nasty/_cli.py:236)
 aliases  # unused variable (src/nasty/_cli.py:237)
 description  # unused variable (src/nasty/_cli.py:238)
@@ -36,9 +38,10 @@ _.num_tombstones  # unused attribute (src/nasty/_retriever/replies_retriever.py:
 _.num_tombstones  # unused attribute (src/nasty/_retriever/thread_retriever.py:132)
 SingleMetavarHelpFormatter  # unused class (src/nasty/_util/argparse_.py:23)
 _._format_action_invocation  # unused method (src/nasty/_util/argparse_.py:24)
-pytest_configure  # unused function (tests/conftest.py:30)
-activate_requests_cache  # unused function (tests/conftest.py:56)
-disrespect_robotstxt  # unused function (tests/conftest.py:67)
+pytest_configure  # unused function (tests/conftest.py:31)
+activate_requests_cache  # unused function (tests/conftest.py:58)
+disrespect_robotstxt  # unused function (tests/conftest.py:69)
+clear_retriever_state  # unused function (tests/conftest.py:75)
 min_tombstones  # unused variable (tests/retriever/test_replies.py:70)
 min_tombstones  # unused variable (tests/retriever/test_thread.py:67)
 exc_type  # unused variable (tests/util/requests_cache.py:174)